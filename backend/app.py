@@ -100,6 +100,18 @@ def setup_database_indexes():
                 safe_create_index(collection, "newsHash")
                 safe_create_index(collection, "id", unique=True)  # id should be unique
             
+            # Indexes for ticker_mentions rollup (unique bucket key + TTL)
+            from processors.mention_rollup import mention_rollup
+            mention_rollup.ensure_indexes()
+            
+            # Index for batch run checkpoints (resume รอบที่ยังไม่จบ)
+            from processors.batch_run_checkpoint import batch_run_checkpoint
+            batch_run_checkpoint.ensure_indexes()
+            
+            # TTL index สำหรับ article content cache (URL ที่ดึงไม่สำเร็จ)
+            from fetchers.article_content_pipeline import article_content_pipeline
+            article_content_pipeline.ensure_indexes()
+            
             print("✅ Database indexes setup completed")
     except Exception as e:
         print(f"⚠️ Error setting up indexes: {e}")
@@ -315,7 +327,8 @@ def get_stock_data(symbol):
         # 3. บันทึกลง database เพื่อใช้ครั้งต่อไป (ใช้ batch_processor)
         try:
             # ใช้ batch_processor เพื่อบันทึกข้อมูล (จะ clean old data และ deduplicate news อัตโนมัติ)
-            asyncio.run(batch_processor.process_single_stock_async(symbol.upper()))
+            # ✅ ปิด aiohttp session ใน loop เดียวกัน (เนื้อหาข่าวถูกดึงต่อใน article content pipeline)
+            asyncio.run(batch_processor.refresh_single_stock_async(symbol.upper()))
         except Exception as e:
             print(f"⚠️ Error saving to database: {e}")
             # ถ้าบันทึกไม่ได้ก็ไม่เป็นไร ยังส่งข้อมูลกลับไปได้
@@ -418,6 +431,14 @@ def refresh_stock_list():
             "message": "Failed to refresh stock list"
         }), 500
 
+@app.route("/api/sentiment/cache-stats")
+def get_sentiment_cache_stats():
+    """Get hit/miss stats of the sentiment memo cache"""
+    try:
+        return jsonify(sentiment_analyzer.get_memo_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/stock-list/stats")
 def get_stock_list_stats():
     """Get statistics about the stock list"""
@@ -502,46 +523,9 @@ def get_dashboard_data():
     try:
         time_range = request.args.get("timeRange", "24h")
         
-        # Get recently tracked stocks
-        recent_stocks = list(db.stock_data.find().sort("fetchedAt", -1).limit(10))
-        
-        # Serialize
-        for stock in recent_stocks:
-            stock["_id"] = str(stock["_id"])
-        
-        # Calculate summary stats
-        total_stocks = db.stock_data.count_documents({})
-        positive_sentiment = db.stock_data.count_documents({
-            "overallSentiment.label": "positive"
-        })
-        negative_sentiment = db.stock_data.count_documents({
-            "overallSentiment.label": "negative"
-        })
-        
-        # Calculate total mentions
-        total_mentions = 0
-        for stock in recent_stocks:
-            total_mentions += stock.get("redditData", {}).get("mentionCount", 0)
-            total_mentions += stock.get("newsData", {}).get("articleCount", 0)
-        
-        # Calculate average sentiment
-        sentiments = [s.get("overallSentiment", {}).get("compound", 0) for s in recent_stocks if s.get("overallSentiment")]
-        avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-        
-        return jsonify({
-            "recentStocks": recent_stocks,
-            "stats": {
-                "totalTracked": total_stocks,
-                "positiveSentiment": positive_sentiment,
-                "negativeSentiment": negative_sentiment,
-                "totalMentions": total_mentions,
-                "avgSentiment": avg_sentiment,
-                "mentionsChange": 0,  # TODO: Calculate change
-                "sentimentChange": 0,  # TODO: Calculate change
-                "spikeEvents": 0,  # TODO: Calculate spikes
-                "activeAlerts": 0  # TODO: Get active alerts count
-            }
-        })
+        # ✅ counts, change deltas, spikes และ active alerts จาก $facet เดียว (cache ต่อ timeRange)
+        from processors.dashboard_stats import dashboard_stats
+        return jsonify(dashboard_stats.get_stats(time_range))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -554,7 +538,11 @@ def get_heatmap_data():
         time_range = request.args.get("timeRange", "24h")
         
         # Get stocks sorted by mentions
-        stocks = list(db.stock_data.find().sort("fetchedAt", -1).limit(100))
+        from processors.stock_snapshot_loader import stock_data_snapshot_loader
+        stocks = stock_data_snapshot_loader.get_recent(
+            100,
+            fields=["redditData.mentionCount", "newsData.articleCount", "overallSentiment.compound", "stockInfo.sector"]
+        )
         
         items = []
         for stock in stocks:
@@ -598,118 +586,29 @@ def get_trending_topics():
     try:
         source = request.args.get("source", "all")  # ✅ เปลี่ยน default เป็น "all" เพื่อดึงจากทุก source
         time_range = request.args.get("timeRange", "24h")
+        top_n = min(max(int(request.args.get("limit", 100)), 1), 500)
         
-        # Calculate time cutoff
-        from datetime import timedelta
-        import re
-        now = datetime.utcnow()
-        if time_range == "24h":
-            cutoff = now - timedelta(hours=24)
-        elif time_range == "7d":
-            cutoff = now - timedelta(days=7)
-        elif time_range == "30d":
-            cutoff = now - timedelta(days=30)
-        elif time_range == "1h":
-            cutoff = now - timedelta(hours=1)
-        elif time_range == "6h":
-            cutoff = now - timedelta(hours=6)
-        else:
-            cutoff = now - timedelta(hours=24)
+        engine = request.args.get("engine", "rollup")  # rollup (ticker_mentions) หรือ raw (scan posts)
         
-        # ✅ ดึงจาก collection ที่ถูกต้องตาม source
-        from utils.post_normalizer import get_collection_name
+        from processors.trending_aggregator import trending_aggregator
+        from processors.mention_rollup import mention_rollup
         
-        posts = []
+        # ✅ รวม buckets จาก ticker_mentions rollup ก่อน (เร็วที่สุด)
+        summary = None
+        if engine == "rollup":
+            summary = mention_rollup.aggregate_tickers(source, time_range, top_n=top_n)
+            if summary is not None and summary["total_posts"] == 0:
+                summary = None
         
-        # กำหนด collection ตาม source
-        if source == "yahoo" or source == "news":
-            # ดึงจาก post_yahoo collection
-            collection_name = get_collection_name('yahoo')
-        elif source == "reddit":
-            # ดึงจาก post_reddit collection
-            collection_name = get_collection_name('reddit')
-        elif source == "all":
-            # ดึงจากทั้งสอง collections
-            yahoo_collection_name = get_collection_name('yahoo')
-            reddit_collection_name = get_collection_name('reddit')
-            
-            # ดึงจาก post_yahoo
-            if hasattr(db, yahoo_collection_name):
-                yahoo_collection = getattr(db, yahoo_collection_name)
-                yahoo_query = {"created_utc": {"$gte": cutoff}}
-                yahoo_posts = list(yahoo_collection.find(yahoo_query).sort("created_utc", -1).limit(5000))
-                if not yahoo_posts:
-                    yahoo_query_str = {"created_utc": {"$gte": cutoff.isoformat()}}
-                    yahoo_posts = list(yahoo_collection.find(yahoo_query_str).sort("created_utc", -1).limit(5000))
-                posts.extend(yahoo_posts)
-            
-            # ดึงจาก post_reddit
-            if hasattr(db, reddit_collection_name):
-                reddit_collection = getattr(db, reddit_collection_name)
-                reddit_query = {"created_utc": {"$gte": cutoff}}
-                reddit_posts = list(reddit_collection.find(reddit_query).sort("created_utc", -1).limit(5000))
-                if not reddit_posts:
-                    reddit_query_str = {"created_utc": {"$gte": cutoff.isoformat()}}
-                    reddit_posts = list(reddit_collection.find(reddit_query_str).sort("created_utc", -1).limit(5000))
-                posts.extend(reddit_posts)
-            
-            print(f"✅ Found {len([p for p in posts if 'yahoo' in str(p.get('source', '')).lower()])} Yahoo posts and {len([p for p in posts if 'reddit' in str(p.get('source', '')).lower()])} Reddit posts")
-        else:
-            # Default: ดึงจาก post_reddit (backward compatibility)
-            collection_name = get_collection_name('reddit')
+        # ✅ ถ้า rollup ยังไม่มีข้อมูล / ยังไม่ครอบคลุมช่วงเวลานี้ → นับ tickers จาก raw posts ด้วย aggregation pipeline
+        if summary is None:
+            engine = "raw"
+            summary = trending_aggregator.aggregate_tickers(source, time_range, top_n=top_n)
+        rows = summary["rows"]
+        total_posts = summary["total_posts"]
+        cutoff = summary["cutoff"]
         
-        # ถ้ายังไม่ได้ดึง (source != "all")
-        if source != "all" and not posts:
-            # Build query - handle both datetime objects and string timestamps
-            time_query = {"created_utc": {"$gte": cutoff}}
-            
-            if hasattr(db, collection_name):
-                post_collection = getattr(db, collection_name)
-                posts = list(post_collection.find(time_query).sort("created_utc", -1).limit(5000))
-                
-                # If no posts found, try with string comparison (in case created_utc is stored as string)
-                if not posts:
-                    time_query_str = {"created_utc": {"$gte": cutoff.isoformat()}}
-                    posts = list(post_collection.find(time_query_str).sort("created_utc", -1).limit(5000))
-                
-                # If no posts with time filter, try without time filter (fallback to show all available data)
-                if not posts:
-                    print(f"⚠️ No posts found with time filter (cutoff: {cutoff.isoformat()}), trying without time filter to show all available data...")
-                    query = {}
-                    posts = list(post_collection.find(query).sort("created_utc", -1).limit(5000))
-                    if posts:
-                        print(f"✅ Found {len(posts)} posts from {collection_name} (showing all available data, not filtered by time)")
-                        # ✅ แจ้งเตือนว่าใช้ข้อมูลทั้งหมด (ไม่กรองเวลา)
-                        print(f"   💡 Note: Using all available data (not filtered by {time_range}) because no recent posts found")
-        
-        # ✅ ถ้ายังไม่มี posts ให้ลองดึงจาก collection อื่นหรือขยาย time range
-        if not posts:
-            print(f"⚠️ No posts found in {collection_name} for source: {source} with time filter ({time_range}), trying to get any available data...")
-            # ลองดึงข้อมูลทั้งหมดโดยไม่กรองเวลา (fallback)
-            if source == "all":
-                # ถ้า source = all แต่ไม่เจอ ให้ลองดึงจากแต่ละ collection
-                yahoo_collection_name = get_collection_name('yahoo')
-                reddit_collection_name = get_collection_name('reddit')
-                
-                if hasattr(db, yahoo_collection_name):
-                    yahoo_collection = getattr(db, yahoo_collection_name)
-                    yahoo_posts = list(yahoo_collection.find({}).sort("created_utc", -1).limit(5000))
-                    posts.extend(yahoo_posts)
-                    print(f"   📊 Found {len(yahoo_posts)} Yahoo posts (no time filter)")
-                
-                if hasattr(db, reddit_collection_name):
-                    reddit_collection = getattr(db, reddit_collection_name)
-                    reddit_posts = list(reddit_collection.find({}).sort("created_utc", -1).limit(5000))
-                    posts.extend(reddit_posts)
-                    print(f"   📊 Found {len(reddit_posts)} Reddit posts (no time filter)")
-            else:
-                # ลองดึงข้อมูลทั้งหมดจาก collection ที่เลือก
-                if hasattr(db, collection_name):
-                    post_collection = getattr(db, collection_name)
-                    posts = list(post_collection.find({}).sort("created_utc", -1).limit(5000))
-                    print(f"   📊 Found {len(posts)} posts from {collection_name} (no time filter)")
-        
-        if not posts:
+        if total_posts == 0:
             print(f"❌ No posts found in database for source: {source}, timeRange: {time_range}")
             print(f"   💡 Suggestions:")
             print(f"      1. Try changing time range (e.g., 7d or 30d)")
@@ -717,18 +616,7 @@ def get_trending_topics():
             print(f"      3. Wait for scheduled updater to fetch data (Reddit every 45 seconds, Yahoo every 30 minutes)")
             print(f"      4. Enable real-time mode to fetch data immediately")
             
-            # ✅ ตรวจสอบว่ามี posts ใน database หรือไม่ (ไม่กรองเวลา)
-            total_posts_count = 0
-            if source == "all":
-                yahoo_collection_name = get_collection_name('yahoo')
-                reddit_collection_name = get_collection_name('reddit')
-                if hasattr(db, yahoo_collection_name):
-                    total_posts_count += getattr(db, yahoo_collection_name).count_documents({})
-                if hasattr(db, reddit_collection_name):
-                    total_posts_count += getattr(db, reddit_collection_name).count_documents({})
-            else:
-                if hasattr(db, collection_name):
-                    total_posts_count = getattr(db, collection_name).count_documents({})
+            total_posts_count = trending_aggregator.count_posts_in_database(source)
             
             return jsonify({
                 "topics": [],
@@ -740,190 +628,49 @@ def get_trending_topics():
                 "tip": f"Try changing time range to '7d' or '30d', or change source to 'all'. Data is being fetched automatically (Reddit every 45 seconds, Yahoo every 30 minutes)."
             })
         
-        # Extract stock tickers ($SYMBOL format) from all posts
-        # Count ALL mentions (not just once per post) to reflect true trending
-        ticker_freq = {}
-        ticker_sources = {}  # Track which sources mention each ticker
-        ticker_sentiment = {}  # Track average sentiment per ticker
-        ticker_posts = {}  # Track unique posts mentioning each ticker
+        if cutoff is None:
+            print(f"   💡 Note: Using all available data (not filtered by {time_range}) because no recent posts found")
+        print(f"📊 Aggregated {total_posts} posts → {summary['total_tickers']} tickers (returning top {len(rows)})")
         
-        # Regex pattern to match $SYMBOL format (1-5 uppercase letters after $)
-        ticker_pattern = re.compile(r'\$([A-Z]{1,5})\b')
+        # ✅ ดึง posts เฉพาะ top-N tickers (เฉพาะ fields ที่ใช้) เพื่อตรวจสอบ pump and dump
+        top_tickers = [row["ticker"] for row in rows]
+        posts = trending_aggregator.fetch_posts_for_tickers(source, top_tickers, cutoff)
         
-        print(f"📊 Processing {len(posts)} posts to extract tickers...")
+        # ✅ ดึง stock_info ของ top tickers ทั้งหมดด้วย query เดียว เพื่อตรวจสอบ volume spike
+        from processors.stock_snapshot_loader import stock_snapshot_loader, extract_pump_dump_info
+        snapshots = stock_snapshot_loader.get_snapshots(top_tickers)
         
-        for post in posts:
-            # Combine all text fields
-            text = f"{post.get('title', '')} {post.get('selftext', '')} {post.get('text', '')} {post.get('body', '')}"
-            post_source = post.get('source', 'unknown')
-            
-            # ✅ ดึง sentiment จาก database (ที่ถูกวิเคราะห์และบันทึกไว้แล้ว)
-            post_sentiment = 0
-            if post.get('sentiment'):
-                if isinstance(post.get('sentiment'), dict):
-                    post_sentiment = post.get('sentiment', {}).get('compound', 0)
-                else:
-                    post_sentiment = post.get('sentiment', 0)
-            elif post.get('sentiment_score'):
-                # Backward compatibility
-                post_sentiment = post.get('sentiment_score', 0)
-            # ✅ ถ้าไม่มี sentiment ใน database ให้คำนวณใหม่ (สำหรับ posts เก่าที่ยังไม่มี sentiment)
-            elif text.strip():
-                try:
-                    sentiment_result = sentiment_analyzer.analyze(text)
-                    post_sentiment = sentiment_result.get('compound', 0)
-                    # บันทึก sentiment กลับไปที่ database (optional - เพื่อไม่ให้คำนวณซ้ำ)
-                    # แต่ไม่ทำตอนนี้เพราะจะช้า - จะให้ scheduled updater จัดการ
-                except Exception:
-                    post_sentiment = 0
-            
-            # ✅ Debug: แสดงตัวอย่าง sentiment (เฉพาะ 5 posts แรก)
-            if len([p for p in posts if p == post]) <= 5:
-                print(f"   🔍 Debug post sentiment: {post.get('id', 'unknown')[:10]}... → {post_sentiment}")
-            
-            post_id = str(post.get('_id', ''))
-            
-            # ✅ วิธีที่ 1: ใช้ field 'symbols' หรือ 'symbol' ที่มีอยู่แล้วใน post (เร็วกว่าและแม่นยำกว่า)
-            tickers = []
-            if post.get('symbols') and isinstance(post.get('symbols'), list):
-                # ใช้ symbols array ที่ถูก extract แล้ว
-                tickers = [s.upper() for s in post.get('symbols') if s]
-            elif post.get('symbol'):
-                # ใช้ symbol field (backward compatibility)
-                tickers = [post.get('symbol').upper()]
-            
-            # ✅ วิธีที่ 2: ถ้าไม่มี symbols field ให้หาจาก text ด้วย regex (fallback)
-            if not tickers:
-                tickers = ticker_pattern.findall(text.upper())
-            
-            # Track unique tickers per post for post count
-            unique_tickers_in_post = set()
-            
-            for ticker in tickers:
-                # Filter out common false positives
-                if ticker in ['USD', 'GDP', 'CEO', 'IPO', 'ETF', 'SEC', 'IRS', 'FDA', 'AI', 'IT', 'TV', 'PC', 'USA']:
-                    continue
-                
-                # Count ALL mentions (not just once per post) - this reflects true trending
-                ticker_freq[ticker] = ticker_freq.get(ticker, 0) + 1
-                
-                # Track unique posts mentioning this ticker
-                if ticker not in ticker_posts:
-                    ticker_posts[ticker] = set()
-                if ticker not in unique_tickers_in_post:
-                    unique_tickers_in_post.add(ticker)
-                    ticker_posts[ticker].add(post_id)
-                
-                # Track sources
-                if ticker not in ticker_sources:
-                    ticker_sources[ticker] = set()
-                ticker_sources[ticker].add(post_source)
-                
-                # Track sentiment (cumulative for averaging later)
-                if ticker not in ticker_sentiment:
-                    ticker_sentiment[ticker] = []
-                ticker_sentiment[ticker].append(post_sentiment)
-        
-        # ✅ Import pump and dump detector
-        from processors.pump_dump_detector import PumpDumpDetector
-        pump_dump_detector = PumpDumpDetector()
-        
-        # Convert to list with additional metadata
-        topics = []
-        for ticker, count in ticker_freq.items():
-            # Calculate average sentiment
-            sentiments = ticker_sentiment.get(ticker, [])
-            avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-            
-            # Get unique post count
-            unique_post_count = len(ticker_posts.get(ticker, set()))
-            
-            # ✅ ดึง posts สำหรับ ticker นี้เพื่อตรวจสอบ pump and dump
-            ticker_posts_list = []
-            for post in posts:
-                post_tickers = post.get('symbols', []) or ([post.get('symbol')] if post.get('symbol') else [])
-                if ticker in [t.upper() for t in post_tickers]:
-                    ticker_posts_list.append(post)
-            
-            # ✅ ดึง stock_info จาก database เพื่อตรวจสอบ volume spike
-            stock_info = {}
-            if db is not None and hasattr(db, 'stocks') and db.stocks is not None:
-                stock_doc = db.stocks.find_one(
-                    {"symbol": ticker.upper()},
-                    sort=[("fetchedAt", -1)]
-                )
-                if stock_doc:
-                    stock_info_data = stock_doc.get('stockInfo', {})
-                    stock_info = {
-                        'volume': stock_info_data.get('volume', 0),
-                        'averageVolume': stock_info_data.get('averageVolume', 0),
-                        'changePercent': stock_info_data.get('changePercent', 0) or stock_info_data.get('priceChangePercent', 0),
-                        'priceChangePercent': stock_info_data.get('changePercent', 0) or stock_info_data.get('priceChangePercent', 0),
-                        'currentPrice': stock_info_data.get('currentPrice', 0) or stock_info_data.get('price', 0)
-                    }
-            
-            # ✅ ตรวจจับ pump and dump
-            pump_dump_result = pump_dump_detector.detect_pump_dump(ticker, ticker_posts_list, stock_info)
-            
-            # ✅ คำนวณ trust score และปรับ sentiment
-            trust_score = pump_dump_detector.calculate_trust_score(ticker, ticker_posts_list, stock_info)
-            adjusted_sentiment = pump_dump_detector.adjust_sentiment_by_trust(avg_sentiment, trust_score)
-            
-            topics.append({
-                "word": ticker,  # Keep 'word' for compatibility
-                "ticker": ticker,  # Add explicit ticker field
-                "count": count,  # Total mentions (all occurrences)
-                "mentions": count,  # Alias for count
-                "uniquePosts": unique_post_count,  # Number of unique posts
-                "sources": list(ticker_sources.get(ticker, set())),
-                "sourceCount": len(ticker_sources.get(ticker, set())),
-                "avgSentiment": round(avg_sentiment, 3),  # Original sentiment
-                "adjustedSentiment": round(adjusted_sentiment, 3),  # ✅ Adjusted sentiment (filtered pump/dump)
-                "trustScore": round(trust_score, 1),  # ✅ Trust score (0-100)
-                "isPumpDump": pump_dump_result.get("is_pump_dump", False),  # ✅ Is pump and dump?
-                "riskScore": round(pump_dump_result.get("risk_score", 0), 1),  # ✅ Risk score (0-100)
-                "pumpDumpSignals": pump_dump_result.get("signals", {}),  # ✅ Detection signals
-                "recommendation": pump_dump_result.get("recommendation", "")  # ✅ Recommendation
-            })
+        def load_stock_info(ticker):
+            return extract_pump_dump_info(snapshots.get(ticker))
         
-        # Sort by mention count (most mentioned first) - ALWAYS show highest mentions first
-        topics.sort(key=lambda x: x["count"], reverse=True)
+        # ✅ ตรวจจับ pump and dump / trust score (ใช้ ticker → posts index ที่สร้างในรอบเดียว)
+        topics = trending_aggregator.build_topics(rows, posts, load_stock_info)
         
         # Log top 5 for debugging (รวม sentiment)
         if topics:
             top5_with_sentiment = [(t['ticker'], t['count'], f"{t.get('avgSentiment', 0):.3f}") for t in topics[:5]]
             print(f"📊 Top 5 trending tickers: {top5_with_sentiment}")
             # ✅ Debug: ตรวจสอบ sentiment ของ posts
-            if topics and topics[0].get('avgSentiment', 0) == 0:
+            if topics[0].get('avgSentiment', 0) == 0:
                 print(f"   ⚠️  WARNING: Top ticker {topics[0].get('ticker')} has avgSentiment = 0")
                 print(f"   💡 ตรวจสอบว่า posts มี sentiment field หรือไม่")
         else:
-            # Debug: ตรวจสอบว่าทำไมไม่เจอ ticker
-            print(f"⚠️ No tickers found from {len(posts)} posts")
-            if posts:
-                # ตรวจสอบ posts ตัวอย่าง
-                sample_post = posts[0]
-                print(f"   Sample post fields: {list(sample_post.keys())}")
-                print(f"   Has 'symbols' field: {sample_post.get('symbols') is not None}")
-                print(f"   Has 'symbol' field: {sample_post.get('symbol') is not None}")
-                if sample_post.get('symbols'):
-                    print(f"   Symbols in sample: {sample_post.get('symbols')}")
-                if sample_post.get('symbol'):
-                    print(f"   Symbol in sample: {sample_post.get('symbol')}")
+            print(f"⚠️ No tickers found from {total_posts} posts")
         
         result = {
-            "topics": topics[:100],  # Top 100 (เพิ่มจาก 50 เพื่อให้หุ้นที่อยู่นอก 50 มีโอกาสเข้ามา)
+            "topics": topics,  # Top N (default 100) เรียงตาม mentions จาก pipeline แล้ว
             "source": source,
             "timeRange": time_range,
-            "totalPosts": len(posts),
-            "totalTickers": len(topics)
+            "totalPosts": total_posts,
+            "totalTickers": summary["total_tickers"],
+            "engine": engine
         }
         
         # If no tickers found, add helpful message
         if len(topics) == 0:
-            result["message"] = f"No stock tickers found. Analyzed {len(posts)} posts. The posts may not have ticker symbols extracted yet. Scheduled updater will extract tickers automatically."
+            result["message"] = f"No stock tickers found. Analyzed {total_posts} posts. The posts may not have ticker symbols extracted yet. Scheduled updater will extract tickers automatically."
             result["debug"] = {
-                "totalPosts": len(posts),
+                "totalPosts": total_posts,
                 "tip": "Posts are being processed. Tickers will be extracted automatically by the scheduled updater."
             }
         
@@ -1020,8 +767,14 @@ def get_trending_realtime():
             # จะดึงเฉพาะหุ้นที่มีข้อมูลจาก source นั้น
             pass  # ตอนนี้ยังไม่กรอง source เพราะข้อมูลถูก aggregate แล้ว
         
-        stocks_cursor = db.stocks.find(stocks_query).sort("fetchedAt", -1).limit(1000)
-        stocks_list = list(stocks_cursor)
+        from processors.stock_snapshot_loader import stock_snapshot_loader
+        stocks_list = stock_snapshot_loader.get_recent(
+            1000,
+            fields=["symbol", "fetchedAt", "stockInfo", "overallSentiment",
+                    "newsData", "redditData", "twitterData", "youtubeData"],
+            query=stocks_query,
+            cache_key="trending-realtime-24h"
+        )
         
         print(f"   ✅ Found {len(stocks_list)} stocks in database")
         
@@ -1334,31 +1087,14 @@ def get_event_analysis():
 
 @app.route("/api/sparklines")
 def get_sparklines():
-    """Get mentions volume sparklines"""
+    """Get mentions volume + sentiment sparklines (from ticker_mentions rollup)"""
     try:
         time_range = request.args.get("timeRange", "24h")
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
         
-        # Get recent stocks
-        stocks = list(db.stock_data.find().sort("fetchedAt", -1).limit(20))
-        
-        sparklines = []
-        for stock in stocks:
-            symbol = stock.get("symbol")
-            if not symbol:
-                continue
-            
-            # Generate mock sparkline data (in production, would aggregate by time)
-            import random
-            data = [random.randint(0, 100) for _ in range(24)]
-            current = data[-1] if data else 0
-            
-            sparklines.append({
-                "ticker": symbol,
-                "data": data,
-                "current": current
-            })
-        
-        return jsonify({"sparklines": sparklines})
+        # ✅ aggregation เดียวสำหรับทุก tickers (cache ต่อ timeRange)
+        from processors.mention_rollup import mention_rollup
+        return jsonify(mention_rollup.get_sparklines(time_range, limit=limit))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1370,7 +1106,8 @@ def get_divergence():
         time_range = request.args.get("timeRange", "24h")
         
         # Get stocks with price and sentiment data
-        stocks = list(db.stock_data.find().sort("fetchedAt", -1).limit(50))
+        from processors.stock_snapshot_loader import stock_data_snapshot_loader
+        stocks = stock_data_snapshot_loader.get_recent(50, fields=["stockInfo", "overallSentiment"])
         
         items = []
         for stock in stocks:
@@ -1414,14 +1151,11 @@ def get_raw_feed():
             post_collection = getattr(db, collection_name)
             posts = list(post_collection.find().sort("created_utc", -1).limit(limit))
         
-        # Serialize and add sentiment
-        from processors.sentiment_analyzer import SentimentAnalyzer
-        analyzer = SentimentAnalyzer()
-        
+        # Serialize and add sentiment (ใช้ analyzer ของ app - ข้อความที่เคยวิเคราะห์แล้วจะมาจาก memo)
         result = []
         for post in posts:
             text = f"{post.get('title', '')} {post.get('selftext', '')}"
-            sentiment = analyzer.analyze(text)
+            sentiment = sentiment_analyzer.analyze(text)
             
             result.append({
                 "id": str(post.get("_id")),
@@ -2130,7 +1864,8 @@ def batch_process_stocks():
         {
             "symbols": ["AAPL", "TSLA", ...],  // Optional: ถ้าไม่ระบุจะดึงทั้งหมด
             "days_back": 7,  // Optional: จำนวนวันที่ดึงข่าวย้อนหลัง
-            "batch_size": 100  // Optional: จำนวนหุ้นต่อ batch
+            "batch_size": 100,  // Optional: จำนวนหุ้นต่อ batch
+            "resume": false  // Optional: ทำต่อจากรอบที่ค้าง (default: true เฉพาะตอนดึงทั้งหมด)
         }
     """
     try:
@@ -2138,6 +1873,9 @@ def batch_process_stocks():
         symbols = data.get("symbols", [])
         days_back = data.get("days_back", 7)
         batch_size = data.get("batch_size", 100)
+        # ✅ ระบุ symbols เอง → เริ่มรอบใหม่เสมอ (ไม่ไปทำต่อรอบอื่นที่ค้าง) เว้นแต่ขอ resume
+        resume = bool(data.get("resume", not symbols))
+        job = None if symbols else "batch-process-all"
         
         # ถ้าไม่ระบุ symbols ให้ดึงทั้งหมด
         if not symbols:
@@ -2160,7 +1898,7 @@ def batch_process_stocks():
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         results = loop.run_until_complete(
-            batch_processor.process_all_stocks_async(symbols, batch_size=batch_size)
+            batch_processor.process_all_stocks_async(symbols, batch_size=batch_size, resume=resume, job=job)
         )
         loop.close()
         
@@ -2212,10 +1950,15 @@ def manual_update_stocks():
 def batch_status():
     """ตรวจสอบสถานะ batch processing"""
     try:
-        # นับจำนวนหุ้นใน database
+        from processors.batch_run_checkpoint import batch_run_checkpoint
+        
+        # ✅ live progress ของรอบปัจจุบัน (หรือรอบล่าสุด) จาก checkpoint - ไม่ต้องนับ collection ทุก request
+        run_progress = batch_run_checkpoint.get_progress()
+        
+        # จำนวนหุ้นใน database (จาก collection metadata - ไม่ scan)
         total_stocks = 0
         if db is not None and hasattr(db, 'stocks') and db.stocks is not None:
-            total_stocks = db.stocks.count_documents({})
+            total_stocks = db.stocks.estimated_document_count()
         
         # หาหุ้นที่อัปเดตล่าสุด
         latest_update = None
@@ -2232,6 +1975,11 @@ def batch_status():
                     latest_update = str(latest_update_value) if latest_update_value else None
         
         # ตรวจสอบ scheduled_updater attributes
+        from scheduling.priority_refresh_scheduler import priority_refresh_scheduler
+        from utils.host_rate_limiter import host_rate_limiter
+        from utils.blocking_executor import blocking_executor
+        from fetchers.article_content_pipeline import article_content_pipeline
+        from fetchers.article_http_cache import article_http_cache
         scheduler_running = False
         update_interval_hours = 0.5  # ✅ default value: 30 นาที (0.5 ชั่วโมง)
         next_update_info = None
@@ -2251,7 +1999,16 @@ def batch_status():
             "latest_update": latest_update,
             "scheduler_running": scheduler_running,
             "update_interval_hours": update_interval_hours,
-            "next_update": next_update_info  # ✅ เพิ่มข้อมูลเวลาที่จะอัปเดตครั้งถัดไป
+            "next_update": next_update_info,  # ✅ เพิ่มข้อมูลเวลาที่จะอัปเดตครั้งถัดไป
+            "run": run_progress,  # ✅ progress ของรอบ batch (completed/failed/pending/ETA)
+            "news_dedup": batch_processor.get_dedup_stats(),  # ✅ ขนาด/false positive rate ของ news dedup filter
+            "priority_refresh": priority_refresh_scheduler.get_metrics(),  # ✅ SLA compliance ต่อ tier
+            "rate_limits": host_rate_limiter.get_stats(),  # ✅ tokens granted / waits / 429 ต่อ host
+            "blocking_io": blocking_executor.get_stats(),  # ✅ queue depth ของ thread pool (yfinance/requests fallback)
+            "article_content": article_content_pipeline.get_stats(),  # ✅ คิว/cache ของการดึงเนื้อหาข่าว
+            "article_http_cache": article_http_cache.get_stats(),  # ✅ hit rate ของ disk cache (304 / HTML เดิม)
+            "reddit_sweep": reddit_bulk_scheduler.processor.last_sweep_stats,  # ✅ เวลาต่อ subreddit ของรอบล่าสุด
+            "reddit_ingest": reddit_bulk_scheduler.get_metrics()  # ✅ เวลาต่อรอบ / pacing / backlog ของ Reddit service
         })
     except Exception as e:
         import traceback
@@ -2351,7 +2108,7 @@ def batch_fetch_news():
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         results = loop.run_until_complete(
-            batch_processor.process_all_stocks_async(symbols, batch_size=batch_size)
+            batch_processor.process_all_stocks_async(symbols, batch_size=batch_size, job="batch-fetch-news")
         )
         loop.close()
         
@@ -2368,6 +2125,8 @@ def batch_fetch_news():
             "processed": len(results),
             "total": len(symbols),
             "total_news_in_db": total_news,
+            "new_news": sum(r.get("newsSaved", {}).get("new", 0) for r in results.values()),
+            "duplicate_news": sum(r.get("newsSaved", {}).get("duplicates", 0) for r in results.values()),
             "message": f"Successfully fetched news for {len(results)}/{len(symbols)} stocks",
             "updatedAt": datetime.utcnow().isoformat()
         })
@@ -2476,22 +2235,25 @@ if __name__ == "__main__":
             print("✅ มีข้อมูลใน database แล้ว - ข้าม initial update")
             print("   💡 ใช้ /api/batch/update เพื่ออัปเดตข้อมูลด้วยตนเอง")
     
-    # ✅ Start Reddit bulk scheduler (ดึง Reddit ทุก 45 วินาที)
+    # ✅ Start Reddit bulk scheduler (service ต่อเนื่อง - รอบละ ~45 วินาที ปรับตามปริมาณ posts)
+    # ✅ หยุดตอนปิด process: รอรอบปัจจุบันเสร็จ แล้วปิด Reddit client / connections
+    import atexit
     reddit_bulk_scheduler.start()
-    print("✅ Reddit bulk scheduler started (fetches Reddit every 45 seconds)")
+    atexit.register(reddit_bulk_scheduler.stop)
+    print("✅ Reddit bulk scheduler started (continuous sweeps, adaptive pacing)")
     
     scheduled_updater.start(run_initial_update=run_initial)
     print("✅ Scheduled updater started (updates Yahoo Finance every 30 minutes)")
     
     print("🚀 Flask API running on http://127.0.0.1:5000")
-    print("💡 Reddit bulk scheduler: ดึง Reddit ทุก 45 วินาที")
+    print("💡 Reddit bulk scheduler: ดึง Reddit ต่อเนื่อง (ทุก ~45 วินาที, ปรับตามปริมาณ posts)")
     print("💡 Scheduled updater: อัปเดต Yahoo Finance ทุก 30 นาที (เฉพาะหุ้นที่เก่า)")
     print("💡 Batch processor is ready - use /api/batch/process to process all stocks")
     print("💡 Use /api/batch/fetch-news to fetch news for all stocks")
     print("")
     print("="*70)
     print("✅ ระบบทำงานต่อเนื่องใน background")
-    print("   - Reddit: ดึงข้อมูลทุก 45 วินาที (ทำงานต่อเนื่อง)")
+    print("   - Reddit: ดึงข้อมูลต่อเนื่องทีละรอบ (ทุก ~45 วินาที)")
     print("   - Yahoo Finance: อัปเดตทุก 30 นาที (ทำงานต่อเนื่อง)")
     print("   - ข้อมูลจะถูกโหลดเข้ามาใน database อัตโนมัติแม้ไม่มีผู้ใช้ใช้งาน")
     print("="*70)
@@ -157,6 +157,37 @@ class RedisCache:
         except Exception as e:
             print(f"⚠️ Error caching sentiment for {symbol}: {e}")
     
+    def get_sentiment_memo(self, text_hash: str) -> Optional[Dict]:
+        """ดึงผล SentimentAnalyzer.analyze ที่ memo ไว้ (key = hash ของ cleaned text + analyzer version)"""
+        if not self.client:
+            return None
+        
+        try:
+            cached = self.client.get(f"sentiment:memo:{text_hash}")
+            if cached:
+                return self._deserialize(cached)
+        except Exception as e:
+            print(f"⚠️ Error getting sentiment memo: {e}")
+        
+        return None
+    
+    def set_sentiment_memo(self, text_hash: str, scores: Dict, ttl: int = 2592000):
+        """
+        บันทึกผล SentimentAnalyzer.analyze ลง cache
+        
+        Args:
+            text_hash: Hash ของ cleaned text + analyzer version
+            scores: ผลของ analyze()
+            ttl: Time to live in seconds (default: 30 days)
+        """
+        if not self.client:
+            return
+        
+        try:
+            self.client.setex(f"sentiment:memo:{text_hash}", ttl, self._serialize(scores))
+        except Exception as e:
+            print(f"⚠️ Error caching sentiment memo: {e}")
+    
     def invalidate_stock(self, symbol: str):
         """ลบ cache ของหุ้น"""
         if not self.client:
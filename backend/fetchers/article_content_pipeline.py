@@ -0,0 +1,411 @@
+"""
+Article Content Pipeline
+ดึงเนื้อหาเต็มของข่าว (full_content, tags, author, ...) แบบ async ด้วย aiohttp
+แยกเป็น stage ที่รันหลังดึงราคา+ข่าวเสร็จ (ไม่ถ่วงการอัปเดตหุ้น)
+
+- รันบน event loop ของตัวเองใน background thread เดียวทั้ง process (ไม่ผูกกับ loop ของ request/batch)
+  → batch/request จบได้ทันทีโดยไม่ต้องรอ drain และ session ไม่รั่วเมื่อ loop ของ caller ปิด
+- คิวมีขนาดจำกัด + workers จำนวนคงที่ (ข่าวที่ล้นคิวถูกข้าม - นับใน stats)
+- อ่าน/เขียน MongoDB ใน blocking_executor (ไม่บล็อก event loop)
+- rate limit / concurrency ต่อ domain ผ่าน host_rate_limiter
+- จำกัดขนาด response และเวลาต่อบทความ
+- cache เนื้อหาตาม URL ใน collection article_content (ใช้ได้ revalidate_hours ชั่วโมง)
+- parse HTML (BeautifulSoup) ใน blocking_executor เพื่อไม่บล็อก event loop
+- cache หมดอายุ/ไม่มี → conditional GET ผ่าน article_http_cache (304 หรือ HTML เดิม → ไม่ parse ซ้ำ)
+- offline mode (ARTICLE_CACHE_OFFLINE=1): ข้าม article_content แล้ว reprocess HTML จาก disk cache
+"""
+import asyncio
+import atexit
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+
+from database.db_config import db
+from fetchers.article_http_cache import article_http_cache
+from fetchers.news_content_fetcher import NewsContentFetcher
+from utils.blocking_executor import blocking_executor
+from utils.host_rate_limiter import host_rate_limiter
+
+COLLECTION_NAME = "article_content"
+
+# fields ที่เติมให้ข่าวใน post_yahoo หลังดึงเนื้อหาได้
+CONTENT_FIELDS = ("full_content", "tags", "author", "publish_date", "word_count", "content_fetched_at")
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+
+class ArticleContentPipeline:
+    """
+    Async pipeline สำหรับดึงเนื้อหาบทความ
+
+    Args:
+        workers: จำนวน workers ที่ดึงพร้อมกัน (concurrency ต่อ domain จำกัดโดย host_rate_limiter)
+        queue_size: ขนาดคิว
+        max_bytes: ขนาด HTML สูงสุดต่อบทความ
+        timeout_seconds: เวลาสูงสุดต่อบทความ
+        failure_ttl_hours: จำ URL ที่ดึงไม่สำเร็จไว้กี่ชั่วโมง (ไม่ลองซ้ำทุกรอบ)
+        revalidate_hours: เนื้อหาที่ cache ไว้เกินกี่ชั่วโมงจึงตรวจกับ server ใหม่ (conditional GET)
+        memory_cache_size: จำนวน URL ที่ cache ใน memory (หน้า database cache)
+        exit_drain_seconds: เวลาสูงสุดที่รอคิวตอน process จบ (atexit)
+    """
+
+    def __init__(self, workers: int = 8, queue_size: int = 1000, max_bytes: int = 2 * 1024 * 1024,
+                 timeout_seconds: float = 10, failure_ttl_hours: float = 24, revalidate_hours: float = 24,
+                 memory_cache_size: int = 5000, enabled: bool = True, exit_drain_seconds: float = 30):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_bytes = max_bytes
+        self.timeout_seconds = timeout_seconds
+        self.failure_ttl_hours = failure_ttl_hours
+        self.revalidate_hours = revalidate_hours
+        self.memory_cache_size = memory_cache_size
+        self.enabled = enabled
+        self.exit_drain_seconds = exit_drain_seconds
+        self.parser = NewsContentFetcher()
+        self._memory_cache: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (details, storedAt)
+        # background event loop (สร้างตอน submit ครั้งแรก) + คิว/workers/session ที่อยู่บน loop นั้น
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pending = 0  # ข่าวที่อยู่ในคิว + กำลังดึง
+        self._start_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "dropped": 0, "cacheHits": 0, "fetched": 0, "failed": 0,
+                      "revalidated": 0, "staleServed": 0, "tooLarge": 0, "timeouts": 0, "updated": 0}
+
+    # ------------------------------------------------------------------
+    # Cache (memory + article_content collection)
+    # ------------------------------------------------------------------
+
+    def _get_collection(self):
+        if db is None:
+            return None
+        return getattr(db, COLLECTION_NAME)
+
+    def ensure_indexes(self):
+        """TTL index สำหรับ URL ที่ดึงไม่สำเร็จ (เนื้อหาที่ดึงได้ไม่มี expireAt - เก็บถาวร)"""
+        collection = self._get_collection()
+        if collection is None:
+            return
+        try:
+            collection.create_index([("expireAt", 1)], expireAfterSeconds=0, background=True)
+        except Exception as e:
+            error_code = getattr(e, 'code', None)
+            if error_code not in [85, 86]:
+                print(f"  ⚠️  Error creating {COLLECTION_NAME} index: {e}")
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        return hashlib.md5(url.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, details: Optional[Dict], stored_at: datetime):
+        self._memory_cache[key] = (details, stored_at)
+        self._memory_cache.move_to_end(key)
+        while len(self._memory_cache) > self.memory_cache_size:
+            self._memory_cache.popitem(last=False)
+
+    def _load_cached(self, key: str):
+        """อ่าน cache จาก article_content (blocking - เรียกผ่าน blocking_executor)"""
+        collection = self._get_collection()
+        if collection is None:
+            return None
+        try:
+            doc = collection.find_one({"_id": key})
+        except Exception:
+            return None
+        if not doc:
+            return None
+        details = None if doc.get("failed") else {field: doc.get(field) for field in ("title",) + CONTENT_FIELDS}
+        return details, doc.get("storedAt") or datetime.min
+
+    def _is_fresh(self, details: Optional[Dict], stored_at: datetime) -> bool:
+        """เนื้อหาที่ดึงได้ใช้ได้ revalidate_hours, URL ที่ล้มเหลวจำไว้ failure_ttl_hours"""
+        ttl_hours = self.revalidate_hours if details else self.failure_ttl_hours
+        return datetime.utcnow() - stored_at < timedelta(hours=ttl_hours)
+
+    async def get_cached(self, url: str):
+        """
+        Returns:
+            (fresh, details) - fresh = True ถ้า cache ยังไม่หมดอายุ (details = None ถ้าดึงไม่สำเร็จ),
+            (False, details เดิม) ถ้าต้อง revalidate, (False, None) ถ้ายังไม่เคยดึง
+        """
+        key = self.url_key(url)
+        if key in self._memory_cache:
+            self._memory_cache.move_to_end(key)
+            entry = self._memory_cache[key]
+        else:
+            entry = await blocking_executor.run(self._load_cached, key)
+            if entry is None:
+                return False, None
+            self._remember(key, *entry)
+        details, stored_at = entry
+        return self._is_fresh(details, stored_at), details
+
+    def _write_cached(self, key: str, url: str, details: Optional[Dict]):
+        """บันทึก cache ลง article_content (blocking - เรียกผ่าน blocking_executor)"""
+        collection = self._get_collection()
+        if collection is None:
+            return
+        doc = {"url": url, "storedAt": datetime.utcnow()}
+        if details:
+            doc.update(details)
+            doc["failed"] = False
+        else:
+            doc["failed"] = True
+            doc["expireAt"] = datetime.utcnow() + timedelta(hours=self.failure_ttl_hours)
+        try:
+            collection.replace_one({"_id": key}, doc, upsert=True)
+        except Exception:
+            pass
+
+    async def _store(self, url: str, details: Optional[Dict]):
+        key = self.url_key(url)
+        self._remember(key, details, datetime.utcnow())
+        await blocking_executor.run(self._write_cached, key, url, details)
+
+    # ------------------------------------------------------------------
+    # Fetch
+    # ------------------------------------------------------------------
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+                headers={"User-Agent": USER_AGENT},
+                connector=aiohttp.TCPConnector(limit=self.workers * 2)
+            )
+        return self._session
+
+    async def _fetch_html(self, url: str, headers: Dict[str, str]):
+        """
+        ดึง HTML (ผ่าน rate limiter ของ domain)
+
+        Returns:
+            (status, response headers, HTML) - HTML = None ถ้า 304, ไม่ใช่ HTML, ใหญ่เกิน หรือ error
+        """
+        session = await self._get_session()
+        async with host_rate_limiter.limit(url):
+            async with session.get(url, allow_redirects=True, headers=headers) as response:
+                host_rate_limiter.record_response(url, response.status, response.headers.get("Retry-After"))
+                if response.status != 200:
+                    return response.status, response.headers, None
+                content_type = response.headers.get("Content-Type", "")
+                if content_type and "html" not in content_type:
+                    return response.status, response.headers, None
+                if (response.content_length or 0) > self.max_bytes:
+                    self.stats["tooLarge"] += 1
+                    return response.status, response.headers, None
+                chunks, size = [], 0
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        self.stats["tooLarge"] += 1
+                        return response.status, response.headers, None
+                    chunks.append(chunk)
+                return response.status, response.headers, b"".join(chunks)
+
+    async def fetch(self, url: str) -> Optional[Dict]:
+        """
+        ดึงรายละเอียดบทความ (ใช้ cache ก่อน - cache ที่หมดอายุถูก revalidate ผ่าน article_http_cache)
+
+        Args:
+            url: URL ของบทความ
+
+        Returns:
+            Dictionary เหมือน NewsContentFetcher.fetch_article_content หรือ None
+        """
+        if not url:
+            return None
+        if article_http_cache.offline:
+            # ✅ offline: ข้าม article_content แล้ว reprocess HTML จาก disk cache ด้วย extractor ปัจจุบัน
+            # (ไม่จำว่าล้มเหลว - ยังไม่ได้ลองดึงจริง)
+            try:
+                details = await blocking_executor.run(article_http_cache.get_offline, url,
+                                                      self.parser.parse_article_html)
+            except Exception:
+                details = None
+            self.stats["fetched" if details else "failed"] += 1
+            if details:
+                await self._store(url, details)
+            return details
+
+        fresh, previous = await self.get_cached(url)
+        if fresh:
+            self.stats["cacheHits"] += 1
+            return previous
+
+        try:
+            # ✅ cache หมดอายุ/ไม่มี → conditional GET (304 / HTML เดิม = ใช้ผล parse เดิมจาก disk cache)
+            # อ่าน/เขียน disk cache และ parse ใน blocking_executor (ไม่บล็อก event loop)
+            entry = await blocking_executor.run(article_http_cache.lookup, url)
+            status, headers, html = await self._fetch_html(url, article_http_cache.conditional_headers(entry))
+            details = await blocking_executor.run(article_http_cache.resolve, url, entry, status, headers,
+                                                  html, self.parser.parse_article_html)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            details = None
+        except Exception:
+            details = None
+
+        if previous and not details:
+            # revalidate ไม่สำเร็จ → ใช้เนื้อหาเดิมต่อ (ไม่เขียนทับด้วยความล้มเหลว ลองใหม่รอบหน้า)
+            self.stats["staleServed"] += 1
+            return previous
+        self.stats["revalidated" if previous else "fetched" if details else "failed"] += 1
+        await self._store(url, details)
+        return details
+
+    # ------------------------------------------------------------------
+    # Background stage
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """เริ่ม background loop + workers (ครั้งแรกที่มีข่าวเข้าคิว)"""
+        with self._start_lock:
+            if self._loop is not None and not self._loop.is_closed():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._queue = asyncio.Queue(maxsize=self.queue_size)
+                self._worker_tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+                ready.set()
+                loop.run_forever()
+
+            thread = threading.Thread(target=run, name="article-content", daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop, self._thread = loop, thread
+            return loop
+
+    def submit(self, articles: Iterable[Dict], collection) -> int:
+        """
+        ส่งข่าวที่เพิ่งบันทึกเข้าคิวดึงเนื้อหา (ไม่รอ) - เรียกได้จากทุก thread / event loop
+
+        Args:
+            articles: ข่าวที่ normalize แล้ว (ต้องมี url และ newsHash หรือ id)
+            collection: collection ของข่าว (post_yahoo) ที่จะเติมเนื้อหาให้
+
+        Returns:
+            จำนวนข่าวที่ส่งเข้าคิว (ข่าวที่ล้นคิวนับใน stats["dropped"])
+        """
+        if not self.enabled or collection is None:
+            return 0
+        items = [(article, collection) for article in articles
+                 if article.get("url") and not article.get("full_content")]
+        if items:
+            self._ensure_started().call_soon_threadsafe(self._enqueue, items)
+        return len(items)
+
+    def _enqueue(self, items: List[tuple]):
+        """ใส่ข่าวเข้าคิว (รันบน background loop)"""
+        for item in items:
+            try:
+                self._queue.put_nowait(item)
+                self._pending += 1
+                self.stats["enqueued"] += 1
+            except asyncio.QueueFull:
+                self.stats["dropped"] += 1
+
+    async def _worker(self):
+        while True:
+            article, collection = await self._queue.get()
+            try:
+                details = await self.fetch(article["url"])
+                if details and await blocking_executor.run(self._apply, article, details, collection):
+                    self.stats["updated"] += 1
+            except Exception:
+                pass
+            finally:
+                self._pending -= 1
+                self._queue.task_done()
+
+    def _apply(self, article: Dict, details: Dict, collection) -> bool:
+        """เติมเนื้อหาให้ข่าวใน database (blocking - เรียกผ่าน blocking_executor)"""
+        fields = {field: details.get(field) for field in CONTENT_FIELDS if details.get(field) is not None}
+        if not article.get("selftext") and details.get("full_content"):
+            fields["selftext"] = details["full_content"][:500]
+        if not article.get("title") and details.get("title"):
+            fields["title"] = details["title"]
+        key = {"newsHash": article["newsHash"]} if article.get("newsHash") else {"id": article.get("id")}
+        if not fields or not any(key.values()):
+            return False
+        try:
+            collection.update_one(key, {"$set": fields})
+            return True
+        except Exception:
+            return False
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        รอให้คิวว่าง (ไม่เกิน timeout) - ข่าวที่ยังค้างเมื่อหมดเวลายังถูกดึงต่อใน background (ไม่ถูกทิ้ง)
+
+        Returns:
+            True ถ้าคิวว่างแล้ว
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return True
+        future = asyncio.run_coroutine_threadsafe(self._queue.join(), loop)
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _close(self, timeout: float):
+        if self._pending:
+            print(f"⏳ รอดึงเนื้อหาข่าวที่ค้าง {self._pending:,} ข่าว (ไม่เกิน {timeout:.0f} วินาที)")
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                self.stats["dropped"] += self._pending
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """รอคิว (ไม่เกิน timeout, default exit_drain_seconds) แล้วหยุด workers ปิด session และ loop (atexit)"""
+        with self._start_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        timeout = self.exit_drain_seconds if timeout is None else timeout
+        try:
+            # รันบน background loop → ต่อคิวหลังข่าวที่ submit ไว้แล้ว (call_soon_threadsafe)
+            asyncio.run_coroutine_threadsafe(self._close(timeout), loop).result(timeout + 15)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+        if not thread.is_alive():
+            loop.close()
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "queueDepth": self._queue.qsize() if self._queue is not None else 0,
+                "pending": self._pending,
+                "running": self._loop is not None, "workers": self.workers, "enabled": self.enabled,
+                "memoryCache": len(self._memory_cache)}
+
+
+# Global instance
+article_content_pipeline = ArticleContentPipeline(
+    workers=int(os.getenv("ARTICLE_CONTENT_WORKERS", 8)),
+    queue_size=int(os.getenv("ARTICLE_CONTENT_QUEUE", 1000)),
+    revalidate_hours=float(os.getenv("ARTICLE_CONTENT_REVALIDATE_HOURS", 24)),
+    enabled=os.getenv("ARTICLE_CONTENT_ENRICHMENT", "1") != "0",
+    exit_drain_seconds=float(os.getenv("ARTICLE_CONTENT_EXIT_DRAIN_SECONDS", 30))
+)
+atexit.register(article_content_pipeline.shutdown)
@@ -0,0 +1,555 @@
+"""
+Article Extractors
+แยกรายละเอียดบทความ (title, full_content, tags, author, publish_date) จาก HTML
+
+- SoupExtractor: BeautifulSoup + html.parser (logic เดิมของ NewsContentFetcher)
+- LxmlExtractor: lxml (C parser) + XPath ที่ compile ไว้ตอน import - กฎเดียวกับ SoupExtractor
+  (ลำดับ selectors, การลบ script/nav/footer/..., fallback <p>) แต่เร็วกว่าหลายเท่าบนหน้าเว็บขนาดใหญ่
+  libxml2 ซ่อม HTML ต่างจาก html.parser (ปิด <p> ก่อน <div>/<p>/<table>, <title> เป็น raw text ฯลฯ)
+  → เอกสารที่ libxml2 ต้องซ่อมโครงสร้าง ส่งต่อให้ SoupExtractor (ผลเหมือน bs4 เสมอ)
+
+เลือก backend ด้วย env ARTICLE_EXTRACTOR=lxml|bs4 (default: bs4)
+lxml เร็วขึ้นเฉพาะหน้าที่ไม่ต้องซ่อม - ดู "fallback" ใน benchmark บนบทความจริงก่อนเปิดใช้
+ตรวจผลลัพธ์ให้ตรงกัน (HTML ที่ซ่อมต่างกัน): scripts/check_article_extractors.py
+ความเร็วบนบทความจริง: scripts/benchmark_article_extraction.py
+"""
+import os
+import re
+import threading
+from collections import Counter
+from html.entities import name2codepoint
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml (optional) - ไม่มี → ใช้ SoupExtractor
+    lxml = None
+    etree = None
+
+# ลำดับ selectors ของเนื้อหาหลัก (ใช้ selector แรกที่ได้ข้อความ)
+CONTENT_SELECTORS = [
+    'article',
+    '[role="article"]',
+    '.article-content',
+    '.article-body',
+    '.post-content',
+    '.entry-content',
+    '.content',
+    'main',
+    '[itemprop="articleBody"]',
+    # Yahoo Finance specific selectors
+    '[data-module="ArticleBody"]',
+    '.caas-body',
+    '.caas-article-body',
+    '[data-test-locator="article-body"]'
+]
+# tags ที่ลบออกจาก element เนื้อหาก่อนดึงข้อความ
+STRIP_TAGS = ("script", "style", "nav", "footer", "header", "aside", "button", "a")
+MIN_CONTENT_CHARS = 100  # ต้องมีเนื้อหามากกว่า 100 ตัวอักษร
+
+XML_DECLARATION_PATTERN = re.compile(r'^\s*<\?xml[^>]*\?>')
+END_TAG_PATTERN = re.compile(r'</([a-zA-Z][^\s/>]*)\s*>')
+ENTITY_REF_PATTERN = re.compile(r'&(#?)([a-zA-Z0-9][-.a-zA-Z0-9]*)(;?)')
+# comments และเนื้อหาใน script/style ไม่นับเป็น end tags
+RAW_TEXT_PATTERN = re.compile(r'<!--.*?-->|(<(script|style)\b[^>]*>).*?(</\2\s*>)', re.S | re.I)
+
+
+class SoupExtractor:
+    """BeautifulSoup backend (html.parser) - ผลลัพธ์อ้างอิง"""
+
+    name = "bs4"
+
+    def extract(self, html) -> Dict:
+        """
+        แยกรายละเอียดบทความจาก HTML
+
+        Args:
+            html: HTML ของบทความ (bytes หรือ str)
+
+        Returns:
+            Dictionary: title, full_content, tags, author, publish_date
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        # ✅ ลำดับสำคัญ: _extract_content ลบ script/nav/a/... ออกจาก tree ก่อนดึง tags/author
+        title = self._extract_title(soup)
+        content = self._extract_content(soup)
+        return {
+            'title': title,
+            'full_content': content,
+            'tags': self._extract_tags(soup),
+            'author': self._extract_author(soup),
+            'publish_date': self._extract_publish_date(soup),
+        }
+
+    def _extract_title(self, soup: BeautifulSoup) -> str:
+        """
+        ดึง title ของบทความ
+        """
+        # ลองหาจาก meta tags ก่อน
+        og_title = soup.find('meta', property='og:title')
+        if og_title and og_title.get('content'):
+            return og_title['content'].strip()
+
+        # หาจาก title tag
+        title_tag = soup.find('title')
+        if title_tag:
+            title_text = title_tag.get_text(strip=True)
+            if title_text:
+                return title_text
+
+        # หาจาก h1
+        h1 = soup.find('h1')
+        if h1:
+            h1_text = h1.get_text(strip=True)
+            if h1_text:
+                return h1_text
+
+        return ''
+
+    def _extract_content(self, soup: BeautifulSoup) -> str:
+        """
+        ดึงเนื้อหาหลักของบทความ
+        """
+        # สำหรับ Yahoo Finance - ลองหาเนื้อหาจากหลายๆ tag ที่เป็นไปได้
+        for selector in CONTENT_SELECTORS:
+            elements = soup.select(selector)
+            if elements:
+                # รวมเนื้อหาจากทุก element
+                texts = []
+                for elem in elements:
+                    # ลบ script และ style tags
+                    for script in elem(list(STRIP_TAGS)):
+                        script.decompose()
+
+                    text = elem.get_text(separator=' ', strip=True)
+                    if text and len(text) > MIN_CONTENT_CHARS:
+                        texts.append(text)
+
+                if texts:
+                    return ' '.join(texts)
+
+        # ถ้าไม่เจอ ให้ดึงจาก <p> tags ทั้งหมด (เฉพาะใน main หรือ article)
+        main_content = soup.find('main') or soup.find('article')
+        if main_content:
+            paragraphs = main_content.find_all('p')
+            if paragraphs:
+                texts = [p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)]
+                content = ' '.join(texts)
+                if len(content) > MIN_CONTENT_CHARS:
+                    return content
+
+        # ถ้ายังไม่เจอ ให้ดึงจาก <p> tags ทั้งหมด
+        paragraphs = soup.find_all('p')
+        if paragraphs:
+            texts = [p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)]
+            content = ' '.join(texts)
+            if len(content) > MIN_CONTENT_CHARS:
+                return content
+
+        return ''
+
+    def extract_images(self, soup: BeautifulSoup, base_url: str) -> list:
+        """
+        ดึงรูปภาพจากบทความ (ไม่ได้ใช้ใน extract เพื่อลดพื้นที่ในการจัดเก็บ)
+        """
+        images = []
+
+        # หา main image (og:image หรือ article image)
+        og_image = soup.find('meta', property='og:image')
+        if og_image and og_image.get('content'):
+            images.append({
+                'url': make_absolute_url(og_image['content'], base_url),
+                'type': 'main'
+            })
+
+        # หา images ใน article
+        article_images = soup.select('article img, [role="article"] img, .article-content img')
+        for img in article_images[:5]:  # จำกัด 5 รูป
+            src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
+            if src:
+                images.append({
+                    'url': make_absolute_url(src, base_url),
+                    'alt': img.get('alt', ''),
+                    'type': 'content'
+                })
+
+        return images
+
+    def _extract_tags(self, soup: BeautifulSoup) -> list:
+        """
+        ดึง tags/categories
+        """
+        tags = []
+
+        # หา meta keywords
+        meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
+        if meta_keywords and meta_keywords.get('content'):
+            tags.extend([t.strip() for t in meta_keywords['content'].split(',')])
+
+        # หา tags จาก HTML
+        tag_elements = soup.select('.tags a, .categories a, [rel="tag"], .tag')
+        for elem in tag_elements:
+            tag_text = elem.get_text(strip=True)
+            if tag_text:
+                tags.append(tag_text)
+
+        # ลบ duplicates และ return
+        return list(set([t for t in tags if t]))
+
+    def _extract_author(self, soup: BeautifulSoup) -> Optional[str]:
+        """
+        ดึงชื่อ author
+        """
+        # หาจาก meta tags
+        author_meta = soup.find('meta', property='article:author') or soup.find('meta', attrs={'name': 'author'})
+        if author_meta and author_meta.get('content'):
+            return author_meta['content']
+
+        # หาจาก HTML
+        author_elem = soup.select_one('.author, [rel="author"], [itemprop="author"]')
+        if author_elem:
+            return author_elem.get_text(strip=True)
+
+        return None
+
+    def _extract_publish_date(self, soup: BeautifulSoup) -> Optional[str]:
+        """
+        ดึงวันที่ publish
+        """
+        # หาจาก meta tags
+        date_meta = soup.find('meta', property='article:published_time') or soup.find('meta', attrs={'name': 'publish-date'})
+        if date_meta and date_meta.get('content'):
+            return date_meta['content']
+
+        # หาจาก time tag
+        time_elem = soup.find('time', attrs={'datetime': True})
+        if time_elem:
+            return time_elem['datetime']
+
+        return None
+
+
+def _has_class(name: str) -> str:
+    """XPath ของ CSS class selector (.name)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _selector_to_xpath(selector: str) -> str:
+    """แปลง CONTENT_SELECTORS (tag / .class / [attr="value"]) เป็น XPath"""
+    if selector.startswith('.'):
+        return f"//*[{_has_class(selector[1:])}]"
+    if selector.startswith('['):
+        attr, _, value = selector[1:-1].partition('=')
+        return f"//*[@{attr}='{value.strip(chr(34))}']"
+    return f"//{selector}"
+
+
+if etree is not None:
+    # ✅ compile XPath ครั้งเดียวตอน import
+    _XPATH = {
+        "og_title": etree.XPath("(//meta[@property='og:title'])[1]"),
+        "title": etree.XPath("(//title)[1]"),
+        "h1": etree.XPath("(//h1)[1]"),
+        "content": [etree.XPath(_selector_to_xpath(selector)) for selector in CONTENT_SELECTORS],
+        "main_or_article": etree.XPath("(//main)[1] | (//article)[1]"),
+        "p": etree.XPath(".//p"),
+        "keywords": etree.XPath("(//meta[@name='keywords'])[1]"),
+        "tags": etree.XPath(f"//*[{_has_class('tags')}]//a | //*[{_has_class('categories')}]//a"
+                            f" | //*[@rel='tag'] | //*[{_has_class('tag')}]"),
+        "author_meta": etree.XPath("(//meta[@property='article:author'])[1]"),
+        "author_name_meta": etree.XPath("(//meta[@name='author'])[1]"),
+        "author": etree.XPath(f"//*[{_has_class('author')} or @rel='author' or @itemprop='author']"),
+        "date_meta": etree.XPath("(//meta[@property='article:published_time'])[1]"),
+        "date_name_meta": etree.XPath("(//meta[@name='publish-date'])[1]"),
+        "time": etree.XPath("(//time[@datetime])[1]"),
+        # elements ที่ libxml2 เก็บเป็นข้อความ (rcdata แปลง entity, raw_text ไม่แปลง)
+        "rcdata": etree.XPath("//title | //textarea"),
+        "raw_text": etree.XPath("//iframe | //xmp | //noembed | //noframes | //plaintext"),
+    }
+
+# tags ที่ libxml2 สร้างให้เองได้ / ไม่มี end tag
+_IMPLIED_TAGS = frozenset(("html", "head", "body"))
+_VOID_TAGS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+                        "param", "source", "track", "wbr"))
+# error ของ libxml2 ที่ไม่เปลี่ยนโครงสร้าง (tags ของ HTML5 เช่น <article>, <main>)
+_BENIGN_PARSE_ERRORS = frozenset(("HTML_UNKNOWN_TAG",))
+# entities ของ HTML 4 (ที่ libxml2 รู้จัก) - ขึ้นต้นชื่อที่ไม่มี ';' เช่น &copy2023 → libxml2 แปลงแค่ &copy
+_KNOWN_ENTITY_PREFIX = re.compile('|'.join(sorted(name2codepoint, key=len, reverse=True)))
+
+# ข้อความใน tags เหล่านี้ (รวมลูกหลาน) ไม่นับใน get_text ของ BeautifulSoup (Script/Stylesheet/TemplateString/RubyText)
+# ยกเว้นเรียก get_text ที่ tag นั้นเอง
+_NON_TEXT_TAGS = frozenset(("script", "style", "template", "rt", "rp"))
+
+
+def _strings(elem, wanted=None, container=None):
+    """
+    text nodes ใน element ตามลำดับเอกสาร (ข้าม comments เหมือน BeautifulSoup)
+
+    Args:
+        wanted: string container ที่นับ (None = ข้อความปกติ, "script" = ข้อความใน <script>)
+        container: string container ที่ครอบ elem อยู่
+    """
+    if elem.tag in _NON_TEXT_TAGS:
+        container = elem.tag
+    if elem.text and container == wanted:
+        yield elem.text
+    for child in elem:
+        if isinstance(child.tag, str):
+            yield from _strings(child, wanted, container)
+        if child.tail and container == wanted:
+            yield child.tail
+
+
+def _get_text(elem, separator: str = '') -> str:
+    """เทียบเท่า Tag.get_text(separator, strip=True)"""
+    wanted = elem.tag if elem.tag in _NON_TEXT_TAGS else None
+    container = next((ancestor.tag for ancestor in elem.iterancestors(*_NON_TEXT_TAGS)), None)
+    return separator.join(s for s in (text.strip() for text in _strings(elem, wanted, container)) if s)
+
+
+def _decompose(elem):
+    """
+    ลบ element ออกจาก tree เหมือน decompose ของ bs4
+    (แทนด้วย comment ว่าง เพื่อให้ tail text ยังเป็น text node แยก - drop_tree จะต่อ tail เข้ากับ text ก่อนหน้า)
+    ล้างข้อความของ element และลูกหลานด้วย (element ที่ selector เลือกไว้แล้วต้องได้ข้อความว่างเหมือน bs4)
+    """
+    parent = elem.getparent()
+    if parent is not None:
+        placeholder = etree.Comment()
+        placeholder.tail = elem.tail
+        parent.replace(elem, placeholder)
+    for node in list(elem.iter()):
+        node.clear()
+
+
+def _same_entity(numeric: str, name: str, semicolon: str) -> bool:
+    """entity reference นี้ html.parser (bs4) กับ libxml2 แปลงเหมือนกันหรือไม่"""
+    if numeric:
+        return bool(semicolon)
+    if semicolon:
+        return name in name2codepoint
+    # ไม่มี ';' (เช่น S&P 500): เหมือนกันถ้าไม่ขึ้นต้นด้วยชื่อ entity
+    return not _KNOWN_ENTITY_PREFIX.match(name)
+
+
+def _first(xpath, root):
+    result = xpath(root)
+    return result[0] if result else None
+
+
+class LxmlExtractor:
+    """lxml backend - กฎเดียวกับ SoupExtractor บน tree ของ libxml2"""
+
+    name = "lxml"
+    _local = threading.local()
+
+    def __init__(self):
+        if etree is None:
+            raise RuntimeError("lxml is not installed")
+        self.fallbacks = 0  # จำนวนเอกสารที่ส่งต่อให้ SoupExtractor
+
+    def _parser(self):
+        """HTMLParser ต่อ thread (error_log ของ parser ใช้ตรวจว่า libxml2 ซ่อมเอกสาร)"""
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = lxml.html.HTMLParser()
+        return parser
+
+    def _parse(self, html):
+        """
+        HTML → root element
+
+        Returns:
+            (root, repaired) - root เป็น None ถ้าเอกสารว่าง
+            repaired=True ถ้า tree ของ libxml2 อาจต่างจาก html.parser (ให้ SoupExtractor ทำแทน)
+        """
+        if isinstance(html, bytes):
+            try:
+                # ✅ เหมือน UnicodeDammit ของ bs4: ลอง UTF-8 ก่อน (encoding อื่นให้ bs4 เดาเอง)
+                html = html.decode('utf-8')
+            except UnicodeDecodeError:
+                return None, True
+        html = XML_DECLARATION_PATTERN.sub('', html, count=1)
+        if not html.strip():
+            return None, False
+        parser = self._parser()
+        try:
+            root = lxml.html.document_fromstring(html, parser=parser)
+        except (etree.ParserError, ValueError):
+            return None, True
+        return root, self._repaired(root, html, parser)
+
+    @staticmethod
+    def _repaired(root, html: str, parser) -> bool:
+        """
+        libxml2 ซ่อมโครงสร้างที่ html.parser ไม่ซ่อมหรือไม่
+        - error ของ parser (end tag เกิน/ไม่ตรง, entity ผิด ฯลฯ)
+        - element ที่ไม่มี end tag ของตัวเองใน HTML (libxml2 ปิดให้ เช่น <p> ก่อน <div>, <li> ก่อน <li>,
+          <div/>) - html.parser ไม่ปิดให้ → ลูกหลานต่างกัน
+        - markup หรือ entity ใน <title>/<textarea>/<iframe>/... (libxml2 เก็บเป็น raw text, html.parser แยก tags + แปลง entity)
+        - <![CDATA[...]]> (libxml2 เป็น comment, bs4 นับเป็นข้อความ)
+        - entity ที่แปลงต่างกัน (&foo; &copy2023 &#150 - html.parser เก็บเป็นข้อความ, libxml2 แปลง/เก็บ ';')
+        """
+        if any(error.type_name not in _BENIGN_PARSE_ERRORS for error in parser.error_log):
+            return True
+        if any('<' in (elem.text or '') for elem in _XPATH["rcdata"](root)):
+            return True
+        if any('<' in text or '&' in text for text in (elem.text or '' for elem in _XPATH["raw_text"](root))):
+            return True
+        elements = Counter(elem.tag for elem in root.iter(etree.Element)
+                           if elem.tag not in _IMPLIED_TAGS and elem.tag not in _VOID_TAGS)
+        source = RAW_TEXT_PATTERN.sub(lambda m: (m.group(1) or '') + (m.group(3) or ''), html)
+        if '<![' in source or any(not _same_entity(*match) for match in ENTITY_REF_PATTERN.findall(source)):
+            return True
+        end_tags = Counter(name.lower() for name in END_TAG_PATTERN.findall(source))
+        return any(end_tags[tag] != count for tag, count in elements.items())
+
+    def extract(self, html) -> Dict:
+        """
+        แยกรายละเอียดบทความจาก HTML (เอกสารที่ libxml2 ซ่อมโครงสร้าง → SoupExtractor)
+
+        Args:
+            html: HTML ของบทความ (bytes หรือ str)
+
+        Returns:
+            Dictionary: title, full_content, tags, author, publish_date
+        """
+        root, repaired = self._parse(html)
+        if repaired:
+            self.fallbacks += 1
+            return SoupExtractor().extract(html)
+        if root is None:
+            return {'title': '', 'full_content': '', 'tags': [], 'author': None, 'publish_date': None}
+        # ✅ ลำดับเดียวกับ SoupExtractor (การลบ elements ใน _extract_content มีผลกับ tags/author)
+        title = self._extract_title(root)
+        content = self._extract_content(root)
+        return {
+            'title': title,
+            'full_content': content,
+            'tags': self._extract_tags(root),
+            'author': self._extract_author(root),
+            'publish_date': self._extract_publish_date(root),
+        }
+
+    def _extract_title(self, root) -> str:
+        og_title = _first(_XPATH["og_title"], root)
+        if og_title is not None and og_title.get('content'):
+            return og_title.get('content').strip()
+        for key in ("title", "h1"):
+            elem = _first(_XPATH[key], root)
+            if elem is not None:
+                text = _get_text(elem)
+                if text:
+                    return text
+        return ''
+
+    def _extract_content(self, root) -> str:
+        for xpath in _XPATH["content"]:
+            elements = xpath(root)
+            if elements:
+                texts = []
+                for elem in elements:
+                    for child in list(elem.iterdescendants(*STRIP_TAGS)):
+                        _decompose(child)
+                    text = _get_text(elem, ' ')
+                    if text and len(text) > MIN_CONTENT_CHARS:
+                        texts.append(text)
+                if texts:
+                    return ' '.join(texts)
+
+        # <p> ใน main (หรือ article) ก่อน แล้วค่อย <p> ทั้งเอกสาร
+        # (ห้ามใช้ `or` กับ lxml element - element ที่ไม่มีลูกเป็น False)
+        main_or_article = _XPATH["main_or_article"](root)
+        main_content = next((e for e in main_or_article if e.tag == 'main'), None)
+        if main_content is None and main_or_article:
+            main_content = main_or_article[0]
+        for scope in ([main_content] if main_content is not None else []) + [root]:
+            texts = [text for text in (_get_text(p) for p in _XPATH["p"](scope)) if text]
+            content = ' '.join(texts)
+            if len(content) > MIN_CONTENT_CHARS:
+                return content
+        return ''
+
+    def _extract_tags(self, root) -> List[str]:
+        tags = []
+        meta_keywords = _first(_XPATH["keywords"], root)
+        if meta_keywords is not None and meta_keywords.get('content'):
+            tags.extend([t.strip() for t in meta_keywords.get('content').split(',')])
+        for elem in _XPATH["tags"](root):
+            tag_text = _get_text(elem)
+            if tag_text:
+                tags.append(tag_text)
+        return list(set([t for t in tags if t]))
+
+    def _extract_author(self, root) -> Optional[str]:
+        author_meta = _first(_XPATH["author_meta"], root)
+        if author_meta is None:
+            author_meta = _first(_XPATH["author_name_meta"], root)
+        if author_meta is not None and author_meta.get('content'):
+            return author_meta.get('content')
+        author_elem = _first(_XPATH["author"], root)
+        if author_elem is not None:
+            return _get_text(author_elem)
+        return None
+
+    def _extract_publish_date(self, root) -> Optional[str]:
+        date_meta = _first(_XPATH["date_meta"], root)
+        if date_meta is None:
+            date_meta = _first(_XPATH["date_name_meta"], root)
+        if date_meta is not None and date_meta.get('content'):
+            return date_meta.get('content')
+        time_elem = _first(_XPATH["time"], root)
+        if time_elem is not None:
+            return time_elem.get('datetime')
+        return None
+
+
+def make_absolute_url(url: str, base_url: str) -> str:
+    """
+    แปลง relative URL เป็น absolute URL
+    """
+    if not url:
+        return ''
+
+    if url.startswith('http://') or url.startswith('https://'):
+        return url
+
+    parsed_base = urlparse(base_url)
+    base = f"{parsed_base.scheme}://{parsed_base.netloc}"
+
+    if url.startswith('//'):
+        return f"{parsed_base.scheme}:{url}"
+    elif url.startswith('/'):
+        return f"{base}{url}"
+    else:
+        return f"{base}/{url}"
+
+
+EXTRACTORS = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+
+def get_extractor(name: Optional[str] = None):
+    """
+    สร้าง extractor ตามชื่อ (หรือ env ARTICLE_EXTRACTOR)
+
+    Args:
+        name: "lxml" หรือ "bs4" (None = env ARTICLE_EXTRACTOR หรือ bs4)
+
+    Returns:
+        Extractor instance (มี method extract(html))
+    """
+    name = (name or os.getenv("ARTICLE_EXTRACTOR") or SoupExtractor.name).lower()
+    if name not in EXTRACTORS:
+        print(f"⚠️ Unknown ARTICLE_EXTRACTOR {name!r}, using bs4")
+        name = SoupExtractor.name
+    if name == LxmlExtractor.name and etree is None:
+        print("⚠️ lxml not installed, using bs4 article extractor")
+        name = SoupExtractor.name
+    return EXTRACTORS[name]()
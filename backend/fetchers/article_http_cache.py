@@ -0,0 +1,236 @@
+"""
+Article HTTP Cache
+On-disk cache ของ HTML บทความข่าว (ข่าวเดียวกันมักถูกดึงซ้ำจากหลาย tickers)
+- เก็บ ETag / Last-Modified → ส่ง If-None-Match / If-Modified-Since (304 = ใช้ผลเดิม ไม่ต้อง parse)
+- เก็บ hash ของ HTML → ถ้าเนื้อหาไม่เปลี่ยน (200 แต่ hash เดิม) ก็ไม่ต้อง parse ใหม่
+- LRU eviction ตามขนาดรวมของไฟล์
+- offline mode: อ่านจาก cache อย่างเดียว (ใช้ reprocess ข่าวเดิมด้วย extractor ใหม่โดยไม่ยิง network)
+
+ไฟล์ต่อ URL (key = md5 ของ URL):
+    <key>.html.z  - HTML (zlib)
+    <key>.json    - {url, etag, lastModified, contentHash, extracted, storedAt}
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, "data", "cache", "article_html")
+
+BODY_SUFFIX = ".html.z"
+META_SUFFIX = ".json"
+
+
+class ArticleHttpCache:
+    """
+    Disk cache สำหรับ HTML บทความ + ผลที่ extract แล้ว
+
+    Args:
+        cache_dir: directory ที่เก็บไฟล์
+        max_bytes: ขนาดรวมสูงสุด (ทิ้ง entry ที่ใช้ล่าสุดนานที่สุดก่อน)
+        offline: True = ไม่ยิง network (อ่านจาก cache อย่างเดียว)
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 512 * 1024 * 1024, offline: bool = False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key → ขนาดไฟล์รวม (เรียงจากใช้ล่าสุดนานที่สุด)
+        self._total_bytes = 0
+        self._loaded = False
+        self.stats = {"lookups": 0, "notModified": 0, "unchanged": 0, "offlineHits": 0, "misses": 0,
+                      "parsed": 0, "stored": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        return hashlib.md5(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _load_index(self):
+        """สร้าง LRU index จากไฟล์ใน directory (เรียงตาม mtime) - เรียกตอนถือ _lock"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries: Dict[str, list] = {}
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    name = entry.name
+                    if name.endswith(META_SUFFIX):
+                        key = name[:-len(META_SUFFIX)]
+                    elif name.endswith(BODY_SUFFIX):
+                        key = name[:-len(BODY_SUFFIX)]
+                    else:
+                        continue
+                    stat = entry.stat()
+                    info = entries.setdefault(key, [0, 0.0])
+                    info[0] += stat.st_size
+                    info[1] = max(info[1], stat.st_mtime)
+            for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                self._index[key] = size
+                self._total_bytes += size
+        except OSError as e:
+            print(f"⚠️ Article cache not available: {e}")
+
+    def _touch(self, key: str):
+        """ย้าย entry ไปท้าย LRU (mtime = เวลาใช้ล่าสุด ใช้ตอนสร้าง index ใหม่)"""
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+        try:
+            os.utime(self._path(key, META_SUFFIX))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """ทิ้ง entries ที่ใช้ล่าสุดนานที่สุดจนขนาดรวมไม่เกิน max_bytes - เรียกตอนถือ _lock"""
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.stats["evictions"] += 1
+            for suffix in (META_SUFFIX, BODY_SUFFIX):
+                try:
+                    os.remove(self._path(key, suffix))
+                except OSError:
+                    pass
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """metadata ของ URL (etag, lastModified, contentHash, extracted) หรือ None"""
+        key = self.make_key(url)
+        with self._lock:
+            self._load_index()
+            self.stats["lookups"] += 1
+            if key not in self._index:
+                return None
+        try:
+            with open(self._path(key, META_SUFFIX), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read_body(self, url: str) -> Optional[bytes]:
+        """HTML ที่เก็บไว้ (ใช้ตอน reprocess แบบ offline)"""
+        try:
+            with open(self._path(self.make_key(url), BODY_SUFFIX), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since จาก entry เดิม"""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("lastModified"):
+                headers["If-Modified-Since"] = entry["lastModified"]
+        return headers
+
+    def store(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str],
+              content_hash: str, extracted: Optional[Dict]):
+        """บันทึก HTML + validators + ผลที่ extract แล้ว"""
+        key = self.make_key(url)
+        meta = {"url": url, "etag": etag, "lastModified": last_modified, "contentHash": content_hash,
+                "extracted": extracted, "storedAt": time.time()}
+        try:
+            with self._lock:
+                self._load_index()
+            compressed = zlib.compress(body, 6)
+            with open(self._path(key, BODY_SUFFIX), "wb") as f:
+                f.write(compressed)
+            meta_bytes = json.dumps(meta, ensure_ascii=False, default=str).encode("utf-8")
+            with open(self._path(key, META_SUFFIX), "wb") as f:
+                f.write(meta_bytes)
+        except OSError:
+            return
+        with self._lock:
+            size = len(compressed) + len(meta_bytes)
+            self._total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            self.stats["stored"] += 1
+            self._evict()
+
+    def resolve(self, url: str, entry: Optional[Dict], status: int, headers, body: Optional[bytes],
+                parse: Callable[[bytes], Optional[Dict]]) -> Optional[Dict]:
+        """
+        ใช้ผลของ conditional GET
+
+        Args:
+            url: URL ของบทความ
+            entry: metadata เดิมจาก lookup (หรือ None)
+            status: HTTP status
+            headers: response headers (ต้องมี .get)
+            body: HTML (None ถ้า 304)
+            parse: function แยกรายละเอียดจาก HTML
+
+        Returns:
+            รายละเอียดบทความ (จาก cache ถ้าเนื้อหาไม่เปลี่ยน) หรือ None
+        """
+        if status == 304 and entry and entry.get("extracted"):
+            self.stats["notModified"] += 1
+            self._touch(self.make_key(url))
+            return entry["extracted"]
+        if status != 200 or body is None:
+            return None
+
+        content_hash = hashlib.md5(body).hexdigest()
+        if entry and entry.get("contentHash") == content_hash and entry.get("extracted"):
+            # ✅ server ไม่รองรับ conditional GET แต่เนื้อหาเดิม → ไม่ต้อง parse ใหม่
+            self.stats["unchanged"] += 1
+            self._touch(self.make_key(url))
+            return entry["extracted"]
+
+        self.stats["misses"] += 1
+        extracted = parse(body)
+        self.stats["parsed"] += 1
+        self.store(url, body, headers.get("ETag"), headers.get("Last-Modified"), content_hash, extracted)
+        return extracted
+
+    def get_offline(self, url: str, parse: Optional[Callable[[bytes], Optional[Dict]]] = None) -> Optional[Dict]:
+        """
+        offline mode: ผลจาก cache อย่างเดียว
+
+        Args:
+            parse: ถ้าระบุ จะ parse HTML ที่เก็บไว้ใหม่ (reprocess ด้วย extractor ปัจจุบัน)
+        """
+        entry = self.lookup(url)
+        if not entry:
+            self.stats["misses"] += 1
+            return None
+        self.stats["offlineHits"] += 1
+        if parse is None:
+            return entry.get("extracted")
+        body = self.read_body(url)
+        if body is None:
+            return entry.get("extracted")
+        self.stats["parsed"] += 1
+        return parse(body)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            hits = self.stats["notModified"] + self.stats["unchanged"] + self.stats["offlineHits"]
+            return {
+                **self.stats,
+                "hitRate": round(hits / self.stats["lookups"], 4) if self.stats["lookups"] else None,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "maxBytes": self.max_bytes,
+                "offline": self.offline,
+            }
+
+
+# Global instance
+article_http_cache = ArticleHttpCache(
+    max_bytes=int(float(os.getenv("ARTICLE_CACHE_MAX_MB", 512)) * 1024 * 1024),
+    offline=os.getenv("ARTICLE_CACHE_OFFLINE", "0") == "1"
+)
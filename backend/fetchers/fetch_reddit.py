@@ -108,6 +108,9 @@ def fetch_posts(keyword="AI", limit=50):
                 
                 if new_posts:
                     post_collection.insert_many(new_posts)
+                    # ✅ อัปเดต ticker_mentions rollup ($inc เฉพาะ posts ใหม่) - engine=rollup ไม่นับขาด
+                    from processors.mention_rollup import mention_rollup
+                    mention_rollup.record_posts(new_posts, 'reddit')
                     print(f"✅ Inserted {len(new_posts)} new posts for '{keyword}' (skipped {len(normalized_posts) - len(new_posts)} duplicates)")
                 else:
                     print(f"ℹ️ All {len(normalized_posts)} posts already exist in database")
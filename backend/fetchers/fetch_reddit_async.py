@@ -109,6 +109,9 @@ async def fetch_posts_async(keyword: str = "AI", limit: int = 50, timeout: float
                 
                 if new_posts:
                     post_collection.insert_many(new_posts)
+                    # ✅ อัปเดต ticker_mentions rollup ($inc เฉพาะ posts ใหม่) - engine=rollup ไม่นับขาด
+                    from processors.mention_rollup import mention_rollup
+                    mention_rollup.record_posts(new_posts, 'reddit')
                     # Suppress print - ไม่แสดง log
                 # Suppress all other print statements
         except Exception:
@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import requests
 from typing import List, Dict, Optional
+from utils.host_rate_limiter import host_rate_limiter
 
 # __file__ = backend/fetchers/news_fetcher.py
 # ต้องการ path = reddit-hashtag-analytics/.env (ขึ้นไป 2 ระดับ)
@@ -58,7 +59,10 @@ class NewsFetcher:
                 'to': to_date.strftime('%Y-%m-%d')
             }
             
-            response = requests.get(f"{self.base_url}/everything", params=params, timeout=10)
+            # ✅ NewsAPI มี budget ของตัวเอง (token bucket ต่อ host + ปรับตาม 429)
+            with host_rate_limiter.limit_sync(self.base_url):
+                response = requests.get(f"{self.base_url}/everything", params=params, timeout=10)
+            host_rate_limiter.record_response(self.base_url, response.status_code, response.headers.get('Retry-After'))
             
             if response.status_code == 200:
                 data = response.json()
@@ -85,7 +89,10 @@ class NewsFetcher:
                     'pageSize': min(max_results - len(articles), 100)
                 }
                 
-                response_headlines = requests.get(f"{self.base_url}/top-headlines", params=params_headlines, timeout=10)
+                with host_rate_limiter.limit_sync(self.base_url):
+                    response_headlines = requests.get(f"{self.base_url}/top-headlines", params=params_headlines, timeout=10)
+                host_rate_limiter.record_response(self.base_url, response_headlines.status_code,
+                                                  response_headlines.headers.get('Retry-After'))
                 
                 if response_headlines.status_code == 200:
                     data_headlines = response_headlines.json()
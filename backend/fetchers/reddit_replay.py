@@ -0,0 +1,382 @@
+"""
+Reddit Replay
+Reddit client จำลองสำหรับ load test ของ RedditBulkProcessor แบบ offline (ไม่ต้องเรียก Reddit จริง)
+- interface เดียวกับส่วนของ asyncpraw ที่ processor ใช้: subreddit().new(), submission(fetch=False),
+  load(), comments(), replace_more(), list(), close()
+- เสิร์ฟ listings (/new) และ comment trees จาก fixture (บันทึกจาก Reddit จริง หรือสร้างแบบ synthetic)
+- latency ต่อ request (+ jitter) และตอบ 429 ตามสัดส่วนที่กำหนด
+- rate_limited=True → ทุก request ผ่าน host_rate_limiter ของ oauth.reddit.com เหมือน RateLimitedRequestor
+
+Fixture (JSON หรือ .json.gz):
+    {"tickers": [...],
+     "subreddits": {"stocks": [{id, title, selftext, score, num_comments, created_utc, url, author,
+                                upvote_ratio, is_self, over_18,
+                                comments: [{id, body, score, author, created_utc, is_submitter, parent_id}]}]}}
+    posts ของแต่ละ subreddit เรียงจากใหม่ไปเก่า (เหมือน /new)
+
+Usage:
+    source = ReplaySource(load_fixture("fixture.json.gz"), latency=0.05)
+    processor.get_reddit_instance = source.get_reddit_instance
+"""
+import asyncio
+import gzip
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utils.host_rate_limiter import host_rate_limiter, REDDIT_HOST
+
+LISTING_PAGE_SIZE = 100  # posts ต่อ request ของ /new (เท่ากับ Reddit)
+COMMENTS_PER_REQUEST = 200  # comments ที่มากับ request แรกของ submission
+MORE_CHILDREN_PER_REQUEST = 100  # comments ต่อ request ของ replace_more
+
+SYNTHETIC_TICKERS = ["AAPL", "TSLA", "NVDA", "AMD", "MSFT", "AMZN", "GOOGL", "META", "PLTR", "GME",
+                     "AMC", "SOFI", "NIO", "INTC", "BABA", "SPY", "QQQ", "COIN", "RIVN", "SNAP"]
+SYNTHETIC_SUBREDDITS = ["wallstreetbets", "stocks", "investing", "options", "pennystocks",
+                        "StockMarket", "Daytrading", "SPACs"]
+_POST_TEMPLATES = [
+    "${t} earnings next week, thinking about buying calls",
+    "Why I'm bullish on {t} for the rest of the year",
+    "{t} is going to the moon, loaded up on shares today",
+    "Is it too late to buy {t}? Down 12% this month",
+    "DD: {t} and {u} are massively undervalued",
+    "Sold my {t} position, taking profits before the Fed meeting",
+    "What do you think about the market today?",
+    "Daily discussion thread",
+]
+_COMMENT_TEMPLATES = [
+    "{t} to the moon", "I'm holding {t} until it hits 200", "This is a terrible take, {t} is overvalued",
+    "Bought more ${t} this morning", "puts on {t} printing", "Great DD, thanks", "lol", "[deleted]",
+    "Not financial advice but {t} looks strong", "Bagholding {t} since last year, pain",
+]
+
+
+class ReplayTooManyRequests(Exception):
+    """429 จำลอง (ข้อความเดียวกับ asyncprawcore.TooManyRequests)"""
+
+    def __init__(self):
+        super().__init__("received 429 HTTP response")
+
+
+class ReplayNotFound(Exception):
+    """404 จำลอง (submission ไม่มีใน fixture)"""
+
+    def __init__(self):
+        super().__init__("received 404 HTTP response")
+
+
+class ReplayComment:
+    """comment ของ fixture (attribute เดียวกับ asyncpraw Comment)"""
+
+    def __init__(self, data: Dict, submission_id: str):
+        self.id = data["id"]
+        self.body = data.get("body", "")
+        self.score = data.get("score", 0)
+        self.author = data.get("author")
+        self.created_utc = data.get("created_utc", time.time())
+        self.is_submitter = data.get("is_submitter", False)
+        self.parent_id = data.get("parent_id") or f"t3_{submission_id}"
+
+
+class ReplayCommentForest:
+    """CommentForest จำลอง - replace_more ใช้ request เพิ่มตามจำนวน comments ที่เกินหน้าแรก"""
+
+    def __init__(self, source: "ReplaySource", submission_id: str, comments: List[Dict]):
+        self._source = source
+        self._submission_id = submission_id
+        self._comments = comments
+
+    async def replace_more(self, limit: Optional[int] = 32):
+        remaining = max(0, len(self._comments) - COMMENTS_PER_REQUEST)
+        requests = -(-remaining // MORE_CHILDREN_PER_REQUEST)
+        if limit is not None:
+            requests = min(requests, limit)
+        for _ in range(requests):
+            await self._source.request("/api/morechildren")
+        return []
+
+    def list(self) -> List[ReplayComment]:
+        return [ReplayComment(data, self._submission_id) for data in self._comments]
+
+
+class ReplaySubmission:
+    """Submission จำลอง (attribute ที่ processor ใช้ + load/comments)"""
+
+    def __init__(self, source: "ReplaySource", data: Dict, subreddit: str):
+        self._source = source
+        self._data = data
+        self.id = data["id"]
+        self.fullname = f"t3_{self.id}"
+        self.title = data.get("title", "")
+        self.selftext = data.get("selftext", "")
+        self.score = data.get("score", 0)
+        self.num_comments = data.get("num_comments", len(data.get("comments") or []))
+        self.created_utc = data["created_utc"] + source.time_offset
+        self.subreddit = subreddit
+        self.url = data.get("url", f"https://www.reddit.com/r/{subreddit}/comments/{self.id}/")
+        self.author = data.get("author")
+        self.upvote_ratio = data.get("upvote_ratio", 1.0)
+        self.is_self = data.get("is_self", True)
+        self.over_18 = data.get("over_18", False)
+
+    async def load(self):
+        await self._source.request(f"/comments/{self.id}")
+
+    async def comments(self) -> ReplayCommentForest:
+        return ReplayCommentForest(self._source, self.id, self._data.get("comments") or [])
+
+
+class _MissingSubmission:
+    """submission ที่ไม่มีใน fixture - load() ได้ 404"""
+
+    def __init__(self, source: "ReplaySource", submission_id: str):
+        self._source = source
+        self.id = submission_id
+
+    async def load(self):
+        await self._source.request(f"/comments/{self.id}")
+        raise ReplayNotFound()
+
+
+class ReplaySubreddit:
+    """Subreddit จำลอง - new() แบ่งหน้าละ LISTING_PAGE_SIZE posts (หนึ่ง request ต่อหน้า)"""
+
+    def __init__(self, source: "ReplaySource", name: str):
+        self._source = source
+        self.display_name = name
+
+    async def new(self, limit: Optional[int] = 100, params: Optional[Dict] = None):
+        posts = self._source.listing(self.display_name)
+        after = (params or {}).get("after")
+        if after:
+            # เหมือน Reddit: เริ่มหลัง post ที่ระบุ (fullname)
+            ids = [f"t3_{data['id']}" for data in posts]
+            posts = posts[ids.index(after) + 1:] if after in ids else []
+        if limit is not None:
+            posts = posts[:limit]
+        for start in range(0, max(len(posts), 1), LISTING_PAGE_SIZE):
+            await self._source.request(f"/r/{self.display_name}/new")
+            for data in posts[start:start + LISTING_PAGE_SIZE]:
+                yield ReplaySubmission(self._source, data, self.display_name)
+
+    def __str__(self):
+        return self.display_name
+
+
+class ReplayReddit:
+    """asyncpraw.Reddit จำลอง"""
+
+    def __init__(self, source: "ReplaySource"):
+        self._source = source
+
+    async def subreddit(self, name: str) -> ReplaySubreddit:
+        return ReplaySubreddit(self._source, name)
+
+    async def submission(self, id: str, fetch: bool = True):
+        data = self._source.find_submission(id)
+        submission = (_MissingSubmission(self._source, id) if data is None
+                      else ReplaySubmission(self._source, *data))
+        if fetch:
+            await submission.load()
+        return submission
+
+    async def close(self):
+        pass
+
+
+class ReplaySource:
+    """
+    แหล่งข้อมูลของ ReplayReddit (fixture + latency + 429)
+
+    Args:
+        fixture: dict ตามรูปแบบใน docstring ของ module
+        latency: เวลาต่อ request (วินาที)
+        jitter: สุ่มเพิ่ม 0..jitter วินาทีต่อ request
+        throttle_rate: สัดส่วนของ requests ที่ตอบ 429 (0-1)
+        retry_after: Retry-After (วินาที) ของ 429 ที่ส่งให้ host_rate_limiter
+        rate_limited: ส่งทุก request ผ่าน host_rate_limiter ของ Reddit (budget จริงของ production)
+        shift_to_now: เลื่อน created_utc ทั้งหมดให้ post ใหม่สุดเพิ่งถูกสร้าง (fixture ที่บันทึกไว้นานแล้วไม่ถูกตัดด้วย since)
+        seed: seed ของ jitter / 429 (ผลซ้ำได้)
+    """
+
+    def __init__(self, fixture: Dict, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: float = 1.0, rate_limited: bool = False, shift_to_now: bool = True,
+                 seed: Optional[int] = None):
+        self.subreddits: Dict[str, List[Dict]] = fixture.get("subreddits", {})
+        self.tickers = list(fixture.get("tickers") or [])
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+        self._random = random.Random(seed)
+        self._index = {data["id"]: (data, name) for name, posts in self.subreddits.items() for data in posts}
+        newest = max((data["created_utc"] for data, _ in self._index.values()), default=None)
+        self.time_offset = (time.time() - 60 - newest) if (shift_to_now and newest is not None) else 0.0
+        self.stats = {"requests": 0, "throttled": 0, "listingPages": 0, "submissionLoads": 0, "moreChildren": 0}
+
+    async def get_reddit_instance(self, session=None) -> ReplayReddit:
+        """แทน RedditBulkProcessor.get_reddit_instance"""
+        return ReplayReddit(self)
+
+    def listing(self, subreddit: str) -> List[Dict]:
+        return self.subreddits.get(subreddit, [])
+
+    def find_submission(self, submission_id: str):
+        return self._index.get(submission_id)
+
+    async def request(self, path: str):
+        """request จำลอง 1 ครั้ง (latency → 429 ตาม throttle_rate)"""
+        self.stats["requests"] += 1
+        if path.endswith("/new"):
+            self.stats["listingPages"] += 1
+        elif path.startswith("/comments/"):
+            self.stats["submissionLoads"] += 1
+        else:
+            self.stats["moreChildren"] += 1
+
+        url = f"https://{REDDIT_HOST}{path}"
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.rate_limited:
+            async with host_rate_limiter.limit(url):
+                await asyncio.sleep(delay)
+        elif delay:
+            await asyncio.sleep(delay)
+
+        throttled = self.throttle_rate and self._random.random() < self.throttle_rate
+        if self.rate_limited:
+            host_rate_limiter.record_response(url, 429 if throttled else 200,
+                                              self.retry_after if throttled else None)
+        if throttled:
+            self.stats["throttled"] += 1
+            raise ReplayTooManyRequests()
+
+
+def generate_fixture(subreddits: Iterable[str] = SYNTHETIC_SUBREDDITS, posts_per_subreddit: int = 200,
+                     comments_per_post: float = 20, tickers: Iterable[str] = SYNTHETIC_TICKERS,
+                     seconds_between_posts: float = 30, seed: int = 42) -> Dict:
+    """
+    สร้าง fixture แบบ synthetic (ข้อความมี tickers ปนกับข้อความทั่วไป, จำนวน comments ต่อ post แบบ exponential)
+
+    Args:
+        subreddits: ชื่อ subreddits
+        posts_per_subreddit: จำนวน posts ต่อ subreddit
+        comments_per_post: จำนวน comments เฉลี่ยต่อ post
+        tickers: tickers ที่ใช้ในข้อความ (เป็น valid tickers ของ fixture ด้วย)
+        seconds_between_posts: ระยะห่างของ created_utc ระหว่าง posts
+        seed: random seed
+
+    Returns:
+        fixture dict
+    """
+    rng = random.Random(seed)
+    tickers = list(tickers)
+    now = time.time()
+    fixture = {"tickers": tickers, "subreddits": {}}
+    for sub_index, subreddit in enumerate(subreddits):
+        posts = []
+        for i in range(posts_per_subreddit):
+            post_id = f"r{sub_index:02x}{i:05x}"
+            created = now - i * seconds_between_posts - rng.uniform(0, seconds_between_posts)
+            ticker, other = rng.sample(tickers, 2)
+            count = int(rng.expovariate(1 / comments_per_post)) if comments_per_post > 0 else 0
+            comments = [{
+                "id": f"{post_id}c{j:04x}",
+                "body": rng.choice(_COMMENT_TEMPLATES).format(t=rng.choice((ticker, other, rng.choice(tickers)))),
+                "score": int(rng.expovariate(1 / 5)),
+                "author": f"user{rng.randrange(5000)}",
+                "created_utc": created + rng.uniform(0, 3600),
+                "is_submitter": rng.random() < 0.05,
+                "parent_id": f"t3_{post_id}",
+            } for j in range(count)]
+            posts.append({
+                "id": post_id,
+                "title": rng.choice(_POST_TEMPLATES).format(t=ticker, u=other),
+                "selftext": " ".join(rng.choice(_COMMENT_TEMPLATES).format(t=rng.choice(tickers))
+                                     for _ in range(rng.randrange(0, 6))),
+                "score": int(rng.expovariate(1 / 50)),
+                "num_comments": count,
+                "created_utc": created,
+                "author": f"user{rng.randrange(5000)}",
+                "upvote_ratio": round(rng.uniform(0.5, 1.0), 2),
+                "is_self": True,
+                "over_18": False,
+                "comments": comments,
+            })
+        fixture["subreddits"][subreddit] = posts
+    return fixture
+
+
+async def record_fixture(reddit, subreddits: Iterable[str], limit: int = 100, max_comments: int = 200,
+                         tickers: Iterable[str] = ()) -> Dict:
+    """
+    บันทึก listings + comment trees จาก Reddit จริง (asyncpraw) เป็น fixture
+
+    Args:
+        reddit: asyncpraw.Reddit instance
+        subreddits: ชื่อ subreddits
+        limit: จำนวน posts ต่อ subreddit
+        max_comments: จำนวน comments สูงสุดต่อ post (replace_more(limit=0) - ไม่ดึง MoreComments เพิ่ม)
+        tickers: valid tickers ที่เก็บไว้ใน fixture
+
+    Returns:
+        fixture dict
+    """
+    fixture = {"tickers": sorted(tickers), "subreddits": {}}
+    for name in subreddits:
+        subreddit = await reddit.subreddit(name)
+        posts = []
+        async for submission in subreddit.new(limit=limit):
+            comments = []
+            if submission.num_comments:
+                try:
+                    forest = await submission.comments()
+                    await forest.replace_more(limit=0)
+                    for comment in forest.list()[:max_comments]:
+                        comments.append({
+                            "id": comment.id,
+                            "body": comment.body,
+                            "score": comment.score or 0,
+                            "author": str(comment.author) if comment.author else None,
+                            "created_utc": comment.created_utc,
+                            "is_submitter": getattr(comment, "is_submitter", False),
+                            "parent_id": str(comment.parent_id),
+                        })
+                except Exception as e:
+                    print(f"   ⚠️ Skip comments of {submission.id}: {e}")
+            posts.append({
+                "id": submission.id,
+                "title": submission.title,
+                "selftext": getattr(submission, "selftext", "") or "",
+                "score": submission.score or 0,
+                "num_comments": submission.num_comments or 0,
+                "created_utc": submission.created_utc,
+                "url": submission.url,
+                "author": str(submission.author) if submission.author else None,
+                "upvote_ratio": getattr(submission, "upvote_ratio", 0),
+                "is_self": submission.is_self,
+                "over_18": getattr(submission, "over_18", False),
+                "comments": comments,
+            })
+        fixture["subreddits"][name] = posts
+        print(f"   📥 r/{name}: {len(posts)} posts, {sum(len(p['comments']) for p in posts)} comments")
+    return fixture
+
+
+def load_fixture(path) -> Dict:
+    """โหลด fixture (.json หรือ .json.gz)"""
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fixture(path, fixture: Dict):
+    """บันทึก fixture (.json หรือ .json.gz)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        json.dump(fixture, f, ensure_ascii=False)
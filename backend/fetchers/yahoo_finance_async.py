@@ -4,10 +4,12 @@ Yahoo Finance Async Fetcher - ใช้ aiohttp แทน yfinance
 """
 import aiohttp
 import asyncio
+from contextlib import asynccontextmanager
 from typing import Dict, List, Optional
 from datetime import datetime
 import json
 import re
+from utils.host_rate_limiter import HostRateLimiter, host_rate_limiter
 
 class YahooFinanceAsyncFetcher:
     """
@@ -15,7 +17,12 @@ class YahooFinanceAsyncFetcher:
     ใช้ aiohttp แทน yfinance เพื่อให้เป็น async จริงๆ
     """
     
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[HostRateLimiter] = None):
+        """
+        Args:
+            rate_limiter: rate limiter ต่อ host (default: host_rate_limiter)
+        """
+        self.rate_limiter = rate_limiter or host_rate_limiter
         self.base_url = "https://query1.finance.yahoo.com/v8/finance/chart"
         self.news_url = "https://query2.finance.yahoo.com/v1/finance/search"
         self.info_url = "https://query2.finance.yahoo.com/v10/finance/quoteSummary"
@@ -30,6 +37,14 @@ class YahooFinanceAsyncFetcher:
             )
         return self.session
     
+    @asynccontextmanager
+    async def _get(self, session: aiohttp.ClientSession, url: str, params: Dict):
+        """GET ผ่าน rate limiter ของ host (query1/query2 แยก budget กัน) - แจ้ง 429/Retry-After กลับไปที่ limiter"""
+        async with self.rate_limiter.limit(url):
+            async with session.get(url, params=params) as response:
+                self.rate_limiter.record_response(url, response.status, response.headers.get("Retry-After"))
+                yield response
+    
     async def close(self):
         """Close aiohttp session"""
         if self.session and not self.session.closed:
@@ -57,7 +72,7 @@ class YahooFinanceAsyncFetcher:
                 "includePrePost": "false"
             }
             
-            async with session.get(url, params=params) as response:
+            async with self._get(session, url, params) as response:
                 if response.status == 200:
                     data = await response.json()
                     
@@ -118,7 +133,7 @@ class YahooFinanceAsyncFetcher:
                 "modules": "summaryProfile,price,defaultKeyStatistics"
             }
             
-            async with session.get(url, params=params) as response:
+            async with self._get(session, url, params) as response:
                 if response.status == 200:
                     data = await response.json()
                     result = data.get('quoteSummary', {}).get('result', [])
@@ -166,7 +181,7 @@ class YahooFinanceAsyncFetcher:
                 "newsCount": max_results
             }
             
-            async with session.get(url, params=params) as response:
+            async with self._get(session, url, params) as response:
                 if response.status == 200:
                     data = await response.json()
                     news_list = data.get('news', [])
@@ -227,7 +242,7 @@ class YahooFinanceAsyncFetcher:
                 "includePrePost": "false"
             }
             
-            async with session.get(url, params=params) as response:
+            async with self._get(session, url, params) as response:
                 if response.status == 200:
                     data = await response.json()
                     result = data.get('chart', {}).get('result', [])
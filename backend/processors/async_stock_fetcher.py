@@ -4,10 +4,13 @@ Async Stock Fetcher - สำหรับดึงข้อมูลหุ้น
 """
 import asyncio
 import aiohttp
+import threading
+import weakref
 from typing import List, Dict, Optional
 from datetime import datetime
 import yfinance as yf
-from concurrent.futures import ThreadPoolExecutor
+from utils.host_rate_limiter import HostRateLimiter, host_rate_limiter, YAHOO_QUERY2_HOST
+from utils.blocking_executor import BlockingExecutor, blocking_executor
 import time
 import hashlib
 import warnings
@@ -25,259 +28,206 @@ class AsyncStockFetcher:
     """
     Async fetcher สำหรับดึงข้อมูลหุ้นจำนวนมากพร้อมกัน
     """
-    def __init__(self, max_concurrent: int = 50, rate_limit: int = 100):
+    def __init__(self, rate_limiter: Optional[HostRateLimiter] = None, executor: Optional[BlockingExecutor] = None):
         """
         Args:
-            max_concurrent: จำนวนหุ้นที่ดึงพร้อมกัน
-            rate_limit: จำนวน requests ต่อนาที
+            rate_limiter: rate limiter ต่อ host (default: host_rate_limiter)
+                          ปรับ rate/concurrency ของแต่ละ host ผ่าน env HOST_RATE_LIMITS
+            executor: thread pool สำหรับ yfinance/requests fallback (default: blocking_executor ของ process)
         """
-        self.max_concurrent = max_concurrent
-        self.rate_limit = rate_limit
-        self.semaphore = asyncio.Semaphore(max_concurrent)
-        self.request_times = []
-        self.lock = asyncio.Lock()
+        self.rate_limiter = rate_limiter or host_rate_limiter
+        self.executor = executor or blocking_executor
+        # YahooFinanceAsyncFetcher (aiohttp session) แยกต่อ event loop - รอบที่รันพร้อมกันคนละ thread/loop
+        # (เช่น priority refresh ของกลุ่ม tier ต่างกัน) ไม่ใช้ session ข้าม loop และไม่ปิด session ของกันและกัน
+        self._yahoo_fetchers = weakref.WeakKeyDictionary()
+        self._fetchers_lock = threading.Lock()
     
-    async def _rate_limit_wait(self):
-        """Rate limiting เพื่อหลีกเลี่ยง API throttling"""
-        async with self.lock:
-            now = time.time()
-            # ลบ request times ที่เก่ากว่า 1 นาที
-            self.request_times = [t for t in self.request_times if now - t < 60]
-            
-            if len(self.request_times) >= self.rate_limit:
-                # รอจนกว่าจะมี slot ว่าง
-                oldest_time = min(self.request_times)
-                wait_time = 60 - (now - oldest_time) + 0.1
-                if wait_time > 0:
-                    await asyncio.sleep(wait_time)
-            
-            self.request_times.append(time.time())
+    def _get_yahoo_fetcher(self):
+        """YahooFinanceAsyncFetcher ของ event loop ที่กำลังรัน (สร้างตอนใช้ครั้งแรก)"""
+        from fetchers.yahoo_finance_async import YahooFinanceAsyncFetcher
+        
+        loop = asyncio.get_running_loop()
+        with self._fetchers_lock:
+            fetcher = self._yahoo_fetchers.get(loop)
+            if fetcher is None:
+                fetcher = self._yahoo_fetchers[loop] = YahooFinanceAsyncFetcher(self.rate_limiter)
+            return fetcher
+    
+    async def close(self):
+        """ปิด session ของ event loop ที่กำลังรัน (ไม่กระทบรอบอื่นที่รันบน loop อื่น)"""
+        with self._fetchers_lock:
+            fetcher = self._yahoo_fetchers.pop(asyncio.get_running_loop(), None)
+        if fetcher is not None:
+            await fetcher.close()
     
-    async def fetch_stock_info_async(self, symbol: str) -> Optional[Dict]:
+    async def fetch_stock_info_async(self, symbol: str, raise_errors: bool = False) -> Optional[Dict]:
         """
         ดึงข้อมูลหุ้นแบบ async - ใช้ Yahoo Finance API โดยตรง (async จริงๆ)
+        raise_errors: ส่ง exception ต่อ (เช่นให้ batch checkpoint จัดประเภท error) แทนการคืน None
         """
-        async with self.semaphore:
-            await self._rate_limit_wait()
+        try:
+            # ใช้ async Yahoo Finance fetcher (เร็วกว่า yfinance) - session ของ event loop นี้
+            # ดึงข้อมูลแบบ async (เร็วกว่า yfinance ~3-5 เท่า)
+            stock_info = await self._get_yahoo_fetcher().fetch_stock_info_async(symbol.upper())
             
-            try:
-                # ใช้ async Yahoo Finance fetcher (เร็วกว่า yfinance)
-                from fetchers.yahoo_finance_async import YahooFinanceAsyncFetcher
-                
-                # สร้าง fetcher instance (ใช้ shared session)
-                if not hasattr(self, '_yahoo_async_fetcher'):
-                    self._yahoo_async_fetcher = YahooFinanceAsyncFetcher()
+            # ถ้า async fetcher ไม่ได้ผล ให้ fallback ไปใช้ yfinance
+            if not stock_info:
+                # Fallback: ใช้ yfinance (blocking I/O) ผ่าน thread pool กลางของ process
+                ticker = yf.Ticker(symbol.upper())
+                async with self.rate_limiter.limit(YAHOO_QUERY2_HOST):
+                    info = await self.executor.run(lambda: ticker.info)
+                async with self.rate_limiter.limit(YAHOO_QUERY2_HOST):
+                    hist = await self.executor.run(lambda: ticker.history(period="1d"))
                 
-                # ดึงข้อมูลแบบ async (เร็วกว่า yfinance ~3-5 เท่า)
-                stock_info = await self._yahoo_async_fetcher.fetch_stock_info_async(symbol.upper())
+                if hist.empty and info:
+                    current_price = info.get('regularMarketPrice')
+                    previous_close = info.get('previousClose', current_price)
+                    change = current_price - previous_close if current_price and previous_close else 0
+                    change_percent = (change / previous_close * 100) if previous_close else 0
+                    
+                    return {
+                        'symbol': symbol.upper(),
+                        'name': info.get('longName', info.get('shortName', symbol)),
+                        'currentPrice': float(current_price) if current_price else 0,
+                        'previousClose': float(previous_close) if previous_close else 0,
+                        'change': float(change),
+                        'changePercent': float(change_percent),
+                        'volume': int(info.get('volume', 0)),
+                        'marketCap': info.get('marketCap', 0),
+                        'sector': info.get('sector', 'Unknown'),
+                        'industry': info.get('industry', 'Unknown'),
+                        'fetchedAt': datetime.utcnow().isoformat()
+                    }
                 
-                # ถ้า async fetcher ไม่ได้ผล ให้ fallback ไปใช้ yfinance
-                if not stock_info:
-                    # Fallback: ใช้ ThreadPoolExecutor สำหรับ yfinance (blocking I/O)
-                    loop = asyncio.get_event_loop()
-                    with ThreadPoolExecutor() as executor:
-                        ticker = await loop.run_in_executor(executor, lambda: yf.Ticker(symbol.upper()))
-                        info = await loop.run_in_executor(executor, lambda: ticker.info)
-                        hist = await loop.run_in_executor(executor, lambda: ticker.history(period="1d"))
-                        
-                        if hist.empty and info:
-                            current_price = info.get('regularMarketPrice')
-                            previous_close = info.get('previousClose', current_price)
-                            change = current_price - previous_close if current_price and previous_close else 0
-                            change_percent = (change / previous_close * 100) if previous_close else 0
-                            
-                            return {
-                                'symbol': symbol.upper(),
-                                'name': info.get('longName', info.get('shortName', symbol)),
-                                'currentPrice': float(current_price) if current_price else 0,
-                                'previousClose': float(previous_close) if previous_close else 0,
-                                'change': float(change),
-                                'changePercent': float(change_percent),
-                                'volume': int(info.get('volume', 0)),
-                                'marketCap': info.get('marketCap', 0),
-                                'sector': info.get('sector', 'Unknown'),
-                                'industry': info.get('industry', 'Unknown'),
-                                'fetchedAt': datetime.utcnow().isoformat()
-                            }
-                        
-                        if not hist.empty:
-                            current_price = hist['Close'].iloc[-1]
-                            previous_close = info.get('previousClose', current_price) if info else current_price
-                            change = current_price - previous_close
-                            change_percent = (change / previous_close * 100) if previous_close else 0
-                            
-                            return {
-                                'symbol': symbol.upper(),
-                                'name': info.get('longName', info.get('shortName', symbol)) if info else symbol,
-                                'currentPrice': float(current_price),
-                                'previousClose': float(previous_close),
-                                'change': float(change),
-                                'changePercent': float(change_percent),
-                                'volume': int(hist['Volume'].iloc[-1]) if 'Volume' in hist.columns else 0,
-                                'marketCap': info.get('marketCap', 0) if info else 0,
-                                'sector': info.get('sector', 'Unknown') if info else 'Unknown',
-                                'industry': info.get('industry', 'Unknown') if info else 'Unknown',
-                                'fetchedAt': datetime.utcnow().isoformat()
-                            }
-                        
-                        return None
+                if not hist.empty:
+                    current_price = hist['Close'].iloc[-1]
+                    previous_close = info.get('previousClose', current_price) if info else current_price
+                    change = current_price - previous_close
+                    change_percent = (change / previous_close * 100) if previous_close else 0
+                    
+                    return {
+                        'symbol': symbol.upper(),
+                        'name': info.get('longName', info.get('shortName', symbol)) if info else symbol,
+                        'currentPrice': float(current_price),
+                        'previousClose': float(previous_close),
+                        'change': float(change),
+                        'changePercent': float(change_percent),
+                        'volume': int(hist['Volume'].iloc[-1]) if 'Volume' in hist.columns else 0,
+                        'marketCap': info.get('marketCap', 0) if info else 0,
+                        'sector': info.get('sector', 'Unknown') if info else 'Unknown',
+                        'industry': info.get('industry', 'Unknown') if info else 'Unknown',
+                        'fetchedAt': datetime.utcnow().isoformat()
+                    }
                 
-                return stock_info
-            except Exception:
-                # Suppress error messages - ไม่แสดง error เพื่อให้ progress bar ดูสะอาด
                 return None
-    
-    async def fetch_stock_news_async(self, symbol: str, max_results: int = 100) -> List[Dict]:
+        
+            return stock_info
+        except Exception:
+            if raise_errors:
+                raise
+            # Suppress error messages - ไม่แสดง error เพื่อให้ progress bar ดูสะอาด
+            return None
+
+    async def fetch_stock_news_async(self, symbol: str, max_results: int = 100, raise_errors: bool = False) -> List[Dict]:
         """
         ดึงข่าวหุ้นแบบ async จาก Yahoo Finance - ใช้ async API โดยตรง (เร็วกว่า yfinance)
+        raise_errors: ส่ง exception ต่อ แทนการคืน list ว่าง
         """
-        async with self.semaphore:
-            await self._rate_limit_wait()
+        try:
+            # ใช้ async Yahoo Finance fetcher (เร็วกว่า yfinance ~3-5 เท่า) - session ของ event loop นี้
+            # ดึงข่าวแบบ async (เร็วกว่า yfinance)
+            news_list = await self._get_yahoo_fetcher().fetch_stock_news_async(symbol.upper(), max_results=max_results)
             
-            try:
-                # ใช้ async Yahoo Finance fetcher (เร็วกว่า yfinance ~3-5 เท่า)
-                from fetchers.yahoo_finance_async import YahooFinanceAsyncFetcher
+            # ถ้า async fetcher ไม่ได้ผล ให้ fallback ไปใช้ yfinance
+            if not news_list:
+                # ดึง Ticker object
+                ticker = yf.Ticker(symbol.upper())
                 
-                # สร้าง fetcher instance (ใช้ shared session)
-                if not hasattr(self, '_yahoo_async_fetcher'):
-                    self._yahoo_async_fetcher = YahooFinanceAsyncFetcher()
+                # ดึงข่าว - ดึงทั้งหมดที่ Yahoo Finance มี (ไม่จำกัด)
+                async with self.rate_limiter.limit(YAHOO_QUERY2_HOST):
+                    news_list_raw = await self.executor.run(lambda: ticker.news)
+            
+                if not news_list_raw:
+                    # บางหุ้นอาจไม่มีข่าว (หุ้นเล็กๆ หรือหุ้นที่เพิ่ง IPO)
+                    return []
                 
-                # ดึงข่าวแบบ async (เร็วกว่า yfinance)
-                news_list = await self._yahoo_async_fetcher.fetch_stock_news_async(symbol.upper(), max_results=max_results)
+                # แปลง yfinance news format เป็น format เดียวกัน
+                news_list = []
+                for item in news_list_raw[:max_results]:
+                    news_list.append({
+                        'title': item.get('title', ''),
+                        'summary': item.get('summary', ''),
+                        'link': item.get('link', ''),
+                        'publisher': item.get('publisher', 'Yahoo Finance'),
+                        'providerPublishTime': item.get('providerPublishTime', 0),
+                        'type': item.get('type', 'STORY'),
+                        'uuid': item.get('uuid', '')
+                    })
                 
-                # ถ้า async fetcher ไม่ได้ผล ให้ fallback ไปใช้ yfinance
-                if not news_list:
-                    loop = asyncio.get_event_loop()
-                    with ThreadPoolExecutor() as executor:
-                        # ดึง Ticker object
-                        ticker = await loop.run_in_executor(executor, lambda: yf.Ticker(symbol.upper()))
-                        
-                        # ดึงข่าว - ดึงทั้งหมดที่ Yahoo Finance มี (ไม่จำกัด)
-                        news_list_raw = await loop.run_in_executor(executor, lambda: ticker.news)
-                    
-                        if not news_list_raw:
-                            # บางหุ้นอาจไม่มีข่าว (หุ้นเล็กๆ หรือหุ้นที่เพิ่ง IPO)
-                            return []
+                # ใช้ max_results เพื่อจำกัดจำนวนข่าวที่ดึงมา (ถ้า Yahoo Finance มีมากกว่า)
+                # แต่ถ้า news_list มีน้อยกว่า max_results ก็ใช้ทั้งหมดที่มี
+                # ✅ ไม่ดึงเนื้อหาเต็มจาก URL ตรงนี้ (บล็อก event loop) - article_content_pipeline
+                # เติม full_content ให้ข่าวใหม่หลังบันทึก (stage แยก ไม่ถ่วงการดึงราคา+ข่าว)
+                articles = []
+                for item in news_list[:max_results]:
+                    try:
+                        # แปลง publishedAt จาก timestamp เป็น ISO format
+                        published_at = item.get('providerPublishTime', 0)
+                        if published_at and isinstance(published_at, (int, float)):
+                            published_at = datetime.fromtimestamp(published_at).isoformat()
+                        elif not published_at:
+                            published_at = datetime.utcnow().isoformat()
                         
-                        # แปลง yfinance news format เป็น format เดียวกัน
-                        news_list = []
-                        for item in news_list_raw[:max_results]:
-                            news_list.append({
-                                'title': item.get('title', ''),
-                                'summary': item.get('summary', ''),
-                                'link': item.get('link', ''),
-                                'publisher': item.get('publisher', 'Yahoo Finance'),
-                                'providerPublishTime': item.get('providerPublishTime', 0),
-                                'type': item.get('type', 'STORY'),
-                                'uuid': item.get('uuid', '')
-                            })
+                        # สร้าง newsHash สำหรับ deduplication
+                        unique_string = f"{item.get('title', '')}{item.get('link', '')}{published_at}"
+                        news_hash = hashlib.md5(unique_string.encode()).hexdigest()
                         
-                        # ใช้ max_results เพื่อจำกัดจำนวนข่าวที่ดึงมา (ถ้า Yahoo Finance มีมากกว่า)
-                        # แต่ถ้า news_list มีน้อยกว่า max_results ก็ใช้ทั้งหมดที่มี
-                        articles = []
-                        # Import news content fetcher (optional - ถ้ามี)
-                        try:
-                            from fetchers.news_content_fetcher import NewsContentFetcher
-                            content_fetcher = NewsContentFetcher()
-                            fetch_content = True
-                        except ImportError:
-                            content_fetcher = None
-                            fetch_content = False
+                        # สร้าง id จาก uuid หรือ hash
+                        post_id = item.get('uuid', '') or news_hash[:12]
                         
-                        for item in news_list[:max_results]:
-                            try:
-                                # แปลง publishedAt จาก timestamp เป็น ISO format
-                                published_at = item.get('providerPublishTime', 0)
-                                if published_at and isinstance(published_at, (int, float)):
-                                    published_at = datetime.fromtimestamp(published_at).isoformat()
-                                elif not published_at:
-                                    published_at = datetime.utcnow().isoformat()
-                                
-                                # สร้าง newsHash สำหรับ deduplication
-                                unique_string = f"{item.get('title', '')}{item.get('link', '')}{published_at}"
-                                news_hash = hashlib.md5(unique_string.encode()).hexdigest()
-                                
-                                # สร้าง id จาก uuid หรือ hash
-                                post_id = item.get('uuid', '') or news_hash[:12]
-                                
-                                # ดึงรายละเอียดเพิ่มเติมจาก URL (ดึงเสมอเพื่อให้ได้เนื้อหาเต็ม)
-                                article_details = {}
-                                fetched_title = ''
-                                fetched_full_content = ''
-                                
-                                article_url = item.get('link', '')
-                                if fetch_content and content_fetcher and article_url:
-                                    try:
-                                        details = content_fetcher.fetch_article_content(article_url)
-                                        if details:
-                                            fetched_title = details.get('title', '')
-                                            fetched_full_content = details.get('full_content', '')
-                                            article_details = {
-                                                'full_content': fetched_full_content,  # เก็บเนื้อหาเต็มไว้
-                                                'tags': details.get('tags', []),
-                                                'author': details.get('author'),
-                                                'publish_date': details.get('publish_date'),
-                                                'word_count': details.get('word_count', 0)
-                                            }
-                                    except Exception as e_content:
-                                        # ถ้าดึงรายละเอียดไม่ได้ ไม่เป็นไร ยังเก็บข้อมูลพื้นฐานได้
-                                        pass
-                                
-                                # ใช้ title และ summary จาก Yahoo Finance API ก่อน
-                                # ถ้าไม่มี ให้ใช้จาก full_content ที่ดึงจาก URL
-                                yahoo_title = item.get('title', '') or ''
-                                yahoo_summary = item.get('summary', '') or ''
-                                
-                                # ใช้ title จาก full_content ถ้า Yahoo Finance ไม่มี
-                                final_title = yahoo_title or fetched_title or ''
-                                
-                                # ใช้ summary จาก Yahoo Finance ก่อน
-                                # ถ้าไม่มี ให้ใช้ full_content (จำกัด 2000 ตัวอักษรแรกเพื่อให้มีเนื้อหาพอสำหรับ sentiment analysis)
-                                if yahoo_summary:
-                                    final_summary = yahoo_summary
-                                elif fetched_full_content:
-                                    # ใช้ full_content เป็น selftext (จำกัด 2000 ตัวอักษรแรก)
-                                    final_summary = fetched_full_content[:2000]
-                                else:
-                                    final_summary = ''
-                                
-                                articles.append({
-                                    # Standard fields (เหมือน Reddit structure)
-                                    'id': post_id,  # ใช้ uuid หรือ hash แรก 12 ตัว
-                                    'title': final_title,  # ใช้ title จาก Yahoo Finance หรือ full_content
-                                    'selftext': final_summary,  # ใช้ summary จาก Yahoo Finance หรือ full_content
-                                    'score': 0,  # Yahoo Finance ไม่มี score
-                                    'num_comments': 0,  # Yahoo Finance ไม่มี comments
-                                    'created_utc': published_at,  # ใช้ publishedAt
-                                    'subreddit': item.get('publisher', 'Yahoo Finance'),  # ใช้ publisher เป็น subreddit
-                                    'keyword': symbol.upper(),  # เพิ่ม keyword (symbol)
-                                    'url': item.get('link', '') or '',
-                                    'author': article_details.get('author') or item.get('publisher', 'Yahoo Finance'),
-                                    'upvote_ratio': 0,  # Yahoo Finance ไม่มี upvote_ratio
-                                    'is_self': False,  # Yahoo Finance เป็น external link
-                                    'over_18': False,
-                                    'fetched_at': datetime.utcnow().isoformat(),
-                                    
-                                    # Yahoo Finance specific fields
-                                    'source': item.get('publisher', 'Yahoo Finance'),
-                                    'publishedAt': published_at,
-                                    'type': item.get('type', 'STORY'),
-                                    'uuid': item.get('uuid', ''),
-                                    'newsHash': news_hash,  # สำหรับ deduplication
-                                    'symbol': symbol.upper(),  # เพิ่ม symbol
-                                    
-                                    # Article details (ถ้าดึงได้)
-                                    **article_details
-                                })
-                            except Exception:
-                                # ถ้า item ไหนมีปัญหา ให้ skip ไป
-                                continue
+                        # ใช้ title และ summary จาก Yahoo Finance API
+                        # (ถ้าไม่มี summary → article_content_pipeline เติม selftext จาก full_content ทีหลัง)
+                        final_title = item.get('title', '') or ''
+                        final_summary = item.get('summary', '') or ''
                         
-                        return articles
-            except Exception:
-                # Suppress error messages - ไม่แสดง error เพื่อให้ progress bar ดูสะอาด
-                return []
-    
+                        articles.append({
+                            # Standard fields (เหมือน Reddit structure)
+                            'id': post_id,  # ใช้ uuid หรือ hash แรก 12 ตัว
+                            'title': final_title,  # ใช้ title จาก Yahoo Finance
+                            'selftext': final_summary,  # ใช้ summary จาก Yahoo Finance
+                            'score': 0,  # Yahoo Finance ไม่มี score
+                            'num_comments': 0,  # Yahoo Finance ไม่มี comments
+                            'created_utc': published_at,  # ใช้ publishedAt
+                            'subreddit': item.get('publisher', 'Yahoo Finance'),  # ใช้ publisher เป็น subreddit
+                            'keyword': symbol.upper(),  # เพิ่ม keyword (symbol)
+                            'url': item.get('link', '') or '',
+                            'author': item.get('publisher', 'Yahoo Finance'),
+                            'upvote_ratio': 0,  # Yahoo Finance ไม่มี upvote_ratio
+                            'is_self': False,  # Yahoo Finance เป็น external link
+                            'over_18': False,
+                            'fetched_at': datetime.utcnow().isoformat(),
+                            
+                            # Yahoo Finance specific fields
+                            'source': item.get('publisher', 'Yahoo Finance'),
+                            'publishedAt': published_at,
+                            'type': item.get('type', 'STORY'),
+                            'uuid': item.get('uuid', ''),
+                            'newsHash': news_hash,  # สำหรับ deduplication
+                            'symbol': symbol.upper(),  # เพิ่ม symbol
+                        })
+                    except Exception:
+                        # ถ้า item ไหนมีปัญหา ให้ skip ไป
+                        continue
+                
+                return articles
+            
+            return news_list
+        except Exception:
+            if raise_errors:
+                raise
+            # Suppress error messages - ไม่แสดง error เพื่อให้ progress bar ดูสะอาด
+            return []
+
     async def fetch_multiple_stocks_async(
         self, 
         symbols: List[str],
@@ -370,7 +320,7 @@ class AsyncStockFetcher:
 # ตัวอย่างการใช้งาน
 async def main():
     """ตัวอย่างการใช้งาน AsyncStockFetcher"""
-    fetcher = AsyncStockFetcher(max_concurrent=50, rate_limit=100)
+    fetcher = AsyncStockFetcher()
     
     # ดึงข้อมูล 100 หุ้นพร้อมกัน
     symbols = ['AAPL', 'TSLA', 'MSFT', 'GOOGL', 'AMZN'] * 20  # 100 symbols
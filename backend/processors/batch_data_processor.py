@@ -10,6 +10,11 @@ from fetchers.yahoo_finance_fetcher import YahooFinanceFetcher
 from processors.sentiment_analyzer import SentimentAnalyzer
 from processors.async_stock_fetcher import AsyncStockFetcher
 from processors.enhanced_sentiment_aggregator import EnhancedSentimentAggregator
+from utils.rotating_bloom_filter import RotatingBloomFilter
+from processors.batch_run_checkpoint import batch_run_checkpoint
+from fetchers.article_content_pipeline import article_content_pipeline
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
 # ไม่ใช้ Redis cache - ลด memory usage
 # from cache.redis_cache import cache
 cache = None
@@ -23,7 +28,9 @@ logging.getLogger('aiohttp').setLevel(logging.ERROR)
 logging.getLogger('aiohttp.client').setLevel(logging.ERROR)
 logging.getLogger('aiohttp.connector').setLevel(logging.ERROR)
 import hashlib
+import os
 import time
+from collections import OrderedDict
 
 class BatchDataProcessor:
     """
@@ -51,12 +58,28 @@ class BatchDataProcessor:
         self.yahoo_fetcher = YahooFinanceFetcher()
         self.sentiment_analyzer = SentimentAnalyzer()
         self.enhanced_sentiment_aggregator = EnhancedSentimentAggregator()
-        # เพิ่มความเร็ว: max_concurrent=2000, rate_limit=2000 (เร็วกว่าเดิม 4 เท่า)
+        # ✅ rate limit / concurrency แยกตาม host (token bucket ปรับตาม 429) - ตั้งค่าผ่าน env HOST_RATE_LIMITS
         # ไม่ใช้ Redis cache - ดึงข้อมูลโดยตรง
-        self.async_fetcher = AsyncStockFetcher(max_concurrent=2000, rate_limit=2000)
+        self.async_fetcher = AsyncStockFetcher()
+        # เวลาสูงสุดที่รอ article content pipeline ตอนจบรอบ (วินาที) - 0 = ไม่รอ
+        # (pipeline รันใน background thread ของตัวเอง ข่าวที่ค้างถูกดึงต่อหลังรอบจบ)
+        self.content_drain_seconds = float(os.getenv("ARTICLE_CONTENT_DRAIN_SECONDS", 0))
         
         # เก็บ hash ของข่าวที่ดึงมาแล้ว (เพื่อหลีกเลี่ยงข่าวซ้ำ)
-        self.processed_news_hashes: Set[str] = set()
+        # ✅ Bloom filter แบบหมุน generation ตามวัน (memory คงที่) อยู่หน้า database check
+        # - ไม่อยู่ใน filter = ไม่มีใน database แน่นอน (หลัง warm) → ไม่ต้อง query
+        # - อยู่ใน filter = อาจซ้ำ → ยืนยันกับ database ($in)
+        self.news_hash_filter = RotatingBloomFilter(
+            window_seconds=(days_back or 7) * 24 * 3600,
+            generations=days_back or 7,
+            capacity_per_generation=int(os.getenv("NEWS_FILTER_CAPACITY", 200_000)),
+            error_rate=float(os.getenv("NEWS_FILTER_ERROR_RATE", 0.001)),
+            max_bytes=int(float(os.getenv("NEWS_FILTER_MAX_MB", 32)) * 1024 * 1024)
+        )
+        self._news_filter_warm = False
+        # hash ที่เพิ่งผ่าน dedup (อาจยังบันทึกไม่เสร็จ) - จำกัดขนาด
+        self._recent_news_hashes: "OrderedDict[str, None]" = OrderedDict()
+        self._recent_news_limit = 50_000
     
     def _generate_news_hash(self, article: Dict) -> str:
         """
@@ -72,6 +95,33 @@ class BatchDataProcessor:
         unique_string = f"{article.get('title', '')}{article.get('url', '')}{article.get('publishedAt', '')}"
         return hashlib.md5(unique_string.encode()).hexdigest()
     
+    def _get_news_collection(self):
+        """collection ของข่าว (post_yahoo) หรือ None"""
+        from utils.post_normalizer import get_collection_name
+        collection_name = get_collection_name('yahoo')
+        if db is not None and hasattr(db, collection_name) and getattr(db, collection_name) is not None:
+            return getattr(db, collection_name)
+        return None
+    
+    def _find_existing_news_hashes(self, news_hashes: List[str]) -> Set[str]:
+        """
+        หา newsHash ที่มีอยู่แล้วใน database ด้วย $in query เดียว
+        
+        Args:
+            news_hashes: List ของ hash ที่ต้องการตรวจสอบ
+        
+        Returns:
+            Set ของ hash ที่มีอยู่แล้ว
+        """
+        post_collection = self._get_news_collection()
+        if post_collection is None or not news_hashes:
+            return set()
+        try:
+            cursor = post_collection.find({"newsHash": {"$in": list(news_hashes)}}, {"newsHash": 1, "_id": 0})
+            return {doc.get("newsHash") for doc in cursor}
+        except Exception:
+            return set()
+    
     def _is_duplicate_news(self, article: Dict) -> bool:
         """
         ตรวจสอบว่าข่าวซ้ำหรือไม่
@@ -82,24 +132,7 @@ class BatchDataProcessor:
         Returns:
             True ถ้าซ้ำ, False ถ้าไม่ซ้ำ
         """
-        news_hash = self._generate_news_hash(article)
-        
-        # ตรวจสอบใน memory cache
-        if news_hash in self.processed_news_hashes:
-            return True
-        
-        # ตรวจสอบใน database (ใช้ collection post_yahoo)
-        from utils.post_normalizer import get_collection_name
-        collection_name = get_collection_name('yahoo')
-        if db is not None and hasattr(db, collection_name) and getattr(db, collection_name) is not None:
-            post_collection = getattr(db, collection_name)
-            existing = post_collection.find_one({"newsHash": news_hash})
-            if existing:
-                return True
-        
-        # เพิ่มเข้า memory cache
-        self.processed_news_hashes.add(news_hash)
-        return False
+        return not self._deduplicate_news([dict(article)])
     
     def _clean_old_data(self, symbol: str, days_to_keep: int = None, skip_reddit: bool = False):
         """
@@ -160,16 +193,62 @@ class BatchDataProcessor:
             # print(f"  ⚠️ Error cleaning old data for {symbol}: {e}")
             pass
     
-    def _should_update_stock(self, symbol: str) -> bool:
+    @staticmethod
+    def _parse_fetched_at(value) -> Optional[datetime]:
+        """แปลง fetchedAt (ISO string หรือ datetime) เป็น naive UTC datetime (None ถ้า parse ไม่ได้)"""
+        if isinstance(value, datetime):
+            return value.replace(tzinfo=None)
+        if isinstance(value, str) and value:
+            try:
+                return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+            except ValueError:
+                return None
+        return None
+    
+    def get_freshness_map(self) -> Optional[Dict[str, Optional[datetime]]]:
+        """
+        ดึง fetchedAt ล่าสุดของทุกหุ้นด้วย projected cursor เดียว (แทน find_one ทีละหุ้น)
+        
+        Returns:
+            {SYMBOL: fetchedAt (datetime) หรือ None ถ้า parse ไม่ได้}
+            หรือ None ถ้าไม่มี database
+        """
+        if db is None or not hasattr(db, 'stocks') or db.stocks is None:
+            return None
+        
+        freshness_map = {}
+        try:
+            for doc in db.stocks.find({}, {"symbol": 1, "fetchedAt": 1, "_id": 0}):
+                symbol = str(doc.get('symbol', '')).upper()
+                if not symbol:
+                    continue
+                fetched_at = self._parse_fetched_at(doc.get('fetchedAt'))
+                previous = freshness_map.get(symbol)
+                # เก็บค่าล่าสุด (กรณีมีหลาย document ต่อ symbol)
+                if symbol not in freshness_map or (fetched_at and (previous is None or fetched_at > previous)):
+                    freshness_map[symbol] = fetched_at
+        except Exception as e:
+            print(f"⚠️ Error loading stock freshness: {e}")
+            return None
+        return freshness_map
+    
+    def _should_update_stock(self, symbol: str, freshness_map: Optional[Dict[str, Optional[datetime]]] = None) -> bool:
         """
         ตรวจสอบว่าควรอัปเดตข้อมูลหุ้นนี้หรือไม่
         
         Args:
             symbol: Stock symbol
+            freshness_map: fetchedAt ของทุกหุ้นที่ดึงไว้แล้ว (get_freshness_map) - ถ้ามีจะไม่ query database
         
         Returns:
             True ถ้าควรอัปเดต, False ถ้ายังไม่ถึงเวลา
         """
+        if freshness_map is not None:
+            fetched_at = freshness_map.get(symbol.upper())
+            if fetched_at is None:
+                return True  # ยังไม่มีข้อมูล ต้องดึง
+            return datetime.utcnow() - fetched_at > timedelta(hours=self.update_interval_hours)
+        
         if db is None or not hasattr(db, 'stocks') or db.stocks is None:
             return True
         
@@ -177,6 +256,7 @@ class BatchDataProcessor:
             # หาข้อมูลล่าสุดของหุ้นนี้
             latest = db.stocks.find_one(
                 {"symbol": symbol.upper()},
+                {"fetchedAt": 1},
                 sort=[("fetchedAt", -1)]
             )
             
@@ -184,11 +264,9 @@ class BatchDataProcessor:
                 return True  # ยังไม่มีข้อมูล ต้องดึง
             
             # ตรวจสอบว่าเกิน update_interval หรือยัง
-            fetched_at_str = latest.get('fetchedAt', '')
-            if isinstance(fetched_at_str, str):
-                fetched_at = datetime.fromisoformat(fetched_at_str.replace('Z', '+00:00'))
-            else:
-                fetched_at = fetched_at_str
+            fetched_at = self._parse_fetched_at(latest.get('fetchedAt'))
+            if fetched_at is None:
+                return True  # ถ้า parse ไม่ได้ ให้ดึงใหม่
             
             time_diff = datetime.utcnow() - fetched_at
             
@@ -197,9 +275,6 @@ class BatchDataProcessor:
         except Exception as e:
             # ไม่แสดง print เพื่อไม่ให้ทับ progress bar
             # print(f"  ⚠️ Error checking update status for {symbol}: {e}")
-            pass
-            import traceback
-            traceback.print_exc()
             return True  # ถ้า error ให้ดึงใหม่
     
     def _deduplicate_news(self, articles: List[Dict]) -> List[Dict]:
@@ -212,25 +287,133 @@ class BatchDataProcessor:
         Returns:
             List of unique news articles
         """
-        unique_articles = []
-        seen_hashes = set()
-        
+        # 1. hash ทั้ง batch + กรองข่าวซ้ำใน batch และข่าวที่เพิ่งผ่าน dedup
+        candidates = {}
         for article in articles:
             news_hash = self._generate_news_hash(article)
-            
-            if news_hash not in seen_hashes and not self._is_duplicate_news(article):
-                article['newsHash'] = news_hash  # เพิ่ม hash เข้าไปใน article
-                unique_articles.append(article)
-                seen_hashes.add(news_hash)
+            if news_hash not in candidates and news_hash not in self._recent_news_hashes:
+                candidates[news_hash] = article
+        
+        # 2. ตรวจสอบกับ database ด้วย query เดียว ($in) - เฉพาะ hash ที่ filter บอกว่าอาจซ้ำ
+        if self._warm_news_filter():
+            maybe_existing = [h for h in candidates if h in self.news_hash_filter]
+        else:
+            maybe_existing = list(candidates)
+        existing_hashes = self._find_existing_news_hashes(maybe_existing)
+        
+        unique_articles = []
+        for news_hash, article in candidates.items():
+            if news_hash in existing_hashes:
+                continue
+            article['newsHash'] = news_hash  # เพิ่ม hash เข้าไปใน article
+            unique_articles.append(article)
+            self._remember_news_hash(news_hash)
         
         return unique_articles
     
-    async def process_single_stock_async(self, symbol: str) -> Optional[Dict]:
+    def _remember_news_hash(self, news_hash: str):
+        """เพิ่ม hash เข้า filter + recent set (ทิ้งตัวเก่าสุดเมื่อเกิน limit)"""
+        self.news_hash_filter.add(news_hash)
+        self._recent_news_hashes[news_hash] = None
+        while len(self._recent_news_hashes) > self._recent_news_limit:
+            self._recent_news_hashes.popitem(last=False)
+    
+    def _warm_news_filter(self) -> bool:
+        """
+        โหลด newsHash ของข่าวใน window (days_back) จาก database เข้า filter ครั้งแรก
+        
+        Returns:
+            True ถ้า filter พร้อมใช้ (ไม่พร้อม = ต้องตรวจทุก hash กับ database)
+        """
+        if self._news_filter_warm:
+            return True
+        post_collection = self._get_news_collection()
+        if post_collection is None:
+            return False
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.news_hash_filter.window_seconds)
+            cursor = post_collection.find(
+                {"fetched_at": {"$gte": cutoff.isoformat()}, "newsHash": {"$nin": ["", None]}},
+                {"newsHash": 1, "_id": 0}
+            )
+            count = 0
+            for doc in cursor:
+                self.news_hash_filter.add(doc["newsHash"])
+                count += 1
+            self._news_filter_warm = True
+            print(f"✅ News dedup filter warmed with {count:,} hashes")
+        except Exception as e:
+            print(f"⚠️ Error warming news dedup filter: {e}")
+        return self._news_filter_warm
+    
+    def get_dedup_stats(self) -> Dict:
+        """สถิติของ news dedup filter (ขนาด, memory, false positive rate)"""
+        return {
+            **self.news_hash_filter.get_stats(),
+            "warm": self._news_filter_warm,
+            "recentHashes": len(self._recent_news_hashes)
+        }
+    
+    def _save_news_articles(self, post_collection, normalized_articles: List[Dict]) -> Dict:
+        """
+        บันทึกข่าวด้วย bulk_write (unordered) ครั้งเดียว
+        ใช้ newsHash หรือ id เป็น unique key (upsert) - ถ้าไม่มีทั้งคู่ให้ insert ใหม่
+        ✅ ข่าวที่มีอยู่แล้วไม่ถูกแก้ ($setOnInsert) - bloom filter ตอบ "ไม่เคยเห็น" ได้กับข่าวที่มีใน database
+        (เก่ากว่า window ตอน warm, บันทึกโดย process อื่น หรือถูกทิ้งเมื่อ filter เต็ม) → นับเป็น duplicates
+        
+        Returns:
+            {'saved': int, 'new': int, 'duplicates': int, 'new_articles': [...]}
+        """
+        operations = []
+        for article in normalized_articles:
+            news_hash = article.get('newsHash')
+            post_id = article.get('id')
+            if news_hash:
+                operations.append(UpdateOne({"newsHash": news_hash}, {"$setOnInsert": article}, upsert=True))
+            elif post_id:
+                operations.append(UpdateOne({"id": post_id}, {"$setOnInsert": article}, upsert=True))
+            else:
+                operations.append(InsertOne(article))
+        
+        if not operations:
+            return {'saved': 0, 'new': 0, 'duplicates': 0, 'new_articles': []}
+        
+        try:
+            result = post_collection.bulk_write(operations, ordered=False)
+            new_indexes = set(result.upserted_ids.keys())
+            duplicate_count = result.matched_count
+            failed_indexes = set()
+        except BulkWriteError as e:
+            # บางข่าวบันทึกไม่สำเร็จ (เช่น id ซ้ำ) - ที่เหลือถูกบันทึกแล้ว
+            details = getattr(e, 'details', None) or {}
+            new_indexes = {item['index'] for item in details.get('upserted', [])}
+            duplicate_count = details.get('nMatched', 0)
+            failed_indexes = {error.get('index') for error in details.get('writeErrors', [])}
+        except Exception:
+            return {'saved': 0, 'new': 0, 'duplicates': 0, 'new_articles': []}
+        
+        # InsertOne (ไม่มี key) ที่ไม่ error = ข่าวใหม่
+        for index, operation in enumerate(operations):
+            if isinstance(operation, InsertOne) and index not in failed_indexes:
+                new_indexes.add(index)
+        
+        new_articles = [normalized_articles[i] for i in sorted(new_indexes)]
+        return {
+            'saved': len(operations) - len(failed_indexes),
+            'new': len(new_indexes),
+            'duplicates': duplicate_count,
+            'new_articles': new_articles
+        }
+    
+    async def process_single_stock_async(self, symbol: str, freshness_map: Optional[Dict[str, Optional[datetime]]] = None,
+                                         raise_errors: bool = False) -> Optional[Dict]:
         """
         ประมวลผลข้อมูลหุ้นเดียวแบบ async
         
         Args:
             symbol: Stock symbol
+            freshness_map: fetchedAt ของทุกหุ้น (จาก get_freshness_map) - ใช้ร่วมกันทั้งรอบ
+            raise_errors: ส่ง exception ต่อ (ให้ checkpoint บันทึก error class) แทนการคืน None
         
         Returns:
             Aggregated stock data หรือ None
@@ -239,7 +422,7 @@ class BatchDataProcessor:
         
         # ตรวจสอบว่าควรอัปเดตหรือไม่
         # แต่ยังคงดึงข่าวใหม่เสมอ (ไม่ skip การดึงข่าว)
-        should_update_stock = self._should_update_stock(symbol_upper)
+        should_update_stock = self._should_update_stock(symbol_upper, freshness_map)
         if not should_update_stock:
             # ดึง stock info จาก database แทน (ไม่ต้องดึงใหม่)
             if db is not None and hasattr(db, 'stocks') and db.stocks is not None:
@@ -269,23 +452,29 @@ class BatchDataProcessor:
             
             # 2-4. ดึงข้อมูลแบบ PARALLEL (พร้อมกัน) - เร็วกว่าเดิม 3 เท่า
             # ดึง stock_info, news, reddit พร้อมกัน แทนที่จะรอทีละอัน
+            # ✅ raise_errors: ให้ error ของ fetch layer ส่งต่อ (checkpoint จัดประเภท + retry ได้)
             async def fetch_stock_info_task():
                 if not stock_info:
                     try:
-                        return await self.async_fetcher.fetch_stock_info_async(symbol_upper)
+                        return await self.async_fetcher.fetch_stock_info_async(symbol_upper, raise_errors=raise_errors)
                     except Exception:
+                        if raise_errors:
+                            raise
                         return None
                 return stock_info
             
             async def fetch_news_task():
                 try:
                     # ดึงข่าวให้ได้มากที่สุด (500 ข่าวต่อหุ้น) - ไม่จำกัดวัน
-                    news_articles_raw = await self.async_fetcher.fetch_stock_news_async(symbol_upper, max_results=500)
+                    news_articles_raw = await self.async_fetcher.fetch_stock_news_async(symbol_upper, max_results=500,
+                                                                                       raise_errors=raise_errors)
                     if news_articles_raw:
                         # กรองข่าวซ้ำ - ตรวจสอบกับ database (จะไม่บันทึกข่าวซ้ำ)
                         return self._deduplicate_news(news_articles_raw)
                     return []
                 except Exception:
+                    if raise_errors:
+                        raise
                     return []
             
             async def fetch_reddit_task():
@@ -324,6 +513,8 @@ class BatchDataProcessor:
                     # ถ้าไม่มีใน database → return empty (Reddit bulk processor จะดึงมาให้)
                     return []
                 except Exception:
+                    if raise_errors:
+                        raise
                     return []
             
             # ดึงข้อมูลแบบ parallel (พร้อมกัน)
@@ -334,6 +525,13 @@ class BatchDataProcessor:
                 return_exceptions=True
             )
             
+            if raise_errors:
+                for fetch_result in (stock_info_result, news_articles, reddit_posts):
+                    if isinstance(fetch_result, Exception):
+                        raise fetch_result
+                if not stock_info_result and not news_articles:
+                    return None  # ไม่มีข้อมูลเลย (เช่นหุ้นถูก delist) → NoData
+            
             # จัดการผลลัพธ์
             if isinstance(stock_info_result, Exception) or not stock_info_result:
                 stock_info = {
@@ -358,7 +556,7 @@ class BatchDataProcessor:
                 items_with_dates = []
                 for a in news_articles:
                     title = a.get('title', '') or ''
-                    selftext = a.get('selftext', '') or ''
+                    selftext = a.get('selftext', '') or a.get('summary', '') or ''
                     full_content = a.get('full_content', '') or ''
                     # ใช้ selftext ก่อน ถ้าไม่มีให้ใช้ full_content (จำกัด 500 ตัวอักษร)
                     content = selftext or (full_content[:500] if full_content else '')
@@ -489,67 +687,97 @@ class BatchDataProcessor:
                 collection_name = get_collection_name('yahoo')
                 if db is not None and hasattr(db, collection_name) and getattr(db, collection_name) is not None and news_articles:
                     post_collection = getattr(db, collection_name)
-                    saved_count = 0
-                    new_count = 0
+                    normalized_articles = []
                     for article in news_articles:
                         # Normalize post structure
                         normalized_article = normalize_post(article, 'yahoo', symbol_upper)
                         normalized_article['symbol'] = symbol_upper
                         normalized_article['fetched_at'] = datetime.utcnow().isoformat()
+                        normalized_articles.append(normalized_article)
+                    
+                    # ✅ บันทึกทุกข่าวด้วย bulk_write ครั้งเดียว (แทน find_one + update_one ต่อข่าว)
+                    save_result = self._save_news_articles(post_collection, normalized_articles)
+                    new_articles = save_result['new_articles']  # ข่าวใหม่ (สำหรับอัปเดต ticker_mentions rollup)
+                    # ✅ จำนวนข่าวที่บันทึก/ใหม่/ซ้ำ (คืนไปกับผลลัพธ์ - ใช้สรุปท้ายรอบ)
+                    result['newsSaved'] = {key: save_result[key] for key in ('saved', 'new', 'duplicates')}
+                    
+                    # ✅ อัปเดต rollup ของ ticker mentions ($inc เฉพาะข่าวใหม่)
+                    if new_articles:
+                        from processors.mention_rollup import mention_rollup
+                        mention_rollup.record_posts(new_articles, 'yahoo')
                         
-                        try:
-                            # ตรวจสอบว่ามีอยู่แล้วหรือไม่ (ใช้ newsHash หรือ id)
-                            news_hash = normalized_article.get('newsHash')
-                            post_id = normalized_article.get('id')
-                            
-                            existing = None
-                            if news_hash:
-                                existing = post_collection.find_one({"newsHash": news_hash})
-                            if not existing and post_id:
-                                existing = post_collection.find_one({"id": post_id})
-                            
-                            is_new = existing is None
-                            
-                            # ใช้ id หรือ newsHash เป็น unique key
-                            if news_hash:
-                                post_collection.update_one(
-                                    {"newsHash": news_hash},
-                                    {"$set": normalized_article},
-                                    upsert=True
-                                )
-                            elif post_id:
-                                post_collection.update_one(
-                                    {"id": post_id},
-                                    {"$set": normalized_article},
-                                    upsert=True
-                                )
-                            else:
-                                # ถ้าไม่มี id หรือ hash ให้ insert ใหม่
-                                post_collection.insert_one(normalized_article)
-                            
-                            saved_count += 1
-                            if is_new:
-                                new_count += 1
-                        except Exception:
-                            pass
-                            continue
+                        # ✅ เติมเนื้อหาเต็มของข่าวใหม่ใน background (ไม่รอ - ไม่ถ่วงหุ้นตัวถัดไป)
+                        article_content_pipeline.submit(new_articles, post_collection)
             
             return result
             
         except Exception as e:
             # ไม่แสดง error เพื่อให้ progress bar ดูสะอาด
+            if raise_errors:
+                raise
+            return None
+    
+    async def _process_tracked(self, run, symbol: str,
+                               freshness_map: Optional[Dict[str, Optional[datetime]]]) -> Optional[Dict]:
+        """ประมวลผลหุ้นเดียวและบันทึกผลลง checkpoint ของรอบ (สำเร็จ / error class / เวลา)"""
+        started = time.perf_counter()
+        try:
+            result = await self.process_single_stock_async(symbol, freshness_map, raise_errors=True)
+        except Exception as e:
+            run.record_failure(symbol, e, time.perf_counter() - started)
             return None
+        if result:
+            run.record_success(symbol, time.perf_counter() - started)
+        else:
+            run.record_failure(symbol, None, time.perf_counter() - started)
+        return result
     
-    async def process_all_stocks_async(self, symbols: List[str], batch_size: int = 50) -> Dict[str, Dict]:
+    async def _process_pass(self, run, symbols: List[str], freshness_map, batch_size: int,
+                            all_results: Dict[str, Dict], total_stocks: int, progress_prefix: str):
+        """ประมวลผลหุ้นเป็น batch (checkpoint หลังจบแต่ละ batch)"""
+        from utils.progress_bar import draw_progress_bar
+        import sys
+        
+        run.start_pass()
+        for i in range(0, len(symbols), batch_size):
+            batch = symbols[i:i + batch_size]
+            
+            # ประมวลผล batch แบบ parallel
+            tasks = [self._process_tracked(run, symbol, freshness_map) for symbol in batch]
+            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+            
+            # รวมผลลัพธ์
+            for symbol, result in zip(batch, batch_results):
+                if not isinstance(result, Exception) and result:
+                    all_results[symbol.upper()] = result
+            
+            # ✅ บันทึก checkpoint - ถ้า process restart รอบถัดไปจะทำต่อจาก batch นี้
+            run.flush()
+            
+            # แสดง progress bar หลัง batch เสร็จ (รวมหุ้นที่ทำเสร็จแล้วก่อน resume)
+            progress = run.get_progress() or {}
+            processed = progress.get("completed", len(all_results))
+            draw_progress_bar(processed, total_stocks, bar_length=50, prefix=progress_prefix, show_total=True)
+            # Force flush เพื่อให้แสดงทันที
+            sys.stdout.flush()
+            
+            # พักระหว่าง batch (ลดเป็น 0.1 วินาที เพื่อให้เร็วขึ้นมาก)
+            if i + batch_size < len(symbols):
+                await asyncio.sleep(0.1)
+    
+    async def process_all_stocks_async(self, symbols: List[str], batch_size: int = 50, resume: bool = True,
+                                       job: Optional[str] = None) -> Dict[str, Dict]:
         """
-        ประมวลผลหุ้นทั้งหมดแบบ batch
+        ประมวลผลหุ้นทั้งหมดแบบ batch (มี checkpoint - ทำต่อจากจุดเดิมได้ถ้ารอบก่อนถูกขัดจังหวะ)
         
         Args:
             symbols: List of stock symbols
             batch_size: จำนวนหุ้นต่อ batch
+            resume: ทำต่อจากรอบที่ยังไม่จบ (ถ้ามี) ที่ scope เดียวกัน แทนการเริ่มใหม่
+            job: ชื่องานสำหรับ resume (None = resume เฉพาะรอบที่มีชุดหุ้นเดียวกัน)
         
         Returns:
-            Dictionary {symbol: stock_data}
+            Dictionary {symbol: stock_data} (เฉพาะหุ้นที่ประมวลผลในรอบนี้)
         """
         from utils.post_normalizer import get_collection_name
         from utils.progress_bar import draw_progress_bar, reset_progress
@@ -565,41 +793,46 @@ class BatchDataProcessor:
             total_news_before = post_collection.count_documents({})
         
         all_results = {}
-        total_stocks = len(symbols)
         start_time = time.time()
         
-        # ✅ แสดง progress bar ทันทีเมื่อเริ่ม (0%) - แสดงทันทีเมื่อกดรัน
+        # ✅ เริ่มรอบใหม่ หรือทำต่อจากรอบที่ค้าง (checkpoint ใน batch_runs)
+        run = batch_run_checkpoint.start(symbols, resume=resume, job=job)
+        total_stocks = run.total
+        pending = run.pending()
+        if run.resumed:
+            print(f"♻️ Resume run {run.run_id}: เหลือ {len(pending):,}/{total_stocks:,} หุ้น")
+        
+        # ✅ ดึง fetchedAt ของทุกหุ้นครั้งเดียว (แทน find_one ทีละหุ้นใน _should_update_stock)
+        freshness_map = self.get_freshness_map()
+        
+        # ✅ แสดง progress bar ทันทีเมื่อเริ่ม - แสดงทันทีเมื่อกดรัน
         # ใช้ print() เพื่อให้แน่ใจว่าแสดงทันที (โดยเฉพาะบน Windows)
         print()  # ขึ้นบรรทัดใหม่ก่อนแสดง progress bar
         import sys
         sys.stdout.flush()  # Force flush
-        draw_progress_bar(0, total_stocks, bar_length=50, prefix="กำลังโหลดข่าว", show_total=True)
+        draw_progress_bar(total_stocks - len(pending), total_stocks, bar_length=50, prefix="กำลังโหลดข่าว", show_total=True)
         sys.stdout.flush()  # Force flush อีกครั้ง
         
-        for i in range(0, len(symbols), batch_size):
-            batch = symbols[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (len(symbols) + batch_size - 1) // batch_size
-            
-            # ประมวลผล batch แบบ parallel
-            tasks = [self.process_single_stock_async(symbol) for symbol in batch]
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # รวมผลลัพธ์
-            for symbol, result in zip(batch, batch_results):
-                if not isinstance(result, Exception) and result:
-                    all_results[symbol.upper()] = result
-            
-            # แสดง progress bar หลัง batch เสร็จ (แสดงจำนวนหุ้นที่ดึงได้จริงๆ)
-            processed = len(all_results)
-            draw_progress_bar(processed, total_stocks, bar_length=50, prefix="กำลังโหลดข่าว", show_total=True)
-            # Force flush เพื่อให้แสดงทันที
-            import sys
-            sys.stdout.flush()
+        try:
+            await self._process_pass(run, pending, freshness_map, batch_size, all_results, total_stocks, "กำลังโหลดข่าว")
             
-            # พักระหว่าง batch (ลดเป็น 0.1 วินาที เพื่อให้เร็วขึ้นมาก)
-            if i + batch_size < len(symbols):
-                await asyncio.sleep(0.1)
+            # ✅ retry หุ้นที่ล้มเหลวแยกอีก pass (backoff เพิ่มขึ้นทุกรอบ)
+            for retry_pass in range(1, run.max_retries + 1):
+                retry_symbols = run.retryable_symbols()
+                if not retry_symbols:
+                    break
+                delay = run.retry_delay(retry_pass)
+                print(f"\n🔁 Retry {retry_pass}/{run.max_retries}: {len(retry_symbols):,} หุ้น (รอ {delay:.0f} วินาที)")
+                await asyncio.sleep(delay)
+                await self._process_pass(run, retry_symbols, freshness_map, batch_size, all_results, total_stocks,
+                                         f"Retry {retry_pass}")
+        except BaseException:
+            # ✅ ถูกยกเลิก/error กลางทาง - เก็บ checkpoint ไว้ให้รอบถัดไปทำต่อ (status ยังเป็น running)
+            run.suspend()
+            raise
+        
+        run.finish("completed")
+        progress = run.get_progress() or {}
         
         elapsed = time.time() - start_time
         
@@ -611,26 +844,55 @@ class BatchDataProcessor:
             total_news_after = post_collection.count_documents({})
         
         new_news = total_news_after - total_news_before
+        # ✅ ข่าวใหม่/ซ้ำ (มีใน database อยู่แล้ว - ไม่ถูกแก้) จากผล bulk upsert ของแต่ละหุ้นในรอบนี้
+        news_new = sum(r.get('newsSaved', {}).get('new', 0) for r in all_results.values())
+        news_duplicates = sum(r.get('newsSaved', {}).get('duplicates', 0) for r in all_results.values())
         
         # ✅ แสดงสรุปข้อมูลที่ดึงมา
         print(f"\n📊 สรุปข้อมูลที่ดึงมา:")
-        print(f"   📰 Yahoo News: {new_news:,} ข่าวใหม่ (รวมทั้งหมด: {total_news_after:,} ข่าว)")
+        print(f"   📰 Yahoo News: {news_new:,} ข่าวใหม่, {news_duplicates:,} ซ้ำ "
+              f"(เพิ่มขึ้นใน database {new_news:,} ข่าว, รวมทั้งหมด: {total_news_after:,} ข่าว)")
         print(f"   📈 Stocks: {len(all_results):,} หุ้น")
+        if progress.get("failed"):
+            print(f"   ⚠️  ล้มเหลว: {progress['failed']:,} หุ้น {progress.get('failedByError')}")
         print(f"   ⏱️  เวลาที่ใช้: {elapsed/60:.1f} นาที")
         
         # Cleanup: ปิด aiohttp sessions
+        await self.close_async_sessions()
+        
+        return all_results
+    
+    async def refresh_single_stock_async(self, symbol: str) -> Optional[Dict]:
+        """
+        process_single_stock_async สำหรับ caller ที่สร้าง event loop ชั่วคราว (asyncio.run ใน request)
+        ปิด sessions ใน loop เดียวกันก่อนคืนผล (session ไม่รั่วเมื่อ loop ปิด)
+        """
         try:
-            # ปิด Yahoo Finance async fetcher session
-            if hasattr(self.async_fetcher, '_yahoo_async_fetcher'):
-                await self.async_fetcher._yahoo_async_fetcher.close()
+            return await self.process_single_stock_async(symbol)
+        finally:
+            await self.close_async_sessions()
+    
+    async def close_async_sessions(self):
+        """
+        ปิด aiohttp sessions ของ async fetcher บน event loop ปัจจุบัน (เรียกตอนจบแต่ละรอบ - แต่ละรอบใช้ event loop ใหม่)
+        รอบที่รันพร้อมกันบน loop อื่นใช้ session ของตัวเอง → ไม่ถูกปิดไปด้วย
+        """
+        if self.content_drain_seconds > 0:
+            try:
+                # รอ content pipeline (background) ดึงเนื้อหาข่าวที่ค้าง - หมดเวลาแล้วยังดึงต่อใน background
+                await article_content_pipeline.drain(timeout=self.content_drain_seconds)
+            except Exception:
+                pass
+        
+        try:
+            # ปิด Yahoo Finance async fetcher session (ของ loop นี้)
+            await self.async_fetcher.close()
             
             # Force garbage collection
             import gc
             gc.collect()
         except:
             pass
-        
-        return all_results
     
     def get_stock_from_database(self, symbol: str) -> Optional[Dict]:
         """
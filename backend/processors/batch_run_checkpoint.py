@@ -0,0 +1,413 @@
+"""
+Batch Run Checkpoint
+เก็บสถานะของรอบอัปเดตหุ้นทั้งหมด (process_all_stocks_async) ไว้ใน collection batch_runs
+(หรือ local journal ถ้าไม่มี database) เพื่อให้รอบที่ถูกขัดจังหวะ (restart / Flask reloader)
+ทำต่อจากจุดเดิมได้ แทนที่จะเริ่มจากหุ้นตัวแรกใหม่
+
+- แต่ละรอบมี scope (ชื่องาน หรือ hash ของชุดหุ้น) - resume เฉพาะรอบที่ scope ตรงกัน
+- start() คืน BatchRun handle ต่อรอบ (หลายรอบรันพร้อมกันได้โดยไม่ทับ state กัน)
+
+Document:
+    {_id: runId, scope, status, symbols, completed, failed: [{symbol, errorClass, error, attempts, lastAttemptAt}],
+     timings: {count, totalSeconds, maxSeconds}, passes, resumes, startedAt, updatedAt, finishedAt}
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from database.db_config import db
+
+COLLECTION_NAME = "batch_runs"
+JOURNAL_PATH = Path(__file__).parent.parent / "data" / "batch_run_journal.json"
+
+# result เป็น None (ไม่มีข้อมูล เช่นหุ้นถูก delist) - retry ไปก็ไม่ได้ผล
+NO_DATA_ERROR = "NoData"
+NON_RETRYABLE_ERRORS = frozenset({NO_DATA_ERROR})
+# จำนวนรอบที่จบแล้วที่เก็บไว้ใน local journal
+JOURNAL_FINISHED_RUNS = 5
+
+
+def make_scope(symbols: Iterable[str], job: Optional[str] = None) -> str:
+    """scope ของรอบ: ชื่องาน (ถ้าระบุ) หรือ hash ของชุดหุ้น (ไม่สนลำดับ)"""
+    if job:
+        return f"job:{job}"
+    digest = hashlib.sha1(",".join(sorted({s.upper() for s in symbols})).encode()).hexdigest()
+    return f"symbols:{digest[:16]}"
+
+
+class BatchRun:
+    """
+    Handle ของรอบที่กำลังรัน (คืนจาก BatchRunCheckpoint.start)
+
+    - record_success / record_failure อัปเดต state ใน memory ของรอบนี้
+    - flush() เขียน state ลง database/journal (เรียกหลังจบแต่ละ batch)
+    """
+
+    def __init__(self, checkpoint: "BatchRunCheckpoint", state: Dict, resumed: bool):
+        self.checkpoint = checkpoint
+        self.state = state
+        self.resumed = resumed
+        self._completed_set = set(state["completed"])
+        self._failed: Dict[str, Dict] = {entry["symbol"]: entry for entry in state.get("failed") or []}
+        self._lock = threading.Lock()
+
+    @property
+    def run_id(self) -> str:
+        return self.state["_id"]
+
+    @property
+    def total(self) -> int:
+        return len(self.state["symbols"])
+
+    @property
+    def max_retries(self) -> int:
+        return self.checkpoint.max_retries
+
+    def pending(self) -> List[str]:
+        """หุ้นที่ยังไม่ได้ทำ (ไม่สำเร็จและยังไม่เคยล้มเหลว)"""
+        with self._lock:
+            done = self._completed_set | set(self._failed)
+            return [s for s in self.state["symbols"] if s not in done]
+
+    def start_pass(self):
+        """นับจำนวน pass (pass แรก + retry passes)"""
+        with self._lock:
+            self.state["passes"] += 1
+
+    def record_success(self, symbol: str, seconds: float):
+        with self._lock:
+            symbol = symbol.upper()
+            self._failed.pop(symbol, None)
+            if symbol not in self._completed_set:
+                self._completed_set.add(symbol)
+                self.state["completed"].append(symbol)
+            self._record_timing(seconds)
+
+    def record_failure(self, symbol: str, error: Optional[BaseException], seconds: float):
+        """
+        บันทึกหุ้นที่ล้มเหลว
+
+        Args:
+            symbol: Stock symbol
+            error: Exception ที่เกิดขึ้น (None = ไม่มีข้อมูล)
+            seconds: เวลาที่ใช้
+        """
+        with self._lock:
+            symbol = symbol.upper()
+            entry = self._failed.setdefault(symbol, {"symbol": symbol, "attempts": 0})
+            entry["errorClass"] = type(error).__name__ if error is not None else NO_DATA_ERROR
+            entry["error"] = str(error)[:200] if error is not None else None
+            entry["attempts"] += 1
+            entry["lastAttemptAt"] = datetime.utcnow().isoformat()
+            self._record_timing(seconds)
+
+    def _record_timing(self, seconds: float):
+        timings = self.state["timings"]
+        timings["count"] += 1
+        timings["totalSeconds"] += seconds
+        timings["maxSeconds"] = max(timings["maxSeconds"], seconds)
+
+    def retryable_symbols(self) -> List[str]:
+        """หุ้นที่ล้มเหลวและควร retry (ไม่รวม NoData และหุ้นที่ retry ครบแล้ว)"""
+        with self._lock:
+            return [
+                symbol for symbol, entry in self._failed.items()
+                if entry.get("errorClass") not in NON_RETRYABLE_ERRORS and entry["attempts"] <= self.max_retries
+            ]
+
+    def retry_delay(self, retry_pass: int) -> float:
+        """backoff ก่อน retry pass ที่ retry_pass (1, 2, 3, ...)"""
+        return self.checkpoint.retry_base_seconds * (2 ** (retry_pass - 1))
+
+    def snapshot(self) -> Dict:
+        """สำเนา state ปัจจุบัน (รวม failed ล่าสุด)"""
+        with self._lock:
+            self.state["failed"] = list(self._failed.values())
+            return {**self.state, "completed": list(self.state["completed"]), "failed": list(self.state["failed"])}
+
+    def flush(self):
+        """เขียน checkpoint (เรียกหลังจบแต่ละ batch)"""
+        with self._lock:
+            self.state["updatedAt"] = datetime.utcnow().isoformat()
+        self.checkpoint._save(self.snapshot())
+
+    def finish(self, status: str = "completed"):
+        """ปิดรอบ (completed / interrupted)"""
+        with self._lock:
+            self.state["status"] = status
+            self.state["finishedAt"] = datetime.utcnow().isoformat()
+        self.flush()
+        self.checkpoint._release(self)
+
+    def suspend(self):
+        """หยุดรอบกลางทาง: เก็บ checkpoint ไว้ให้รอบถัดไปทำต่อ (status ยังเป็น running)"""
+        self.flush()
+        self.checkpoint._release(self)
+
+    def get_progress(self) -> Optional[Dict]:
+        """progress ของรอบนี้"""
+        return self.checkpoint.summarize(self.snapshot())
+
+
+class BatchRunCheckpoint:
+    """
+    Checkpoint ของรอบ batch update
+
+    - start() สร้างรอบใหม่ หรือ resume รอบที่ยังไม่จบ (status = running) ที่ scope ตรงกัน
+      และเริ่มไม่เกิน resume_max_age_hours → คืน BatchRun handle
+    - get_progress() ใช้ใน /api/batch/status (live progress ของรอบล่าสุดที่กำลังรัน หรือรอบล่าสุด)
+
+    Args:
+        collection_name: ชื่อ collection ที่เก็บสถานะ
+        journal_path: ไฟล์ที่ใช้แทน database (ถ้า db เป็น None)
+        resume_max_age_hours: รอบที่เก่ากว่านี้จะไม่ resume (เริ่มรอบใหม่แทน)
+        max_retries: จำนวนรอบ retry ของหุ้นที่ล้มเหลว
+        retry_base_seconds: backoff ก่อน retry รอบแรก (เพิ่มเป็น 2 เท่าทุกรอบ)
+    """
+
+    def __init__(self, collection_name: str = COLLECTION_NAME, journal_path: Path = JOURNAL_PATH,
+                 resume_max_age_hours: float = 12, max_retries: int = 3, retry_base_seconds: float = 5.0):
+        self.collection_name = collection_name
+        self.journal_path = Path(journal_path)
+        self.resume_max_age_hours = resume_max_age_hours
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self._active: Dict[str, BatchRun] = {}  # รอบที่กำลังรันใน process นี้ (runId -> handle)
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+
+    def _get_collection(self):
+        if db is None:
+            return None
+        return getattr(db, self.collection_name)
+
+    def ensure_indexes(self):
+        """สร้าง index สำหรับหารอบล่าสุด / รอบที่ยังไม่จบ"""
+        collection = self._get_collection()
+        if collection is None:
+            return
+        try:
+            collection.create_index([("status", 1), ("startedAt", -1)], background=True)
+            collection.create_index([("scope", 1), ("status", 1), ("startedAt", -1)], background=True)
+        except Exception as e:
+            error_code = getattr(e, 'code', None)
+            if error_code not in [85, 86]:
+                print(f"  ⚠️  Error creating {self.collection_name} index: {e}")
+
+    # ------------------------------------------------------------------
+    # Storage (database หรือ local journal)
+    # ------------------------------------------------------------------
+
+    def _read_journal(self) -> Dict[str, Dict]:
+        """runs ทั้งหมดใน local journal (runId -> state)"""
+        if not self.journal_path.exists():
+            return {}
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "_id" in data:
+            return {data["_id"]: data}  # journal รูปแบบเดิม (เก็บรอบเดียว)
+        return data.get("runs", {})
+
+    def _load_latest(self, status: Optional[str] = None, scope: Optional[str] = None) -> Optional[Dict]:
+        """รอบล่าสุด (กรองตาม status / scope ได้)"""
+        query = {}
+        if status:
+            query["status"] = status
+        if scope:
+            query["scope"] = scope
+
+        collection = self._get_collection()
+        if collection is not None:
+            try:
+                return collection.find_one(query, sort=[("startedAt", -1)])
+            except Exception as e:
+                print(f"⚠️ Error loading batch run checkpoint: {e}")
+                return None
+
+        try:
+            with self._journal_lock:
+                runs = self._read_journal().values()
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Error reading batch run journal: {e}")
+            return None
+        matching = [state for state in runs if all(state.get(key) == value for key, value in query.items())]
+        return max(matching, key=lambda state: state.get("startedAt") or "", default=None)
+
+    def _save(self, state: Dict):
+        collection = self._get_collection()
+        if collection is not None:
+            try:
+                collection.replace_one({"_id": state["_id"]}, state, upsert=True)
+            except Exception as e:
+                print(f"⚠️ Error saving batch run checkpoint: {e}")
+            return
+
+        # ✅ เขียนไฟล์ชั่วคราวแล้ว rename (ไฟล์ไม่เสียถ้า process ตายกลางทาง)
+        try:
+            with self._journal_lock:
+                try:
+                    runs = self._read_journal()
+                except ValueError:
+                    runs = {}
+                runs[state["_id"]] = state
+                # เก็บรอบที่ยังไม่จบทั้งหมด + รอบที่จบแล้วล่าสุดไม่เกิน JOURNAL_FINISHED_RUNS
+                finished = sorted((s for s in runs.values() if s.get("status") != "running"),
+                                  key=lambda s: s.get("startedAt") or "", reverse=True)
+                for old_state in finished[JOURNAL_FINISHED_RUNS:]:
+                    runs.pop(old_state["_id"], None)
+                self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.journal_path.with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"runs": runs}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.journal_path)
+        except OSError as e:
+            print(f"⚠️ Error writing batch run journal: {e}")
+
+    # ------------------------------------------------------------------
+    # Run lifecycle
+    # ------------------------------------------------------------------
+
+    def _is_resumable(self, state: Optional[Dict]) -> bool:
+        if not state or state.get("status") != "running":
+            return False
+        try:
+            started_at = datetime.fromisoformat(state.get("startedAt"))
+        except (TypeError, ValueError):
+            return False
+        return datetime.utcnow() - started_at <= timedelta(hours=self.resume_max_age_hours)
+
+    def start(self, symbols: Iterable[str], resume: bool = True, job: Optional[str] = None) -> BatchRun:
+        """
+        เริ่มรอบใหม่ หรือ resume รอบที่ยังไม่จบที่มี scope เดียวกัน
+
+        Args:
+            symbols: หุ้นที่ต้องการอัปเดตในรอบนี้
+            resume: ทำต่อจากรอบที่ค้างอยู่ (ถ้ามี)
+            job: ชื่องาน (เช่น scheduled-popular) - None = ใช้ hash ของชุดหุ้นเป็น scope
+
+        Returns:
+            BatchRun handle (ใช้ pending(), record_*, flush(), finish())
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        scope = make_scope(symbols, job)
+        now = datetime.utcnow().isoformat()
+        previous = self._load_latest(status="running", scope=scope) if resume else None
+
+        with self._lock:
+            # รอบที่กำลังรันอยู่ใน process นี้ไม่ถูก resume ซ้ำ (จะทำหุ้นเดียวกันพร้อมกัน)
+            if previous and previous["_id"] in self._active:
+                previous = None
+            if self._is_resumable(previous):
+                # ✅ ทำต่อ: หุ้นของรอบเดิมก่อน แล้วต่อด้วยหุ้นใหม่ที่รอบเดิมไม่มี (กรณี scope เป็นชื่องาน)
+                state = previous
+                state["symbols"] = list(dict.fromkeys(list(state.get("symbols") or []) + symbols))
+                state["resumes"] = state.get("resumes", 0) + 1
+                state["updatedAt"] = now
+                resumed = True
+            else:
+                if previous and previous.get("status") == "running":
+                    # รอบเก่าเกินไป - ปิดไว้เป็น abandoned
+                    previous["status"] = "abandoned"
+                    previous["finishedAt"] = now
+                    self._save(previous)
+                state = {
+                    "_id": f"run-{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}",
+                    "scope": scope,
+                    "status": "running",
+                    "symbols": symbols,
+                    "completed": [],
+                    "failed": [],
+                    "timings": {"count": 0, "totalSeconds": 0.0, "maxSeconds": 0.0},
+                    "passes": 0,
+                    "resumes": 0,
+                    "startedAt": now,
+                    "updatedAt": now,
+                    "finishedAt": None,
+                }
+                resumed = False
+
+            run = BatchRun(self, state, resumed)
+            self._active[run.run_id] = run
+
+        run.flush()
+        return run
+
+    def _release(self, run: BatchRun):
+        with self._lock:
+            self._active.pop(run.run_id, None)
+
+    # ------------------------------------------------------------------
+    # Progress
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def summarize(state: Optional[Dict]) -> Optional[Dict]:
+        """สรุป progress จาก state (ไม่รวม list ของหุ้นทั้งหมด)"""
+        if not state:
+            return None
+        total = len(state.get("symbols") or [])
+        completed = len(state.get("completed") or [])
+        failed_entries = state.get("failed") or []
+        processed = completed + len(failed_entries)
+        timings = state.get("timings") or {}
+
+        elapsed_seconds = None
+        eta_seconds = None
+        try:
+            started_at = datetime.fromisoformat(state.get("startedAt"))
+            end = datetime.fromisoformat(state["finishedAt"]) if state.get("finishedAt") else datetime.utcnow()
+            elapsed_seconds = round((end - started_at).total_seconds(), 1)
+            if state.get("status") == "running" and processed and elapsed_seconds:
+                eta_seconds = round(elapsed_seconds / processed * (total - processed), 1)
+        except (TypeError, ValueError):
+            pass
+
+        error_classes: Dict[str, int] = {}
+        for entry in failed_entries:
+            error_class = entry.get("errorClass") or NO_DATA_ERROR
+            error_classes[error_class] = error_classes.get(error_class, 0) + 1
+
+        return {
+            "runId": state.get("_id"),
+            "scope": state.get("scope"),
+            "status": state.get("status"),
+            "total": total,
+            "completed": completed,
+            "failed": len(failed_entries),
+            "pending": max(0, total - processed),
+            "percent": round(processed / total * 100, 1) if total else 100.0,
+            "failedByError": error_classes,
+            "passes": state.get("passes", 0),
+            "resumes": state.get("resumes", 0),
+            "avgSecondsPerSymbol": (
+                round(timings["totalSeconds"] / timings["count"], 3) if timings.get("count") else None
+            ),
+            "maxSecondsPerSymbol": round(timings.get("maxSeconds", 0.0), 3),
+            "elapsedSeconds": elapsed_seconds,
+            "etaSeconds": eta_seconds,
+            "startedAt": state.get("startedAt"),
+            "updatedAt": state.get("updatedAt"),
+            "finishedAt": state.get("finishedAt"),
+        }
+
+    def get_progress(self) -> Optional[Dict]:
+        """progress ของรอบล่าสุดที่กำลังรันใน process นี้ หรือรอบล่าสุดใน database/journal"""
+        with self._lock:
+            runs = list(self._active.values())
+        if runs:
+            latest = max(runs, key=lambda run: run.state.get("startedAt") or "")
+            progress = latest.get_progress()
+            progress["activeRuns"] = len(runs)
+            return progress
+        return self.summarize(self._load_latest())
+
+
+# Global instance
+batch_run_checkpoint = BatchRunCheckpoint(
+    resume_max_age_hours=float(os.getenv("BATCH_RUN_RESUME_HOURS", 12)),
+    max_retries=int(os.getenv("BATCH_RUN_MAX_RETRIES", 3))
+)
@@ -0,0 +1,202 @@
+"""
+Dashboard Stats
+สรุปข้อมูลสำหรับ /api/dashboard ด้วย aggregation ($facet) เดียว พร้อม cache ต่อ timeRange
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict
+from database.db_config import db
+from processors.mention_rollup import ALL_TICKERS, COLLECTION_NAME, RANGE_GRANULARITY, floor_bucket
+from processors.trending_aggregator import TIME_RANGES
+
+# Fields ที่หน้า home ใช้จาก recent stocks
+RECENT_STOCK_FIELDS = {
+    "symbol": 1,
+    "fetchedAt": 1,
+    "overallSentiment.compound": 1,
+    "overallSentiment.label": 1,
+    "redditData.mentionCount": 1,
+    "newsData.articleCount": 1,
+    "stockInfo.currentPrice": 1,
+    "stockInfo.changePercent": 1,
+}
+
+# Spike = ticker ที่ mentions ในช่วงปัจจุบัน >= SPIKE_MIN_MENTIONS และ >= SPIKE_RATIO เท่าของช่วงก่อนหน้า
+SPIKE_MIN_MENTIONS = 10
+SPIKE_RATIO = 3
+
+
+class DashboardStats:
+    """
+    คำนวณ stats ของ dashboard ใน round trip เดียว:
+    stock_data (counts + recent stocks) + alerts (active) + ticker_mentions (ช่วงปัจจุบันเทียบช่วงก่อนหน้า)
+    รวมกันด้วย $unionWith แล้วแยกคำนวณด้วย $facet
+    """
+
+    def __init__(self, ttl_seconds: float = 15, recent_limit: int = 10):
+        self.ttl_seconds = ttl_seconds
+        self.recent_limit = recent_limit
+        self._cache: Dict[str, tuple] = {}  # timeRange -> (expires_at, result)
+        self._lock = threading.Lock()
+
+    def build_pipeline(self, time_range: str, now: datetime) -> list:
+        """สร้าง pipeline (รันบน stock_data)"""
+        granularity = RANGE_GRANULARITY.get(time_range, "1h")
+        period = TIME_RANGES.get(time_range, TIME_RANGES["24h"])
+        current_start = floor_bucket(now - period, granularity)
+        previous_start = floor_bucket(now - 2 * period, granularity)
+
+        stock_projection = {"_kind": {"$literal": "stock"}}
+        stock_projection.update(RECENT_STOCK_FIELDS)
+
+        def count(match: Dict) -> list:
+            return [{"$match": match}, {"$count": "n"}]
+
+        return [
+            {"$project": stock_projection},
+            {"$unionWith": {"coll": "alerts", "pipeline": [
+                {"$match": {"enabled": {"$ne": False}}},
+                {"$project": {"_id": 0, "_kind": {"$literal": "alert"}}},
+            ]}},
+            {"$unionWith": {"coll": COLLECTION_NAME, "pipeline": [
+                {"$match": {
+                    "granularity": granularity,
+                    "bucket": {"$gte": previous_start},
+                    "source": {"$in": ["reddit", "yahoo"]},
+                }},
+                {"$project": {
+                    "_id": 0,
+                    "_kind": {"$literal": "mention"},
+                    "ticker": 1,
+                    "mentions": 1,
+                    "sentimentSum": 1,
+                    "sentimentCount": 1,
+                    "period": {"$cond": [{"$gte": ["$bucket", current_start]}, "current", "previous"]},
+                }},
+            ]}},
+            {"$facet": {
+                "totalTracked": count({"_kind": "stock"}),
+                "positiveSentiment": count({"_kind": "stock", "overallSentiment.label": "positive"}),
+                "negativeSentiment": count({"_kind": "stock", "overallSentiment.label": "negative"}),
+                "activeAlerts": count({"_kind": "alert"}),
+                "recentStocks": [
+                    {"$match": {"_kind": "stock"}},
+                    {"$sort": {"fetchedAt": -1}},
+                    {"$limit": self.recent_limit},
+                    {"$project": {"_kind": 0}},
+                ],
+                # จำนวน posts และ sentiment ต่อช่วงเวลา (จาก ticker "*")
+                "posts": [
+                    {"$match": {"_kind": "mention", "ticker": ALL_TICKERS}},
+                    {"$group": {
+                        "_id": "$period",
+                        "posts": {"$sum": "$mentions"},
+                        "sentimentSum": {"$sum": "$sentimentSum"},
+                        "sentimentCount": {"$sum": "$sentimentCount"},
+                    }},
+                ],
+                "mentions": [
+                    {"$match": {"_kind": "mention", "ticker": {"$ne": ALL_TICKERS}}},
+                    {"$group": {"_id": "$period", "mentions": {"$sum": "$mentions"}}},
+                ],
+                "spikes": [
+                    {"$match": {"_kind": "mention", "ticker": {"$ne": ALL_TICKERS}}},
+                    {"$group": {
+                        "_id": "$ticker",
+                        "current": {"$sum": {"$cond": [{"$eq": ["$period", "current"]}, "$mentions", 0]}},
+                        "previous": {"$sum": {"$cond": [{"$eq": ["$period", "previous"]}, "$mentions", 0]}},
+                    }},
+                    {"$match": {"current": {"$gte": SPIKE_MIN_MENTIONS}}},
+                    {"$match": {"$expr": {"$gte": ["$current", {"$multiply": [SPIKE_RATIO, {"$max": ["$previous", 1]}]}]}}},
+                    {"$sort": {"current": -1}},
+                ],
+            }},
+        ]
+
+    def get_stats(self, time_range: str = "24h") -> Dict:
+        """
+        ดึงข้อมูล dashboard (cache ต่อ timeRange)
+
+        Returns:
+            {"recentStocks": [...], "stats": {...}, "spikes": [...]}
+        """
+        with self._lock:
+            entry = self._cache.get(time_range)
+            if entry and entry[0] > time.time():
+                return entry[1]
+
+        result = self._compute(time_range)
+
+        with self._lock:
+            self._cache[time_range] = (time.time() + self.ttl_seconds, result)
+        return result
+
+    def _compute(self, time_range: str) -> Dict:
+        if db is None:
+            raise RuntimeError("Database not available")
+
+        now = datetime.utcnow()
+        facet = (list(db.stock_data.aggregate(self.build_pipeline(time_range, now), allowDiskUse=True)) or [{}])[0]
+
+        def first_count(name: str) -> int:
+            rows = facet.get(name) or []
+            return rows[0].get("n", 0) if rows else 0
+
+        posts = {row["_id"]: row for row in facet.get("posts", [])}
+        mentions = {row["_id"]: row.get("mentions", 0) for row in facet.get("mentions", [])}
+
+        recent_stocks = facet.get("recentStocks", [])
+        for stock in recent_stocks:
+            stock["_id"] = str(stock["_id"])
+
+        current_mentions = mentions.get("current", 0)
+        previous_mentions = mentions.get("previous", 0)
+        if current_mentions or previous_mentions:
+            total_mentions = current_mentions
+            mentions_change = ((current_mentions - previous_mentions) / previous_mentions * 100) if previous_mentions else 0
+        else:
+            # ยังไม่มี rollup → ใช้จำนวนจาก recent stocks (แบบเดิม)
+            total_mentions = sum(
+                stock.get("redditData", {}).get("mentionCount", 0) + stock.get("newsData", {}).get("articleCount", 0)
+                for stock in recent_stocks
+            )
+            mentions_change = 0
+
+        def avg_sentiment(period: str):
+            row = posts.get(period) or {}
+            return row.get("sentimentSum", 0) / row["sentimentCount"] if row.get("sentimentCount") else None
+
+        current_sentiment = avg_sentiment("current")
+        previous_sentiment = avg_sentiment("previous")
+        if current_sentiment is None:
+            sentiments = [s.get("overallSentiment", {}).get("compound", 0) for s in recent_stocks if s.get("overallSentiment")]
+            current_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
+        sentiment_change = current_sentiment - previous_sentiment if previous_sentiment is not None else 0
+
+        spikes = [
+            {"ticker": row["_id"], "current": row["current"], "previous": row["previous"]}
+            for row in facet.get("spikes", [])
+        ]
+
+        return {
+            "recentStocks": recent_stocks,
+            "stats": {
+                "totalTracked": first_count("totalTracked"),
+                "positiveSentiment": first_count("positiveSentiment"),
+                "negativeSentiment": first_count("negativeSentiment"),
+                "totalMentions": total_mentions,
+                "avgSentiment": current_sentiment,
+                "mentionsChange": round(mentions_change, 1),
+                "sentimentChange": round(sentiment_change, 3),
+                "spikeEvents": len(spikes),
+                "activeAlerts": first_count("activeAlerts"),
+            },
+            "spikes": spikes[:20],
+            "timeRange": time_range,
+            "generatedAt": now.isoformat(),
+        }
+
+
+# Global instance
+dashboard_stats = DashboardStats()
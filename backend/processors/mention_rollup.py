@@ -0,0 +1,492 @@
+"""
+Mention Rollup
+เก็บจำนวน ticker mentions แบบ pre-aggregated ใน collection ticker_mentions
+keyed by (ticker, source, granularity, bucket) ที่ 5 นาที / 1 ชั่วโมง / 1 วัน
+อัปเดตด้วย $inc bulk writes ตอนบันทึก posts (Reddit bulk + Yahoo news)
+- นับ mentions แบบเดียวกับ raw pipeline (ticker ซ้ำใน post นับทุกครั้ง, sentiment ถ่วงตาม mentions)
+- เก็บ coveredSince ต่อ source: ช่วงเวลาที่เริ่มก่อน coveredSince ใช้ raw pipeline แทน (rollup ยังไม่ครบ)
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+from database.db_config import db
+from processors.trending_aggregator import FALSE_POSITIVE_TICKERS, TIME_RANGES, get_source_collections, get_time_cutoff
+from utils.post_normalizer import get_collection_name
+from utils.ticker_extractor import DOLLAR_TICKER_PATTERN
+
+COLLECTION_NAME = "ticker_mentions"
+# เวลาเริ่มต้นที่ rollup ครบของแต่ละ source ({_id: source, coveredSince})
+COVERAGE_COLLECTION_NAME = "ticker_mentions_coverage"
+
+# ticker พิเศษสำหรับนับจำนวน posts ทั้งหมด (post ที่มีหลาย tickers นับครั้งเดียว)
+ALL_TICKERS = "*"
+
+# granularity → (ขนาด bucket, ระยะเวลาที่เก็บไว้ก่อนหมดอายุ)
+GRANULARITIES = {
+    "5m": (timedelta(minutes=5), timedelta(days=2)),
+    "1h": (timedelta(hours=1), timedelta(days=10)),
+    "1d": (timedelta(days=1), timedelta(days=400)),
+}
+
+# timeRange → granularity ที่ใช้ตอน query (จำนวน buckets ต่อ ticker ไม่เกิน ~200)
+# ขอบเขตของ sparkline parameters (ใช้ normalise cache key)
+MAX_SPARKLINE_LIMIT = 100
+MAX_SPARKLINE_POINTS = 96
+
+RANGE_GRANULARITY = {
+    "1h": "5m",
+    "6h": "5m",
+    "24h": "1h",
+    "7d": "1h",
+    "30d": "1d",
+}
+
+
+def floor_bucket(dt: datetime, granularity: str) -> datetime:
+    """ปัด datetime ลงให้ตรงกับต้น bucket"""
+    if granularity == "1d":
+        return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "1h":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    size_minutes = int(GRANULARITIES[granularity][0].total_seconds() // 60)
+    return dt.replace(minute=dt.minute - dt.minute % size_minutes, second=0, microsecond=0)
+
+
+def parse_created_utc(value) -> Optional[datetime]:
+    """แปลง created_utc (datetime / ISO string / timestamp) เป็น naive datetime"""
+    try:
+        if isinstance(value, datetime):
+            dt = value
+        elif isinstance(value, str) and value:
+            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        elif isinstance(value, (int, float)):
+            dt = datetime.utcfromtimestamp(value)
+        else:
+            return None
+        if dt.tzinfo is not None:
+            dt = dt.replace(tzinfo=None) - dt.utcoffset()
+        return dt
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def get_post_ticker_mentions(post: Dict) -> Dict[str, int]:
+    """
+    จำนวน mentions ต่อ ticker ของ post - นับแบบเดียวกับ raw pipeline ของ TrendingAggregator:
+    symbols → symbol → $SYMBOL ใน text (fallback), ticker ซ้ำใน post นับทุกครั้ง, ตัด false positives
+
+    Returns:
+        {ticker: จำนวน mentions} (ตามลำดับที่พบ)
+    """
+    symbols = post.get('symbols')
+    if isinstance(symbols, list) and symbols:
+        raw = symbols
+    elif isinstance(post.get('symbol'), str) and post.get('symbol'):
+        raw = [post['symbol']]
+    else:
+        text = " ".join(str(post.get(field) or "") for field in ("title", "selftext", "text", "body"))
+        raw = DOLLAR_TICKER_PATTERN.findall(text.upper())
+
+    mentions: Dict[str, int] = {}
+    for ticker in raw:
+        if not ticker or not isinstance(ticker, str):
+            continue
+        ticker = ticker.upper()
+        if ticker in FALSE_POSITIVE_TICKERS:
+            continue
+        mentions[ticker] = mentions.get(ticker, 0) + 1
+    return mentions
+
+
+def get_post_sentiment(post: Dict) -> Optional[float]:
+    """ดึง sentiment ของ post แบบเดียวกับ raw pipeline: ตัวเลข → sentiment.compound → sentiment_score"""
+    sentiment = post.get('sentiment')
+    if isinstance(sentiment, (int, float)) and not isinstance(sentiment, bool):
+        return sentiment
+    value = sentiment.get('compound') if isinstance(sentiment, dict) else None
+    if value is None:
+        value = post.get('sentiment_score')
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class MentionRollup:
+    """
+    Rollup collection ของ ticker mentions
+
+    Document:
+        {ticker, source, granularity, bucket, mentions, posts, sentimentSum, sentimentCount, expireAt}
+    """
+
+    def __init__(self, collection_name: str = COLLECTION_NAME, sparkline_ttl_seconds: float = 30,
+                 coverage_collection_name: str = COVERAGE_COLLECTION_NAME, sparkline_cache_size: int = 64):
+        self.collection_name = collection_name
+        self.coverage_collection_name = coverage_collection_name
+        self._covered_sources = set()  # sources ที่บันทึก coveredSince แล้วใน process นี้
+        self.sparkline_ttl_seconds = sparkline_ttl_seconds
+        self._sparkline_cache: Dict[tuple, tuple] = {}  # (timeRange, limit, points) -> (expires_at, result)
+        self.sparkline_cache_size = max(1, sparkline_cache_size)
+        self._sparkline_lock = threading.Lock()
+
+    def _get_collection(self):
+        if db is None:
+            return None
+        return getattr(db, self.collection_name)
+
+    def _get_coverage_collection(self):
+        if db is None:
+            return None
+        return getattr(db, self.coverage_collection_name)
+
+    def mark_covered(self, source: str, since: datetime):
+        """บันทึกว่า rollup ของ source ครบตั้งแต่ since (เก็บค่าที่เก่าที่สุด)"""
+        collection = self._get_coverage_collection()
+        if collection is None:
+            return
+        try:
+            collection.update_one({"_id": source}, {"$min": {"coveredSince": since}}, upsert=True)
+            self._covered_sources.add(source)
+        except Exception as e:
+            print(f"⚠️  Error updating {self.coverage_collection_name}: {e}")
+
+    def is_covered(self, sources: List[str], start: datetime) -> bool:
+        """rollup ของทุก source ครบตั้งแต่ start หรือไม่"""
+        collection = self._get_coverage_collection()
+        if collection is None:
+            return False
+        try:
+            coverage = {doc["_id"]: doc.get("coveredSince") for doc in collection.find({"_id": {"$in": sources}})}
+        except Exception as e:
+            print(f"⚠️  Error reading {self.coverage_collection_name}: {e}")
+            return False
+        return all(coverage.get(source) is not None and coverage[source] <= start for source in sources)
+
+    def ensure_indexes(self):
+        """สร้าง indexes (unique key + query index + TTL)"""
+        collection = self._get_collection()
+        if collection is None:
+            return
+        for keys, options in [
+            ([("ticker", 1), ("source", 1), ("granularity", 1), ("bucket", 1)], {"unique": True}),
+            ([("granularity", 1), ("bucket", -1)], {}),
+            ([("expireAt", 1)], {"expireAfterSeconds": 0}),
+        ]:
+            try:
+                collection.create_index(keys, background=True, **options)
+            except Exception as e:
+                error_code = getattr(e, 'code', None)
+                if error_code not in [85, 86]:
+                    print(f"  ⚠️  Error creating {self.collection_name} index: {e}")
+
+    def build_increments(self, posts: Iterable[Dict], source: str) -> Dict[tuple, Dict]:
+        """
+        รวม increments ของ posts ตาม (ticker, source, granularity, bucket)
+
+        Args:
+            posts: Posts ที่เพิ่งบันทึกใหม่ (ต้องไม่ซ้ำกับที่เคยนับแล้ว)
+            source: Source (reddit, yahoo)
+
+        Returns:
+            {(ticker, source, granularity, bucket): {"mentions", "posts", "sentimentSum", "sentimentCount"}}
+        """
+        increments: Dict[tuple, Dict] = {}
+        for post in posts:
+            created = parse_created_utc(post.get('created_utc'))
+            if created is None:
+                continue
+            sentiment = get_post_sentiment(post)
+            # ALL_TICKERS นับ post ละ 1 (จำนวน posts ทั้งหมด รวม posts ที่ไม่มี ticker)
+            mentions = list(get_post_ticker_mentions(post).items()) + [(ALL_TICKERS, 1)]
+
+            for granularity in GRANULARITIES:
+                bucket = floor_bucket(created, granularity)
+                for ticker, count in mentions:
+                    key = (ticker, source, granularity, bucket)
+                    inc = increments.setdefault(key, {"mentions": 0, "posts": 0, "sentimentSum": 0.0, "sentimentCount": 0})
+                    inc["mentions"] += count
+                    inc["posts"] += 1
+                    if sentiment is not None:
+                        # ✅ ถ่วงตาม mentions เหมือน raw pipeline
+                        inc["sentimentSum"] += count * sentiment
+                        inc["sentimentCount"] += count
+        return increments
+
+    def record_posts(self, posts: Iterable[Dict], source: str) -> int:
+        """
+        อัปเดต rollup ด้วย $inc bulk write (เรียกหลังบันทึก posts ใหม่)
+
+        Returns:
+            จำนวน bucket documents ที่อัปเดต
+        """
+        collection = self._get_collection()
+        if collection is None:
+            return 0
+
+        increments = self.build_increments(posts, source)
+        if not increments:
+            return 0
+
+        now = datetime.utcnow()
+        operations = []
+        for (ticker, post_source, granularity, bucket), inc in increments.items():
+            operations.append(UpdateOne(
+                {"ticker": ticker, "source": post_source, "granularity": granularity, "bucket": bucket},
+                {
+                    "$inc": inc,
+                    "$set": {"updatedAt": now},
+                    "$setOnInsert": {"expireAt": bucket + GRANULARITIES[granularity][1]},
+                },
+                upsert=True
+            ))
+
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"⚠️  Error updating {self.collection_name}: {e}")
+            return 0
+
+        if source not in self._covered_sources:
+            # ✅ ingest แรกที่เขียนสำเร็จของ process: rollup ครบตั้งแต่ตอนนี้เป็นต้นไป (ค่าเดิมที่เก่ากว่าไม่ถูกทับ)
+            # (เขียนไม่สำเร็จ → ไม่อ้าง coverage ให้ trending ใช้ raw pipeline แทน)
+            self.mark_covered(source, now)
+        return len(operations)
+
+    def aggregate_tickers(self, source: str, time_range: str, top_n: int = 100) -> Dict:
+        """
+        รวม buckets ของ timeRange เป็น trending tickers (shape เดียวกับ TrendingAggregator.aggregate_tickers)
+
+        Returns:
+            summary หรือ None ถ้า rollup ยังไม่ครอบคลุมช่วงเวลานี้ (ให้ใช้ raw pipeline แทน)
+        """
+        empty = {"rows": [], "total_posts": 0, "total_tickers": 0, "cutoff": None}
+        collection = self._get_collection()
+        if collection is None:
+            return None
+
+        granularity = RANGE_GRANULARITY.get(time_range, "1h")
+        cutoff = get_time_cutoff(time_range)
+        sources = [name.replace("post_", "") for name in get_source_collections(source)]
+        if not self.is_covered(sources, floor_bucket(cutoff, granularity)):
+            return None
+
+        pipeline = [
+            {"$match": {
+                "granularity": granularity,
+                "bucket": {"$gte": floor_bucket(cutoff, granularity)},
+                "source": {"$in": sources},
+            }},
+            {"$group": {
+                "_id": "$ticker",
+                "mentions": {"$sum": "$mentions"},
+                "uniquePosts": {"$sum": "$posts"},
+                "sources": {"$addToSet": "$source"},
+                "sentimentSum": {"$sum": "$sentimentSum"},
+                "sentimentCount": {"$sum": "$sentimentCount"},
+            }},
+            {"$facet": {
+                "posts": [{"$match": {"_id": ALL_TICKERS}}],
+                "tickers": [
+                    {"$match": {"_id": {"$ne": ALL_TICKERS}}},
+                    {"$sort": {"mentions": -1, "_id": 1}},
+                    {"$group": {"_id": None, "total": {"$sum": 1}, "rows": {"$push": "$$ROOT"}}},
+                    {"$project": {"_id": 0, "total": 1, "rows": {"$slice": ["$rows", top_n]}}},
+                ],
+            }},
+        ]
+
+        try:
+            result = list(collection.aggregate(pipeline))
+        except Exception as e:
+            print(f"⚠️  Error reading {self.collection_name}: {e}")
+            return empty
+
+        facet = result[0] if result else {}
+        totals = (facet.get("posts") or [{}])[0]
+        tickers_summary = (facet.get("tickers") or [{}])[0]
+
+        rows = []
+        for row in tickers_summary.get("rows", []):
+            sentiment_count = row.get("sentimentCount", 0)
+            rows.append({
+                "ticker": row["_id"],
+                "mentions": row.get("mentions", 0),
+                "uniquePosts": row.get("uniquePosts", 0),
+                "sources": row.get("sources", []),
+                "avgSentiment": row.get("sentimentSum", 0) / sentiment_count if sentiment_count else 0,
+            })
+
+        return {
+            "rows": rows,
+            "total_posts": totals.get("uniquePosts", 0),
+            "total_tickers": tickers_summary.get("total", 0),
+            "cutoff": cutoff,
+        }
+
+    def get_sparklines(self, time_range: str = "24h", limit: int = 20, points: int = 24) -> Dict:
+        """
+        Sparklines (mention volume + sentiment) ของ tickers ที่ถูกพูดถึงล่าสุด
+        ใช้ aggregation เดียวบน rollup สำหรับทุก tickers และ cache ผลไว้ต่อ timeRange
+
+        Args:
+            time_range: 1h/6h/24h/7d/30d (ค่าอื่นใช้ 24h)
+            limit: จำนวน tickers (1-100)
+            points: จำนวนจุดสูงสุดต่อ sparkline (1-96)
+
+        Returns:
+            {"sparklines": [{ticker, data, sentiment, current, total, avgSentiment}], "points", "intervalMinutes", ...}
+        """
+        # ✅ normalise key ก่อน cache (timeRange ที่ไม่รู้จัก → 24h) เพื่อไม่ให้ cache โตไม่จำกัด
+        if time_range not in TIME_RANGES:
+            time_range = "24h"
+        limit = min(max(int(limit), 1), MAX_SPARKLINE_LIMIT)
+        points = min(max(int(points), 1), MAX_SPARKLINE_POINTS)
+
+        cache_key = (time_range, limit, points)
+        with self._sparkline_lock:
+            entry = self._sparkline_cache.get(cache_key)
+            if entry and entry[0] > time.time():
+                return entry[1]
+
+        result = self._compute_sparklines(time_range, limit, points)
+
+        with self._sparkline_lock:
+            now = time.time()
+            if cache_key not in self._sparkline_cache and len(self._sparkline_cache) >= self.sparkline_cache_size:
+                # ลบ entries ที่หมดอายุก่อน ถ้ายังเต็มลบตัวที่จะหมดอายุเร็วที่สุด
+                for key in [key for key, (expires_at, _) in self._sparkline_cache.items() if expires_at <= now]:
+                    del self._sparkline_cache[key]
+                if len(self._sparkline_cache) >= self.sparkline_cache_size:
+                    oldest = min(self._sparkline_cache, key=lambda key: self._sparkline_cache[key][0])
+                    del self._sparkline_cache[oldest]
+            self._sparkline_cache[cache_key] = (now + self.sparkline_ttl_seconds, result)
+        return result
+
+    def _compute_sparklines(self, time_range: str, limit: int, points: int) -> Dict:
+        granularity = RANGE_GRANULARITY.get(time_range, "1h")
+        bucket_size = GRANULARITIES[granularity][0]
+        now = datetime.utcnow()
+        start = floor_bucket(get_time_cutoff(time_range, now), granularity)
+        end = floor_bucket(now, granularity) + bucket_size
+
+        # จำนวนจุด = ไม่เกินจำนวน buckets ในช่วงเวลา (เช่น 1h = 12 จุด x 5 นาที)
+        num_points = max(1, min(points, int((end - start) / bucket_size)))
+        interval = (end - start) / num_points
+
+        result = {
+            "sparklines": [],
+            "timeRange": time_range,
+            "points": num_points,
+            "intervalMinutes": round(interval.total_seconds() / 60, 1),
+            "generatedAt": now.isoformat(),
+        }
+
+        collection = self._get_collection()
+        if collection is None:
+            return result
+
+        pipeline = [
+            {"$match": {
+                "granularity": granularity,
+                "bucket": {"$gte": start},
+                "source": {"$in": ["reddit", "yahoo"]},
+                "ticker": {"$ne": ALL_TICKERS},
+            }},
+            # รวม reddit + yahoo ต่อ (ticker, bucket)
+            {"$group": {
+                "_id": {"ticker": "$ticker", "bucket": "$bucket"},
+                "mentions": {"$sum": "$mentions"},
+                "sentimentSum": {"$sum": "$sentimentSum"},
+                "sentimentCount": {"$sum": "$sentimentCount"},
+            }},
+            {"$group": {
+                "_id": "$_id.ticker",
+                "lastBucket": {"$max": "$_id.bucket"},
+                "total": {"$sum": "$mentions"},
+                "buckets": {"$push": {
+                    "bucket": "$_id.bucket",
+                    "mentions": "$mentions",
+                    "sentimentSum": "$sentimentSum",
+                    "sentimentCount": "$sentimentCount",
+                }},
+            }},
+            # tickers ที่ถูกพูดถึงล่าสุดก่อน (เท่ากันใช้จำนวน mentions)
+            {"$sort": {"lastBucket": -1, "total": -1, "_id": 1}},
+            {"$limit": limit},
+        ]
+
+        try:
+            rows = list(collection.aggregate(pipeline, allowDiskUse=True))
+        except Exception as e:
+            print(f"⚠️  Error building sparklines from {self.collection_name}: {e}")
+            return result
+
+        for row in rows:
+            mentions = [0] * num_points
+            sentiment_sum = [0.0] * num_points
+            sentiment_count = [0] * num_points
+            for point in row.get("buckets", []):
+                index = min(num_points - 1, max(0, int((point["bucket"] - start) / interval)))
+                mentions[index] += point.get("mentions", 0)
+                sentiment_sum[index] += point.get("sentimentSum", 0)
+                sentiment_count[index] += point.get("sentimentCount", 0)
+
+            total_count = sum(sentiment_count)
+            result["sparklines"].append({
+                "ticker": row["_id"],
+                "data": mentions,  # mention volume ต่อช่วงเวลา
+                "sentiment": [round(sentiment_sum[i] / sentiment_count[i], 3) if sentiment_count[i] else 0
+                              for i in range(num_points)],
+                "current": mentions[-1],
+                "total": row.get("total", 0),
+                "avgSentiment": round(sum(sentiment_sum) / total_count, 3) if total_count else 0,
+                "lastMentionBucket": row["lastBucket"].isoformat() if row.get("lastBucket") else None,
+            })
+        return result
+
+    def rebuild(self, days: int = 30, sources: Optional[List[str]] = None, batch_size: int = 5000) -> int:
+        """
+        สร้าง rollup ใหม่จาก raw posts (ใช้ตอนเริ่มใช้ rollup ครั้งแรก หรือเมื่อข้อมูลไม่ตรง)
+        ลบ buckets ตั้งแต่ cutoff แล้วนับใหม่ - ควรรันตอนที่ไม่มี ingest ทำงานอยู่
+
+        Returns:
+            จำนวน posts ที่นับ
+        """
+        collection = self._get_collection()
+        if collection is None:
+            return 0
+
+        sources = sources or ['reddit', 'yahoo']
+        cutoff = floor_bucket(datetime.utcnow() - timedelta(days=days), "1d")
+        collection.delete_many({"source": {"$in": sources}, "bucket": {"$gte": cutoff}})
+
+        # text fields สำหรับ $SYMBOL fallback (posts ที่ไม่มี symbols/symbol)
+        projection = {"symbols": 1, "symbol": 1, "created_utc": 1, "sentiment": 1, "sentiment_score": 1,
+                      "title": 1, "selftext": 1, "text": 1, "body": 1}
+        time_match = {"$or": [
+            {"created_utc": {"$gte": cutoff}},
+            {"created_utc": {"$gte": cutoff.isoformat()}},
+        ]}
+
+        total = 0
+        for source in sources:
+            collection_name = get_collection_name(source)
+            if not hasattr(db, collection_name):
+                continue
+            batch = []
+            for post in getattr(db, collection_name).find(time_match, projection).batch_size(batch_size):
+                batch.append(post)
+                if len(batch) >= batch_size:
+                    self.record_posts(batch, source)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                self.record_posts(batch, source)
+                total += len(batch)
+            self.mark_covered(source, cutoff)
+            print(f"   ✅ Rebuilt {self.collection_name} from {collection_name}")
+        return total
+
+
+# Global instance
+mention_rollup = MentionRollup()
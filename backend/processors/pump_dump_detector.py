@@ -272,14 +272,15 @@ class PumpDumpDetector:
             
             # ตรวจสอบว่ามี posts เกิดขึ้นพร้อมกันมากเกินไปหรือไม่
             # (หลาย posts ในช่วงเวลา 1 ชั่วโมง = coordinated)
-            time_windows = []
-            for i, time in enumerate(post_times):
+            # ✅ sliding window (two pointers) แทนการนับ posts ทั้งหมดซ้ำทุก post
+            max_posts_in_hour = 0
+            end = 0
+            for start, time in enumerate(post_times):
                 # นับ posts ใน 1 ชั่วโมงถัดไป
                 window_end = time + timedelta(hours=1)
-                posts_in_window = sum(1 for t in post_times if time <= t <= window_end)
-                time_windows.append(posts_in_window)
-            
-            max_posts_in_hour = max(time_windows) if time_windows else 0
+                while end < len(post_times) and post_times[end] <= window_end:
+                    end += 1
+                max_posts_in_hour = max(max_posts_in_hour, end - start)
             
             # ถ้ามี posts มากกว่า 20 ตัวใน 1 ชั่วโมง → สงสัย
             if max_posts_in_hour > 20:
@@ -381,7 +382,12 @@ class PumpDumpDetector:
         Score สูง = น่าเชื่อถือ, Score ต่ำ = น่าสงสัย
         """
         detection_result = self.detect_pump_dump(symbol, posts, stock_info)
-        
+        return self.trust_score_from_result(detection_result)
+    
+    def trust_score_from_result(self, detection_result: Dict) -> float:
+        """
+        คำนวณ trust score จากผลของ detect_pump_dump ที่มีอยู่แล้ว (ไม่ต้องตรวจจับซ้ำ)
+        """
         # Trust score = 100 - risk_score
         trust_score = 100 - detection_result.get("risk_score", 0)
         
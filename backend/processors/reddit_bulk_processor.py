@@ -4,14 +4,21 @@ Reddit Bulk Processor - ดึง Reddit แบบ bulk (time-based)
 """
 import asyncio
 import asyncpraw
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from database.db_config import db
 from typing import List, Dict, Optional, Set
 from processors.sentiment_analyzer import SentimentAnalyzer
+from processors.sentiment_pool import sentiment_pool
 from utils.post_normalizer import normalize_post, get_collection_name, get_comment_collection_name
-import re
+from utils.ticker_extractor import TickerExtractor, IGNORE_TICKERS
+from processors.mention_rollup import mention_rollup
+from utils.reddit_requestor import RateLimitedRequestor
+from processors.reddit_comment_queue import reddit_comment_queue
+from processors.reddit_watermarks import reddit_watermarks
 import hashlib
 import time
 
@@ -21,7 +28,7 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '..', '.en
 class RedditBulkProcessor:
     """
     ดึง Reddit posts แบบ bulk (time-based)
-    - ดึง posts ใหม่ทุก 45 วินาที (ตาม reddit_bulk_scheduler)
+    - ดึง posts ใหม่ต่อเนื่อง (ตาม reddit_bulk_scheduler - ระยะห่างระหว่างรอบปรับตามปริมาณ posts)
     - Extract symbols จาก posts
     - วิเคราะห์ sentiment ครั้งเดียวต่อ post
     """
@@ -107,22 +114,37 @@ class RedditBulkProcessor:
         # ✅ ตรวจสอบและลบ duplicates
         self.subreddits = list(dict.fromkeys(self.subreddits))  # เก็บลำดับเดิมแต่ลบ duplicates
         self.last_fetched_at = None
+        # ✅ จำนวน subreddits ที่ดึงพร้อมกัน (budget รวมของ Reddit คุมโดย host_rate_limiter)
+        self.subreddit_concurrency = max(1, int(os.getenv("REDDIT_SUBREDDIT_CONCURRENCY", 8)))
+        self.last_sweep_stats: Optional[Dict] = None  # เวลาต่อ subreddit ของรอบล่าสุด
+        # ✅ คิวดึง comments (แยกจาก listing) - workers ดึงตาม priority ภายใน budget ของ Reddit
+        self.comment_queue = reddit_comment_queue
+        self.comment_workers = max(1, int(os.getenv("REDDIT_COMMENT_WORKERS", 4)))
+        self.comment_drain_seconds = float(os.getenv("REDDIT_COMMENT_DRAIN_SECONDS", 30))
+        # ✅ watermark ต่อ subreddit (sweep แบบ incremental - หยุดที่ post แรกที่รู้จักแล้ว)
+        self.watermarks = reddit_watermarks
+        self.known_rescan = int(os.getenv("REDDIT_KNOWN_RESCAN", 25))  # posts ที่รู้จักแล้วที่ส่งให้ comment queue ตรวจซ้ำ
         # ✅ ไม่ใช้ processed_post_ids ใน memory (จะตรวจสอบจาก database แทน)
         # self.processed_post_ids: Set[str] = set()
         
         # Ticker ignore list (false positives)
-        self.ignore_tickers = {
-            'USD', 'GDP', 'CEO', 'IPO', 'ETF', 'SEC', 'IRS', 'FDA', 
-            'AI', 'IT', 'TV', 'PC', 'USA', 'ON', 'ALL', 'FOR', 'THE',
-            'AND', 'OR', 'IS', 'AT', 'TO', 'IN', 'OF', 'AS', 'BE'
-        }
+        self.ignore_tickers = set(IGNORE_TICKERS)
+        # ✅ ticker extractor (compiled patterns + tokenization รอบเดียว)
+        self.ticker_extractor = TickerExtractor(self.ignore_tickers)
     
-    async def get_reddit_instance(self):
-        """สร้าง Async Reddit instance"""
+    async def get_reddit_instance(self, session=None):
+        """
+        สร้าง Async Reddit instance
+        
+        Args:
+            session: aiohttp.ClientSession ที่ใช้ร่วมกัน (None = asyncprawcore สร้างใหม่)
+        """
         return asyncpraw.Reddit(
             client_id=os.getenv("REDDIT_CLIENT_ID"),
             client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-            user_agent=os.getenv("USER_AGENT")
+            user_agent=os.getenv("USER_AGENT"),
+            requestor_class=RateLimitedRequestor,  # ✅ ทุก request ผ่าน token bucket ของ Reddit
+            requestor_kwargs={"session": session} if session is not None else None
         )
     
     def extract_tickers(self, text: str, valid_tickers: Set[str]) -> Set[str]:
@@ -141,85 +163,23 @@ class RedditBulkProcessor:
         Returns:
             Set ของ ticker symbols ที่พบ
         """
-        if not text or not valid_tickers or len(valid_tickers) == 0:
-            return set()
-        
-        tickers = set()
-        text_upper = text.upper()
-        
-        # Pattern 1: $SYMBOL (สำคัญที่สุด - ใช้บ่อยที่สุด)
-        dollar_pattern = re.compile(r'\$([A-Z]{1,5})\b')
-        dollar_matches = dollar_pattern.findall(text_upper)
-        for ticker in dollar_matches:
-            if ticker in valid_tickers and ticker not in self.ignore_tickers:
-                tickers.add(ticker)
-        
-        # Pattern 2: Standalone ticker (ต้องมี context)
-        # หา ticker ที่อยู่หลังคำสำคัญ เช่น "buy AAPL", "AAPL stock"
-        standalone_pattern = re.compile(
-            r'\b(buy|sell|hold|trade|stock|shares?|ticker|symbol|NYSE|NASDAQ)\s+([A-Z]{1,5})\b',
-            re.IGNORECASE
-        )
-        standalone_matches = standalone_pattern.findall(text_upper)
-        for _, ticker in standalone_matches:
-            if ticker in valid_tickers and ticker not in self.ignore_tickers:
-                tickers.add(ticker)
-        
-        # Pattern 2b: Standalone ticker ที่อยู่หน้าคำสำคัญ เช่น "AAPL is", "TSLA to"
-        standalone_before_pattern = re.compile(
-            r'\b([A-Z]{1,5})\s+(is|to|will|can|should|going|up|down|buy|sell|hold|stock|shares?|ticker|symbol)\b',
-            re.IGNORECASE
-        )
-        standalone_before_matches = standalone_before_pattern.findall(text_upper)
-        for ticker, _ in standalone_before_matches:
-            if ticker in valid_tickers and ticker not in self.ignore_tickers:
-                tickers.add(ticker)
-        
-        # Pattern 3: Ticker ใน parentheses หรือ brackets
-        bracket_pattern = re.compile(r'[\(\[]([A-Z]{1,5})[\)\]]')
-        bracket_matches = bracket_pattern.findall(text_upper)
-        for ticker in bracket_matches:
-            if ticker in valid_tickers and ticker not in self.ignore_tickers:
-                tickers.add(ticker)
-        
-        # Pattern 4: Ticker ที่อยู่หลัง "ticker:" หรือ "symbol:"
-        colon_pattern = re.compile(r'(?:ticker|symbol):\s*([A-Z]{1,5})\b', re.IGNORECASE)
-        colon_matches = colon_pattern.findall(text_upper)
-        for ticker in colon_matches:
-            if ticker in valid_tickers and ticker not in self.ignore_tickers:
-                tickers.add(ticker)
-        
-        # Pattern 5: Ticker ที่อยู่ระหว่าง spaces หรือ punctuation (เช่น "I like AAPL", "AAPL, MSFT")
-        # ต้องมี context ว่าเป็น ticker (เช่น อยู่หลังคำสำคัญ หรือมี comma/period)
-        word_boundary_pattern = re.compile(r'\b([A-Z]{2,5})\b')
-        word_matches = word_boundary_pattern.findall(text_upper)
-        for ticker in word_matches:
-            # ตรวจสอบว่าเป็น valid ticker และไม่ใช่ ignore list
-            if ticker in valid_tickers and ticker not in self.ignore_tickers:
-                # ตรวจสอบ context: ต้องมีคำสำคัญใกล้ๆ หรือมี punctuation
-                ticker_pos = text_upper.find(ticker)
-                if ticker_pos >= 0:
-                    # ดู context รอบๆ ticker (50 ตัวอักษรก่อนและหลัง)
-                    context_start = max(0, ticker_pos - 50)
-                    context_end = min(len(text_upper), ticker_pos + len(ticker) + 50)
-                    context = text_upper[context_start:context_end]
-                    # ถ้ามีคำสำคัญใน context ให้เพิ่ม ticker
-                    context_keywords = ['STOCK', 'SHARE', 'TICKER', 'SYMBOL', 'BUY', 'SELL', 'HOLD', 'TRADE', 
-                                     'PRICE', 'MARKET', 'INVEST', 'PORTFOLIO', 'POSITION', 'CALL', 'PUT',
-                                     'OPTION', 'DIVIDEND', 'EARNINGS', 'REVENUE', 'EPS', 'PE', 'RATIO']
-                    if any(keyword in context for keyword in context_keywords):
-                        tickers.add(ticker)
-        
-        return tickers
+        return self.ticker_extractor.extract(text, valid_tickers)
     
-    async def fetch_new_posts_bulk(self, since: Optional[datetime] = None, limit_per_subreddit: int = 500, valid_tickers: Optional[Set[str]] = None) -> List[Dict]:
+    async def fetch_new_posts_bulk(self, since: Optional[datetime] = None, limit_per_subreddit: int = 500, valid_tickers: Optional[Set[str]] = None,
+                                   reddit=None) -> List[Dict]:
         """
         ดึง Reddit posts ใหม่แบบ bulk
         
+        ✅ ดึงหลาย subreddits พร้อมกัน (สูงสุด subreddit_concurrency ตัว)
+        ทุก request ผ่าน token bucket ของ Reddit (RateLimitedRequestor) → เวลาทั้งรอบขึ้นกับ API quota
+        ไม่ใช่ผลรวม latency ของแต่ละ subreddit
+        ✅ comments ไม่อยู่ใน listing loop - posts ถูกส่งเข้า comment_queue แล้ว comment workers ดึงตาม priority
+        
         Args:
             since: วันที่เริ่มดึง (ถ้า None = ดึง 2 ชั่วโมงล่าสุด)
             limit_per_subreddit: จำนวน posts ต่อ subreddit (default: 500, แต่จะปรับตามช่วงเวลาที่ดึง)
             valid_tickers: Set of valid ticker symbols (สำหรับ extract symbols จาก comments)
+            reddit: Reddit instance ที่ใช้ร่วมกันข้ามรอบ (None = สร้างใหม่แล้วปิดเมื่อจบรอบ)
             
         Returns:
             List of posts
@@ -229,171 +189,296 @@ class RedditBulkProcessor:
             # เพราะ Reddit อาจจะไม่มี posts ใหม่ทุก 30 วินาที
             since = datetime.utcnow() - timedelta(hours=1)
         
-        all_posts = []
-        reddit = await self.get_reddit_instance()
+        owns_reddit = reddit is None
+        if owns_reddit:
+            reddit = await self.get_reddit_instance()
         
         from utils.progress_bar import draw_progress_bar, reset_progress
         
-        print(f"   🔍 กำลังดึง posts จาก {len(self.subreddits)} subreddits")
+        print(f"   🔍 กำลังดึง posts จาก {len(self.subreddits)} subreddits (พร้อมกัน {self.subreddit_concurrency} ตัว)")
         print(f"   ⏰ ดึง posts ที่สร้างหลังจาก: {since.strftime('%Y-%m-%d %H:%M:%S')}")
         
         # Reset progress bar
         reset_progress()
         
-        # ✅ ตัวนับสำหรับ comments progress bar
-        total_comments_processed = 0
-        comments_progress_shown = False  # ตรวจสอบว่าแสดง progress bar สำหรับ comments หรือยัง
+        semaphore = asyncio.Semaphore(self.subreddit_concurrency)
+        completed = 0
+        
+        async def fetch_one(subreddit_name):
+            nonlocal completed
+            async with semaphore:
+                result = await self._fetch_subreddit(reddit, subreddit_name, since, limit_per_subreddit, valid_tickers)
+            completed += 1
+            # แสดง progress สำหรับ subreddits ที่ดึงเสร็จแล้ว
+            draw_progress_bar(completed, len(self.subreddits), bar_length=50, prefix="กำลังโหลด post_reddit", show_total=True)
+            return result
+        
+        # ✅ comment workers ทำงานพร้อม listing (ใช้ budget ของ Reddit ร่วมกัน)
+        # หลัง listing เสร็จ drain ต่อได้ไม่เกิน comment_drain_seconds - งานที่เหลือค้างในคิวไปรอบถัดไป
+        harvest = {"listingsDone": False, "deadline": None}
+        workers = [asyncio.ensure_future(self._comment_worker(reddit, valid_tickers, harvest))
+                   for _ in range(self.comment_workers)]
+        
+        sweep_started = time.perf_counter()
+        try:
+            results = await asyncio.gather(*(fetch_one(name) for name in self.subreddits))
+            wall_seconds = time.perf_counter() - sweep_started
+            harvest["deadline"] = time.monotonic() + self.comment_drain_seconds
+            harvest["listingsDone"] = True
+            print(f"   💬 Comment queue: {len(self.comment_queue)} posts รอดึง comments "
+                  f"({self.comment_workers} workers, ไม่เกิน {self.comment_drain_seconds:.0f}s)")
+            await asyncio.gather(*workers)
+        finally:
+            harvest["listingsDone"] = True
+            harvest["deadline"] = harvest["deadline"] or time.monotonic()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if owns_reddit:
+                await reddit.close()
+        self.comment_queue.prune()
+        
+        all_posts = [post for posts, _ in results for post in posts]
+        timings = {timing["subreddit"]: timing for _, timing in results}
+        self.last_sweep_stats = {
+            "finishedAt": datetime.utcnow().isoformat(),
+            "wallSeconds": round(wall_seconds, 2),
+            "sumSubredditSeconds": round(sum(t["seconds"] for t in timings.values()), 2),
+            "concurrency": self.subreddit_concurrency,
+            "posts": len(all_posts),
+            "commentsQueued": sum(t["commentsQueued"] for t in timings.values()),
+            "errors": sum(1 for t in timings.values() if t["error"]),
+            "subreddits": timings,
+            "commentQueue": self.comment_queue.get_stats(),
+        }
+        
+        # ✅ เวลาต่อ subreddit (แสดงตัวที่ช้าที่สุด)
+        print(f"   ⏱️  Sweep: {wall_seconds:.1f}s (รวมเวลาทุก subreddit {self.last_sweep_stats['sumSubredditSeconds']:.1f}s)")
+        for timing in sorted(timings.values(), key=lambda t: t["seconds"], reverse=True)[:5]:
+            error = f" ⚠️ {timing['error']}" if timing["error"] else ""
+            print(f"      r/{timing['subreddit']:<20} {timing['seconds']:>6.1f}s | {timing['posts']} posts | "
+                  f"{timing['commentsQueued']} queued for comments{error}")
+        
+        if len(all_posts) == 0:
+            print(f"   💡 Tip: อาจจะไม่มี posts ใหม่ในช่วงเวลาที่กำหนด หรือ Reddit API rate limit")
+        
+        return all_posts
+    
+    async def _fetch_subreddit(self, reddit, subreddit_name: str, since: datetime, limit_per_subreddit: int,
+                               valid_tickers: Optional[Set[str]]):
+        """
+        ดึง posts ใหม่ของ subreddit เดียว (comments ส่งเข้า comment_queue)
+        
+        Returns:
+            (posts, timing) - timing = {subreddit, seconds, posts, commentsQueued, error}
+        """
+        started = time.perf_counter()
+        posts = []
+        queued = 0
+        error = None
+        
+        # ✅ จำกัดจำนวน posts ต่อ subreddit แบบ dynamic:
+        # - ถ้าดึงย้อนหลังมาก (ระบบปิดไปนาน) → limit สูง (2000)
+        # - ถ้าดึงแค่ 2 ชั่วโมงล่าสุด → limit ต่ำ (500)
+        backfill = datetime.utcnow() - since > timedelta(hours=4)
+        max_posts = 2000 if backfill else 500
+        
+        # ✅ watermark = post ใหม่สุดที่เคยดึงแล้ว → หยุดที่ post แรกที่รู้จัก (ไม่มี → ใช้ since)
+        # gap = ช่วงที่ sweep ก่อนดึงไม่ถึง (ชน max_posts ก่อนถึง watermark) → ดึงต่อจาก gap.afterId
+        watermark = self.watermarks.get(subreddit_name)
+        gap = (watermark or {}).get("gap")
+        newest = None
+        known_seen = 0
+        seen_ids = set()
+        
+        def add_post(submission, post_time):
+            """สร้าง post + ส่งเข้าคิวดึง comments (priority ตาม score / comments / ticker)"""
+            nonlocal queued
+            post = {
+                "id": submission.id,
+                "title": submission.title,
+                "selftext": getattr(submission, 'selftext', '') or '',
+                "score": submission.score or 0,
+                "num_comments": submission.num_comments or 0,
+                "created_utc": post_time,
+                "subreddit": str(submission.subreddit),
+                "url": submission.url,
+                "author": str(submission.author) if submission.author else "[deleted]",
+                "upvote_ratio": getattr(submission, 'upvote_ratio', 0),
+                "is_self": submission.is_self,
+                "over_18": getattr(submission, 'over_18', False),
+                "fetched_at": datetime.utcnow(),
+                "comments": [],  # ✅ comments ถูกดึง/บันทึกโดย comment workers (ไม่อยู่ใน listing loop)
+                "comments_fetched": 0,  # worker เติมให้เมื่อดึง comments เสร็จ
+                "comments_saved": False
+            }
+            posts.append(post)
+            seen_ids.add(submission.id)
+            # Comments ที่เป็น positive มากๆ สามารถขับเคลื่อนราคาได้ แม้จะเป็นข่าวร้าย
+            has_ticker = bool(valid_tickers) and bool(
+                self.extract_tickers(f"{post['title']} {post['selftext']}", valid_tickers))
+            if self.comment_queue.offer(post["id"], post["num_comments"], post["score"], has_ticker, post):
+                queued += 1
         
         try:
-            subreddit_idx = 0
-            for subreddit_name in self.subreddits:
-                subreddit_idx += 1
-                # แสดง progress สำหรับ subreddits
-                draw_progress_bar(subreddit_idx, len(self.subreddits), bar_length=50, prefix="กำลังโหลด post_reddit", show_total=True)
+            subreddit = await reddit.subreddit(subreddit_name)
+            
+            # ✅ ดึง posts ใหม่ (sort by new) - เพิ่ม limit
+            # ใช้ limit สูงเพื่อดึงได้มากขึ้น (Reddit API รองรับได้)
+            reached, oldest, scanned = False, None, 0
+            async for submission in subreddit.new(limit=limit_per_subreddit):
+                scanned += 1
                 try:
-                    subreddit = await reddit.subreddit(subreddit_name)
+                    created_utc = submission.created_utc
+                    post_time = datetime.utcfromtimestamp(created_utc)
+                    if newest is None:
+                        newest = (submission.fullname, created_utc)
+                    
+                    # /new เรียงจากใหม่ไปเก่า → เจอ post ที่รู้จักแล้ว (หรือเก่ากว่า watermark) = ไม่มี post ใหม่ต่อจากนี้
+                    # (เทียบ created_utc ด้วย กรณี post ของ watermark ถูกลบไปแล้ว)
+                    if watermark and (known_seen or submission.fullname == watermark.get("newestId")
+                                      or created_utc < (watermark.get("newestCreatedUtc") or 0)):
+                        reached = True
+                        # ✅ posts ที่รู้จักแล้ว (อยู่ใน page เดียวกันอยู่แล้ว) ไม่บันทึกซ้ำ
+                        # แต่เสนอให้ comment queue ดึง comments ซ้ำถ้ายังโตอยู่ - ไม่เกิน known_rescan ตัว
+                        known_seen += 1
+                        if known_seen > self.known_rescan:
+                            break
+                        self.comment_queue.offer(submission.id, submission.num_comments or 0, submission.score or 0)
+                        continue
+                    if not watermark and post_time < since:
+                        reached = True
+                        break
+                    
+                    add_post(submission, post_time)
+                    oldest = submission.fullname
+                    
+                    # ✅ จำกัดจำนวน posts ต่อ subreddit
+                    if len(posts) >= max_posts:
+                        break
                     
-                    # ✅ ดึง posts ใหม่ (sort by new) - เพิ่ม limit
-                    # ใช้ limit สูงเพื่อดึงได้มากขึ้น (Reddit API รองรับได้)
-                    posts_count = 0
-                    skipped_old = 0
-                    async for submission in subreddit.new(limit=limit_per_subreddit):
-                        try:
-                            # ตรวจสอบวันที่
-                            post_time = datetime.utcfromtimestamp(submission.created_utc)
-                            if post_time < since:
-                                skipped_old += 1
-                                # ✅ ใช้ threshold แบบ dynamic:
-                                # - ถ้าดึงย้อนหลังมาก (ระบบปิดไปนาน) → threshold สูง (100)
-                                # - ถ้าดึงแค่ 2 ชั่วโมงล่าสุด → threshold ต่ำ (20)
-                                time_range = datetime.utcnow() - since
-                                threshold = 100 if time_range > timedelta(hours=4) else 20
-                                if skipped_old >= threshold:
-                                    break
-                                continue
-                            
-                            # ✅ Reset skipped_old counter เมื่อเจอ post ใหม่
-                            skipped_old = 0
-                            
-                            # ✅ ไม่ตรวจสอบ processed_post_ids ใน memory (จะตรวจสอบจาก database แทน)
-                            # เพราะ processed_post_ids ใน memory อาจจะใหญ่เกินไป
-                            # ตรวจสอบจาก database แทน (จะทำใน save_to_database)
-                            
-                            posts_count += 1
-                            
-                            # ✅ ดึง comments สำหรับ post นี้ (สำคัญมาก!)
-                            # Comments ที่เป็น positive มากๆ สามารถขับเคลื่อนราคาได้ แม้จะเป็นข่าวร้าย
-                            # ดึง comments มากสุด 100 ตัว (ลดลงเพื่อหลีกเลี่ยง rate limit)
-                            # ✅ เพิ่ม delay 0.5 วินาทีระหว่างการดึง comments แต่ละ post เพื่อหลีกเลี่ยง rate limit
-                            await asyncio.sleep(0.5)
-                            comments = await self.fetch_comments_for_post(submission, max_comments=100)
-                            
-                            # ✅ บันทึก comments ลง database ทันที (ไม่ต้องรอจนถึง save_to_database)
-                            comments_saved = False
-                            if comments:
-                                try:
-                                    # บันทึก comments
-                                    await self.save_comments_immediately(
-                                        submission.id, 
-                                        comments, 
-                                        valid_tickers, 
-                                        source='reddit',
-                                        show_progress=False
-                                    )
-                                    comments_saved = True
-                                    # ✅ อัปเดต progress bar สำหรับ comments
-                                    total_comments_processed += len(comments)
-                                    
-                                    # ✅ แสดง progress bar สำหรับ comments (ถ้ามี comments มากกว่า 50)
-                                    if total_comments_processed > 50 and not comments_progress_shown:
-                                        comments_progress_shown = True
-                                        reset_progress()  # Reset progress bar สำหรับ comments
-                                        print()  # ขึ้นบรรทัดใหม่
-                                    
-                                    if comments_progress_shown:
-                                        # ประมาณ total comments จาก posts ที่ดึงมาแล้ว + comments ที่เหลือ
-                                        estimated_total = sum(p.get('comments_fetched', 0) for p in all_posts) + len(comments)
-                                        if estimated_total > 0:
-                                            draw_progress_bar(
-                                                total_comments_processed, 
-                                                estimated_total, 
-                                                bar_length=50, 
-                                                prefix="กำลังโหลด comment", 
-                                                show_total=True
-                                            )
-                                except Exception:
-                                    # ถ้าบันทึกไม่ได้ก็ไม่เป็นไร ยังเก็บไว้ใน post['comments'] เพื่อบันทึกทีหลัง
-                                    pass
-                            
-                            post = {
-                                "id": submission.id,
-                                "title": submission.title,
-                                "selftext": getattr(submission, 'selftext', '') or '',
-                                "score": submission.score or 0,
-                                "num_comments": submission.num_comments or 0,
-                                "created_utc": post_time,
-                                "subreddit": str(submission.subreddit),
-                                "url": submission.url,
-                                "author": str(submission.author) if submission.author else "[deleted]",
-                                "upvote_ratio": getattr(submission, 'upvote_ratio', 0),
-                                "is_self": submission.is_self,
-                                "over_18": getattr(submission, 'over_18', False),
-                                "fetched_at": datetime.utcnow(),
-                                "comments": comments if not comments_saved else [],  # ✅ เก็บ comments เฉพาะถ้ายังไม่ได้บันทึก (ประหยัด memory)
-                                "comments_fetched": len(comments),  # จำนวน comments ที่ดึงได้
-                                "comments_saved": comments_saved  # ระบุว่า comments ถูกบันทึกไปแล้วหรือยัง
-                            }
-                            
-                            all_posts.append(post)
-                            # ✅ ไม่เก็บใน memory (จะตรวจสอบจาก database แทน)
-                            # self.processed_post_ids.add(submission.id)
-                            
-                            # ✅ จำกัดจำนวน posts ต่อ subreddit แบบ dynamic:
-                            # - ถ้าดึงย้อนหลังมาก (ระบบปิดไปนาน) → limit สูง (2000)
-                            # - ถ้าดึงแค่ 2 ชั่วโมงล่าสุด → limit ต่ำ (500)
-                            time_range = datetime.utcnow() - since
-                            max_posts = 2000 if time_range > timedelta(hours=4) else 500
-                            if posts_count >= max_posts:
-                                break
-                            
-                        except Exception:
-                            continue
-                            
                 except Exception:
                     continue
+            # listing หมดก่อน limit (ไม่ได้หยุดเพราะ max_posts) = ไม่มี post เก่ากว่านี้ให้ดึงแล้ว
+            capped = len(posts) >= max_posts
+            if not capped and (limit_per_subreddit is None or scanned < limit_per_subreddit):
+                reached = True
             
-        finally:
-            await reddit.close()
-        
-        # ✅ นับจำนวน comments ที่ดึงได้ทั้งหมด
-        total_comments = sum(post.get('comments_fetched', 0) for post in all_posts)
-        
-        # ✅ แสดง progress bar เสร็จสิ้นสำหรับ posts
-        draw_progress_bar(len(self.subreddits), len(self.subreddits), bar_length=50, prefix="กำลังโหลด post_reddit", show_total=True)
-        
-        # ✅ แสดง progress bar เสร็จสิ้นสำหรับ comments (ถ้ามี comments และแสดง progress bar แล้ว)
-        if total_comments > 0 and comments_progress_shown:
-            # แสดง progress bar เสร็จสิ้น
-            draw_progress_bar(total_comments, total_comments, bar_length=50, prefix="กำลังโหลด comment", show_total=True)
+            if not reached:
+                # ✅ ชน max_posts ก่อนถึง watermark → จำช่วงที่ยังไม่ได้ดึง (sweep ถัดไปดึงต่อ ไม่ข้ามไปเลย)
+                # gap เดิมที่ยังค้างอยู่ถูกรวมเข้าไป (ขอบล่างคือขอบล่างของ gap เดิม)
+                if gap:
+                    until = {"untilId": gap.get("untilId"), "untilCreatedUtc": gap.get("untilCreatedUtc")}
+                elif watermark:
+                    until = {"untilId": watermark.get("newestId"), "untilCreatedUtc": watermark.get("newestCreatedUtc")}
+                else:
+                    until = {"untilId": None, "untilCreatedUtc": (since - datetime(1970, 1, 1)).total_seconds()}
+                gap = {"afterId": oldest, **until}
+            elif gap:
+                # ✅ ดึงต่อจากช่วงที่ค้าง (ต่อจาก gap.afterId จนถึงขอบล่าง) ด้วย budget ที่เหลือของรอบนี้
+                gap_oldest, scanned = None, 0
+                gap_reached = False
+                async for submission in subreddit.new(limit=limit_per_subreddit, params={"after": gap["afterId"]}):
+                    scanned += 1
+                    try:
+                        created_utc = submission.created_utc
+                        if (submission.fullname == gap.get("untilId")
+                                or created_utc < (gap.get("untilCreatedUtc") or 0)):
+                            gap_reached = True
+                            break
+                        if submission.id not in seen_ids:
+                            add_post(submission, datetime.utcfromtimestamp(created_utc))
+                        gap_oldest = submission.fullname
+                        if len(posts) >= max_posts:
+                            break
+                    except Exception:
+                        continue
+                if len(posts) < max_posts and (limit_per_subreddit is None or scanned < limit_per_subreddit):
+                    gap_reached = True
+                gap = None if gap_reached else {**gap, "afterId": gap_oldest or gap["afterId"]}
+            
+            # ✅ listing ครบแล้ว → ขยับ watermark + ช่วงที่ค้าง (บันทึกจริงหลัง save_to_database)
+            if newest is not None:
+                self.watermarks.stage(subreddit_name, *newest, gap=gap)
+                    
+        except Exception as e:
+            error = type(e).__name__
+        
+        return posts, {
+            "subreddit": subreddit_name,
+            "seconds": round(time.perf_counter() - started, 2),
+            "posts": len(posts),
+            "commentsQueued": queued,
+            "incremental": watermark is not None,
+            "gapPending": gap is not None,
+            "error": error,
+        }
+    
+    async def _comment_worker(self, reddit, valid_tickers: Optional[Set[str]], harvest: Dict):
+        """
+        ดึง comments ตามลำดับ priority จาก comment_queue
+        หยุดเมื่อ listing เสร็จแล้วและ (คิวว่าง หรือเลย deadline ของการ drain)
+        """
+        while True:
+            if harvest["listingsDone"] and time.monotonic() >= harvest["deadline"]:
+                return
+            item = self.comment_queue.pop()
+            if item is None:
+                if harvest["listingsDone"]:
+                    return
+                await asyncio.sleep(0.2)  # รอ listing ส่งงานเข้าคิว
+                continue
+            post_id, num_comments, post = item
+            try:
+                await self._harvest_comments(reddit, post_id, num_comments, post, valid_tickers)
+            except Exception as e:
+                self.comment_queue.mark_fetched(post_id, num_comments, None)
+                print(f"   ⚠️  Error harvesting comments for post {post_id}: {e}")
+    
+    async def _harvest_comments(self, reddit, post_id: str, num_comments: int, post: Optional[Dict],
+                                valid_tickers: Optional[Set[str]]):
+        """ดึง + บันทึก comments ของ post เดียว (ครั้งแรก หรือดึงซ้ำเมื่อ comments เพิ่มขึ้น)"""
+        # ✅ lazy submission (ไม่ต้องใช้ object จาก listing - ดึงซ้ำข้ามรอบได้)
+        submission = await reddit.submission(post_id, fetch=False)
+        
+        # ดึง comments มากสุด 100 ตัว (ลดลงเพื่อหลีกเลี่ยง rate limit)
+        # (ดึงไม่สำเร็จ → raise ให้ _comment_worker บันทึกว่าล้มเหลว - ส่งเข้าคิวใหม่ได้ในรอบถัดไป)
+        comments = await self.fetch_comments_for_post(submission, max_comments=100, raise_errors=True)
+        if not comments:
+            # ✅ ดึงสำเร็จแต่ไม่มี comment ที่ใช้ได้ (ถูกลบหมด) → บันทึกว่าดึงแล้ว ไม่ส่งเข้าคิวซ้ำจนกว่าจะโตขึ้น
+            self.comment_queue.mark_fetched(post_id, num_comments, 0)
+            return
         
-        if len(all_posts) == 0:
-            print(f"   💡 Tip: อาจจะไม่มี posts ใหม่ในช่วงเวลาที่กำหนด หรือ Reddit API rate limit")
+        await self.save_comments_immediately(post_id, comments, valid_tickers, source='reddit', show_progress=False)
+        self.comment_queue.mark_fetched(post_id, num_comments, len(comments))
         
-        return all_posts
+        if post is not None:
+            post["comments_fetched"] = max(post.get("comments_fetched", 0), len(comments))
+            post["comments_saved"] = True
+        # post ที่บันทึกไปแล้วในรอบก่อน (ดึงซ้ำ) → อัปเดตจำนวน comments
+        if db is not None:
+            try:
+                getattr(db, get_collection_name('reddit')).update_one(
+                    {"id": post_id},
+                    {"$max": {"comments_fetched": len(comments), "comments_count": len(comments)}}
+                )
+            except Exception:
+                pass
     
-    async def fetch_comments_for_post(self, submission, max_comments: int = 100) -> List[Dict]:
+    async def fetch_comments_for_post(self, submission, max_comments: int = 100,
+                                      raise_errors: bool = False) -> List[Dict]:
         """
         ดึง comments จาก Reddit post (ไม่วิเคราะห์ sentiment ตอนดึง - จะวิเคราะห์ทีหลัง)
         
         Args:
             submission: Reddit submission object
             max_comments: จำนวน comments สูงสุดที่ดึง (default: 100)
+            raise_errors: ส่ง exception ต่อแทนการคืน list ว่าง (แยก "ไม่มี comments" ออกจาก "ดึงไม่สำเร็จ")
             
         Returns:
             List of comments (ยังไม่วิเคราะห์ sentiment)
         """
         comments = []
         try:
+            # ✅ rate limit ของ Reddit อยู่ที่ RateLimitedRequestor (ทุก HTTP request ใช้ token ของ Reddit)
             # ✅ ต้อง load submission ก่อนเข้าถึง comments
             await submission.load()
             
@@ -438,10 +523,13 @@ class RedditBulkProcessor:
                 comment_count += 1
                 
         except Exception as e:
+            if raise_errors:
+                raise
             # ถ้าเกิด error ในการดึง comments → ข้าม (ไม่ให้กระทบการดึง posts)
             error_msg = str(e)
             # ✅ ตรวจสอบว่าเป็น rate limit error หรือไม่
             if "429" in error_msg or "rate limit" in error_msg.lower():
+                # (RateLimitedRequestor แจ้ง limiter ไปแล้ว - หยุดตาม Retry-After และลด rate ของ Reddit)
                 print(f"   ⚠️  Rate limit hit for post {submission.id if hasattr(submission, 'id') else 'unknown'}: skipping comments")
             else:
                 print(f"   ⚠️  Error fetching comments for post {submission.id if hasattr(submission, 'id') else 'unknown'}: {error_msg}")
@@ -528,22 +616,11 @@ class RedditBulkProcessor:
             else:
                 # ถ้าไม่มี valid_tickers หรือ body ว่าง → extract แบบง่าย
                 if comment_body.strip():
-                    dollar_pattern = re.compile(r'\$([A-Z]{1,5})\b')
-                    comment_symbols = set(dollar_pattern.findall(comment_body.upper()))
+                    comment_symbols = set(self.ticker_extractor.extract_dollar(comment_body))
                 else:
                     comment_symbols = set()
             
-            # ✅ วิเคราะห์ sentiment
-            comment_sentiment = {}
-            if comment_body.strip():
-                try:
-                    comment_sentiment = self.sentiment_analyzer.analyze(comment_body)
-                except Exception:
-                    comment_sentiment = {"compound": 0.0, "pos": 0.0, "neu": 1.0, "neg": 0.0}
-            else:
-                # ถ้า body ว่าง → neutral sentiment
-                comment_sentiment = {"compound": 0.0, "pos": 0.0, "neu": 1.0, "neg": 0.0}
-            
+            # ✅ sentiment วิเคราะห์ทีเดียวทั้ง batch หลัง loop (ถ้า body ว่าง → neutral sentiment)
             normalized_comment = {
                 "id": comment_id,
                 "post_id": post_id,
@@ -551,7 +628,7 @@ class RedditBulkProcessor:
                 "score": comment.get('score', 0),
                 "author": comment.get('author', '[deleted]'),
                 "created_utc": comment.get('created_utc'),
-                "sentiment": comment_sentiment,
+                "sentiment": {"compound": 0.0, "pos": 0.0, "neu": 1.0, "neg": 0.0},
                 "is_submitter": comment.get('is_submitter', False),
                 "parent_id": comment.get('parent_id'),
                 "fetched_at": datetime.utcnow(),
@@ -561,6 +638,9 @@ class RedditBulkProcessor:
             normalized_comments.append(normalized_comment)
             existing_comment_ids.add(comment_id)  # ป้องกัน duplicates
         
+        # ✅ วิเคราะห์ sentiment ทั้ง batch ใน worker pool (ไม่บล็อก event loop)
+        await self._score_comments(normalized_comments)
+        
         # ✅ Bulk insert comments
         if normalized_comments:
             try:
@@ -669,21 +749,46 @@ class RedditBulkProcessor:
         Returns:
             Sentiment dictionary
         """
-        text = f"{post.get('title', '')} {post.get('selftext', '')}".strip()
+        text = self._post_text(post)
         if not text:
-            return {
-                "compound": 0.0,
-                "positive": 0.0,
-                "negative": 0.0,
-                "neutral": 1.0,
-                "label": "neutral"
-            }
+            return self._empty_post_sentiment()
         
         # วิเคราะห์ sentiment (ครั้งเดียว)
         sentiment = self.sentiment_analyzer.analyze(text)
         
         return sentiment
     
+    @staticmethod
+    def _post_text(post: Dict) -> str:
+        """ข้อความของ post ที่ใช้วิเคราะห์ sentiment (title + selftext)"""
+        return f"{post.get('title', '')} {post.get('selftext', '')}".strip()
+    
+    @staticmethod
+    def _empty_post_sentiment() -> Dict:
+        return {
+            "compound": 0.0,
+            "positive": 0.0,
+            "negative": 0.0,
+            "neutral": 1.0,
+            "label": "neutral"
+        }
+    
+    async def _score_comments(self, normalized_comments: List[Dict]):
+        """
+        วิเคราะห์ sentiment ของ comments ทั้ง batch ผ่าน sentiment_pool
+        (comments ที่ body ว่างคง sentiment เดิมไว้)
+        """
+        targets = [c for c in normalized_comments if (c.get('body') or '').strip()]
+        if not targets:
+            return
+        try:
+            sentiments = await sentiment_pool.score_many([c['body'] for c in targets])
+        except Exception as e:
+            print(f"   ⚠️  Error scoring comments: {e}")
+            return
+        for comment, sentiment in zip(targets, sentiments):
+            comment['sentiment'] = sentiment
+    
     async def process_bulk_posts(self, posts: List[Dict], valid_tickers: Set[str]) -> Dict[str, List[Dict]]:
         """
         Process posts แบบ bulk:
@@ -702,16 +807,22 @@ class RedditBulkProcessor:
         processed_posts = []  # สำหรับบันทึกลง database
         
         posts_without_tickers = 0
+        posts_with_symbols = []  # [(post, symbols)]
+        
+        # Extract tickers (รวม comments ด้วย - comments อาจมี tickers!)
+        texts = []
         for post in posts:
-            # Extract tickers (รวม comments ด้วย - comments อาจมี tickers!)
             text = f"{post.get('title', '')} {post.get('selftext', '')}"
             # ✅ เพิ่ม comments text เพื่อ extract tickers จาก comments ด้วย
             comments = post.get('comments', [])
             if comments:
                 comments_text = ' '.join([c.get('body', '') for c in comments])
                 text += ' ' + comments_text
-            symbols = self.extract_tickers(text, valid_tickers)
-            
+            texts.append(text)
+        # ✅ batch extraction (ข้อความซ้ำ extract ครั้งเดียว)
+        symbols_per_post = self.ticker_extractor.extract_many(texts, valid_tickers)
+        
+        for post, text, symbols in zip(posts, texts, symbols_per_post):
             # ✅ Debug: แสดงตัวอย่าง extraction (เฉพาะ 3 ตัวแรก)
             if posts_without_tickers < 3 and not symbols:
                 sample_text = text[:150]
@@ -721,8 +832,19 @@ class RedditBulkProcessor:
                 posts_without_tickers += 1
                 continue  # ข้าม post ที่ไม่มี ticker
             
-            # วิเคราะห์ sentiment ของ post
-            post_sentiment = self.analyze_post_sentiment(post)
+            posts_with_symbols.append((post, symbols))
+        
+        # ✅ วิเคราะห์ sentiment ของทุก post ที่มี ticker ใน worker pool ทีเดียว (ไม่บล็อก event loop)
+        post_texts = [self._post_text(post) for post, _ in posts_with_symbols]
+        try:
+            post_sentiments = await sentiment_pool.score_many(post_texts)
+        except Exception as e:
+            print(f"   ⚠️  Sentiment pool error, scoring in-process: {e}")
+            post_sentiments = [self.sentiment_analyzer.analyze(text) for text in post_texts]
+        
+        for (post, symbols), text, post_sentiment in zip(posts_with_symbols, post_texts, post_sentiments):
+            if not text:
+                post_sentiment = self._empty_post_sentiment()
             
             # ✅ ใช้ post sentiment ธรรมดา (ไม่รวม comments เพราะ comments ยังไม่วิเคราะห์ sentiment)
             # Comments จะถูกวิเคราะห์ sentiment ตอนบันทึกลง database
@@ -812,21 +934,11 @@ class RedditBulkProcessor:
         normalized_posts = []
         normalized_comments = []
         
-        # ✅ ใช้ distinct แบบมี limit เพื่อให้เร็วขึ้น (ตรวจสอบเฉพาะ 10000 posts ล่าสุด)
-        try:
-            recent_posts = list(post_collection.find(
-                {},
-                {"id": 1},
-                sort=[("created_utc", -1)],
-                limit=10000
-            ))
-            existing_post_ids = {p.get("id") for p in recent_posts if p.get("id")}
-        except Exception:
-            existing_post_ids = set(post_collection.distinct("id"))
+        # ✅ ไม่ prefetch post ids ที่มีอยู่แล้ว - duplicates ถูกกันด้วย unique index ของ id + upsert ($setOnInsert)
         
         # ✅ ตรวจสอบ comment IDs ที่มีอยู่แล้ว (เพื่อหลีกเลี่ยง duplicates)
         existing_comment_ids = set()
-        if comment_collection:
+        if comment_collection is not None:
             try:
                 recent_comments = list(comment_collection.find(
                     {},
@@ -865,13 +977,10 @@ class RedditBulkProcessor:
                         comment_symbols = self.extract_tickers(comment_body, valid_tickers)
                     else:
                         # ถ้าไม่มี valid_tickers → extract แบบง่าย (หา $SYMBOL pattern)
-                        dollar_pattern = re.compile(r'\$([A-Z]{1,5})\b')
-                        comment_symbols = set(dollar_pattern.findall(comment_body.upper()))
+                        comment_symbols = set(self.ticker_extractor.extract_dollar(comment_body))
                     
-                    # ✅ วิเคราะห์ sentiment ตอนบันทึกลง database (ไม่ใช่ตอนดึง)
+                    # ✅ วิเคราะห์ sentiment ตอนบันทึกลง database (ไม่ใช่ตอนดึง) - ทั้ง batch หลัง loop
                     comment_sentiment = {}
-                    if comment_body.strip():
-                        comment_sentiment = self.sentiment_analyzer.analyze(comment_body)
                     
                     normalized_comment = {
                         "id": comment_id,
@@ -894,10 +1003,6 @@ class RedditBulkProcessor:
                 if len(normalized_comments) > 0 and len(normalized_comments) % 100 == 0:
                     print(f"   🔍 Debug: เตรียม {len(normalized_comments)} comments แล้ว...")
             
-            # ✅ ตรวจสอบว่ามี post อยู่แล้วหรือยัง
-            if post_id in existing_post_ids:
-                continue
-            
             # Normalize post (ไม่เก็บ comments array)
             first_symbol = post.get('symbols', [])[0] if post.get('symbols') else ''
             normalized = normalize_post(post, 'reddit', first_symbol)
@@ -917,23 +1022,25 @@ class RedditBulkProcessor:
             normalized['sentiment'] = post.get('sentiment', {})
             normalized_posts.append(normalized)
         
-        # ✅ Bulk insert posts
+        # ✅ Bulk upsert posts (unordered) - post ที่มีอยู่แล้วไม่ถูกแก้ ($setOnInsert)
+        new_posts = []  # posts ที่ถูกบันทึกใหม่จริง (สำหรับอัปเดต ticker_mentions rollup)
         if normalized_posts:
+            operations = [UpdateOne({"id": post['id']}, {"$setOnInsert": post}, upsert=True)
+                          for post in normalized_posts]
             try:
-                post_collection.insert_many(normalized_posts, ordered=False)
-            except Exception:
-                # ถ้า insert_many ล้มเหลว → insert ทีละตัว
-                saved_posts = 0
-                for post in normalized_posts:
-                    try:
-                        post_collection.update_one(
-                            {"id": post['id']},
-                            {"$set": post},
-                            upsert=True
-                        )
-                        saved_posts += 1
-                    except Exception:
-                        continue
+                result = post_collection.bulk_write(operations, ordered=False)
+                upserted_indexes = result.upserted_ids.keys()
+            except BulkWriteError as e:
+                # duplicate key จาก upsert ที่ชนกันพร้อมกัน (post ถูกบันทึกโดย process อื่นแล้ว) → ข้าม
+                upserted_indexes = [item['index'] for item in e.details.get('upserted', [])]
+            except Exception as e:
+                print(f"   ⚠️  Error saving posts: {e}")
+                raise
+            new_posts = [normalized_posts[i] for i in sorted(upserted_indexes)]
+        
+        # ✅ อัปเดต rollup ของ ticker mentions ($inc เฉพาะ posts ใหม่)
+        if new_posts:
+            mention_rollup.record_posts(new_posts, source)
         
         # ✅ Bulk insert comments
         # ✅ ตรวจสอบว่า collection ถูกสร้างหรือไม่
@@ -951,6 +1058,8 @@ class RedditBulkProcessor:
                 comment_collection = None
         
         if normalized_comments and comment_collection:
+            # ✅ วิเคราะห์ sentiment ของ comments ทั้ง batch ใน worker pool
+            await self._score_comments(normalized_comments)
             try:
                 comment_collection.insert_many(normalized_comments, ordered=False)
             except Exception:
@@ -967,12 +1076,13 @@ class RedditBulkProcessor:
                     except Exception:
                         continue
     
-    async def run_bulk_fetch(self, valid_tickers: Optional[Set[str]] = None) -> Dict:
+    async def run_bulk_fetch(self, valid_tickers: Optional[Set[str]] = None, reddit=None) -> Dict:
         """
         รัน bulk fetch process
         
         Args:
             valid_tickers: Set of valid ticker symbols (ถ้า None จะดึงจาก database)
+            reddit: Reddit instance ที่ใช้ร่วมกันข้ามรอบ (จาก reddit_bulk_scheduler)
             
         Returns:
             Dictionary with results
@@ -1005,6 +1115,7 @@ class RedditBulkProcessor:
             # ✅ ถ้ายังไม่มี database ให้ดึงย้อนหลัง 2 ชั่วโมง (ไม่ใช่ 7 วัน)
             self.last_fetched_at = datetime.utcnow() - timedelta(hours=2)
         
+        # ✅ subreddits ที่มี watermark แล้วหยุดที่ post แรกที่รู้จัก - since ใช้กับ subreddit ที่ยังไม่เคยดึงเท่านั้น
         # ✅ ดึง posts ใหม่ - ตรวจสอบว่า last_fetched_at เก่าแค่ไหน
         # ถ้าเก่าเกิน 2 ชั่วโมง (ระบบปิดไป) → ดึงย้อนหลังให้ครอบคลุมช่วงที่ปิดไป
         # ถ้าไม่เก่า (ดึงทุก 30 วินาที) → ดึงแค่ posts ที่ใหม่กว่า last_fetched_at
@@ -1024,9 +1135,10 @@ class RedditBulkProcessor:
         else:
             # ✅ ครั้งแรก (ยังไม่มี last_fetched_at) → ดึงย้อนหลัง 2 ชั่วโมง
             since_time = now - timedelta(hours=2)
-        posts = await self.fetch_new_posts_bulk(since=since_time, valid_tickers=valid_tickers)
+        posts = await self.fetch_new_posts_bulk(since=since_time, valid_tickers=valid_tickers, reddit=reddit)
         
         if not posts:
+            self.watermarks.commit()
             return {
                 "posts_fetched": 0,
                 "posts_processed": 0,
@@ -1073,7 +1185,13 @@ class RedditBulkProcessor:
         print(f"   🔍 Debug: processed_posts = {len(processed_posts)}, total comments in posts = {total_comments_in_processed}")
         
         # บันทึกลง database (ใช้ source='reddit' สำหรับ Reddit bulk processor)
-        await self.save_to_database(processed_posts, valid_tickers, source='reddit')
+        try:
+            await self.save_to_database(processed_posts, valid_tickers, source='reddit')
+        except Exception:
+            # ✅ บันทึกไม่สำเร็จ → ไม่ขยับ watermark (รอบถัดไปดึงช่วงเดิมซ้ำ)
+            self.watermarks.discard()
+            raise
+        self.watermarks.commit()
         
         # ✅ นับจำนวน comments ที่บันทึกได้
         from utils.post_normalizer import get_comment_collection_name
@@ -1081,7 +1199,7 @@ class RedditBulkProcessor:
         total_comments_saved = 0
         if db is not None and comment_collection_name in db.list_collection_names():
             comment_collection = getattr(db, comment_collection_name)
-            if comment_collection:
+            if comment_collection is not None:
                 # นับ comments ที่บันทึกในรอบนี้ (ประมาณจาก posts ที่บันทึก)
                 try:
                     # นับ comments จาก posts ที่เพิ่งบันทึก (ใช้ post_id จาก processed_posts)
@@ -0,0 +1,185 @@
+"""
+Reddit Comment Queue
+คิวงานดึง comments แยกจากการดึง listing ของ subreddits
+- listing แค่ส่ง post เข้าคิว (ไม่รอ comments) → ความสดของ posts ไม่ขึ้นกับจำนวน comments
+- priority ตาม score / จำนวน comments ใหม่ / มี ticker หรือไม่ (โพสต์ที่ร้อนถูกดึงก่อน)
+- ดึงซ้ำเมื่อ comments ของโพสต์เพิ่มขึ้นพอ (โพสต์ร้อนที่ยังโตอยู่)
+- ข้ามโพสต์ที่จำนวน comments หยุดเปลี่ยน
+- คิวอยู่ข้ามรอบ (งานที่ค้างเมื่อหมดเวลา drain จะถูกดึงในรอบถัดไป)
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+TICKER_BONUS = 3.0  # priority เพิ่มเมื่อ post มี ticker
+
+
+class RedditCommentQueue:
+    """
+    Priority queue ของ posts ที่ต้องดึง comments
+
+    Args:
+        max_size: จำนวน posts ที่รอในคิวได้สูงสุด (เต็ม → แทนที่ตัวที่ priority ต่ำสุด)
+        min_growth: จำนวน comments ใหม่ขั้นต่ำก่อนดึงซ้ำ
+        growth_ratio: สัดส่วน comments ใหม่ขั้นต่ำ (เทียบกับที่ดึงไปแล้ว) ก่อนดึงซ้ำ
+        min_refetch_seconds: เวลาขั้นต่ำระหว่างการดึงซ้ำของ post เดียวกัน
+        track_hours: จำสถานะของ post กี่ชั่วโมง (หลังจากนั้นถือว่าไม่ร้อนแล้ว - ไม่ดึงซ้ำ)
+    """
+
+    def __init__(self, max_size: int = 5000, min_growth: int = 5, growth_ratio: float = 0.2,
+                 min_refetch_seconds: float = 120, track_hours: float = 24):
+        self.max_size = max_size
+        self.min_growth = min_growth
+        self.growth_ratio = growth_ratio
+        self.min_refetch_seconds = min_refetch_seconds
+        self.track_seconds = track_hours * 3600
+        self._heap = []  # (-priority, seq, post_id) - pop งานที่ priority สูงสุด
+        self._min_heap = []  # (priority, seq, post_id) - หางานที่ priority ต่ำสุดตอนคิวเต็ม
+        self._pending: Dict[str, Tuple[float, int, Optional[Dict]]] = {}  # post_id → (priority, num_comments, post)
+        self._tracked: Dict[str, Dict] = {}  # post_id → {numComments, fetchedAt, stable}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"offered": 0, "enqueued": 0, "refetches": 0, "skippedStable": 0, "skippedRecent": 0,
+                      "skippedEmpty": 0, "evicted": 0, "fetched": 0, "commentsFetched": 0, "failed": 0}
+
+    @staticmethod
+    def priority(score: int, new_comments: int, has_ticker: bool) -> float:
+        """score และจำนวน comments ใหม่ (log scale) + bonus ถ้ามี ticker"""
+        return (math.log1p(max(score or 0, 0)) + 2 * math.log1p(max(new_comments, 0))
+                + (TICKER_BONUS if has_ticker else 0.0))
+
+    def offer(self, post_id: str, num_comments: int, score: int = 0, has_ticker: bool = False,
+              post: Optional[Dict] = None) -> bool:
+        """
+        เสนอ post เข้าคิว (จาก listing)
+
+        Args:
+            post_id: Reddit post ID
+            num_comments: จำนวน comments ตาม listing
+            score: score ของ post
+            has_ticker: title/selftext มี ticker หรือไม่
+            post: dict ของ post ในรอบนี้ (worker จะเติม comments_fetched / comments_saved ให้)
+
+        Returns:
+            True ถ้าเข้าคิว (หรืออัปเดต priority ของงานที่รออยู่)
+        """
+        now = time.time()
+        with self._lock:
+            self.stats["offered"] += 1
+            if not num_comments:
+                self.stats["skippedEmpty"] += 1
+                return False
+
+            tracked = self._tracked.get(post_id)
+            new_comments = num_comments
+            if tracked is not None:
+                new_comments = num_comments - tracked["numComments"]
+                if new_comments < max(self.min_growth, tracked["numComments"] * self.growth_ratio):
+                    # ✅ จำนวน comments หยุดเปลี่ยน (หรือโตน้อย) → ไม่ดึงซ้ำ
+                    tracked["stable"] += 1
+                    self.stats["skippedStable"] += 1
+                    return False
+                if now - tracked["fetchedAt"] < self.min_refetch_seconds:
+                    self.stats["skippedRecent"] += 1
+                    return False
+
+            priority = self.priority(score, new_comments, has_ticker)
+            if post_id not in self._pending and len(self._pending) >= self.max_size:
+                # ✅ คิวเต็ม → แทนที่งานที่ priority ต่ำสุด (ถ้างานใหม่สำคัญกว่า)
+                lowest_id = self._lowest_pending()
+                if self._pending[lowest_id][0] >= priority:
+                    self.stats["evicted"] += 1
+                    return False
+                del self._pending[lowest_id]
+                heapq.heappop(self._min_heap)
+                self.stats["evicted"] += 1
+
+            # งานเดิมใน heap ถูกข้ามตอน pop (priority ไม่ตรงกับ _pending)
+            self._pending[post_id] = (priority, num_comments, post)
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (-priority, seq, post_id))
+            heapq.heappush(self._min_heap, (priority, seq, post_id))
+            self.stats["enqueued"] += 1
+            if tracked is not None:
+                self.stats["refetches"] += 1
+            return True
+
+    def _lowest_pending(self) -> str:
+        """post_id ที่ priority ต่ำสุดในคิว (ทิ้ง entries เก่าบนยอด min heap - ต้องถือ _lock และคิวไม่ว่าง)"""
+        while True:
+            priority, _, post_id = self._min_heap[0]
+            entry = self._pending.get(post_id)
+            if entry is not None and entry[0] == priority:
+                return post_id
+            heapq.heappop(self._min_heap)
+
+    def pop(self) -> Optional[Tuple[str, int, Optional[Dict]]]:
+        """
+        งานที่ priority สูงสุด
+
+        Returns:
+            (post_id, num_comments, post) หรือ None ถ้าคิวว่าง
+        """
+        with self._lock:
+            while self._heap:
+                neg_priority, _, post_id = heapq.heappop(self._heap)
+                entry = self._pending.get(post_id)
+                if entry is None or entry[0] != -neg_priority:
+                    continue  # ถูกแทนที่ด้วย priority ใหม่ หรือถูกทิ้งไปแล้ว
+                del self._pending[post_id]
+                return post_id, entry[1], entry[2]
+            return None
+
+    def mark_fetched(self, post_id: str, num_comments: int, fetched_count: Optional[int]):
+        """
+        บันทึกผลการดึง comments
+
+        Args:
+            post_id: Reddit post ID
+            num_comments: จำนวน comments ตอนส่งเข้าคิว
+            fetched_count: จำนวน comments ที่ดึงได้ (0 = ไม่มี comment ที่ใช้ได้ - ไม่ดึงซ้ำจนกว่าจะโตขึ้น,
+                None = ดึงไม่สำเร็จ - ส่งเข้าคิวใหม่ได้)
+        """
+        with self._lock:
+            if fetched_count is None:
+                self.stats["failed"] += 1
+                return
+            self.stats["fetched"] += 1
+            self.stats["commentsFetched"] += fetched_count
+            tracked = self._tracked.setdefault(post_id, {"numComments": 0, "fetchedAt": 0.0, "stable": 0})
+            tracked["numComments"] = num_comments
+            tracked["fetchedAt"] = time.time()
+            tracked["stable"] = 0
+
+    def prune(self):
+        """ลืม posts ที่ดึงครั้งล่าสุดนานเกิน track_hours (จำกัด memory)"""
+        cutoff = time.time() - self.track_seconds
+        with self._lock:
+            for post_id in [pid for pid, t in self._tracked.items() if t["fetchedAt"] < cutoff]:
+                del self._tracked[post_id]
+            # ✅ ลบ entries เก่าใน heaps (ถูกแทนที่/ทิ้งไปแล้ว)
+            if max(len(self._heap), len(self._min_heap)) > 2 * len(self._pending):
+                entries = [(priority, next(self._seq), post_id)
+                           for post_id, (priority, _, _) in self._pending.items()]
+                self._heap = [(-priority, seq, post_id) for priority, seq, post_id in entries]
+                self._min_heap = entries
+                heapq.heapify(self._heap)
+                heapq.heapify(self._min_heap)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "pending": len(self._pending), "tracked": len(self._tracked)}
+
+
+# Global instance (คิวอยู่ข้ามรอบของ reddit_bulk_scheduler)
+reddit_comment_queue = RedditCommentQueue(
+    max_size=int(os.getenv("REDDIT_COMMENT_QUEUE_SIZE", 5000)),
+    min_growth=int(os.getenv("REDDIT_COMMENT_MIN_GROWTH", 5))
+)
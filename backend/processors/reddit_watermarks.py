@@ -0,0 +1,142 @@
+"""
+Reddit Watermarks
+high-water mark ต่อ subreddit (post ใหม่สุดที่เคยดึงแล้ว) สำหรับ sweep แบบ incremental
+- listing /new หยุดที่ post แรกที่รู้จักแล้ว (fullname ตรงกัน หรือเก่ากว่า created_utc ของ watermark)
+  แทนการนับ skipped_old แบบ heuristic
+- stage() ระหว่าง sweep → commit() หลังบันทึก posts ลง database แล้ว
+  (ถ้า process ตายกลางทาง watermark ไม่ขยับ → รอบถัดไปดึงช่วงเดิมซ้ำ, duplicates ถูกกันด้วย unique index)
+- gap: ช่วงที่ sweep ชน max_posts ก่อนถึง watermark เดิม → sweep ถัดไปดึงต่อจาก afterId จนถึง untilId
+  (watermark ขยับไป post ใหม่สุดได้โดยไม่ข้ามช่วงที่ยังไม่ได้ดึง)
+
+เก็บใน collection reddit_watermarks (หรือ local file ถ้าไม่มี database)
+
+Document:
+    {_id: subreddit (ตัวพิมพ์เล็ก), newestId: "t3_xxx", newestCreatedUtc: epoch seconds,
+     gap: {afterId, untilId, untilCreatedUtc} หรือ None, updatedAt}
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+
+from database.db_config import db
+
+COLLECTION_NAME = "reddit_watermarks"
+JOURNAL_PATH = Path(__file__).parent.parent / "data" / "reddit_watermarks.json"
+
+
+class RedditWatermarks:
+    """
+    Watermarks ของทุก subreddit (โหลดครั้งเดียว แล้วเก็บใน memory)
+
+    Args:
+        collection_name: ชื่อ collection ที่เก็บ watermarks
+        journal_path: ไฟล์ที่ใช้แทน database (ถ้า db เป็น None)
+    """
+
+    def __init__(self, collection_name: str = COLLECTION_NAME, journal_path: Path = JOURNAL_PATH):
+        self.collection_name = collection_name
+        self.journal_path = Path(journal_path)
+        self._marks: Optional[Dict[str, Dict]] = None
+        self._staged: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _get_collection(self):
+        if db is None:
+            return None
+        return getattr(db, self.collection_name)
+
+    def _load(self) -> Dict[str, Dict]:
+        """โหลด watermarks ทั้งหมด (ครั้งแรกที่ใช้) - เรียกตอนถือ _lock"""
+        if self._marks is not None:
+            return self._marks
+        self._marks = {}
+        collection = self._get_collection()
+        if collection is not None:
+            try:
+                for doc in collection.find({}):
+                    self._marks[doc["_id"]] = {"newestId": doc.get("newestId"),
+                                               "newestCreatedUtc": doc.get("newestCreatedUtc"),
+                                               "gap": doc.get("gap")}
+            except Exception as e:
+                print(f"⚠️ Error loading Reddit watermarks: {e}")
+            return self._marks
+
+        try:
+            if self.journal_path.exists():
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    self._marks = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Error reading Reddit watermarks file: {e}")
+        return self._marks
+
+    def get(self, subreddit: str) -> Optional[Dict]:
+        """
+        watermark ของ subreddit
+
+        Returns:
+            {newestId, newestCreatedUtc, gap} หรือ None ถ้ายังไม่เคยดึง
+        """
+        with self._lock:
+            return self._load().get(subreddit.lower())
+
+    def stage(self, subreddit: str, newest_id: str, newest_created_utc: float, gap: Optional[Dict] = None):
+        """
+        เก็บ post ใหม่สุดของ sweep นี้ไว้ก่อน (ยังไม่บันทึกจนกว่าจะ commit)
+
+        Args:
+            gap: ช่วงที่ยังดึงไม่ครบ {afterId, untilId, untilCreatedUtc} (None = ดึงครบแล้ว)
+        """
+        key = subreddit.lower()
+        with self._lock:
+            current = self._staged.get(key) or self._load().get(key) or {}
+            mark = {"newestId": current.get("newestId"), "newestCreatedUtc": current.get("newestCreatedUtc"),
+                    "gap": gap}
+            if (current.get("newestCreatedUtc") or 0) <= newest_created_utc:
+                mark.update(newestId=newest_id, newestCreatedUtc=newest_created_utc)
+            self._staged[key] = mark
+
+    def commit(self):
+        """บันทึก watermarks ที่ stage ไว้ (เรียกหลัง save_to_database สำเร็จ)"""
+        with self._lock:
+            staged, self._staged = self._staged, {}
+            if not staged:
+                return
+            marks = self._load()
+            marks.update(staged)
+            snapshot = dict(marks)
+
+        collection = self._get_collection()
+        if collection is not None:
+            now = datetime.utcnow()
+            try:
+                collection.bulk_write([
+                    UpdateOne({"_id": key}, {"$set": {**mark, "updatedAt": now}}, upsert=True)
+                    for key, mark in staged.items()
+                ], ordered=False)
+            except Exception as e:
+                print(f"⚠️ Error saving Reddit watermarks: {e}")
+            return
+
+        # ✅ เขียนไฟล์ชั่วคราวแล้ว rename (ไฟล์ไม่เสียถ้า process ตายกลางทาง)
+        try:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.journal_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.journal_path)
+        except OSError as e:
+            print(f"⚠️ Error writing Reddit watermarks file: {e}")
+
+    def discard(self):
+        """ทิ้ง watermarks ที่ stage ไว้ (บันทึก posts ไม่สำเร็จ)"""
+        with self._lock:
+            self._staged = {}
+
+
+# Global instance
+reddit_watermarks = RedditWatermarks()
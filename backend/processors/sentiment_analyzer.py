@@ -4,11 +4,73 @@ Uses VADER (Valence Aware Dictionary and sEntiment Reasoner) for financial senti
 """
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from datetime import datetime, timedelta
+from processors.sentiment_cache import sentiment_memo
+import numpy as np
+import hashlib
 import re
-import math
+
+try:
+    import ahocorasick  # pyahocorasick (optional) - จับ booster phrases ทั้งหมดในรอบเดียว
+except ImportError:
+    ahocorasick = None
+
+# เปลี่ยนเมื่อ logic ของ analyze() เปลี่ยน เพื่อไม่ให้ใช้ผลที่ memo ไว้จาก version เก่า
+ANALYZER_VERSION = "vader-financial-1"
+
+# ✅ compile ครั้งเดียวตอน import (ใช้ทั้ง analyze และ batch API)
+URL_PATTERN = re.compile(r'http\S+')
+SPECIAL_CHARS_PATTERN = re.compile(r'[^\w\s]')
+
+NEUTRAL_SCORES = {'neg': 0.0, 'neu': 1.0, 'pos': 0.0, 'compound': 0.0}
+
+
+def clean_text(text):
+    """ลบ URLs และอักขระพิเศษ (ขั้นตอนเดียวกับ analyze)"""
+    return SPECIAL_CHARS_PATTERN.sub(' ', URL_PATTERN.sub('', text))
+
+
+def sentiment_label(compound):
+    """แปลง compound เป็น label (threshold ±0.05)"""
+    if compound >= 0.05:
+        return 'positive'
+    if compound <= -0.05:
+        return 'negative'
+    return 'neutral'
+
+
+class BoosterMatcher:
+    """
+    หา financial booster terms ที่อยู่ในข้อความ (substring match เหมือนเดิม แต่ละ term นับครั้งเดียว)
+    ใช้ Aho-Corasick automaton ถ้ามี pyahocorasick ไม่เช่นนั้นใช้ substring scan (C-level) ต่อ term
+    """
+
+    def __init__(self, boosters):
+        self.boosters = dict(boosters)
+        self._terms = tuple(self.boosters.items())
+        self._automaton = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for term, boost in self._terms:
+                automaton.add_word(term, (term, boost))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def total_boost(self, text_lower):
+        """ผลรวม boost ของ terms ที่พบใน text_lower"""
+        if self._automaton is not None:
+            found = {}
+            for _, (term, boost) in self._automaton.iter(text_lower):
+                found[term] = boost
+            return sum(found.values())
+        return sum(boost for term, boost in self._terms if term in text_lower)
 
 class SentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, memo=None, use_memo=True):
+        """
+        Args:
+            memo: SentimentMemoCache (default: sentiment_memo ที่ใช้ร่วมกันทั้ง process)
+            use_memo: ถ้า False จะวิเคราะห์ใหม่ทุกครั้ง
+        """
         self.analyzer = SentimentIntensityAnalyzer()
         # Financial-specific words that might affect sentiment
         # เพิ่ม boosters เพื่อให้ sentiment สามารถเกิน ±1.0 ได้ (รองรับ -500% ถึง +500%)
@@ -34,6 +96,13 @@ class SentimentAnalyzer:
             'bull market': 1.5,  # เพิ่มใหม่
             'bear market': -1.5  # เพิ่มใหม่
         }
+        
+        self.booster_matcher = BoosterMatcher(self.financial_boosters)
+        
+        # ✅ memo ผลของ analyze() (key = hash ของ cleaned text + version ของ analyzer/boosters)
+        self.memo = (memo if memo is not None else sentiment_memo) if use_memo else None
+        boosters_hash = hashlib.sha1(repr(sorted(self.financial_boosters.items())).encode()).hexdigest()[:12]
+        self.version = f"{ANALYZER_VERSION}:{boosters_hash}"
     
     def analyze(self, text):
         """
@@ -55,36 +124,86 @@ class SentimentAnalyzer:
                 'label': 'neutral'
             }
         
-        # Clean text
-        text = re.sub(r'http\S+', '', text)  # Remove URLs
-        text = re.sub(r'[^\w\s]', ' ', text)  # Remove special chars
+        # Clean text (remove URLs + special chars)
+        text = clean_text(text)
         
+        # ✅ ใช้ผลที่เคยวิเคราะห์แล้ว (ข้อความเดียวกันถูกวิเคราะห์ซ้ำบ่อย)
+        memo_key = None
+        if self.memo is not None:
+            memo_key = self.memo.make_key(text, self.version)
+            cached = self.memo.get(memo_key)
+            if cached is not None:
+                return cached
+        
+        scores = self._score_cleaned(text)
+        
+        if memo_key is not None:
+            self.memo.set(memo_key, scores)
+        return scores
+    
+    def _score_cleaned(self, text):
+        """วิเคราะห์ข้อความที่ clean แล้ว (VADER + financial boosters)"""
         # Get base sentiment
         scores = self.analyzer.polarity_scores(text)
         
         # Boost for financial terms
         # อนุญาตให้ sentiment เกิน ±1.0 เพื่อรองรับ -500% ถึง +500%
-        text_lower = text.lower()
-        base_compound = scores['compound']
-        
-        for term, boost in self.financial_boosters.items():
-            if term in text_lower:
-                base_compound += boost
+        base_compound = scores['compound'] + self.booster_matcher.total_boost(text.lower())
         
         # จำกัดที่ -5.0 ถึง +5.0 (รองรับ -500% ถึง +500%)
         scores['compound'] = max(-5.0, min(5.0, base_compound))
         
         # Determine label
-        if scores['compound'] >= 0.05:
-            label = 'positive'
-        elif scores['compound'] <= -0.05:
-            label = 'negative'
-        else:
-            label = 'neutral'
-        
-        scores['label'] = label
+        scores['label'] = sentiment_label(scores['compound'])
         return scores
     
+    def analyze_many(self, texts):
+        """
+        Batch API: วิเคราะห์หลายข้อความพร้อมกัน
+        - clean ด้วย regex ที่ compile ไว้แล้ว
+        - ข้อความซ้ำกันวิเคราะห์ครั้งเดียว (และใช้ memo ร่วมกับ analyze)
+        
+        Args:
+            texts: List/array ของข้อความ
+        
+        Returns:
+            {'compound', 'pos', 'neu', 'neg': np.ndarray (float), 'label': np.ndarray (str)}
+            ข้อความว่าง/ไม่ใช่ string → neutral (neu = 1.0)
+        """
+        n = len(texts)
+        compound = np.zeros(n)
+        pos = np.zeros(n)
+        neu = np.ones(n)
+        neg = np.zeros(n)
+        
+        # จัดกลุ่ม index ตาม cleaned text (ข้อความซ้ำวิเคราะห์ครั้งเดียว)
+        groups = {}
+        for i, text in enumerate(texts):
+            if text and isinstance(text, str):
+                groups.setdefault(clean_text(text), []).append(i)
+        
+        for cleaned, indexes in groups.items():
+            scores = None
+            memo_key = None
+            if self.memo is not None:
+                memo_key = self.memo.make_key(cleaned, self.version)
+                scores = self.memo.get(memo_key)
+            if scores is None:
+                scores = self._score_cleaned(cleaned)
+                if memo_key is not None:
+                    self.memo.set(memo_key, scores)
+            compound[indexes] = scores.get('compound', 0.0)
+            pos[indexes] = scores.get('pos', 0.0)
+            neu[indexes] = scores.get('neu', 1.0)
+            neg[indexes] = scores.get('neg', 0.0)
+        
+        labels = np.where(compound >= 0.05, 'positive', np.where(compound <= -0.05, 'negative', 'neutral'))
+        return {'compound': compound, 'pos': pos, 'neu': neu, 'neg': neg, 'label': labels}
+    
+    def get_memo_stats(self):
+        """สถิติ hit/miss ของ memo cache"""
+        return self.memo.get_stats() if self.memo is not None else {}
+    
     def analyze_batch(self, texts, use_time_weighting=False, items_with_dates=None, max_age_hours=168, recent_positive_override=True):
         """
         Analyze multiple texts and return aggregated sentiment
@@ -106,41 +225,32 @@ class SentimentAnalyzer:
         if use_time_weighting and items_with_dates:
             return self._analyze_batch_time_weighted(items_with_dates, max_age_hours=max_age_hours, recent_positive_override=recent_positive_override)
         
-        # Original simple averaging (backward compatible)
-        results = []
-        for text in texts:
-            try:
-                result = self.analyze(text)
-                if result and isinstance(result, dict):
-                    results.append(result)
-            except Exception as e:
-                print(f"⚠️ Error analyzing text: {e}")
-                continue
+        # Simple averaging (backward compatible) - วิเคราะห์ทั้ง batch แล้วเฉลี่ยด้วย NumPy
+        try:
+            results = self.analyze_many(list(texts))
+        except Exception as e:
+            print(f"⚠️ Error analyzing texts: {e}")
+            return None
         
-        if not results:
+        total = len(results['compound'])
+        if total == 0:
             return None
         
-        # Aggregate - use .get() to safely access keys
-        avg_compound = sum(r.get('compound', 0) for r in results) / len(results)
-        avg_positive = sum(r.get('positive', 0) for r in results) / len(results)
-        avg_neutral = sum(r.get('neutral', 0) for r in results) / len(results)
-        avg_negative = sum(r.get('negative', 0) for r in results) / len(results)
+        avg_compound = float(results['compound'].mean())
         
         # Count labels
+        labels, counts = np.unique(results['label'], return_counts=True)
         label_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
-        for r in results:
-            label = r.get('label', 'neutral')
-            if label in label_counts:
-                label_counts[label] += 1
+        label_counts.update({str(label): int(count) for label, count in zip(labels, counts)})
         
         return {
             'compound': avg_compound,
-            'positive': avg_positive,
-            'neutral': avg_neutral,
-            'negative': avg_negative,
-            'label': 'positive' if avg_compound >= 0.05 else ('negative' if avg_compound <= -0.05 else 'neutral'),
+            'positive': float(results['pos'].mean()),
+            'neutral': float(results['neu'].mean()),
+            'negative': float(results['neg'].mean()),
+            'label': sentiment_label(avg_compound),
             'counts': label_counts,
-            'total': len(results)
+            'total': total
         }
     
     def _analyze_batch_time_weighted(self, items_with_dates, half_life_hours=24, max_age_hours=168, recent_positive_override=True):
@@ -165,151 +275,112 @@ class SentimentAnalyzer:
             return None
         
         now = datetime.utcnow()
-        weighted_results = []
-        total_weight = 0
-        
-        # ตรวจสอบว่ามีข่าวบวกล่าสุด (ภายใน 24 ชั่วโมง) หรือไม่
-        recent_positive_news = False
-        if recent_positive_override:
-            for item in items_with_dates:
-                published_at = item.get('publishedAt')
-                if published_at:
-                    try:
-                        if isinstance(published_at, str):
-                            if 'T' in published_at:
-                                published_dt = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
-                            else:
-                                try:
-                                    published_dt = datetime.fromtimestamp(float(published_at))
-                                except:
-                                    continue
-                        elif isinstance(published_at, (int, float)):
-                            published_dt = datetime.fromtimestamp(published_at)
-                        else:
-                            continue
-                        
-                        age_hours = (now - published_dt.replace(tzinfo=None)).total_seconds() / 3600
-                        if 0 <= age_hours <= 24:  # ข่าวล่าสุด 24 ชั่วโมง
-                            text = item.get('text', '')
-                            if text:
-                                result = self.analyze(text)
-                                if result and result.get('compound', 0) > 0.3:  # ข่าวบวกที่ชัดเจน
-                                    recent_positive_news = True
-                                    break
-                    except:
-                        continue
         
+        # แปลง publishedAt เป็นอายุ (ชั่วโมง)
+        texts = []
+        ages = []
+        prescan_ages = []  # อายุที่ใช้ตรวจ "ข่าวบวกล่าสุด" (None = ไม่นับ เช่นไม่มีวันที่)
         for item in items_with_dates:
             text = item.get('text', '')
             if not text:
                 continue
             
-            # Parse publishedAt date
-            published_at = item.get('publishedAt')
-            if not published_at:
-                # ถ้าไม่มีวันที่ ให้ใช้เวลาปัจจุบัน (น้ำหนักเต็ม)
-                age_hours = 0
-            else:
-                try:
-                    # Handle different date formats
-                    if isinstance(published_at, str):
-                        # Try ISO format first
-                        if 'T' in published_at:
-                            published_dt = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
-                        else:
-                            # Try timestamp
-                            try:
-                                published_dt = datetime.fromtimestamp(float(published_at))
-                            except:
-                                published_dt = now
-                    elif isinstance(published_at, (int, float)):
-                        # Timestamp
-                        published_dt = datetime.fromtimestamp(published_at)
-                    else:
-                        published_dt = now
-                    
-                    # Calculate age in hours
-                    age_hours = (now - published_dt.replace(tzinfo=None)).total_seconds() / 3600
-                    if age_hours < 0:
-                        age_hours = 0  # Future dates = treat as now
-                except Exception as e:
-                    print(f"⚠️ Error parsing date {published_at}: {e}")
-                    age_hours = 0
+            age_hours, parsed = self._parse_age_hours(item.get('publishedAt'), now)
             
             # ตัดข่าวที่เก่ากว่า max_age_hours
-            if age_hours > max_age_hours:
+            if max(age_hours, 0) > max_age_hours:
                 continue  # ข้ามข่าวเก่าเกินไป
             
-            # Calculate exponential decay weight
-            # weight = 2^(-age_hours / half_life_hours)
-            # ข่าวใหม่ (0 ชั่วโมง) = weight 1.0
-            # ข่าวเก่า 24 ชั่วโมง = weight 0.5
-            # ข่าวเก่า 48 ชั่วโมง = weight 0.25
-            # ข่าวเก่า 72 ชั่วโมง = weight 0.125
-            base_weight = math.pow(2, -age_hours / half_life_hours)
-            
-            # Analyze sentiment
-            try:
-                result = self.analyze(text)
-                if result and isinstance(result, dict):
-                    sentiment_compound = result.get('compound', 0)
-                    
-                    # ถ้ามีข่าวบวกล่าสุด และข่าวนี้เป็นข่าวลบเก่า (3+ วัน) ให้ลดน้ำหนักลงมาก
-                    if recent_positive_override and recent_positive_news:
-                        if age_hours >= 72 and sentiment_compound < -0.1:  # ข่าวลบเก่า 3+ วัน
-                            # ลดน้ำหนักลงเหลือ 10% ของเดิม
-                            weight = base_weight * 0.1
-                        elif age_hours >= 48 and sentiment_compound < -0.1:  # ข่าวลบเก่า 2+ วัน
-                            # ลดน้ำหนักลงเหลือ 30% ของเดิม
-                            weight = base_weight * 0.3
-                        else:
-                            weight = base_weight
-                    else:
-                        weight = base_weight
-                    
-                    weighted_results.append({
-                        'result': result,
-                        'weight': weight,
-                        'age_hours': age_hours
-                    })
-                    total_weight += weight
-            except Exception as e:
-                print(f"⚠️ Error analyzing text: {e}")
-                continue
+            texts.append(text)
+            ages.append(max(age_hours, 0))  # Future dates = treat as now
+            prescan_ages.append(age_hours if parsed else None)
         
-        if not weighted_results or total_weight == 0:
+        if not texts:
             return None
         
-        # Calculate weighted averages
-        weighted_compound = sum(r['result'].get('compound', 0) * r['weight'] for r in weighted_results) / total_weight
-        weighted_positive = sum(r['result'].get('positive', 0) * r['weight'] for r in weighted_results) / total_weight
-        weighted_neutral = sum(r['result'].get('neutral', 0) * r['weight'] for r in weighted_results) / total_weight
-        weighted_negative = sum(r['result'].get('negative', 0) * r['weight'] for r in weighted_results) / total_weight
+        # ✅ วิเคราะห์ทั้ง batch ครั้งเดียว (ไม่ต้องวิเคราะห์ซ้ำตอนตรวจข่าวบวกล่าสุด)
+        results = self.analyze_many(texts)
+        compound = results['compound']
+        age_array = np.array(ages, dtype=float)
         
-        # Count labels (weighted)
-        label_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
-        for r in weighted_results:
-            label = r['result'].get('label', 'neutral')
-            if label in label_counts:
-                label_counts[label] += r['weight']
+        # Calculate exponential decay weight
+        # weight = 2^(-age_hours / half_life_hours)
+        # ข่าวใหม่ (0 ชั่วโมง) = weight 1.0
+        # ข่าวเก่า 24 ชั่วโมง = weight 0.5
+        # ข่าวเก่า 48 ชั่วโมง = weight 0.25
+        # ข่าวเก่า 72 ชั่วโมง = weight 0.125
+        weights = np.exp2(-age_array / half_life_hours)
+        
+        # ตรวจสอบว่ามีข่าวบวกล่าสุด (ภายใน 24 ชั่วโมง) หรือไม่
+        recent_positive_news = False
+        if recent_positive_override:
+            prescan = np.array([a if a is not None else np.nan for a in prescan_ages], dtype=float)
+            recent_positive_news = bool(np.any((prescan >= 0) & (prescan <= 24) & (compound > 0.3)))
+        
+        # ถ้ามีข่าวบวกล่าสุด ให้ลดน้ำหนักข่าวลบเก่า (3+ วัน → 10%, 2+ วัน → 30%)
+        if recent_positive_override and recent_positive_news:
+            negative = compound < -0.1
+            weights = np.where(negative & (age_array >= 72), weights * 0.1,
+                               np.where(negative & (age_array >= 48), weights * 0.3, weights))
+        
+        total_weight = float(weights.sum())
+        if total_weight == 0:
+            return None
         
-        # Normalize label counts
-        if total_weight > 0:
-            for label in label_counts:
-                label_counts[label] = label_counts[label] / total_weight * len(weighted_results)
+        # Calculate weighted averages
+        weighted_compound = float(np.dot(compound, weights) / total_weight)
+        
+        # Count labels (weighted, normalized)
+        total = len(texts)
+        label_counts = {}
+        for label in ('positive', 'neutral', 'negative'):
+            label_weight = float(weights[results['label'] == label].sum())
+            label_counts[label] = int(round(label_weight / total_weight * total))
         
         return {
             'compound': weighted_compound,
-            'positive': weighted_positive,
-            'neutral': weighted_neutral,
-            'negative': weighted_negative,
-            'label': 'positive' if weighted_compound >= 0.05 else ('negative' if weighted_compound <= -0.05 else 'neutral'),
-            'counts': {k: int(round(v)) for k, v in label_counts.items()},
-            'total': len(weighted_results),
+            'positive': float(np.dot(results['pos'], weights) / total_weight),
+            'neutral': float(np.dot(results['neu'], weights) / total_weight),
+            'negative': float(np.dot(results['neg'], weights) / total_weight),
+            'label': sentiment_label(weighted_compound),
+            'counts': label_counts,
+            'total': total,
             'time_weighted': True,
             'half_life_hours': half_life_hours,
             'max_age_hours': max_age_hours,
             'recent_positive_override': recent_positive_override,
-            'avg_age_hours': sum(r['age_hours'] for r in weighted_results) / len(weighted_results) if weighted_results else 0
+            'avg_age_hours': float(age_array.mean())
         }
-
+    
+    def _parse_age_hours(self, published_at, now):
+        """
+        แปลง publishedAt (ISO string / timestamp) เป็นอายุเป็นชั่วโมง
+        
+        Returns:
+            (age_hours, parsed) - parsed = False ถ้าไม่มีวันที่หรือ parse ไม่ได้ (age = 0 = น้ำหนักเต็ม)
+        """
+        if not published_at:
+            # ถ้าไม่มีวันที่ ให้ใช้เวลาปัจจุบัน (น้ำหนักเต็ม)
+            return 0.0, False
+        try:
+            # Handle different date formats
+            if isinstance(published_at, str):
+                # Try ISO format first
+                if 'T' in published_at:
+                    published_dt = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+                else:
+                    # Try timestamp
+                    try:
+                        published_dt = datetime.fromtimestamp(float(published_at))
+                    except (ValueError, OverflowError, OSError):
+                        return 0.0, False
+            elif isinstance(published_at, (int, float)):
+                # Timestamp
+                published_dt = datetime.fromtimestamp(published_at)
+            else:
+                return 0.0, False
+            
+            return (now - published_dt.replace(tzinfo=None)).total_seconds() / 3600, True
+        except Exception as e:
+            print(f"⚠️ Error parsing date {published_at}: {e}")
+            return 0.0, False
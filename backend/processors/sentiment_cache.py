@@ -0,0 +1,141 @@
+"""
+Sentiment Memo Cache
+LRU cache สำหรับผลของ SentimentAnalyzer.analyze (key = hash ของ cleaned text + analyzer version)
+มี persistent tier (Redis หรือไฟล์ SQLite) แบบ optional และนับ hit/miss
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_FILE = os.path.join(BASE_DIR, "data", "cache", "sentiment_memo.sqlite3")
+
+
+class SentimentMemoCache:
+    """
+    Bounded LRU memo (in-process) + persistent tier (optional)
+
+    persist:
+        None / ""  - in-process เท่านั้น
+        "redis"    - ใช้ cache.redis_cache (ถ้า Redis ไม่พร้อมจะใช้ in-process อย่างเดียว)
+        "file"     - SQLite ไฟล์ local (default: backend/data/cache/sentiment_memo.sqlite3)
+    """
+
+    def __init__(self, max_size: int = 50000, persist: Optional[str] = None, file_path: Optional[str] = None):
+        self.max_size = max_size
+        self.persist = (persist or "").lower()
+        self.file_path = file_path or DEFAULT_CACHE_FILE
+        self._memo: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self._db = None
+        self.stats = {"hits": 0, "misses": 0, "persistent_hits": 0, "evictions": 0}
+        self._init_persistent_tier()
+
+    def _init_persistent_tier(self):
+        if self.persist == "redis":
+            try:
+                from cache.redis_cache import cache
+                self._redis = cache if cache.client else None
+            except Exception as e:
+                print(f"⚠️ Sentiment memo: Redis tier not available: {e}")
+        elif self.persist == "file":
+            try:
+                os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+                self._db = sqlite3.connect(self.file_path, check_same_thread=False)
+                self._db.execute("CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, scores TEXT NOT NULL)")
+                self._db.commit()
+            except Exception as e:
+                print(f"⚠️ Sentiment memo: file tier not available: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(cleaned_text: str, version: str) -> str:
+        """สร้าง key จาก cleaned text + analyzer version"""
+        return hashlib.sha1(f"{version}\0{cleaned_text}".encode("utf-8", "surrogatepass")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """ดึงผลที่ memo ไว้ (คืน copy) หรือ None"""
+        with self._lock:
+            scores = self._memo.get(key)
+            if scores is not None:
+                self._memo.move_to_end(key)
+                self.stats["hits"] += 1
+                return dict(scores)
+
+        scores = self._get_persistent(key)
+        with self._lock:
+            if scores is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.stats["persistent_hits"] += 1
+            self._put_memory(key, scores)
+        return dict(scores)
+
+    def set(self, key: str, scores: Dict):
+        """บันทึกผล (in-process + persistent tier)"""
+        scores = dict(scores)
+        with self._lock:
+            self._put_memory(key, scores)
+        self._set_persistent(key, scores)
+
+    def _put_memory(self, key: str, scores: Dict):
+        """เพิ่มเข้า LRU (เรียกตอนถือ _lock อยู่)"""
+        self._memo[key] = scores
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.max_size:
+            self._memo.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _get_persistent(self, key: str) -> Optional[Dict]:
+        if self._redis is not None:
+            return self._redis.get_sentiment_memo(key)
+        if self._db is not None:
+            try:
+                with self._lock:
+                    row = self._db.execute("SELECT scores FROM memo WHERE key = ?", (key,)).fetchone()
+                return json.loads(row[0]) if row else None
+            except Exception:
+                return None
+        return None
+
+    def _set_persistent(self, key: str, scores: Dict):
+        if self._redis is not None:
+            self._redis.set_sentiment_memo(key, scores)
+        elif self._db is not None:
+            try:
+                with self._lock:
+                    self._db.execute("INSERT OR REPLACE INTO memo (key, scores) VALUES (?, ?)", (key, json.dumps(scores)))
+                    self._db.commit()
+            except Exception as e:
+                print(f"⚠️ Error saving sentiment memo: {e}")
+
+    def clear(self):
+        """ล้าง in-process memo (ไม่ลบ persistent tier)"""
+        with self._lock:
+            self._memo.clear()
+
+    def get_stats(self) -> Dict:
+        """สถิติ hit/miss"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._memo),
+                "max_size": self.max_size,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "persistent_tier": self.persist or None,
+            }
+
+
+# Global instance (ใช้ร่วมกันทุก SentimentAnalyzer ใน process)
+sentiment_memo = SentimentMemoCache(
+    max_size=int(os.getenv("SENTIMENT_CACHE_SIZE", 50000)),
+    persist=os.getenv("SENTIMENT_CACHE_PERSIST", ""),
+    file_path=os.getenv("SENTIMENT_CACHE_FILE") or None
+)
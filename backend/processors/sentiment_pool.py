@@ -0,0 +1,159 @@
+"""
+Sentiment Worker Pool
+วิเคราะห์ sentiment แบบ multi-process (ProcessPoolExecutor) สำหรับ bulk ingest
+- แต่ละ worker สร้าง VADER ครั้งเดียว (initializer) แล้วรับงานเป็น chunk
+- score_many() เป็น awaitable → event loop ดึงข้อมูลต่อได้ระหว่างที่ workers คำนวณ
+- ใช้ memo ร่วมกับ SentimentAnalyzer ใน process หลัก (ข้อความที่เคยวิเคราะห์แล้วไม่ต้องส่งไป worker)
+- workers เริ่มด้วย forkserver/spawn (ไม่ fork process หลักที่มี threads / Mongo client อยู่)
+  และ import แค่ processors.sentiment_worker (ไม่ run app.py / script หลักซ้ำ - ดู sentiment_worker.py)
+"""
+import asyncio
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from processors.sentiment_analyzer import SentimentAnalyzer, clean_text
+from processors.sentiment_worker import get_mp_context, init_worker, loaded_modules, score_chunk
+
+
+class SentimentPool:
+    """
+    Pool ของ SentimentAnalyzer workers
+
+    - batch เล็ก (< min_pool_batch ข้อความที่ต้องวิเคราะห์จริง) → วิเคราะห์ใน thread (ไม่คุ้มค่า IPC)
+    - batch ใหญ่ → แบ่ง chunk ละ chunk_size ส่งให้ workers พร้อมกัน
+    - ถ้า process pool ใช้ไม่ได้ (เช่น worker ตาย) → fallback เป็น thread ใน process หลัก
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = 200, min_pool_batch: int = 64,
+                 start_method: Optional[str] = None):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.start_method = start_method
+        self.chunk_size = chunk_size
+        self.min_pool_batch = min_pool_batch
+        self.analyzer = SentimentAnalyzer()  # ใช้ memo ร่วมกันทั้ง process
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {"texts": 0, "memo_hits": 0, "pool_texts": 0, "inline_texts": 0, "chunks": 0}
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """สร้าง ProcessPoolExecutor ตอนใช้ครั้งแรก (ไม่ spawn workers ตอน import)"""
+        with self._lock:
+            if self._executor is None:
+                try:
+                    mp_context = get_mp_context(self.start_method)
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp_context,
+                                                         initializer=init_worker)
+                    print(f"✅ Sentiment pool started ({self.max_workers} workers, {mp_context.get_start_method()})")
+                except Exception as e:
+                    print(f"⚠️ Sentiment pool not available, scoring in-process: {e}")
+                    return None
+            return self._executor
+
+    async def score_many(self, texts: List[str]) -> List[Dict]:
+        """
+        วิเคราะห์ sentiment หลายข้อความ (ผลเหมือน SentimentAnalyzer.analyze ทีละข้อความ)
+
+        Args:
+            texts: List ของข้อความ
+
+        Returns:
+            List ของ sentiment dict ตามลำดับเดียวกับ texts
+        """
+        results: List[Optional[Dict]] = [None] * len(texts)
+
+        # จัดกลุ่มตาม cleaned text + ใช้ memo ก่อน
+        pending: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if not text or not isinstance(text, str):
+                results[i] = self.analyzer.analyze(text)
+                continue
+            pending.setdefault(clean_text(text), []).append(i)
+
+        memo = self.analyzer.memo
+        to_score = []
+        for cleaned, indexes in pending.items():
+            cached = memo.get(memo.make_key(cleaned, self.analyzer.version)) if memo is not None else None
+            if cached is not None:
+                for i in indexes:
+                    results[i] = dict(cached)
+                self.stats["memo_hits"] += 1
+            else:
+                to_score.append(cleaned)
+
+        self.stats["texts"] += len(texts)
+        if to_score:
+            scored = await self._score_cleaned_texts(to_score)
+            for cleaned, scores in zip(to_score, scored):
+                if memo is not None:
+                    memo.set(memo.make_key(cleaned, self.analyzer.version), scores)
+                for i in pending[cleaned]:
+                    results[i] = dict(scores)
+
+        return results
+
+    async def _score_cleaned_texts(self, cleaned_texts: List[str]) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor() if len(cleaned_texts) >= self.min_pool_batch else None
+
+        if executor is not None:
+            chunks = [cleaned_texts[i:i + self.chunk_size] for i in range(0, len(cleaned_texts), self.chunk_size)]
+            try:
+                chunk_results = await asyncio.gather(*[
+                    loop.run_in_executor(executor, score_chunk, chunk) for chunk in chunks
+                ])
+                self.stats["pool_texts"] += len(cleaned_texts)
+                self.stats["chunks"] += len(chunks)
+                return [scores for chunk in chunk_results for scores in chunk]
+            except BrokenProcessPool as e:
+                print(f"⚠️ Sentiment pool broken, restarting on next batch: {e}")
+                with self._lock:
+                    if self._executor is executor:
+                        executor.shutdown(wait=False)
+                        self._executor = None
+
+        # batch เล็ก หรือ pool ใช้ไม่ได้ → ใช้ thread (ไม่บล็อก event loop)
+        self.stats["inline_texts"] += len(cleaned_texts)
+        return await loop.run_in_executor(
+            None, lambda: [self.analyzer._score_cleaned(text) for text in cleaned_texts]
+        )
+
+    def worker_modules(self, prefixes: List[str]) -> Optional[List[str]]:
+        """
+        modules ที่ worker process import ไว้ (ตรวจว่า worker ไม่ได้ import app / database)
+
+        Args:
+            prefixes: ชื่อ module ที่ต้องการตรวจ เช่น ["database", "app"]
+
+        Returns:
+            รายชื่อ modules ที่ตรงกับ prefixes (รวม __mp_main__ ถ้า script หลักถูก run ซ้ำ) หรือ None ถ้า pool ใช้ไม่ได้
+        """
+        executor = self._get_executor()
+        if executor is None:
+            return None
+        return executor.submit(loaded_modules, prefixes).result()
+
+    def shutdown(self):
+        """ปิด worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def get_stats(self) -> Dict:
+        """สถิติการใช้งาน pool"""
+        return {**self.stats, "max_workers": self.max_workers, "chunk_size": self.chunk_size,
+                "running": self._executor is not None}
+
+
+# Global instance (workers เริ่มตอนใช้ครั้งแรก)
+sentiment_pool = SentimentPool(
+    max_workers=int(os.getenv("SENTIMENT_POOL_WORKERS", 0)) or None,
+    chunk_size=int(os.getenv("SENTIMENT_POOL_CHUNK", 200)),
+    start_method=os.getenv("SENTIMENT_POOL_START_METHOD") or None
+)
+# ✅ ปิด worker processes ตอน interpreter จบ (app + scripts)
+atexit.register(sentiment_pool.shutdown)
@@ -0,0 +1,98 @@
+"""
+Sentiment Worker
+entry ของ worker processes ใน SentimentPool - import แค่ SentimentAnalyzer (VADER) ไม่มี Flask / MongoDB
+
+multiprocessing (forkserver/spawn) จะ run script หลัก (__main__) ซ้ำใน worker ทุกตัวเป็น __mp_main__
+(python app.py → connect Mongo, สร้าง indexes, เริ่ม threads และ singletons ทั้งหมดซ้ำ)
+WorkerProcess จึงซ่อน __main__ ของ process หลักระหว่าง start() → worker import แค่ module นี้
+"""
+import multiprocessing
+import sys
+import threading
+import types
+from contextlib import contextmanager
+from multiprocessing.context import ForkServerProcess, SpawnProcess
+from typing import Dict, List, Optional
+
+from processors.sentiment_analyzer import SentimentAnalyzer
+
+# Analyzer ของแต่ละ worker process (สร้างใน init_worker)
+_worker_analyzer = None
+
+# sys.modules เป็นของทั้ง process → start() ทีละ worker
+_main_lock = threading.Lock()
+
+
+def init_worker():
+    """Initializer ของ worker: โหลด VADER lexicon ครั้งเดียวต่อ process"""
+    global _worker_analyzer
+    _worker_analyzer = SentimentAnalyzer(use_memo=False)
+
+
+def score_chunk(cleaned_texts: List[str]) -> List[Dict]:
+    """วิเคราะห์ chunk ของข้อความที่ clean แล้ว (รันใน worker process)"""
+    if _worker_analyzer is None:
+        init_worker()
+    return [_worker_analyzer._score_cleaned(text) for text in cleaned_texts]
+
+
+def loaded_modules(prefixes: List[str]) -> List[str]:
+    """
+    modules ใน worker ที่ขึ้นต้นด้วย prefixes (ใช้ตรวจว่า worker ไม่ได้ import app / database)
+    รวม "__mp_main__" ถ้า script หลักถูก run ซ้ำ (multiprocessing ตั้ง alias __mp_main__ เสมอ - ดูจาก __file__)
+    """
+    names = [name for name in sys.modules if any(name.startswith(prefix) for prefix in prefixes)]
+    if getattr(sys.modules.get("__mp_main__"), "__file__", None):
+        names.append("__mp_main__")
+    return sorted(names)
+
+
+@contextmanager
+def _hidden_main():
+    """
+    แทน __main__ ด้วย module ว่างระหว่างสร้าง process
+    (spawn.get_preparation_data ไม่ส่ง path ของ script หลักไปให้ worker run ซ้ำ)
+    """
+    with _main_lock:
+        main_module = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main_module
+
+
+class ForkServerWorkerProcess(ForkServerProcess):
+    def start(self):
+        with _hidden_main():
+            super().start()
+
+
+class SpawnWorkerProcess(SpawnProcess):
+    def start(self):
+        with _hidden_main():
+            super().start()
+
+
+WORKER_PROCESSES = {"forkserver": ForkServerWorkerProcess, "spawn": SpawnWorkerProcess}
+
+
+def get_mp_context(start_method: Optional[str] = None):
+    """
+    multiprocessing context สำหรับ SentimentPool: forkserver ถ้า platform รองรับ ไม่เช่นนั้น spawn
+
+    Args:
+        start_method: บังคับ start method (เช่น "spawn" หรือ "fork" - fork ไม่ซ่อน __main__ เพราะไม่ import ซ้ำ)
+    """
+    available = multiprocessing.get_all_start_methods()
+    if start_method not in available:
+        start_method = "forkserver" if "forkserver" in available else "spawn"
+    base = multiprocessing.get_context(start_method)
+    if start_method not in WORKER_PROCESSES:
+        return base
+    if start_method == "forkserver":
+        # ✅ forkserver import แค่ module นี้ (default คือ preload __main__ = run app.py ใน forkserver)
+        base.set_forkserver_preload(["processors.sentiment_worker"])
+    context = type(base)()
+    context.Process = WORKER_PROCESSES[start_method]
+    return context
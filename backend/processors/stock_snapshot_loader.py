@@ -0,0 +1,231 @@
+"""
+Stock Snapshot Loader
+ดึง snapshot ล่าสุดของหุ้นหลายตัวด้วย query เดียว ($in + projection) พร้อม in-process TTL cache
+ใช้ร่วมกันระหว่าง trending-topics, trending-realtime, heatmap, divergence และ dashboard
+"""
+import copy
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from database.db_config import db
+
+# Fields ที่ PumpDumpDetector ใช้จาก stockInfo
+PUMP_DUMP_FIELDS = ["symbol", "fetchedAt", "stockInfo"]
+
+
+def extract_pump_dump_info(stock_doc: Optional[Dict]) -> Dict:
+    """
+    แปลง stock document เป็น stock_info สำหรับ PumpDumpDetector.detect_pump_dump
+
+    Args:
+        stock_doc: Document จาก db.stocks (หรือ None)
+
+    Returns:
+        {volume, averageVolume, changePercent, priceChangePercent, currentPrice} หรือ {} ถ้าไม่มีข้อมูล
+    """
+    if not stock_doc:
+        return {}
+    stock_info_data = stock_doc.get('stockInfo', {}) or {}
+    change_percent = stock_info_data.get('changePercent', 0) or stock_info_data.get('priceChangePercent', 0)
+    return {
+        'volume': stock_info_data.get('volume', 0),
+        'averageVolume': stock_info_data.get('averageVolume', 0),
+        'changePercent': change_percent,
+        'priceChangePercent': change_percent,
+        'currentPrice': stock_info_data.get('currentPrice', 0) or stock_info_data.get('price', 0)
+    }
+
+
+class StockSnapshotLoader:
+    """
+    Bulk loader สำหรับ stock documents (หนึ่ง document ต่อ symbol)
+
+    - get_snapshots(): snapshot ของหลาย symbols ด้วย $in query เดียว
+    - get_recent(): stocks ล่าสุด (เรียงตาม fetchedAt) พร้อม projection
+    ผลลัพธ์ถูก cache ไว้ใน process สั้นๆ (ttl_seconds) เพื่อให้ requests ที่มาพร้อมกันใช้ผลเดียวกัน
+    """
+
+    def __init__(self, collection_name: str = 'stocks', ttl_seconds: float = 30):
+        self.collection_name = collection_name
+        self.ttl_seconds = ttl_seconds
+        self._symbol_cache: Dict[tuple, tuple] = {}  # (symbol, fields) -> (expires_at, doc)
+        self._query_cache: Dict[tuple, tuple] = {}  # cache key -> (expires_at, docs)
+        self._lock = threading.Lock()
+        # ✅ ให้มี query ไปที่ database ทีละชุด - request อื่นรอแล้วใช้ผลจาก cache
+        self._fetch_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "queries": 0}
+
+    def _get_collection(self):
+        if db is None or not hasattr(db, self.collection_name):
+            return None
+        return getattr(db, self.collection_name)
+
+    @staticmethod
+    def _projection(fields: Optional[Iterable[str]]) -> Optional[Dict]:
+        if not fields:
+            return None
+        projection = {field: 1 for field in fields}
+        projection["symbol"] = 1
+        return projection
+
+    def _lookup_symbols(self, symbols: List[str], fields_key: tuple, now: float) -> tuple:
+        """คืน (found, missing) จาก cache"""
+        found = {}
+        missing = []
+        with self._lock:
+            for symbol in symbols:
+                entry = self._symbol_cache.get((symbol, fields_key))
+                if entry and entry[0] > now:
+                    found[symbol] = entry[1]
+                else:
+                    missing.append(symbol)
+        return found, missing
+
+    def get_snapshots(self, symbols: Iterable[str], fields: Optional[Iterable[str]] = PUMP_DUMP_FIELDS) -> Dict[str, Dict]:
+        """
+        ดึง snapshot ล่าสุดของหลาย symbols
+
+        Args:
+            symbols: รายชื่อ symbols
+            fields: fields ที่ต้องการ (None = ทั้ง document)
+
+        Returns:
+            {SYMBOL: document} (เฉพาะ symbols ที่มีใน database)
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+        if not symbols:
+            return {}
+
+        fields_key = tuple(sorted(fields)) if fields else ()
+        found, missing = self._lookup_symbols(symbols, fields_key, time.time())
+        if missing:
+            with self._fetch_lock:
+                # อาจถูกดึงโดย request อื่นระหว่างรอ lock
+                more, missing = self._lookup_symbols(missing, fields_key, time.time())
+                found.update(more)
+                if missing:
+                    found.update(self._fetch_symbols(missing, fields, fields_key))
+
+        with self._lock:
+            self.stats["hits"] += len(symbols) - len(missing)
+            self.stats["misses"] += len(missing)
+
+        return {symbol: copy.copy(doc) for symbol, doc in found.items() if doc is not None}
+
+    def _fetch_symbols(self, symbols: List[str], fields: Optional[Iterable[str]], fields_key: tuple) -> Dict[str, Dict]:
+        """ดึง symbols ที่ไม่มีใน cache ด้วย $in query เดียว"""
+        collection = self._get_collection()
+        if collection is None:
+            return {}
+
+        docs = {}
+        try:
+            cursor = collection.find({"symbol": {"$in": symbols}}, self._projection(fields)).sort("fetchedAt", -1)
+            for doc in cursor:
+                symbol = str(doc.get("symbol", "")).upper()
+                # เรียง fetchedAt ล่าสุดก่อน → เก็บตัวแรกของแต่ละ symbol
+                if symbol and symbol not in docs:
+                    docs[symbol] = doc
+            with self._lock:
+                self.stats["queries"] += 1
+        except Exception as e:
+            print(f"⚠️  Error loading stock snapshots from {self.collection_name}: {e}")
+            return {}
+
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            for symbol in symbols:
+                # เก็บ None สำหรับ symbols ที่ไม่มีใน database ด้วย (ไม่ต้อง query ซ้ำ)
+                self._symbol_cache[(symbol, fields_key)] = (expires_at, docs.get(symbol))
+        return docs
+
+    def get_recent(self, limit: int, fields: Optional[Iterable[str]] = None, query: Optional[Dict] = None,
+                   cache_key: Optional[str] = None) -> List[Dict]:
+        """
+        ดึง stocks ล่าสุด (เรียงตาม fetchedAt)
+
+        Args:
+            limit: จำนวน documents
+            fields: fields ที่ต้องการ (None = ทั้ง document)
+            query: filter เพิ่มเติม
+            cache_key: key สำหรับ cache (ใช้เมื่อ query เปลี่ยนทุกครั้ง เช่นมี cutoff เวลา)
+
+        Returns:
+            List of documents
+        """
+        fields_key = tuple(sorted(fields)) if fields else ()
+        key = (cache_key or repr(sorted((query or {}).items())), limit, fields_key)
+
+        docs = self._lookup_query(key)
+        if docs is None:
+            with self._fetch_lock:
+                docs = self._lookup_query(key)
+                if docs is None:
+                    docs = self._fetch_recent(key, limit, fields, query)
+        return [copy.copy(doc) for doc in docs]
+
+    def _lookup_query(self, key: tuple) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._query_cache.get(key)
+            if entry and entry[0] > time.time():
+                self.stats["hits"] += 1
+                return entry[1]
+        return None
+
+    def _fetch_recent(self, key: tuple, limit: int, fields: Optional[Iterable[str]], query: Optional[Dict]) -> List[Dict]:
+        collection = self._get_collection()
+        if collection is None:
+            return []
+
+        try:
+            docs = list(collection.find(query or {}, self._projection(fields)).sort("fetchedAt", -1).limit(limit))
+        except Exception as e:
+            print(f"⚠️  Error loading recent stocks from {self.collection_name}: {e}")
+            return []
+
+        with self._lock:
+            self.stats["misses"] += 1
+            self.stats["queries"] += 1
+            self._query_cache[key] = (time.time() + self.ttl_seconds, docs)
+            # warm per-symbol cache ด้วย (trending ใช้ต่อได้)
+            expires_at = time.time() + self.ttl_seconds
+            for doc in docs:
+                symbol = str(doc.get("symbol", "")).upper()
+                if symbol and (symbol, key[2]) not in self._symbol_cache:
+                    self._symbol_cache[(symbol, key[2])] = (expires_at, doc)
+            self._evict_expired()
+        return docs
+
+    def _evict_expired(self):
+        """ลบ entries ที่หมดอายุ (เรียกตอนถือ _lock อยู่)"""
+        now = time.time()
+        for cache in (self._symbol_cache, self._query_cache):
+            expired = [k for k, (expires_at, _) in cache.items() if expires_at <= now]
+            for k in expired:
+                del cache[k]
+
+    def invalidate(self, symbols: Optional[Iterable[str]] = None):
+        """ลบ cache (ทั้งหมด หรือเฉพาะ symbols)"""
+        with self._lock:
+            if symbols is None:
+                self._symbol_cache.clear()
+            else:
+                targets = {s.upper() for s in symbols if s}
+                for k in [k for k in self._symbol_cache if k[0] in targets]:
+                    del self._symbol_cache[k]
+            self._query_cache.clear()
+
+    def get_stats(self) -> Dict:
+        """สถิติ cache"""
+        with self._lock:
+            return {
+                **self.stats,
+                "cachedSymbols": len(self._symbol_cache),
+                "cachedQueries": len(self._query_cache),
+                "ttlSeconds": self.ttl_seconds,
+            }
+
+
+# Global instances
+stock_snapshot_loader = StockSnapshotLoader('stocks')  # ข้อมูลจาก batch processor
+stock_data_snapshot_loader = StockSnapshotLoader('stock_data')  # ข้อมูลจาก DataAggregator (heatmap, divergence, dashboard)
@@ -0,0 +1,331 @@
+"""
+Trending Aggregator
+นับ ticker mentions ฝั่ง MongoDB ด้วย aggregation pipeline แทนการดึง posts ทั้งหมดมานับใน Python
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from database.db_config import db
+from utils.post_normalizer import get_collection_name
+from utils.ticker_extractor import DOLLAR_TICKER_REGEX
+
+# ช่วงเวลาที่ /api/trending-topics รองรับ
+TIME_RANGES = {
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+}
+
+# คำที่ไม่ใช่ ticker จริง (false positives)
+FALSE_POSITIVE_TICKERS = ['USD', 'GDP', 'CEO', 'IPO', 'ETF', 'SEC', 'IRS', 'FDA', 'AI', 'IT', 'TV', 'PC', 'USA']
+
+# Fields ที่ PumpDumpDetector ใช้ (projection ตอนดึง posts ของ top tickers)
+PUMP_DUMP_POST_FIELDS = {
+    "id": 1, "title": 1, "selftext": 1, "score": 1, "num_comments": 1,
+    "sentiment": 1, "created_utc": 1, "author": 1, "source": 1,
+    "symbol": 1, "symbols": 1,
+}
+
+
+def get_time_cutoff(time_range: str, now: Optional[datetime] = None) -> datetime:
+    """แปลง timeRange (1h/6h/24h/7d/30d) เป็น cutoff datetime (default 24h)"""
+    now = now or datetime.utcnow()
+    return now - TIME_RANGES.get(time_range, TIME_RANGES["24h"])
+
+
+def get_source_collections(source: str) -> List[str]:
+    """คืนชื่อ collections ที่ต้องใช้ตาม source"""
+    if source in ("yahoo", "news"):
+        return [get_collection_name('yahoo')]
+    if source == "all":
+        return [get_collection_name('reddit'), get_collection_name('yahoo')]
+    # Default: post_reddit (backward compatibility)
+    return [get_collection_name('reddit')]
+
+
+def build_time_match(cutoff: Optional[datetime]) -> Dict:
+    """
+    สร้าง $match สำหรับ created_utc
+    created_utc ถูกเก็บทั้งแบบ datetime และ ISO string จึงต้อง match ทั้งสองแบบใน query เดียว
+    """
+    if cutoff is None:
+        return {}
+    return {"$or": [
+        {"created_utc": {"$gte": cutoff}},
+        {"created_utc": {"$gte": cutoff.isoformat()}},
+    ]}
+
+
+def build_ticker_post_index(posts: List[Dict]) -> Dict[str, List[int]]:
+    """
+    สร้าง inverted index ticker → ตำแหน่ง posts ในรอบเดียว (แทนการวน posts ทั้งหมดซ้ำทุก ticker)
+
+    Args:
+        posts: List of posts (ใช้ field symbols หรือ symbol)
+
+    Returns:
+        {ticker: [index ของ post ใน posts, ...]} (แต่ละ post ปรากฏครั้งเดียวต่อ ticker)
+    """
+    index: Dict[str, List[int]] = {}
+    for i, post in enumerate(posts):
+        post_tickers = post.get('symbols') or ([post.get('symbol')] if post.get('symbol') else [])
+        seen = set()
+        for ticker in post_tickers:
+            if not ticker or not isinstance(ticker, str):
+                continue
+            ticker = ticker.upper()
+            if ticker in seen:
+                continue
+            seen.add(ticker)
+            index.setdefault(ticker, []).append(i)
+    return index
+
+
+class TrendingAggregator:
+    """
+    คำนวณ trending tickers ด้วย aggregation pipeline:
+    $match (เวลา) → $unionWith (post_yahoo) → $project tickers → $unwind → $group
+    ส่งกลับมาเฉพาะ top-N rows
+    """
+
+    def __init__(self, fallback_limit: int = 5000):
+        # จำนวน posts ล่าสุดต่อ collection ที่ใช้เมื่อไม่มี posts ในช่วงเวลาที่เลือก
+        self.fallback_limit = fallback_limit
+
+    def _source_stages(self, cutoff: Optional[datetime]) -> List[Dict]:
+        """Stages ที่เลือก posts ของแต่ละ collection (ตามเวลา หรือ posts ล่าสุดถ้าไม่มี cutoff)"""
+        if cutoff is not None:
+            return [{"$match": build_time_match(cutoff)}]
+        return [{"$sort": {"created_utc": -1}}, {"$limit": self.fallback_limit}]
+
+    def build_pipeline(self, collections: List[str], cutoff: Optional[datetime], top_n: int = 100) -> List[Dict]:
+        """
+        สร้าง aggregation pipeline
+
+        Args:
+            collections: รายชื่อ collections (ตัวแรกเป็น collection หลัก ที่เหลือใช้ $unionWith)
+            cutoff: เวลาเริ่มต้น (None = ไม่กรองเวลา ใช้ posts ล่าสุดแทน)
+            top_n: จำนวน tickers ที่ส่งกลับ
+
+        Returns:
+            Pipeline (list of stages)
+        """
+        source_stages = self._source_stages(cutoff)
+        pipeline = list(source_stages)
+        for collection_name in collections[1:]:
+            pipeline.append({"$unionWith": {"coll": collection_name, "pipeline": list(source_stages)}})
+
+        text_expr = {"$toUpper": {"$concat": [
+            {"$ifNull": ["$title", ""]}, " ",
+            {"$ifNull": ["$selftext", ""]}, " ",
+            {"$ifNull": ["$text", ""]}, " ",
+            {"$ifNull": ["$body", ""]},
+        ]}}
+
+        pipeline.extend([
+            {"$project": {
+                "source": {"$ifNull": ["$source", "unknown"]},
+                # ✅ sentiment อาจเป็น dict (compound) หรือตัวเลข (backward compatibility)
+                "sentiment": {"$cond": [
+                    {"$isNumber": "$sentiment"},
+                    "$sentiment",
+                    {"$ifNull": ["$sentiment.compound", "$sentiment_score"]},
+                ]},
+                # ✅ วิธีที่ 1: symbols → symbol → วิธีที่ 2: หา $SYMBOL จาก text (fallback)
+                "tickers": {"$cond": [
+                    {"$gt": [{"$size": {"$cond": [{"$isArray": "$symbols"}, "$symbols", []]}}, 0]},
+                    "$symbols",
+                    {"$cond": [
+                        {"$gt": [{"$strLenCP": {"$ifNull": ["$symbol", ""]}}, 0]},
+                        ["$symbol"],
+                        {"$map": {
+                            "input": {"$regexFindAll": {"input": text_expr, "regex": DOLLAR_TICKER_REGEX}},
+                            "as": "m",
+                            "in": {"$arrayElemAt": ["$$m.captures", 0]},
+                        }},
+                    ]},
+                ]},
+            }},
+            {"$facet": {
+                "posts": [{"$count": "total"}],
+                "tickers": [
+                    {"$unwind": "$tickers"},
+                    {"$match": {"tickers": {"$type": "string", "$ne": ""}}},
+                    {"$project": {"source": 1, "sentiment": 1, "ticker": {"$toUpper": "$tickers"}}},
+                    {"$match": {"ticker": {"$nin": FALSE_POSITIVE_TICKERS}}},
+                    # นับ mentions ต่อ (post, ticker) ก่อน เพื่อให้ได้ทั้ง mentions และ unique posts
+                    {"$group": {
+                        "_id": {"post": "$_id", "ticker": "$ticker"},
+                        "mentions": {"$sum": 1},
+                        "source": {"$first": "$source"},
+                        "sentiment": {"$first": "$sentiment"},
+                    }},
+                    {"$group": {
+                        "_id": "$_id.ticker",
+                        "mentions": {"$sum": "$mentions"},
+                        "uniquePosts": {"$sum": 1},
+                        "sources": {"$addToSet": "$source"},
+                        # avg sentiment ถ่วงตาม mentions (เหมือนเดิมที่เก็บ sentiment ต่อ mention)
+                        "sentimentSum": {"$sum": {"$multiply": ["$mentions", {"$ifNull": ["$sentiment", 0]}]}},
+                        "sentimentCount": {"$sum": {"$cond": [{"$isNumber": "$sentiment"}, "$mentions", 0]}},
+                    }},
+                    {"$sort": {"mentions": -1, "_id": 1}},
+                    # เก็บจำนวน tickers ทั้งหมดไว้ แล้วส่งกลับเฉพาะ top-N
+                    {"$group": {"_id": None, "total": {"$sum": 1}, "rows": {"$push": "$$ROOT"}}},
+                    {"$project": {"_id": 0, "total": 1, "rows": {"$slice": ["$rows", top_n]}}},
+                ],
+            }},
+        ])
+        return pipeline
+
+    def _run(self, collections: List[str], cutoff: Optional[datetime], top_n: int) -> Dict:
+        """รัน pipeline บน collection หลัก"""
+        available = [name for name in collections if hasattr(db, name)]
+        if not available:
+            return {"total_posts": 0, "total_tickers": 0, "rows": []}
+
+        pipeline = self.build_pipeline(available, cutoff, top_n)
+        result = list(getattr(db, available[0]).aggregate(pipeline, allowDiskUse=True))
+        facet = result[0] if result else {}
+
+        posts_count = facet.get("posts") or [{}]
+        tickers_summary = (facet.get("tickers") or [{}])[0]
+
+        rows = []
+        for row in tickers_summary.get("rows", []):
+            sentiment_count = row.get("sentimentCount", 0)
+            rows.append({
+                "ticker": row["_id"],
+                "mentions": row.get("mentions", 0),
+                "uniquePosts": row.get("uniquePosts", 0),
+                "sources": row.get("sources", []),
+                "avgSentiment": row.get("sentimentSum", 0) / sentiment_count if sentiment_count else 0,
+            })
+
+        return {
+            "total_posts": posts_count[0].get("total", 0),
+            "total_tickers": tickers_summary.get("total", 0),
+            "rows": rows,
+        }
+
+    def aggregate_tickers(self, source: str, time_range: str, top_n: int = 100) -> Dict:
+        """
+        นับ trending tickers สำหรับ source และ timeRange
+
+        Returns:
+            {
+                "rows": [{"ticker", "mentions", "uniquePosts", "sources", "avgSentiment"}, ...],
+                "total_posts": int,
+                "total_tickers": int,
+                "cutoff": datetime หรือ None (None = ใช้ posts ล่าสุดโดยไม่กรองเวลา)
+            }
+        """
+        if db is None:
+            return {"rows": [], "total_posts": 0, "total_tickers": 0, "cutoff": None}
+
+        collections = get_source_collections(source)
+        cutoff = get_time_cutoff(time_range)
+
+        summary = self._run(collections, cutoff, top_n)
+        if summary["total_posts"] == 0:
+            # ✅ ไม่มี posts ในช่วงเวลานี้ → ใช้ posts ล่าสุดแทน (fallback เหมือนเดิม)
+            print(f"⚠️ No posts found with time filter (cutoff: {cutoff.isoformat()}), using latest {self.fallback_limit} posts per collection...")
+            cutoff = None
+            summary = self._run(collections, cutoff, top_n)
+
+        summary["cutoff"] = cutoff
+        return summary
+
+    def fetch_posts_for_tickers(self, source: str, tickers: List[str], cutoff: Optional[datetime],
+                                limit: int = 5000) -> List[Dict]:
+        """
+        ดึง posts (เฉพาะ fields ที่ PumpDumpDetector ใช้) ของ tickers ที่ระบุ
+
+        Args:
+            source: Source (all/reddit/yahoo/news)
+            tickers: รายชื่อ tickers (top-N)
+            cutoff: เวลาเริ่มต้น (None = ไม่กรองเวลา)
+            limit: จำนวน posts สูงสุดต่อ collection
+        """
+        if db is None or not tickers:
+            return []
+
+        ticker_query = {"$or": [{"symbols": {"$in": tickers}}, {"symbol": {"$in": tickers}}]}
+        time_match = build_time_match(cutoff)
+        query = {"$and": [time_match, ticker_query]} if time_match else ticker_query
+
+        posts = []
+        for collection_name in get_source_collections(source):
+            if not hasattr(db, collection_name):
+                continue
+            cursor = getattr(db, collection_name).find(query, PUMP_DUMP_POST_FIELDS)
+            posts.extend(cursor.sort("created_utc", -1).limit(limit))
+        return posts
+
+    def build_topics(self, rows: List[Dict], posts: List[Dict],
+                     stock_info_loader: Callable[[str], Dict], pump_dump_detector=None) -> List[Dict]:
+        """
+        เพิ่มข้อมูล pump and dump / trust score ให้ top-N rows
+
+        Args:
+            rows: ผลจาก aggregate_tickers()["rows"]
+            posts: posts ของ top tickers (จาก fetch_posts_for_tickers)
+            stock_info_loader: ฟังก์ชันคืน stock_info (volume, price) ของ ticker
+            pump_dump_detector: PumpDumpDetector (optional)
+
+        Returns:
+            List of topics (response shape ของ /api/trending-topics)
+        """
+        if pump_dump_detector is None:
+            from processors.pump_dump_detector import PumpDumpDetector
+            pump_dump_detector = PumpDumpDetector()
+
+        # ✅ วน posts รอบเดียวเพื่อสร้าง ticker → posts
+        post_index = build_ticker_post_index(posts)
+
+        topics = []
+        for row in rows:
+            ticker = row["ticker"]
+            count = row["mentions"]
+            avg_sentiment = row["avgSentiment"]
+
+            ticker_posts_list = [posts[i] for i in post_index.get(ticker, [])]
+            stock_info = stock_info_loader(ticker) or {}
+
+            # ✅ ตรวจจับ pump and dump ครั้งเดียว แล้วใช้ผลเดียวกันคำนวณ trust score
+            pump_dump_result = pump_dump_detector.detect_pump_dump(ticker, ticker_posts_list, stock_info)
+            trust_score = pump_dump_detector.trust_score_from_result(pump_dump_result)
+            adjusted_sentiment = pump_dump_detector.adjust_sentiment_by_trust(avg_sentiment, trust_score)
+
+            topics.append({
+                "word": ticker,  # Keep 'word' for compatibility
+                "ticker": ticker,  # Add explicit ticker field
+                "count": count,  # Total mentions (all occurrences)
+                "mentions": count,  # Alias for count
+                "uniquePosts": row["uniquePosts"],  # Number of unique posts
+                "sources": row["sources"],
+                "sourceCount": len(row["sources"]),
+                "avgSentiment": round(avg_sentiment, 3),  # Original sentiment
+                "adjustedSentiment": round(adjusted_sentiment, 3),  # ✅ Adjusted sentiment (filtered pump/dump)
+                "trustScore": round(trust_score, 1),  # ✅ Trust score (0-100)
+                "isPumpDump": pump_dump_result.get("is_pump_dump", False),  # ✅ Is pump and dump?
+                "riskScore": round(pump_dump_result.get("risk_score", 0), 1),  # ✅ Risk score (0-100)
+                "pumpDumpSignals": pump_dump_result.get("signals", {}),  # ✅ Detection signals
+                "recommendation": pump_dump_result.get("recommendation", "")  # ✅ Recommendation
+            })
+        return topics
+
+    def count_posts_in_database(self, source: str) -> int:
+        """นับ posts ทั้งหมดใน collections ของ source (ใช้ในข้อความตอนไม่มีข้อมูล)"""
+        if db is None:
+            return 0
+        total = 0
+        for collection_name in get_source_collections(source):
+            if hasattr(db, collection_name):
+                total += getattr(db, collection_name).estimated_document_count()
+        return total
+
+
+# Global instance
+trending_aggregator = TrendingAggregator()
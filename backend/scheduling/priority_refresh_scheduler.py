@@ -0,0 +1,351 @@
+"""
+Priority Refresh Scheduler
+เลือกลำดับการอัปเดตหุ้นตามความสำคัญ แทนการอัปเดตทีละ batch 50 ตัวเท่ากันหมด
+- tier ของหุ้น: watchlist/alerts → critical, mentions เยอะ → hot, มี mentions → normal, อื่นๆ → cold
+- แต่ละ tier มี SLA (อายุข้อมูลสูงสุดเป็นนาที) - หุ้นที่ใกล้/เกิน SLA จะถูกอัปเดต
+- priority = น้ำหนัก tier × (อายุ / SLA) + log(1 + mentions ต่อชั่วโมง)
+- รัน process_single_stock_async ภายใต้ concurrency budget เดียว และเก็บสถิติการทำ SLA ต่อ tier
+- วางแผนใหม่ระหว่างรอบ (ทุก replan_seconds) - หุ้นที่ถึงเวลากลางรอบถูกเพิ่มเข้าคิวทันที
+- guard แยกต่อกลุ่ม tier: งาน critical/hot ที่มาระหว่างรอบใหญ่จะถูกแทรกเข้าคิวของรอบนั้น (ไม่ถูกข้าม)
+"""
+import asyncio
+import heapq
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+from database.db_config import db
+from processors.batch_data_processor import batch_processor
+from processors.mention_rollup import ALL_TICKERS, COLLECTION_NAME, floor_bucket
+from utils.blocking_executor import blocking_executor
+
+# SLA ต่อ tier (นาที) - normal เท่ากับรอบเดิม 30 นาที
+DEFAULT_TIER_SLAS = {"critical": 10, "hot": 15, "normal": 30, "cold": 120}
+TIER_WEIGHTS = {"critical": 8.0, "hot": 4.0, "normal": 2.0, "cold": 1.0}
+TIER_ORDER = ("critical", "hot", "normal", "cold")
+
+# mentions ต่อชั่วโมง (reddit + yahoo) ที่ถือว่า "hot"
+HOT_MENTIONS_PER_HOUR = 5.0
+# อายุสูงสุดที่ใช้คิด priority (หุ้นที่ยังไม่เคยดึง = MAX_STALENESS)
+MAX_STALENESS = 10.0
+
+
+def parse_tier_slas(value: Optional[str]) -> Dict[str, float]:
+    """แปลง "critical=10,hot=15,..." เป็น dict (ค่าที่ไม่ได้ระบุใช้ default)"""
+    slas = dict(DEFAULT_TIER_SLAS)
+    for part in (value or "").split(","):
+        if "=" in part:
+            tier, minutes = part.split("=", 1)
+            tier = tier.strip().lower()
+            if tier in slas:
+                try:
+                    slas[tier] = float(minutes)
+                except ValueError:
+                    pass
+    return slas
+
+
+class PriorityRefreshScheduler:
+    """
+    Priority queue scheduler สำหรับ BatchDataProcessor
+
+    Args:
+        processor: BatchDataProcessor (default: batch_processor)
+        concurrency: จำนวนหุ้นที่อัปเดตพร้อมกันสูงสุด (global budget)
+        tier_slas: SLA ต่อ tier (นาที)
+        velocity_window_hours: ช่วงเวลาที่ใช้คำนวณ mentions ต่อชั่วโมง
+        due_fraction: เริ่มอัปเดตเมื่ออายุข้อมูลถึงสัดส่วนนี้ของ SLA (ก่อนเกิน SLA)
+        replan_seconds: ระยะเวลาระหว่างการวางแผนใหม่กลางรอบ
+    """
+
+    def __init__(self, processor=None, concurrency: int = 50, tier_slas: Optional[Dict[str, float]] = None,
+                 velocity_window_hours: int = 6, due_fraction: float = 0.8, replan_seconds: float = 60):
+        self.processor = processor or batch_processor
+        self.concurrency = concurrency
+        self.tier_slas = dict(tier_slas or DEFAULT_TIER_SLAS)
+        self.velocity_window_hours = velocity_window_hours
+        self.due_fraction = due_fraction
+        self.replan_seconds = replan_seconds
+        self._lock = threading.Lock()
+        # รอบที่กำลังรันต่อกลุ่ม tier: frozenset(tiers) -> {"replan": bool}
+        self._active_cycles: Dict[FrozenSet[str], Dict] = {}
+        # หุ้นที่กำลังอัปเดตอยู่ (ทุกรอบ) - รอบที่รันซ้อนกันจะไม่อัปเดตหุ้นเดียวกันพร้อมกัน
+        self._in_flight: Set[str] = set()
+        self.last_cycle: Dict = {}
+        self.totals = {tier: {"refreshed": 0, "failed": 0, "slaMet": 0, "slaMissed": 0} for tier in TIER_ORDER}
+
+    # ------------------------------------------------------------------
+    # Signals
+    # ------------------------------------------------------------------
+    def _load_watchlist(self) -> Set[str]:
+        if db is None or not hasattr(db, 'watchlist'):
+            return set()
+        try:
+            tickers = set()
+            for doc in db.watchlist.find({}, {"tickers": 1, "_id": 0}):
+                tickers.update(str(t).upper() for t in doc.get("tickers", []) if t)
+            return tickers
+        except Exception as e:
+            print(f"⚠️ Error loading watchlist: {e}")
+            return set()
+
+    def _load_alert_tickers(self) -> Set[str]:
+        if db is None or not hasattr(db, 'alerts'):
+            return set()
+        try:
+            tickers = set()
+            for doc in db.alerts.find({"enabled": {"$ne": False}}, {"tickers": 1, "_id": 0}):
+                tickers.update(str(t).upper() for t in doc.get("tickers", []) or [] if t)
+            return tickers
+        except Exception as e:
+            print(f"⚠️ Error loading alert tickers: {e}")
+            return set()
+
+    def _load_mention_velocity(self, now: datetime) -> Dict[str, float]:
+        """mentions ต่อชั่วโมงจาก ticker_mentions rollup (post_reddit + post_yahoo)"""
+        if db is None or not hasattr(db, COLLECTION_NAME):
+            return {}
+        try:
+            start = floor_bucket(now - timedelta(hours=self.velocity_window_hours), "1h")
+            rows = getattr(db, COLLECTION_NAME).aggregate([
+                {"$match": {
+                    "granularity": "1h",
+                    "bucket": {"$gte": start},
+                    "source": {"$in": ["reddit", "yahoo"]},
+                    "ticker": {"$ne": ALL_TICKERS},
+                }},
+                {"$group": {"_id": "$ticker", "mentions": {"$sum": "$mentions"}}},
+            ])
+            return {row["_id"]: row["mentions"] / self.velocity_window_hours for row in rows}
+        except Exception as e:
+            print(f"⚠️ Error loading mention velocity: {e}")
+            return {}
+
+    def load_signals(self, now: Optional[datetime] = None) -> Dict:
+        """โหลด watchlist, alert subscriptions และ mention velocity"""
+        now = now or datetime.utcnow()
+        return {
+            "watchlist": self._load_watchlist(),
+            "alerts": self._load_alert_tickers(),
+            "velocity": self._load_mention_velocity(now),
+        }
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+    @staticmethod
+    def classify(symbol: str, signals: Dict) -> str:
+        """tier ของหุ้นจาก signals"""
+        if symbol in signals["watchlist"] or symbol in signals["alerts"]:
+            return "critical"
+        velocity = signals["velocity"].get(symbol, 0.0)
+        if velocity >= HOT_MENTIONS_PER_HOUR:
+            return "hot"
+        if velocity > 0:
+            return "normal"
+        return "cold"
+
+    def plan(self, symbols: Iterable[str], freshness_map: Optional[Dict[str, Optional[datetime]]],
+             signals: Dict, now: Optional[datetime] = None, tiers: Optional[Iterable[str]] = None) -> Dict:
+        """
+        สร้าง priority queue ของหุ้นที่ถึงเวลาอัปเดต
+
+        Returns:
+            {"queue": heap ของ (-priority, symbol, task), "tiers": สถิติต่อ tier ตอนวางแผน}
+        """
+        now = now or datetime.utcnow()
+        allowed = set(tiers) if tiers else set(TIER_ORDER)
+        freshness_map = freshness_map or {}
+        queue = []
+        tier_stats = {tier: {"symbols": 0, "withinSla": 0, "due": 0} for tier in TIER_ORDER}
+
+        for symbol in dict.fromkeys(s.upper() for s in symbols if s):
+            tier = self.classify(symbol, signals)
+            sla = self.tier_slas[tier]
+            fetched_at = freshness_map.get(symbol)
+            age_minutes = (now - fetched_at).total_seconds() / 60 if fetched_at else None
+
+            stats = tier_stats[tier]
+            stats["symbols"] += 1
+            if age_minutes is not None and age_minutes <= sla:
+                stats["withinSla"] += 1
+
+            if tier not in allowed:
+                continue
+            if age_minutes is not None and age_minutes < sla * self.due_fraction:
+                continue  # ยังไม่ถึงเวลา
+
+            stats["due"] += 1
+            staleness = MAX_STALENESS if age_minutes is None else min(MAX_STALENESS, age_minutes / sla)
+            velocity = signals["velocity"].get(symbol, 0.0)
+            priority = TIER_WEIGHTS[tier] * staleness + math.log1p(velocity)
+            task = {"symbol": symbol, "tier": tier, "slaMinutes": sla, "ageMinutes": age_minutes,
+                    "velocity": velocity, "priority": priority, "plannedAt": time.time()}
+            queue.append((-priority, symbol, task))
+
+        heapq.heapify(queue)
+        for stats in tier_stats.values():
+            stats["coverage"] = round(stats["withinSla"] / stats["symbols"], 4) if stats["symbols"] else None
+        return {"queue": queue, "tiers": tier_stats}
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+    async def run_cycle(self, symbols: Iterable[str], tiers: Optional[Iterable[str]] = None) -> Optional[Dict]:
+        """
+        วางแผนและอัปเดตหุ้นตาม priority
+
+        ถ้ามีรอบที่ครอบคลุม tiers เดียวกันกำลังรันอยู่ จะให้รอบนั้นวางแผนใหม่ทันที (หุ้นที่ถึงเวลาถูกแทรกเข้าคิว)
+        แทนการเริ่มรอบซ้อน - กลุ่ม tier อื่น (เช่น critical/hot ระหว่างรอบ cold) รันพร้อมกันได้
+
+        Args:
+            symbols: หุ้นทั้งหมดที่ติดตาม
+            tiers: จำกัดเฉพาะ tiers ที่ระบุ (None = ทุก tier)
+
+        Returns:
+            สรุปรอบ (หรือ None ถ้าแทรกเข้ารอบที่กำลังรันอยู่)
+        """
+        group = frozenset(tiers) if tiers else frozenset(TIER_ORDER)
+        with self._lock:
+            covering = next((state for running, state in self._active_cycles.items() if group <= running), None)
+            if covering is not None:
+                covering["replan"] = True
+                print(f"⏭️  priority refresh ({', '.join(sorted(group))}) แทรกเข้ารอบที่กำลังรันอยู่")
+                return None
+            cycle_state = {"replan": False}
+            self._active_cycles[group] = cycle_state
+
+        symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+        try:
+            started = time.time()
+            now = datetime.utcnow()
+            freshness_map = self.processor.get_freshness_map()
+            signals = self.load_signals(now)
+            plan = self.plan(symbols, freshness_map, signals, now, group)
+            queue = plan["queue"]
+            planning_seconds = time.time() - started
+
+            cycle = {
+                "startedAt": now.isoformat(),
+                "tiersRequested": [tier for tier in TIER_ORDER if tier in group],
+                "planningSeconds": round(planning_seconds, 3),
+                "due": len(queue),
+                "replans": 0,
+                "addedMidCycle": 0,
+                "tiers": {tier: {**plan["tiers"][tier], "slaMinutes": self.tier_slas[tier], "refreshed": 0,
+                                 "failed": 0, "slaMet": 0, "slaMissed": 0, "maxLatenessMinutes": 0.0}
+                          for tier in TIER_ORDER},
+            }
+            print(f"📋 Priority refresh: {len(queue):,} หุ้นถึงเวลาอัปเดต (วางแผนใน {planning_seconds:.2f} วินาที) - "
+                  + ", ".join(f"{tier} {cycle['tiers'][tier]['due']}" for tier in TIER_ORDER))
+
+            queued = {symbol for _, symbol, _ in queue}
+            next_replan = time.time() + self.replan_seconds
+            replan_lock = asyncio.Lock()
+
+            async def replan():
+                """วางแผนใหม่: เพิ่มหุ้นที่ถึงเวลาระหว่างรอบ (ที่ยังไม่เคยอยู่ในคิวของรอบนี้)"""
+                nonlocal next_replan
+                async with replan_lock:
+                    if time.time() < next_replan and not cycle_state["replan"]:
+                        return
+                    cycle_state["replan"] = False
+                    next_replan = time.time() + self.replan_seconds
+                    replan_now = datetime.utcnow()
+                    # query database ใน blocking_executor (ไม่บล็อก workers ที่กำลังรอ network)
+                    fresh = await blocking_executor.run(self.processor.get_freshness_map)
+                    replan_signals = await blocking_executor.run(self.load_signals, replan_now)
+                    added = 0
+                    for entry in self.plan(symbols, fresh, replan_signals, replan_now, group)["queue"]:
+                        if entry[1] not in queued:
+                            queued.add(entry[1])
+                            heapq.heappush(queue, entry)
+                            cycle["tiers"][entry[2]["tier"]]["due"] += 1
+                            added += 1
+                    cycle["replans"] += 1
+                    cycle["addedMidCycle"] += added
+                    cycle["due"] += added
+                    if added:
+                        print(f"📋 Priority refresh: เพิ่ม {added:,} หุ้นที่ถึงเวลาระหว่างรอบ")
+
+            async def worker():
+                while True:
+                    if cycle_state["replan"] or time.time() >= next_replan:
+                        await replan()
+                    if not queue:
+                        return
+                    _, symbol, task = heapq.heappop(queue)
+                    with self._lock:
+                        if symbol in self._in_flight:
+                            continue  # รอบอื่นกำลังอัปเดตหุ้นนี้อยู่
+                        self._in_flight.add(symbol)
+                    try:
+                        # scheduler ตัดสินแล้วว่าถึงเวลา → ส่ง map ว่าง (ให้ดึง stock info ใหม่โดยไม่ query ซ้ำ)
+                        result = await self.processor.process_single_stock_async(symbol, freshness_map={})
+                    except Exception:
+                        result = None
+                    finally:
+                        with self._lock:
+                            self._in_flight.discard(symbol)
+                    self._record(cycle["tiers"][task["tier"]], task, result)
+
+            # workers ครบ budget (คิวอาจโตขึ้นจากการวางแผนใหม่กลางรอบ)
+            await asyncio.gather(*[worker() for _ in range(max(1, self.concurrency))])
+            await self.processor.close_async_sessions()
+
+            cycle["elapsedSeconds"] = round(time.time() - started, 1)
+            self.last_cycle = cycle
+            return cycle
+        finally:
+            with self._lock:
+                self._active_cycles.pop(group, None)
+
+    def _record(self, tier_metrics: Dict, task: Dict, result: Optional[Dict]):
+        """บันทึกผลการอัปเดตหนึ่งหุ้น (SLA met = อายุข้อมูลตอนอัปเดตเสร็จไม่เกิน SLA)"""
+        totals = self.totals[task["tier"]]
+        if not result:
+            tier_metrics["failed"] += 1
+            totals["failed"] += 1
+            return
+
+        tier_metrics["refreshed"] += 1
+        totals["refreshed"] += 1
+        if task["ageMinutes"] is None:
+            return  # หุ้นใหม่ - ไม่นับ SLA
+
+        age_at_refresh = task["ageMinutes"] + (time.time() - task["plannedAt"]) / 60
+        lateness = age_at_refresh - task["slaMinutes"]
+        if lateness <= 0:
+            tier_metrics["slaMet"] += 1
+            totals["slaMet"] += 1
+        else:
+            tier_metrics["slaMissed"] += 1
+            totals["slaMissed"] += 1
+            tier_metrics["maxLatenessMinutes"] = round(max(tier_metrics["maxLatenessMinutes"], lateness), 1)
+
+    def get_metrics(self) -> Dict:
+        """สถิติ SLA ต่อ tier (รอบล่าสุด + สะสม)"""
+        totals = {}
+        for tier, counts in self.totals.items():
+            measured = counts["slaMet"] + counts["slaMissed"]
+            totals[tier] = {**counts, "slaCompliance": round(counts["slaMet"] / measured, 4) if measured else None}
+        return {
+            "tierSlasMinutes": self.tier_slas,
+            "concurrency": self.concurrency,
+            "running": bool(self._active_cycles),
+            "activeTierGroups": [sorted(group) for group in self._active_cycles],
+            "inFlight": len(self._in_flight),
+            "lastCycle": self.last_cycle,
+            "totals": totals,
+        }
+
+
+# Global instance
+priority_refresh_scheduler = PriorityRefreshScheduler(
+    concurrency=int(os.getenv("REFRESH_CONCURRENCY", 50)),
+    tier_slas=parse_tier_slas(os.getenv("REFRESH_TIER_SLAS")),
+    replan_seconds=float(os.getenv("REFRESH_REPLAN_SECONDS", 60))
+)
@@ -1,64 +1,143 @@
 """
 Reddit Bulk Scheduler
-รัน Reddit bulk fetch ทุก 45 วินาที
+service ดึง Reddit ต่อเนื่องบน event loop เดียวที่อยู่ตลอดอายุของ process
+- Reddit client (asyncpraw) และ aiohttp connector ตัวเดียว ใช้ซ้ำทุกรอบ (connection ถูก reuse)
+- รันทีละรอบต่อกัน (ไม่มีรอบซ้อนกัน) - รอบถัดไปเริ่มหลังรอบก่อนเสร็จเท่านั้น
+- adaptive pacing: posts ใหม่เยอะ/comments ค้างคิว → รอบถี่ขึ้น, ไม่มี posts ใหม่ → ห่างขึ้น
+  (ไม่เกิน max_interval, error ติดกัน → backoff)
+- Reddit client / session พัง → backoff แล้วสร้างใหม่ (thread ของ service ไม่ตาย)
+- get_metrics(): เวลาต่อรอบ, interval ปัจจุบัน, backlog ของ comment queue
 """
 import asyncio
-import schedule
-import time
+import os
 import threading
+import time
+from collections import deque
 from datetime import datetime
+from typing import Dict, Optional
+
+import aiohttp
+
 from processors.reddit_bulk_processor import RedditBulkProcessor
+from utils.blocking_executor import blocking_executor
 from utils.stock_list_fetcher import stock_list_fetcher
 
+# posts ต่อรอบที่ถือว่า "เยอะ" (รอบถัดไปเร็วขึ้น)
+BUSY_POSTS_PER_CYCLE = 50
+
+
+def _percentile(values, fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
 class RedditBulkScheduler:
     """
-    Scheduler สำหรับ Reddit bulk fetch
+    Service สำหรับ Reddit bulk fetch (event loop + Reddit client เดียว)
+
+    Args:
+        interval: ระยะห่างระหว่างจุดเริ่มของแต่ละรอบ (วินาที) ในสภาวะปกติ
+        min_interval: ระยะห่างต่ำสุด (posts ใหม่เยอะ / comments ค้างคิว)
+        max_interval: ระยะห่างสูงสุด (ไม่มี posts ใหม่ / error ติดกัน)
+        connector_limit: จำนวน connections สูงสุดของ aiohttp connector
     """
-    
-    def __init__(self):
+
+    def __init__(self, interval: float = 45, min_interval: float = 10, max_interval: float = 180,
+                 connector_limit: int = 32):
         self.processor = RedditBulkProcessor()
         self.is_running = False
         self.thread = None
         self.valid_tickers = None
+        self.base_interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.connector_limit = connector_limit
+        self.interval = interval
         self._fetch_in_progress = False  # ✅ ตรวจสอบว่า bulk fetch กำลังรันอยู่หรือไม่
-    
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._serve_task: Optional[asyncio.Task] = None
+        self._cycle_seconds = deque(maxlen=50)
+        self._consecutive_failures = 0
+        self.last_cycle: Dict = {}
+        self.next_sweep_at: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.totals = {"cycles": 0, "failures": 0, "postsFetched": 0, "postsSaved": 0, "skippedOverlap": 0,
+                       "clientRestarts": 0}
+
     def _load_valid_tickers(self):
         """โหลด valid tickers (cache)"""
         if self.valid_tickers is None:
             all_tickers = stock_list_fetcher.get_all_valid_tickers(force_refresh=False)
             self.valid_tickers = {t.upper() for t in all_tickers}
         return self.valid_tickers
-    
-    async def _run_bulk_fetch(self):
-        """รัน bulk fetch"""
+
+    def _next_interval(self, posts_fetched: int, comment_backlog: int) -> float:
+        """
+        ปรับระยะห่างของรอบถัดไปตามผลของรอบนี้
+
+        Args:
+            posts_fetched: จำนวน posts ใหม่ในรอบนี้
+            comment_backlog: จำนวน posts ที่ยังค้างในคิว comments หลัง drain
+
+        Returns:
+            interval ใหม่ (วินาที)
+        """
+        if self._consecutive_failures:
+            # ✅ error ติดกัน → backoff แบบ exponential
+            return min(self.max_interval, self.base_interval * 2 ** self._consecutive_failures)
+        if posts_fetched >= BUSY_POSTS_PER_CYCLE or comment_backlog:
+            return max(self.min_interval, self.interval * 0.5)
+        if posts_fetched == 0:
+            return min(self.max_interval, self.interval * 1.5)
+        # ปกติ → กลับเข้าหา base interval
+        return (self.interval + self.base_interval) / 2
+
+    async def _run_bulk_fetch(self, reddit=None) -> float:
+        """
+        รัน bulk fetch หนึ่งรอบ
+
+        Args:
+            reddit: Reddit instance ของ service (None = processor สร้างใหม่สำหรับรอบนี้)
+
+        Returns:
+            เวลาที่ต้องรอก่อนเริ่มรอบถัดไป (วินาที)
+        """
         # ✅ ตรวจสอบว่ามี bulk fetch กำลังรันอยู่หรือไม่
         if self._fetch_in_progress:
+            self.totals["skippedOverlap"] += 1
             print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ⏭️  ข้าม Reddit bulk (ยังมีงานกำลังรันอยู่)")
-            return
-        
+            return self.interval
+
         # ✅ ตั้ง flag ว่า bulk fetch กำลังรันอยู่
         self._fetch_in_progress = True
-        
+        started = time.perf_counter()
+        started_at = datetime.utcnow().isoformat()
+        result = None
+        error = None
+
         try:
             print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 🔄 เริ่มดึง Reddit bulk...")
             print(f"   💡 ระบบทำงานต่อเนื่อง - ข้อมูลจะถูกบันทึกใน database อัตโนมัติ")
-            
-            valid_tickers = self._load_valid_tickers()
+
+            valid_tickers = await blocking_executor.run(self._load_valid_tickers)
             print(f"   📋 Valid tickers loaded: {len(valid_tickers)} tickers")
-            
-            result = await self.processor.run_bulk_fetch(valid_tickers)
-            
+
+            result = await self.processor.run_bulk_fetch(valid_tickers, reddit=reddit)
+
             print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✅ Reddit bulk เสร็จ:")
             print(f"   📊 Posts ที่ดึงได้: {result['posts_fetched']}")
             print(f"   🔍 Posts ที่มี ticker: {result['posts_processed']}")
             print(f"   💬 Symbols ที่พบ: {result['symbols_found']}")
             print(f"   💾 Posts ที่บันทึก: {result['posts_saved']}")
-            
+
             # ✅ แสดง warning ถ้าไม่มี posts ที่บันทึก
             if result['posts_fetched'] > 0 and result['posts_saved'] == 0:
                 print(f"   ⚠️  WARNING: ดึงได้ {result['posts_fetched']} posts แต่ไม่มี ticker → ไม่บันทึก")
                 print(f"   💡 ตรวจสอบว่า valid_tickers มีข้อมูลหรือไม่ และ posts มี ticker symbols หรือไม่")
-            
+
             # ✅ แสดงจำนวน posts ทั้งหมดใน database
             try:
                 from utils.post_normalizer import get_collection_name
@@ -66,75 +145,187 @@ class RedditBulkScheduler:
                 collection_name = get_collection_name('reddit')
                 if db is not None and hasattr(db, collection_name):
                     post_collection = getattr(db, collection_name)
-                    total_posts = post_collection.count_documents({})
+                    total_posts = await blocking_executor.run(post_collection.estimated_document_count)
                     print(f"   📚 จำนวน posts ทั้งหมดใน database: {total_posts:,}")
             except Exception:
                 pass
-            
-            print(f"   ⏰ ครั้งถัดไปจะดึงในอีก 45 วินาที")
-            
+
+            self._consecutive_failures = 0
+            self.last_success_at = time.time()
+
         except Exception as e:
+            error = str(e)
+            self._consecutive_failures += 1
+            self.totals["failures"] += 1
             print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ❌ Error ใน Reddit bulk: {e}")
             import traceback
             traceback.print_exc()
         finally:
             # ✅ ตั้ง flag ว่า bulk fetch เสร็จแล้ว
             self._fetch_in_progress = False
-    
-    def _run_async(self):
-        """รัน async function ใน thread"""
+
+        seconds = time.perf_counter() - started
+        posts_fetched = result["posts_fetched"] if result else 0
+        comment_backlog = len(self.processor.comment_queue)
+        self._cycle_seconds.append(seconds)
+        self.totals["cycles"] += 1
+        self.totals["postsFetched"] += posts_fetched
+        self.totals["postsSaved"] += result["posts_saved"] if result else 0
+        self.interval = self._next_interval(posts_fetched, comment_backlog)
+        # ✅ นับจากจุดเริ่มของรอบ - รอบที่ช้ากว่า interval เริ่มรอบถัดไปทันที (แต่ไม่ซ้อนกัน)
+        delay = max(0.0, self.interval - seconds)
+        self.last_cycle = {
+            "startedAt": started_at,
+            "seconds": round(seconds, 2),
+            "postsFetched": posts_fetched,
+            "postsSaved": result["posts_saved"] if result else 0,
+            "commentBacklog": comment_backlog,
+            "error": error,
+        }
+        print(f"   ⏰ ครั้งถัดไปจะดึงในอีก {delay:.0f} วินาที (รอบนี้ {seconds:.1f}s, interval {self.interval:.0f}s)")
+        return delay
+
+    async def _wait_for_stop(self, delay: float) -> bool:
+        """รอ delay วินาที หรือจนกว่าจะสั่งหยุด (True = ถูกสั่งหยุด)"""
+        self.next_sweep_at = datetime.utcfromtimestamp(time.time() + delay).isoformat()
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        return self._stop_event.is_set()
+
+    async def _serve(self):
+        """
+        loop หลักของ service
+        error นอกรอบ (สร้าง Reddit client / session พัง) → backoff แล้วสร้าง client ใหม่ (service ไม่หยุด)
+        """
+        while self.is_running and not self._stop_event.is_set():
+            try:
+                await self._serve_client()
+            except Exception as e:
+                self._consecutive_failures += 1
+                self.totals["failures"] += 1
+                self.totals["clientRestarts"] += 1
+                # ✅ backoff แบบ exponential เหมือนรอบที่ error (ไม่เกิน max_interval)
+                self.interval = self._next_interval(0, 0)
+                self.last_cycle = {**self.last_cycle, "error": str(e)}
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ❌ Reddit client error: {e}"
+                      f" → สร้าง client ใหม่ในอีก {self.interval:.0f} วินาที")
+                import traceback
+                traceback.print_exc()
+                if await self._wait_for_stop(self.interval):
+                    break
+        self.next_sweep_at = None
+
+    async def _serve_client(self):
+        """รันรอบต่อกันบน Reddit client และ connector เดียว (จนกว่าจะสั่งหยุด หรือ client พัง)"""
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connector_limit, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=None)
+        )
+        reddit = None
+        try:
+            reddit = await self.processor.get_reddit_instance(session=session)
+            while self.is_running and not self._stop_event.is_set():
+                delay = await self._run_bulk_fetch(reddit)
+                if await self._wait_for_stop(delay):
+                    break
+        finally:
+            try:
+                if reddit is not None:
+                    await reddit.close()
+            except Exception as e:
+                print(f"⚠️  Error closing Reddit client: {e}")
+            if not session.closed:
+                await session.close()
+
+    def _run_loop(self):
+        """event loop ของ service (thread เดียวตลอดอายุ service)"""
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        loop.run_until_complete(self._run_bulk_fetch())
-        loop.close()
-    
-    def _scheduled_job(self):
-        """Job ที่ schedule เรียก"""
-        if self.is_running:
-            # รันใน thread แยกเพื่อไม่ block
-            thread = threading.Thread(target=self._run_async, daemon=True)
-            thread.start()
-    
+        self._loop = loop
+        self._stop_event = asyncio.Event()
+        try:
+            self._serve_task = loop.create_task(self._serve())
+            loop.run_until_complete(self._serve_task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"❌ Reddit ingest loop หยุดทำงาน: {e}")
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+            self._loop = None
+            self.is_running = False
+
     def start(self):
-        """เริ่ม scheduler"""
+        """เริ่ม service (รอบแรกเริ่มทันที)"""
         if self.is_running:
             print("⚠️  Reddit bulk scheduler กำลังรันอยู่แล้ว")
             return
-        
+
         self.is_running = True
-        
-        # ✅ Schedule ทุก 45 วินาที (ลดความถี่เพื่อหลีกเลี่ยง rate limit)
-        schedule.every(45).seconds.do(self._scheduled_job)
-        
-        print("✅ Reddit bulk scheduler เริ่มทำงาน (ทุก 45 วินาที)")
-        
-        # รัน job ครั้งแรกทันที
-        self._scheduled_job()
-        
-        # รัน scheduler loop
         # ✅ ทำงานต่อเนื่องแม้ไม่มีผู้ใช้ใช้งาน (daemon thread)
-        def run_scheduler():
-            print(f"✅ Reddit bulk scheduler thread started - จะทำงานต่อเนื่องแม้ไม่มีผู้ใช้ใช้งาน")
-            while self.is_running:
-                try:
-                    schedule.run_pending()
-                    time.sleep(1)
-                except Exception as e:
-                    print(f"⚠️ Error in Reddit scheduler loop: {e}")
-                    time.sleep(5)  # รอ 5 วินาทีแล้วลองใหม่
-        
-        self.thread = threading.Thread(target=run_scheduler, daemon=True)
+        self.thread = threading.Thread(target=self._run_loop, name="reddit-ingest", daemon=True)
         self.thread.start()
-    
-    def stop(self):
-        """หยุด scheduler"""
+        print(f"✅ Reddit bulk scheduler เริ่มทำงาน (ทุก {self.base_interval:.0f} วินาที, "
+              f"ปรับได้ {self.min_interval:.0f}-{self.max_interval:.0f} วินาที)")
+
+    def stop(self, timeout: float = 90):
+        """
+        หยุด service - รอรอบที่กำลังรันอยู่ให้เสร็จ (watermarks/comments ถูกบันทึก) แล้วปิด Reddit client
+
+        Args:
+            timeout: เวลารอสูงสุด (วินาที) ก่อน cancel รอบที่ค้างอยู่
+        """
+        if not self.is_running:
+            return
         self.is_running = False
-        schedule.clear()
+        loop, thread = self._loop, self.thread
+        if loop is not None and self._stop_event is not None:
+            loop.call_soon_threadsafe(self._stop_event.set)
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive() and self._loop is not None and self._serve_task is not None:
+                print("⚠️  Reddit bulk รอบปัจจุบันยังไม่เสร็จ → cancel")
+                self._loop.call_soon_threadsafe(self._serve_task.cancel)
+                thread.join(10)
         print("⏹️  Reddit bulk scheduler หยุดทำงาน")
-    
+
     def run_once(self):
-        """รัน bulk fetch ครั้งเดียว (ไม่ schedule)"""
-        self._run_async()
+        """รัน bulk fetch ครั้งเดียว (ไม่ schedule) - ข้ามถ้า service กำลังรันอยู่"""
+        if self.is_running:
+            self.totals["skippedOverlap"] += 1
+            print("⚠️  Reddit bulk scheduler กำลังรันอยู่ - ข้าม run_once")
+            return
+        asyncio.run(self._run_bulk_fetch())
+
+    def get_metrics(self) -> Dict:
+        """เวลาต่อรอบ, pacing และ backlog"""
+        durations = list(self._cycle_seconds)
+        return {
+            "running": self.is_running,
+            "cycleInProgress": self._fetch_in_progress,
+            "intervalSeconds": round(self.interval, 1),
+            "nextSweepAt": self.next_sweep_at,
+            "secondsSinceSuccess": round(time.time() - self.last_success_at, 1) if self.last_success_at else None,
+            "consecutiveFailures": self._consecutive_failures,
+            "cycleSeconds": {
+                "last": round(durations[-1], 2) if durations else None,
+                "avg": round(sum(durations) / len(durations), 2) if durations else None,
+                "p95": round(_percentile(durations, 0.95), 2) if durations else None,
+                "max": round(max(durations), 2) if durations else None,
+            },
+            "backlog": {"comments": len(self.processor.comment_queue)},
+            "lastCycle": self.last_cycle,
+            "totals": self.totals,
+        }
+
 
 # Global instance
-reddit_bulk_scheduler = RedditBulkScheduler()
+reddit_bulk_scheduler = RedditBulkScheduler(
+    interval=float(os.getenv("REDDIT_SWEEP_INTERVAL", 45)),
+    min_interval=float(os.getenv("REDDIT_SWEEP_MIN_INTERVAL", 10)),
+    max_interval=float(os.getenv("REDDIT_SWEEP_MAX_INTERVAL", 180)),
+    connector_limit=int(os.getenv("REDDIT_CONNECTOR_LIMIT", 32))
+)
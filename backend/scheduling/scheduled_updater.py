@@ -6,6 +6,7 @@ import time
 import threading
 from datetime import datetime
 from processors.batch_data_processor import batch_processor
+from scheduling.priority_refresh_scheduler import priority_refresh_scheduler
 from utils.stock_list_fetcher import stock_list_fetcher
 import asyncio
 
@@ -35,9 +36,6 @@ class ScheduledUpdater:
             print(f"\n🔄 Scheduled update (INCREMENTAL) started at {datetime.utcnow().isoformat()}")
             
             try:
-                from database.db_config import db
-                from datetime import timedelta
-                
                 # ✅ ตั้งค่าให้ใช้ Reddit จาก database เท่านั้น (Reddit bulk processor จะดึงมาให้)
                 batch_processor.reddit_from_db_only = True
                 batch_processor.skip_reddit = False  # ใช้ Reddit จาก DB
@@ -50,66 +48,17 @@ class ScheduledUpdater:
                     print("⚠️ No stock symbols found")
                     return
                 
-                # ✅ กรองหุ้นที่ต้องอัปเดต (เก่ากว่า update_interval_hours หรือยังไม่มีข้อมูล)
-                # รองรับทศนิยม (เช่น 0.5 = 30 นาที)
-                cutoff_time = datetime.utcnow() - timedelta(hours=self.update_interval_hours)
-                stocks_to_update = []
-                
-                if db is not None and hasattr(db, 'stocks') and db.stocks is not None:
-                    for symbol in all_symbols:
-                        symbol_upper = symbol.upper()
-                        latest = db.stocks.find_one(
-                            {"symbol": symbol_upper},
-                            sort=[("fetchedAt", -1)]
-                        )
-                        
-                        if not latest:
-                            # ยังไม่มีข้อมูล → ต้องดึง
-                            stocks_to_update.append(symbol)
-                        else:
-                            # ตรวจสอบว่าเก่ากว่า 2 ชั่วโมงหรือไม่
-                            fetched_at_str = latest.get('fetchedAt', '')
-                            if isinstance(fetched_at_str, str):
-                                try:
-                                    fetched_at = datetime.fromisoformat(fetched_at_str.replace('Z', '+00:00'))
-                                except:
-                                    fetched_at = cutoff_time - timedelta(hours=1)  # ถ้า parse ไม่ได้ ให้ดึงใหม่
-                            else:
-                                fetched_at = fetched_at_str
-                            
-                            if fetched_at < cutoff_time:
-                                stocks_to_update.append(symbol)
-                else:
-                    # ถ้าไม่มี database → ดึงทั้งหมด
-                    stocks_to_update = list(all_symbols)
-                
-                if not stocks_to_update:
-                    # ✅ แสดงเวลาที่ถูกต้อง (รองรับทศนิยม)
-                    interval_display = f"{int(self.update_interval_hours * 60)} นาที" if self.update_interval_hours < 1 else f"{self.update_interval_hours} ชั่วโมง"
-                    print(f"✅ ไม่มีหุ้นที่ต้องอัปเดต (ข้อมูลทั้งหมดใหม่กว่า {interval_display})")
-                    return
-                
-                print(f"\n{'='*70}")
-                # ✅ แสดงเวลาที่ถูกต้อง (รองรับทศนิยม)
-                interval_display = f"{int(self.update_interval_hours * 60)} นาที" if self.update_interval_hours < 1 else f"{self.update_interval_hours} ชั่วโมง"
-                print(f"📊 พบ {len(stocks_to_update):,} หุ้นที่ต้องอัปเดต (จากทั้งหมด {len(all_symbols):,} หุ้น)")
-                print(f"   ⏰ หุ้นที่เก่ากว่า {interval_display}")
-                print(f"   📰 คาดว่าจะใช้เวลา ~{len(stocks_to_update) * 0.05:.1f} นาที (ประมาณ 3 วินาทีต่อหุ้น)")
+                # ✅ อัปเดตตาม priority (staleness + mention velocity + watchlist/alerts)
+                # แต่ละ tier มี SLA ของตัวเอง - หุ้นสำคัญไม่ต้องรอหลังหุ้นที่ไม่มีคนสนใจ
                 print(f"   🔴 Reddit: ใช้จาก database เท่านั้น (Reddit bulk processor ดึงมาให้)")
                 print(f"   🚀 รันใน background thread - Flask API ยังทำงานปกติ")
-                print(f"{'='*70}\n")
-                
-                # ✅ แสดง progress bar จะเริ่มแสดงใน process_all_stocks_async
-                # ประมวลผลเฉพาะหุ้นที่ต้องอัปเดต
-                asyncio.run(
-                    batch_processor.process_all_stocks_async(
-                        stocks_to_update,
-                        batch_size=50
-                    )
-                )
+                cycle = asyncio.run(priority_refresh_scheduler.run_cycle(list(all_symbols)))
+                if cycle is None:
+                    return
                 
-                # บันทึกเวลาที่อัปเดตเสร็จ
-                self.last_update_time = datetime.utcnow()
+                if not cycle["due"]:
+                    print(f"✅ ไม่มีหุ้นที่ต้องอัปเดต (ข้อมูลทุก tier ยังอยู่ใน SLA)")
+                    return
                 
                 # บันทึกเวลาที่อัปเดตเสร็จ
                 self.last_update_time = datetime.utcnow()
@@ -118,7 +67,11 @@ class ScheduledUpdater:
                 print("🎉 SCHEDULED UPDATE COMPLETED! 🎉")
                 print("="*70)
                 print(f"✅ Scheduled update (INCREMENTAL) completed at {self.last_update_time.isoformat()}")
-                print(f"   📊 อัปเดต {len(stocks_to_update):,} หุ้น")
+                print(f"   📊 อัปเดต {cycle['due']:,} หุ้น ใน {cycle['elapsedSeconds'] / 60:.1f} นาที")
+                for tier, metrics in cycle["tiers"].items():
+                    if metrics["due"]:
+                        print(f"      {tier:<8} SLA {metrics['slaMinutes']:g} นาที: อัปเดต {metrics['refreshed']:,}, "
+                              f"ทัน SLA {metrics['slaMet']:,}, ไม่ทัน {metrics['slaMissed']:,}")
                 # ✅ แสดงเวลาที่ถูกต้อง (รองรับทศนิยม)
                 interval_display = f"{int(self.update_interval_hours * 60)} นาที" if self.update_interval_hours < 1 else f"{self.update_interval_hours} ชั่วโมง"
                 print(f"   ⏰ ครั้งถัดไปจะอัปเดตในอีก {interval_display}")
@@ -149,6 +102,22 @@ class ScheduledUpdater:
         update_thread.start()
         print(f"✅ Background update thread started (ไม่ block Flask API)")
     
+    def _update_priority_tiers(self):
+        """
+        อัปเดตเฉพาะ tier ที่ SLA สั้น (critical/hot) ระหว่างรอบใหญ่
+        ถ้ารอบใหญ่กำลังรันอยู่ หุ้น critical/hot ที่ถึงเวลาจะถูกแทรกเข้าคิวของรอบนั้น (priority สูงกว่า → ทำก่อน)
+        รันใน background thread เพื่อไม่ block Flask app
+        """
+        def run_priority_in_thread():
+            try:
+                all_symbols = stock_list_fetcher.get_all_valid_tickers(force_refresh=False)
+                if all_symbols:
+                    asyncio.run(priority_refresh_scheduler.run_cycle(list(all_symbols), tiers=("critical", "hot")))
+            except Exception as e:
+                print(f"❌ Error in priority tier update: {e}")
+        
+        threading.Thread(target=run_priority_in_thread, daemon=True).start()
+    
     def _update_popular_stocks(self):
         """
         อัปเดตเฉพาะหุ้นยอดนิยม (เร็วกว่า)
@@ -172,7 +141,8 @@ class ScheduledUpdater:
                 asyncio.run(
                     batch_processor.process_all_stocks_async(
                         popular_symbols,
-                        batch_size=50
+                        batch_size=50,
+                        job="scheduled-popular"
                     )
                 )
                 
@@ -235,6 +205,11 @@ class ScheduledUpdater:
             # ถ้ามากกว่าหรือเท่ากับ 1 ชั่วโมง ให้ใช้ hours
             schedule.every(self.update_interval_hours).hours.do(self._update_all_stocks)
         
+        # ✅ tier ที่ SLA สั้นกว่ารอบใหญ่ (critical/hot) ตรวจทุกครึ่งหนึ่งของ SLA ที่สั้นที่สุด
+        fast_sla = min(priority_refresh_scheduler.tier_slas["critical"], priority_refresh_scheduler.tier_slas["hot"])
+        if fast_sla < self.update_interval_hours * 60:
+            schedule.every(max(1, int(fast_sla / 2))).minutes.do(self._update_priority_tiers)
+        
         # อัปเดตครั้งแรกทันที - ดึงหุ้นทั้งหมด (เฉพาะถ้ายังไม่เคยรัน)
         # ✅ รันใน background thread เพื่อไม่ block Flask app
         if run_initial_update and not self.initial_update_done:
@@ -0,0 +1,164 @@
+"""
+Benchmark article extraction (ms/article) + parity check
+เปรียบเทียบ SoupExtractor (BeautifulSoup html.parser - logic เดิมของ NewsContentFetcher)
+กับ LxmlExtractor (lxml + XPath) และตรวจว่า title/full_content/tags/author/publish_date ตรงกัน
+(ทั้งบนบทความจริง และ HTML ที่ parser ซ่อมต่างกันใน scripts/check_article_extractors.py)
+fallback = จำนวนหน้าที่ LxmlExtractor ส่งต่อให้ bs4 (libxml2 ต้องซ่อม HTML) - สูง = lxml เร็วขึ้นน้อย
+
+HTML บทความจริง:
+- default: disk cache ของ article_http_cache (backend/data/cache/article_html - เก็บไว้ตอนดึงข่าว)
+- --corpus DIR: ไฟล์ *.html / *.htm ใน directory
+- --fetch N: ดึงบทความล่าสุด N ข่าวจาก post_yahoo เข้า disk cache ก่อน (ต้องต่อ network + database)
+
+Usage:
+    python scripts/benchmark_article_extraction.py
+    python scripts/benchmark_article_extraction.py --fetch 200
+    python scripts/benchmark_article_extraction.py --corpus ./saved_pages --repeat 5 --show-diffs 10
+"""
+import sys
+import time
+import zlib
+from pathlib import Path
+
+# ตั้งค่า encoding สำหรับ Windows terminal
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# เพิ่ม path ของ backend เข้าไปใน sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from fetchers.article_extractors import EXTRACTORS, SoupExtractor
+from fetchers.article_http_cache import DEFAULT_CACHE_DIR, BODY_SUFFIX
+from check_article_extractors import COMPARED_FIELDS, PARITY_CASES, check_cases, normalize
+
+
+def fetch_corpus(limit):
+    """ดึงบทความล่าสุดจาก post_yahoo ผ่าน NewsContentFetcher (HTML ถูกเก็บใน disk cache)"""
+    from database.db_config import db
+    from fetchers.news_content_fetcher import NewsContentFetcher
+
+    if db is None:
+        print("❌ Database not available")
+        sys.exit(1)
+
+    fetcher = NewsContentFetcher()
+    urls = [doc["url"] for doc in db.post_yahoo.find({"url": {"$nin": [None, ""]}}, {"url": 1})
+            .sort("fetched_at", -1).limit(limit)]
+    print(f"🌐 Fetching {len(urls)} articles into {DEFAULT_CACHE_DIR} ...")
+    for i, url in enumerate(urls, 1):
+        fetcher.fetch_article_content(url)
+        if i % 20 == 0:
+            print(f"   {i}/{len(urls)}")
+
+
+def load_corpus(corpus_dir=None, limit=None):
+    """HTML (bytes) จาก directory ที่ระบุ หรือจาก disk cache ของ article_http_cache"""
+    pages = []
+    if corpus_dir:
+        paths = sorted(p for p in Path(corpus_dir).iterdir() if p.suffix.lower() in (".html", ".htm"))
+        for path in paths[:limit]:
+            pages.append((path.name, path.read_bytes()))
+        return pages
+
+    cache_dir = Path(DEFAULT_CACHE_DIR)
+    if not cache_dir.exists():
+        return pages
+    for path in sorted(cache_dir.glob("*" + BODY_SUFFIX))[:limit]:
+        try:
+            pages.append((path.name, zlib.decompress(path.read_bytes())))
+        except zlib.error as e:
+            print(f"⚠️ Skip {path.name}: {e}")
+    return pages
+
+
+def check_parity(pages, candidate, show_diffs):
+    """
+    เทียบผลของ candidate กับ SoupExtractor ทีละบทความ
+
+    Returns:
+        {field: จำนวนบทความที่ไม่ตรง}
+    """
+    reference = SoupExtractor()
+    mismatches = {field: 0 for field in COMPARED_FIELDS}
+    shown = 0
+    for name, html in pages:
+        expected = normalize(reference.extract(html))
+        actual = normalize(candidate.extract(html))
+        for field in COMPARED_FIELDS:
+            if expected[field] != actual[field]:
+                mismatches[field] += 1
+                if shown < show_diffs:
+                    shown += 1
+                    print(f"   ≠ {name} [{field}]")
+                    print(f"       bs4 : {str(expected[field])[:160]!r}")
+                    print(f"       {candidate.name:<4}: {str(actual[field])[:160]!r}")
+    return mismatches
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(pages, repeat, show_diffs):
+    total_bytes = sum(len(html) for _, html in pages)
+
+    print("=" * 70)
+    print(f"📊 Article extraction benchmark ({len(pages):,} pages, {total_bytes / 1e6:.1f} MB HTML)")
+    print("=" * 70)
+
+    all_identical = True
+    results = []
+    for name, extractor_class in EXTRACTORS.items():
+        try:
+            extractor = extractor_class()
+        except RuntimeError as e:
+            print(f"   ⚠️ {name}: {e}")
+            continue
+        if extractor_class is not SoupExtractor:
+            failed_cases = check_cases(extractor, show_diffs)
+            print(f"   parity cases ({name} vs bs4): "
+                  f"{'✅ identical' if not failed_cases else '⚠️ ' + ', '.join(failed_cases)} ({len(PARITY_CASES)} cases)")
+            extractor.fallbacks = 0
+            mismatches = check_parity(pages, extractor, show_diffs)
+            differing = {field: count for field, count in mismatches.items() if count}
+            all_identical = all_identical and not differing and not failed_cases
+            print(f"   parity ({name} vs bs4): "
+                  f"{'✅ identical' if not differing else '⚠️ ' + ', '.join(f'{f}: {c}' for f, c in differing.items())}"
+                  f" | fallback to bs4: {extractor.fallbacks}/{len(pages)} pages")
+        results.append((name, timed(lambda: [extractor.extract(html) for _, html in pages], repeat)))
+
+    baseline = results[0][1]
+    for name, seconds in results:
+        print(f"   {name:<10} {seconds * 1000:>9.1f} ms | {seconds * 1000 / len(pages):>7.2f} ms/page | "
+              f"{total_bytes / 1e6 / seconds:>6.1f} MB/s | {baseline / seconds:>5.1f}x")
+    return all_identical
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark article HTML extraction backends")
+    parser.add_argument("--corpus", help="directory ของไฟล์ *.html (default: disk cache ของ article_http_cache)")
+    parser.add_argument("--fetch", type=int, default=0, help="ดึงบทความล่าสุด N ข่าวเข้า disk cache ก่อน")
+    parser.add_argument("--limit", type=int, default=None, help="จำนวนบทความสูงสุด")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--show-diffs", type=int, default=5, help="จำนวน field ที่ไม่ตรงที่จะแสดง")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_corpus(args.fetch)
+    pages = load_corpus(args.corpus, args.limit)
+    if not pages:
+        print("❌ No article HTML found (ใช้ --fetch N หรือ --corpus DIR)")
+        sys.exit(1)
+    # exit code 1 ถ้าผลไม่ตรงกัน (ใช้เป็น parity check ก่อนเปลี่ยน ARTICLE_EXTRACTOR)
+    sys.exit(0 if benchmark(pages, args.repeat, args.show_diffs) else 1)
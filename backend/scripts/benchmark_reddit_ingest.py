@@ -0,0 +1,288 @@
+"""
+Benchmark Reddit ingest (RedditBulkProcessor.run_bulk_fetch) แบบ offline
+ใช้ ReplaySource (fetchers/reddit_replay.py) แทน Reddit จริง แล้ววัด:
+- posts/sec, comments/sec (ทั้งรอบ: listing + comment workers + process + save)
+- เวลาวิเคราะห์ sentiment (sentiment_pool.score_many + SentimentAnalyzer.analyze)
+- เวลา extract tickers (TickerExtractor.extract / extract_dollar)
+- เวลาเขียน MongoDB (insert/update/bulk_write) แยกต่อ collection
+เวลาของ sentiment/ticker/Mongo เป็นเวลารวมของทุก call (calls ที่ทำงานพร้อมกันนับซ้อนกันได้)
+
+Fixture:
+- default: synthetic (--subreddits / --posts / --comments)
+- --fixture PATH: fixture ที่บันทึกไว้ (.json / .json.gz)
+- --record PATH: บันทึก fixture จาก Reddit จริง (ต้องตั้ง REDDIT_CLIENT_ID/SECRET) แล้วจบ
+
+MongoDB: เขียนลง database แยก (--db-name, default reddit_analytics_benchmark - ถูกล้างก่อนรัน)
+หรือ --no-db เพื่อวัดเฉพาะ fetch/process (ไม่บันทึก)
+
+Usage:
+    python scripts/benchmark_reddit_ingest.py --no-db
+    python scripts/benchmark_reddit_ingest.py --posts 500 --comments 40 --latency 50 --throttle-rate 0.02
+    python scripts/benchmark_reddit_ingest.py --record data/fixtures/reddit.json.gz --posts 100
+    python scripts/benchmark_reddit_ingest.py --fixture data/fixtures/reddit.json.gz --json results.json
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from functools import wraps
+from pathlib import Path
+
+# ตั้งค่า encoding สำหรับ Windows terminal
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# เพิ่ม path ของ backend เข้าไปใน sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+import processors.mention_rollup as mention_rollup_module
+import processors.reddit_bulk_processor as bulk_module
+import processors.reddit_watermarks as watermarks_module
+from fetchers.reddit_replay import (ReplaySource, generate_fixture, load_fixture, record_fixture, save_fixture,
+                                    SYNTHETIC_SUBREDDITS)
+from processors.reddit_bulk_processor import RedditBulkProcessor
+from processors.reddit_comment_queue import RedditCommentQueue
+from processors.reddit_watermarks import RedditWatermarks
+from processors.sentiment_pool import sentiment_pool
+from utils.host_rate_limiter import host_rate_limiter, REDDIT_HOST
+
+PRODUCTION_DB_NAME = "reddit_analytics"
+WRITE_METHODS = ("insert_one", "insert_many", "update_one", "update_many", "replace_one", "bulk_write",
+                 "delete_one", "delete_many", "find_one_and_update")
+
+
+class Timer:
+    """เวลารวม + จำนวน calls ต่อชื่อ"""
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, name, seconds):
+        entry = self.totals.setdefault(name, {"calls": 0, "seconds": 0.0})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+
+    def seconds(self, prefix):
+        return sum(entry["seconds"] for name, entry in self.totals.items() if name.startswith(prefix))
+
+    def wrap(self, name, fn):
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+        return timed
+
+    def wrap_async(self, name, fn):
+        @wraps(fn)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+        return timed
+
+
+class TimedCollection:
+    """pymongo Collection ที่จับเวลา write operations"""
+
+    def __init__(self, collection, timer):
+        self._collection = collection
+        self._timer = timer
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in WRITE_METHODS:
+            return self._timer.wrap(f"mongo.{self._collection.name}.{name}", attr)
+        return attr
+
+
+class TimedDatabase:
+    """pymongo Database ที่คืน TimedCollection (processor ใช้ getattr(db, name) / db[name])"""
+
+    def __init__(self, database, timer):
+        self._database = database
+        self._timer = timer
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name in ("list_collection_names", "create_collection", "command", "name"):
+            return getattr(self._database, name)
+        return TimedCollection(self._database[name], self._timer)
+
+    def __getitem__(self, name):
+        return TimedCollection(self._database[name], self._timer)
+
+
+def instrument(processor, timer):
+    """จับเวลา sentiment / ticker extraction ของ processor (แทน attribute ของ instance)"""
+    extractor = processor.ticker_extractor
+    # extract_many เรียก extract ทีละข้อความ (ถูกจับเวลาแล้ว - ไม่ wrap ซ้ำ)
+    for name in ("extract", "extract_dollar"):
+        setattr(extractor, name, timer.wrap(f"ticker.{name}", getattr(extractor, name)))
+    processor.sentiment_analyzer.analyze = timer.wrap("sentiment.analyze", processor.sentiment_analyzer.analyze)
+    sentiment_pool.score_many = timer.wrap_async("sentiment.score_many", sentiment_pool.score_many)
+
+
+def setup_database(db_name, keep, timer):
+    """database แยกสำหรับ benchmark (ล้างก่อนรัน) - คืน TimedDatabase หรือ None"""
+    from database.db_config import client
+
+    if db_name == PRODUCTION_DB_NAME:
+        print(f"❌ --db-name {PRODUCTION_DB_NAME} คือ database จริง - ใช้ชื่ออื่น")
+        sys.exit(1)
+    try:
+        if not keep:
+            client.drop_database(db_name)
+        database = client[db_name]
+        database.post_reddit.create_index("id", unique=True)  # เหมือน setup_database_indexes ของ app.py
+    except Exception as e:
+        print(f"❌ Database not available: {e} (ใช้ --no-db)")
+        sys.exit(1)
+    return TimedDatabase(database, timer)
+
+
+async def run_benchmark(fixture, args):
+    timer = Timer()
+    database = None if args.no_db else setup_database(args.db_name, args.keep, timer)
+    # ✅ processor ใช้ database ของ benchmark (ไม่เขียนลง reddit_analytics)
+    for module in (bulk_module, mention_rollup_module, watermarks_module):
+        module.db = database
+
+    source = ReplaySource(fixture, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                          throttle_rate=args.throttle_rate, rate_limited=args.rate_limited, seed=args.seed)
+    processor = RedditBulkProcessor()
+    processor.subreddits = list(source.subreddits)
+    processor.get_reddit_instance = source.get_reddit_instance
+    processor.comment_queue = RedditCommentQueue(max_size=10 ** 6)
+    processor.comment_drain_seconds = args.drain
+    workdir = tempfile.mkdtemp(prefix="reddit_bench_")
+    processor.watermarks = RedditWatermarks(collection_name="reddit_watermarks",
+                                            journal_path=Path(workdir) / "reddit_watermarks.json")
+    instrument(processor, timer)
+    valid_tickers = {t.upper() for t in (source.tickers or [])}
+
+    cycles = []
+    for cycle in range(args.cycles):
+        timer.totals.clear()
+        before = dict(processor.comment_queue.stats)
+        start = time.perf_counter()
+        result = await processor.run_bulk_fetch(valid_tickers)
+        wall = time.perf_counter() - start
+        comments = processor.comment_queue.stats["commentsFetched"] - before["commentsFetched"]
+        cycles.append({
+            "cycle": cycle + 1,
+            "wallSeconds": round(wall, 3),
+            "listingSeconds": processor.last_sweep_stats.get("wallSeconds"),
+            "postsFetched": result["posts_fetched"],
+            "postsSaved": result["posts_saved"],
+            "commentsFetched": comments,
+            "postsPerSec": round(result["posts_fetched"] / wall, 1) if wall else None,
+            "commentsPerSec": round(comments / wall, 1) if wall else None,
+            "sentimentSeconds": round(timer.seconds("sentiment."), 3),
+            "tickerSeconds": round(timer.seconds("ticker."), 3),
+            "mongoWriteSeconds": round(timer.seconds("mongo."), 3),
+            "breakdown": {name: {"calls": e["calls"], "seconds": round(e["seconds"], 4)}
+                          for name, e in sorted(timer.totals.items())},
+        })
+
+    return {
+        "fixture": {"subreddits": len(source.subreddits),
+                    "posts": sum(len(posts) for posts in source.subreddits.values()),
+                    "comments": sum(len(p.get("comments") or []) for posts in source.subreddits.values()
+                                    for p in posts)},
+        "settings": {"latencyMs": args.latency, "jitterMs": args.jitter, "throttleRate": args.throttle_rate,
+                     "rateLimited": args.rate_limited, "database": None if args.no_db else args.db_name,
+                     "subredditConcurrency": processor.subreddit_concurrency,
+                     "commentWorkers": processor.comment_workers},
+        "replay": source.stats,
+        "rateLimiter": host_rate_limiter.get_stats().get(REDDIT_HOST) if args.rate_limited else None,
+        "cycles": cycles,
+    }
+
+
+def print_report(report):
+    fixture = report["fixture"]
+    print("\n" + "=" * 70)
+    print(f"📊 Reddit ingest benchmark ({fixture['subreddits']} subreddits, {fixture['posts']:,} posts, "
+          f"{fixture['comments']:,} comments)")
+    print("=" * 70)
+    settings = report["settings"]
+    print(f"   latency {settings['latencyMs']}ms (+{settings['jitterMs']}ms jitter) | 429 rate {settings['throttleRate']} | "
+          f"rate limiter {'on' if settings['rateLimited'] else 'off'} | db {settings['database'] or '-'}")
+    for cycle in report["cycles"]:
+        print(f"\n   รอบ {cycle['cycle']}: {cycle['wallSeconds']:.2f}s (listing {cycle['listingSeconds']}s)")
+        print(f"      posts    {cycle['postsFetched']:>7,} fetched | {cycle['postsSaved']:>7,} saved | "
+              f"{cycle['postsPerSec']:>8} posts/s")
+        print(f"      comments {cycle['commentsFetched']:>7,} fetched | {cycle['commentsPerSec']:>8} comments/s")
+        print(f"      sentiment {cycle['sentimentSeconds']:.3f}s | tickers {cycle['tickerSeconds']:.3f}s | "
+              f"mongo writes {cycle['mongoWriteSeconds']:.3f}s")
+        for name, entry in cycle["breakdown"].items():
+            print(f"         {name:<40} {entry['calls']:>7,} calls {entry['seconds'] * 1000:>10.1f} ms")
+    replay = report["replay"]
+    print(f"\n   replay requests: {replay['requests']:,} (listing {replay['listingPages']:,}, "
+          f"loads {replay['submissionLoads']:,}, morechildren {replay['moreChildren']:,}, 429 {replay['throttled']:,})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark RedditBulkProcessor.run_bulk_fetch with replayed Reddit data")
+    parser.add_argument("--fixture", help="fixture file (.json / .json.gz) - default: synthetic")
+    parser.add_argument("--record", help="บันทึก fixture จาก Reddit จริงลงไฟล์นี้แล้วจบ")
+    parser.add_argument("--save-fixture", help="บันทึก synthetic fixture ลงไฟล์ (ใช้ซ้ำ/เทียบข้ามเครื่อง)")
+    parser.add_argument("--subreddits", type=int, default=len(SYNTHETIC_SUBREDDITS), help="จำนวน subreddits (synthetic)")
+    parser.add_argument("--posts", type=int, default=200, help="posts ต่อ subreddit (synthetic / --record)")
+    parser.add_argument("--comments", type=float, default=20, help="comments เฉลี่ยต่อ post (synthetic)")
+    parser.add_argument("--latency", type=float, default=0, help="latency ต่อ request (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="jitter สูงสุดต่อ request (ms)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="สัดส่วน requests ที่ตอบ 429")
+    parser.add_argument("--rate-limited", action="store_true", help="ส่ง requests ผ่าน host_rate_limiter ของ Reddit")
+    parser.add_argument("--cycles", type=int, default=1, help="จำนวนรอบ (รอบที่ 2+ = incremental จาก watermarks)")
+    parser.add_argument("--drain", type=float, default=600, help="เวลา drain comment queue สูงสุดต่อรอบ (วินาที)")
+    parser.add_argument("--db-name", default="reddit_analytics_benchmark", help="database ของ benchmark (ถูกล้างก่อนรัน)")
+    parser.add_argument("--keep", action="store_true", help="ไม่ล้าง database ก่อนรัน")
+    parser.add_argument("--no-db", action="store_true", help="ไม่บันทึกลง MongoDB")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="บันทึกผลเป็น JSON (เทียบ regression)")
+    args = parser.parse_args()
+
+    if args.record:
+        from utils.stock_list_fetcher import stock_list_fetcher
+
+        async def record():
+            processor = RedditBulkProcessor()
+            reddit = await processor.get_reddit_instance()
+            try:
+                return await record_fixture(reddit, processor.subreddits[:args.subreddits], limit=args.posts,
+                                            tickers=stock_list_fetcher.get_all_valid_tickers(force_refresh=False))
+            finally:
+                await reddit.close()
+
+        save_fixture(args.record, asyncio.run(record()))
+        print(f"✅ Fixture saved: {args.record}")
+        sys.exit(0)
+
+    if args.fixture:
+        fixture = load_fixture(args.fixture)
+    else:
+        fixture = generate_fixture(SYNTHETIC_SUBREDDITS[:args.subreddits] if args.subreddits <= len(SYNTHETIC_SUBREDDITS)
+                                   else [f"bench{i}" for i in range(args.subreddits)],
+                                   posts_per_subreddit=args.posts, comments_per_post=args.comments,
+                                   # ✅ posts ทั้งหมดอยู่ในช่วง ~100 นาที (ไม่ถูกตัดด้วย since 2 ชั่วโมงของรอบแรก)
+                                   seconds_between_posts=min(30.0, 6000 / max(args.posts, 1)), seed=args.seed)
+        if args.save_fixture:
+            save_fixture(args.save_fixture, fixture)
+
+    report = asyncio.run(run_benchmark(fixture, args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ Results saved: {args.json}")
@@ -0,0 +1,109 @@
+"""
+Benchmark batch sentiment (texts/sec)
+เปรียบเทียบการวน analyze() ทีละข้อความแบบเดิม (re.sub ทุกครั้ง + วน boosters 20 terms)
+กับ SentimentAnalyzer.analyze_many() (regex compile ไว้แล้ว + dedupe + NumPy arrays)
+ใช้ข้อความจริงจาก backend/data/process/*.xlsx (title + selftext)
+
+Usage:
+    python scripts/benchmark_sentiment_batch.py
+    python scripts/benchmark_sentiment_batch.py --limit 5000 --repeat 3
+"""
+import sys
+import re
+import time
+from pathlib import Path
+
+# ตั้งค่า encoding สำหรับ Windows terminal
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# เพิ่ม path ของ backend เข้าไปใน sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+import pandas as pd
+from processors.sentiment_analyzer import SentimentAnalyzer
+from processors.sentiment_cache import SentimentMemoCache
+
+DATA_DIR = backend_path / "data" / "process"
+
+
+def load_texts(limit=None):
+    """โหลดข้อความจากไฟล์ Excel ที่ export ไว้ (title + selftext ถ้ามี)"""
+    texts = []
+    for path in sorted(DATA_DIR.glob("*.xlsx")):
+        try:
+            df = pd.read_excel(path)
+        except Exception as e:
+            print(f"⚠️ Skip {path.name}: {e}")
+            continue
+        titles = df["title"].fillna("").astype(str) if "title" in df else pd.Series([""] * len(df))
+        if "selftext" in df:
+            titles = titles + " " + df["selftext"].fillna("").astype(str)
+        texts.extend(t.strip() for t in titles if t.strip())
+    return texts[:limit] if limit else texts
+
+
+def analyze_legacy(analyzer, text):
+    """analyze() แบบเดิม: re.sub ทุกครั้ง + วน dict ของ boosters"""
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    scores = analyzer.analyzer.polarity_scores(text)
+    base_compound = scores['compound']
+    text_lower = text.lower()
+    for term, boost in analyzer.financial_boosters.items():
+        if term in text_lower:
+            base_compound += boost
+    scores['compound'] = max(-5.0, min(5.0, base_compound))
+    return scores
+
+
+def timed(fn, repeat):
+    """คืนเวลาที่ดีที่สุด (วินาที) จาก repeat รอบ"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(texts, repeat):
+    uncached = SentimentAnalyzer(use_memo=False)
+    memoized = SentimentAnalyzer(memo=SentimentMemoCache(max_size=len(texts) + 1))
+    memoized.analyze_many(texts)  # warm memo
+
+    unique = len(set(texts))
+    print("=" * 70)
+    print(f"📊 Sentiment batch benchmark ({len(texts):,} texts, {unique:,} unique)")
+    print(f"   booster matching: {'Aho-Corasick' if uncached.booster_matcher._automaton else 'substring scan'}")
+    print("=" * 70)
+
+    results = [
+        ("legacy loop", timed(lambda: [analyze_legacy(uncached, t) for t in texts], repeat)),
+        ("analyze_many (no memo)", timed(lambda: uncached.analyze_many(texts), repeat)),
+        ("analyze_many (warm memo)", timed(lambda: memoized.analyze_many(texts), repeat)),
+    ]
+
+    baseline = results[0][1]
+    for name, seconds in results:
+        rate = len(texts) / seconds if seconds else float("inf")
+        print(f"   {name:<26} {seconds * 1000:>9.1f} ms | {rate:>10,.0f} texts/sec | {baseline / seconds:>5.1f}x")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark batch sentiment analysis")
+    parser.add_argument("--limit", type=int, default=None, help="จำนวนข้อความสูงสุด")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = load_texts(args.limit)
+    if not texts:
+        print(f"❌ No texts found in {DATA_DIR}")
+        sys.exit(1)
+    benchmark(texts, args.repeat)
@@ -0,0 +1,200 @@
+"""
+Benchmark ticker extraction (texts/sec)
+เปรียบเทียบ RedditBulkProcessor.extract_tickers แบบเดิม (compile regex 6 ตัวทุกครั้ง + findall 6 รอบ)
+กับ TickerExtractor (tokenization รอบเดียว + keyword index) และ extract_many (batch)
+พร้อมตรวจว่าผลลัพธ์ตรงกัน (ข้อความจริง + ข้อความสุ่มจาก keywords/tickers/เครื่องหมาย) - exit code 1 ถ้าไม่ตรง
+
+ข้อความ: post (title + selftext) + comments ของ post นั้น
+- default: จาก backend/data/process/*.xlsx (รวม titles เป็นกลุ่มๆ แทน comments)
+- --live: จาก post_reddit + comment_reddit ใน database
+
+Usage:
+    python scripts/benchmark_ticker_extraction.py
+    python scripts/benchmark_ticker_extraction.py --live --limit 2000
+    python scripts/benchmark_ticker_extraction.py --fuzz 200000
+"""
+import sys
+import random
+import re
+import time
+from pathlib import Path
+
+# ตั้งค่า encoding สำหรับ Windows terminal
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# เพิ่ม path ของ backend เข้าไปใน sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from utils.ticker_extractor import (
+    TickerExtractor, IGNORE_TICKERS, CONTEXT_KEYWORDS, KEYWORDS_AFTER, KEYWORDS_BEFORE, WORD_PATTERN
+)
+
+DATA_DIR = backend_path / "data" / "process"
+
+
+def extract_legacy(text, valid_tickers, ignore_tickers=IGNORE_TICKERS):
+    """RedditBulkProcessor.extract_tickers แบบเดิม (ใช้เปรียบเทียบ)"""
+    if not text or not valid_tickers:
+        return set()
+    tickers = set()
+    text_upper = text.upper()
+
+    def add(ticker):
+        if ticker in valid_tickers and ticker not in ignore_tickers:
+            tickers.add(ticker)
+
+    for ticker in re.compile(r'\$([A-Z]{1,5})\b').findall(text_upper):
+        add(ticker)
+    for _, ticker in re.compile(r'\b(buy|sell|hold|trade|stock|shares?|ticker|symbol|NYSE|NASDAQ)\s+([A-Z]{1,5})\b',
+                                re.IGNORECASE).findall(text_upper):
+        add(ticker)
+    for ticker, _ in re.compile(r'\b([A-Z]{1,5})\s+(is|to|will|can|should|going|up|down|buy|sell|hold|stock|shares?|ticker|symbol)\b',
+                                re.IGNORECASE).findall(text_upper):
+        add(ticker)
+    for ticker in re.compile(r'[\(\[]([A-Z]{1,5})[\)\]]').findall(text_upper):
+        add(ticker)
+    for ticker in re.compile(r'(?:ticker|symbol):\s*([A-Z]{1,5})\b', re.IGNORECASE).findall(text_upper):
+        add(ticker)
+    for ticker in re.compile(r'\b([A-Z]{2,5})\b').findall(text_upper):
+        if ticker in valid_tickers and ticker not in ignore_tickers:
+            ticker_pos = text_upper.find(ticker)
+            if ticker_pos >= 0:
+                context = text_upper[max(0, ticker_pos - 50):min(len(text_upper), ticker_pos + len(ticker) + 50)]
+                if any(keyword in context for keyword in CONTEXT_KEYWORDS):
+                    tickers.add(ticker)
+    return tickers
+
+
+def load_texts_from_excel(comments_per_post):
+    """titles จากไฟล์ Excel: แต่ละข้อความ = title + titles ถัดไป (แทน comments)"""
+    import pandas as pd
+
+    titles = []
+    for path in sorted(DATA_DIR.glob("*.xlsx")):
+        try:
+            df = pd.read_excel(path)
+        except Exception as e:
+            print(f"⚠️ Skip {path.name}: {e}")
+            continue
+        if "title" in df:
+            titles.extend(str(t) for t in df["title"].dropna())
+    return [" ".join(titles[i:i + 1 + comments_per_post]) for i in range(len(titles))]
+
+
+def load_texts_from_database(limit):
+    """post_reddit + comment_reddit (title + selftext + comments)"""
+    from database.db_config import db
+
+    if db is None:
+        print("❌ Database not available")
+        sys.exit(1)
+
+    posts = list(db.post_reddit.find({}, {"id": 1, "title": 1, "selftext": 1}).sort("created_utc", -1).limit(limit))
+    comments = {}
+    for comment in db.comment_reddit.find({"post_id": {"$in": [p.get("id") for p in posts]}}, {"post_id": 1, "body": 1}):
+        comments.setdefault(comment.get("post_id"), []).append(comment.get("body") or "")
+    return [
+        " ".join([post.get("title") or "", post.get("selftext") or ""] + comments.get(post.get("id"), []))
+        for post in posts
+    ]
+
+
+def load_valid_tickers(texts, live):
+    """รายชื่อหุ้น: จาก database (--live) หรือ tokens ตัวพิมพ์ใหญ่ทั้งหมดในข้อความ (offline)"""
+    if live:
+        from utils.stock_list_fetcher import stock_list_fetcher
+        tickers = stock_list_fetcher.get_all_valid_tickers(force_refresh=False)
+        if tickers:
+            return set(tickers)
+    return {token for text in texts for token in WORD_PATTERN.findall(text.upper())
+            if len(token) <= 5 and token.isascii() and token.isalpha()}
+
+
+def fuzz_texts(count, seed=0):
+    """ข้อความสุ่มที่เน้นกรณีขอบ (keywords ติดกัน, วงเล็บ, colon, $, unicode) สำหรับตรวจ parity"""
+    rng = random.Random(seed)
+    pieces = sorted(KEYWORDS_BEFORE | KEYWORDS_AFTER) + [
+        "A", "X", "AMD", "GME", "AAPL", "TSLA", "PRICE", "CALL", "XTICKER", "foo", "1", "_", "é",
+        "\u0130S", "STOC\u212a", "(", ")", "[", "]", ":", "$",
+    ]
+    separators = ["", " ", " ", "  ", "\n", "\t", ": "]
+    return [
+        "".join(rng.choice(pieces) + rng.choice(separators) for _ in range(rng.randint(1, 12)))
+        for _ in range(count)
+    ]
+
+
+def check_parity(texts, valid_tickers, extractor):
+    """จำนวนข้อความที่ผลของ TickerExtractor ไม่ตรงกับแบบเดิม (แสดงตัวอย่างไม่เกิน 5 รายการ)"""
+    mismatches = 0
+    for text in texts:
+        legacy, current = extract_legacy(text, valid_tickers), extractor.extract(text, valid_tickers)
+        if legacy != current:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"      {text!r}: legacy={sorted(legacy)} new={sorted(current)}")
+    return mismatches
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(texts, valid_tickers, repeat, fuzz=0):
+    extractor = TickerExtractor()
+    total_chars = sum(len(t) for t in texts)
+
+    print("=" * 70)
+    print(f"📊 Ticker extraction benchmark ({len(texts):,} texts, {total_chars / 1e6:.1f}M chars, "
+          f"{len(valid_tickers):,} valid tickers)")
+    print("=" * 70)
+
+    mismatches = check_parity(texts, valid_tickers, extractor)
+    print(f"   parity: {'✅ identical' if mismatches == 0 else f'❌ {mismatches} texts differ'}")
+    if fuzz:
+        fuzz_corpus = fuzz_texts(fuzz)
+        fuzz_valid = valid_tickers | load_valid_tickers(fuzz_corpus, live=False)
+        fuzz_mismatches = check_parity(fuzz_corpus, fuzz_valid, extractor)
+        print(f"   parity (fuzz, {fuzz:,} texts): "
+              f"{'✅ identical' if fuzz_mismatches == 0 else f'❌ {fuzz_mismatches} texts differ'}")
+        mismatches += fuzz_mismatches
+
+    results = [
+        ("legacy (6 regex passes)", timed(lambda: [extract_legacy(t, valid_tickers) for t in texts], repeat)),
+        ("TickerExtractor.extract", timed(lambda: [extractor.extract(t, valid_tickers) for t in texts], repeat)),
+        ("TickerExtractor.extract_many", timed(lambda: extractor.extract_many(texts, valid_tickers), repeat)),
+    ]
+    baseline = results[0][1]
+    for name, seconds in results:
+        print(f"   {name:<30} {seconds * 1000:>9.1f} ms | {len(texts) / seconds:>10,.0f} texts/sec | "
+              f"{baseline / seconds:>5.1f}x")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark ticker extraction")
+    parser.add_argument("--live", action="store_true", help="ใช้ posts + comments จาก database")
+    parser.add_argument("--limit", type=int, default=1000, help="จำนวน posts (--live)")
+    parser.add_argument("--comments", type=int, default=20, help="จำนวน 'comments' ต่อ post (offline)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fuzz", type=int, default=20000, help="จำนวนข้อความสุ่มสำหรับตรวจ parity (0 = ไม่ตรวจ)")
+    args = parser.parse_args()
+
+    texts = load_texts_from_database(args.limit) if args.live else load_texts_from_excel(args.comments)
+    if not texts:
+        print("❌ No texts found")
+        sys.exit(1)
+    identical = benchmark(texts, load_valid_tickers(texts, args.live), args.repeat, fuzz=args.fuzz)
+    sys.exit(0 if identical else 1)
@@ -0,0 +1,198 @@
+"""
+Benchmark /api/trending-topics (ส่วนที่ทำงานใน Python)
+เปรียบเทียบการวน posts ทั้งหมดซ้ำทุก ticker (แบบเดิม) กับ ticker → posts index (รอบเดียว)
+ทั้งสองแบบคำนวณ top-N tickers ชุดเดียวกัน และตรวจว่า trust score / pump-dump ตรงกัน
+ตามจำนวน posts ตั้งแต่ 1k ถึง 50k
+
+Usage:
+    python scripts/benchmark_trending_topics.py
+    python scripts/benchmark_trending_topics.py --sizes 1000 10000 50000 --tickers 1500
+    python scripts/benchmark_trending_topics.py --live   # วัด endpoint จริง (ต้องต่อ database ได้)
+"""
+import sys
+import time
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# ตั้งค่า encoding สำหรับ Windows terminal
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# เพิ่ม path ของ backend เข้าไปใน sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from processors.pump_dump_detector import PumpDumpDetector
+from processors.trending_aggregator import trending_aggregator
+
+
+def generate_posts(num_posts, num_tickers, seed=42):
+    """สร้าง posts จำลอง (ticker กระจายแบบ Zipf เหมือน Reddit จริง)"""
+    rng = random.Random(seed)
+    tickers = [f"T{i:04d}"[:5] for i in range(num_tickers)]
+    weights = [1.0 / (rank + 1) for rank in range(num_tickers)]
+    now = datetime.utcnow()
+
+    posts = []
+    for i in range(num_posts):
+        post_tickers = list(set(rng.choices(tickers, weights=weights, k=rng.randint(1, 3))))
+        posts.append({
+            "_id": i,
+            "id": f"p{i}",
+            "title": f"Thoughts on {' '.join('$' + t for t in post_tickers)} to the moon",
+            "selftext": "Earnings beat, buy the dip" if i % 3 else "Bearish, sell before crash",
+            "score": rng.randint(0, 5000),
+            "num_comments": rng.randint(0, 500),
+            "sentiment": {"compound": rng.uniform(-1, 1)},
+            "created_utc": (now - timedelta(minutes=rng.randint(0, 24 * 60))).isoformat(),
+            "author": f"user{rng.randint(0, num_posts // 5)}",
+            "source": "reddit" if i % 4 else "yahoo",
+            "symbols": post_tickers,
+        })
+    return posts
+
+
+def aggregate_rows(posts, top_n=None):
+    """จำลองผลของ aggregation pipeline (ฝั่ง MongoDB - ไม่นับรวมในเวลาที่วัด)"""
+    mentions = Counter()
+    unique_posts = Counter()
+    sources = {}
+    sentiment_sum = Counter()
+    for post in posts:
+        for ticker in post["symbols"]:
+            mentions[ticker] += 1
+            unique_posts[ticker] += 1
+            sources.setdefault(ticker, set()).add(post["source"])
+            sentiment_sum[ticker] += post["sentiment"]["compound"]
+    return [{
+        "ticker": ticker,
+        "mentions": count,
+        "uniquePosts": unique_posts[ticker],
+        "sources": list(sources[ticker]),
+        "avgSentiment": sentiment_sum[ticker] / count,
+    } for ticker, count in mentions.most_common(top_n)]
+
+
+def stock_info_loader(ticker):
+    return {"volume": 3_000_000, "averageVolume": 1_000_000, "changePercent": -6.0,
+            "priceChangePercent": -6.0, "currentPrice": 12.5}
+
+
+def run_legacy(rows, posts, detector):
+    """แบบเดิม: วน posts ทั้งหมดทุก ticker + detect_pump_dump สองครั้ง (detect + trust score)"""
+    topics = []
+    for row in rows:
+        ticker = row["ticker"]
+        ticker_posts_list = []
+        for post in posts:
+            post_tickers = post.get('symbols', []) or ([post.get('symbol')] if post.get('symbol') else [])
+            if ticker in [t.upper() for t in post_tickers]:
+                ticker_posts_list.append(post)
+        stock_info = stock_info_loader(ticker)
+        pump_dump_result = detector.detect_pump_dump(ticker, ticker_posts_list, stock_info)
+        trust_score = detector.calculate_trust_score(ticker, ticker_posts_list, stock_info)
+        adjusted_sentiment = detector.adjust_sentiment_by_trust(row["avgSentiment"], trust_score)
+        topics.append({
+            "ticker": ticker,
+            "adjustedSentiment": round(adjusted_sentiment, 3),
+            "trustScore": round(trust_score, 1),
+            "isPumpDump": pump_dump_result.get("is_pump_dump", False),
+            "riskScore": round(pump_dump_result.get("risk_score", 0), 1),
+        })
+    return topics
+
+
+def run_indexed(rows, posts, detector):
+    """แบบใหม่: ticker → posts index รอบเดียว + detect_pump_dump ครั้งเดียว"""
+    return trending_aggregator.build_topics(rows, posts, stock_info_loader, detector)
+
+
+COMPARED_FIELDS = ("ticker", "adjustedSentiment", "trustScore", "isPumpDump", "riskScore")
+
+
+def benchmark(sizes, num_tickers, top_n, legacy_max):
+    """
+    ทั้งสองแบบคำนวณ top-N rows ชุดเดียวกันจาก posts ชุดเดียวกัน แล้วตรวจว่าผลตรงกัน
+
+    Returns:
+        True ถ้าผลตรงกันทุกขนาด
+    """
+    detector = PumpDumpDetector()
+    all_identical = True
+
+    print("=" * 78)
+    print(f"📊 trending-topics benchmark ({num_tickers} tickers, top {top_n})")
+    print("=" * 78)
+    print(f"{'posts':>8} | {'legacy (top-N)':>16} | {'indexed (top-N)':>16} | {'speedup':>8} | parity")
+    print("-" * 78)
+
+    for size in sizes:
+        posts = generate_posts(size, num_tickers)
+        top_rows = aggregate_rows(posts, top_n)
+
+        start = time.perf_counter()
+        indexed = run_indexed(top_rows, posts, detector)
+        indexed_ms = (time.perf_counter() - start) * 1000
+
+        if size <= legacy_max:
+            start = time.perf_counter()
+            legacy = run_legacy(top_rows, posts, detector)
+            legacy_ms = (time.perf_counter() - start) * 1000
+            identical = legacy == [{field: topic[field] for field in COMPARED_FIELDS} for topic in indexed]
+            all_identical = all_identical and identical
+            legacy_text = f"{legacy_ms:>13.1f} ms"
+            speedup_text = f"{legacy_ms / indexed_ms:>7.1f}x"
+            parity_text = "✅" if identical else "❌ mismatch"
+        else:
+            legacy_text = f"{'skipped':>16}"
+            speedup_text = f"{'-':>8}"
+            parity_text = "-"
+
+        print(f"{size:>8} | {legacy_text} | {indexed_ms:>13.1f} ms | {speedup_text} | {parity_text}")
+
+    print("-" * 78)
+    print(f"💡 legacy ข้ามเมื่อ posts > {legacy_max:,} (ใช้ --legacy-max เพื่อปรับ)")
+    return all_identical
+
+
+def benchmark_live(repeat):
+    """วัด latency ของ endpoint จริงผ่าน Flask test client"""
+    from app import app
+
+    client = app.test_client()
+    print("=" * 70)
+    print("🌐 /api/trending-topics (live database)")
+    print("=" * 70)
+    for time_range in ["1h", "6h", "24h", "7d", "30d"]:
+        timings = []
+        total_posts = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(f"/api/trending-topics?source=all&timeRange={time_range}")
+            timings.append((time.perf_counter() - start) * 1000)
+            total_posts = (response.get_json() or {}).get("totalPosts", 0)
+        timings.sort()
+        print(f"   {time_range:>4}: {total_posts:>7,} posts | median {timings[len(timings) // 2]:>8.1f} ms | max {timings[-1]:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark /api/trending-topics")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000, 25000, 50000])
+    parser.add_argument("--tickers", type=int, default=1500)
+    parser.add_argument("--top", type=int, default=100)
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    parser.add_argument("--live", action="store_true", help="วัด endpoint จริง (ต้องต่อ database ได้)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.live:
+        benchmark_live(args.repeat)
+    else:
+        # exit code 1 ถ้าผลของสองแบบไม่ตรงกัน
+        sys.exit(0 if benchmark(args.sizes, args.tickers, args.top, args.legacy_max) else 1)
@@ -0,0 +1,124 @@
+"""
+ตรวจ LxmlExtractor ให้ผลตรงกับ SoupExtractor (BeautifulSoup html.parser) บน HTML ที่ parser ซ่อมต่างกัน
+- <p> ที่มี <div>/<p>/<table>/<ul> ข้างใน, <p> ที่ไม่ปิด, markup ใน <title>, <div/>, CDATA, entities ฯลฯ
+  (libxml2 ปิด <p> ก่อน block / เก็บ <title> เป็น raw text → LxmlExtractor ต้องส่งต่อให้ SoupExtractor)
+- หน้าที่ไม่ต้องซ่อม ต้องใช้ lxml จริง (ไม่ fallback) และได้ผลเหมือนกัน
+- default ของ get_extractor() เป็น bs4
+
+Usage:
+    python scripts/check_article_extractors.py
+    python scripts/check_article_extractors.py --show-diffs 10
+"""
+import os
+import sys
+from pathlib import Path
+
+# ตั้งค่า encoding สำหรับ Windows terminal
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# เพิ่ม path ของ backend เข้าไปใน sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from fetchers.article_extractors import LxmlExtractor, SoupExtractor, etree, get_extractor
+
+COMPARED_FIELDS = ("title", "full_content", "tags", "author", "publish_date")
+
+# ข้อความยาวกว่า MIN_CONTENT_CHARS เพื่อให้ถึง fallback <p>
+FILLER = "Shares of the company rose after quarterly revenue beat analyst estimates by a wide margin."
+
+# (ชื่อ, HTML, lxml ต้อง parse เอง (ไม่ fallback) หรือไม่)
+PARITY_CASES = [
+    ("p_div", f"<html><body><main><p>text <div>block</div> tail {FILLER}</p></main></body></html>", False),
+    ("p_div_root", f"<p>text <div>block</div> tail</p><p>{FILLER}</p>", False),
+    ("p_p", f"<main><p>one <p>two {FILLER}</p></p></main>", False),
+    ("unclosed_p", f"<main><p>a <b>bold<p>next {FILLER}</main>", False),
+    ("p_table", f"<p>intro<table><tr><td>cell</td></tr></table>outro {FILLER}</p>", False),
+    ("p_ul", f"<p>list<ul><li>one<li>two</ul>after {FILLER}</p>", False),
+    ("title_b", "<html><head><title>My <b>Title</b></title></head><body></body></html>", False),
+    ("title_entity", "<title>Q3 &amp; outlook</title>", False),
+    ("h1_title_b", "<h1>Fed <b>holds</b> rates</h1>", True),
+    ("self_closing_div", f"<main><div/>{FILLER}<p>{FILLER}</p></main>", False),
+    ("block_in_inline", f"<article><b><div>{FILLER}</div></b></article>", False),
+    ("textarea_markup", f"<textarea class='author'>a <b>b</b></textarea><p>{FILLER}</p>", False),
+    ("cdata", f"<article><![CDATA[data]]>{FILLER}</article>", False),
+    ("entity_unknown", f"<article>R&D; &foo; &check; {FILLER}</article>", False),
+    ("entity_no_semicolon", f"<article>&copy2024 &#150 {FILLER}</article>", False),
+    ("entity_plain", f"<article>S&P 500 &amp; AT&T &copy; &#8212; &nbsp; {FILLER}</article>", True),
+    ("template", f"<template><article class='author'>hidden {FILLER}</article></template><p>{FILLER}</p>", True),
+    ("selected_script", f"<div class='content'>{FILLER}<script class='content'>var x = 1;</script></div>", True),
+    ("wellformed", f"""<html><head><title>Stocks &amp; bonds</title>
+        <meta property="article:published_time" content="2024-05-01">
+        <meta name="keywords" content="stocks, bonds"></head>
+        <body><nav><a href="/">Home</a></nav>
+        <article><h1>Markets</h1><p>{FILLER}</p><p>{FILLER} <a href="#">link</a> more</p>
+        <ul class="tags"><li><a href="/t/aapl">AAPL</a></li></ul><span class="author">Jane Doe</span><br>
+        <img src="x.png"><script>if (a < b) {{ x = "</div>"; }}</script></article>
+        <footer>footer</footer></body></html>""", True),
+]
+
+
+def normalize(details):
+    """tags เป็น set (ลำดับจาก list(set(...)) ไม่แน่นอน)"""
+    return {field: (sorted(details.get(field) or []) if field == "tags" else details.get(field))
+            for field in COMPARED_FIELDS}
+
+
+def check_cases(candidate, show_diffs=5):
+    """
+    เทียบ candidate กับ SoupExtractor บน PARITY_CASES
+
+    Returns:
+        รายชื่อ cases ที่ไม่ผ่าน (ผลไม่ตรง หรือ fallback ทั้งที่ควร parse เอง)
+    """
+    reference = SoupExtractor()
+    failed = []
+    for name, html, native in PARITY_CASES:
+        fallbacks = candidate.fallbacks
+        expected = normalize(reference.extract(html))
+        actual = normalize(candidate.extract(html))
+        fell_back = candidate.fallbacks > fallbacks
+        diffs = [field for field in COMPARED_FIELDS if expected[field] != actual[field]]
+        if diffs or (native and fell_back):
+            failed.append(name)
+            if len(failed) <= show_diffs:
+                print(f"   ≠ {name}: {'fallback to bs4' if native and fell_back else ''}")
+                for field in diffs:
+                    print(f"       [{field}] bs4 : {str(expected[field])[:160]!r}")
+                    print(f"       [{field}] lxml: {str(actual[field])[:160]!r}")
+    return failed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check LxmlExtractor parity with BeautifulSoup on repaired HTML")
+    parser.add_argument("--show-diffs", type=int, default=5, help="จำนวน cases ที่ไม่ตรงที่จะแสดง")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🔍 Article extractor parity check")
+    print("=" * 70)
+    ok = True
+
+    os.environ.pop("ARTICLE_EXTRACTOR", None)
+    default_name = get_extractor().name
+    print(f"   default extractor: {default_name}")
+    ok = default_name == SoupExtractor.name
+
+    if etree is None:
+        print("   ⚠️ lxml not installed - skip LxmlExtractor cases")
+    else:
+        extractor = LxmlExtractor()
+        failed = check_cases(extractor, args.show_diffs)
+        print(f"   cases: {len(PARITY_CASES)} | mismatches: {len(failed)} | fallback to bs4: {extractor.fallbacks}")
+        ok = ok and not failed
+
+    if ok:
+        print("✅ LxmlExtractor matches BeautifulSoup")
+    else:
+        print("❌ Article extractor parity check failed")
+        sys.exit(1)
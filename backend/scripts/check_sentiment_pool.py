@@ -0,0 +1,78 @@
+"""
+ตรวจ SentimentPool workers
+- ผลของ pool ตรงกับ SentimentAnalyzer.analyze ใน process หลัก
+- worker process ไม่ได้ run script หลักซ้ำ (__mp_main__) และไม่ได้ import database / Flask
+  (script นี้ import database.db_config ก่อนเริ่ม pool เหมือน app.py)
+
+Usage:
+    python scripts/check_sentiment_pool.py
+    python scripts/check_sentiment_pool.py --start-method spawn
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+# ตั้งค่า encoding สำหรับ Windows terminal
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# เพิ่ม path ของ backend เข้าไปใน sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+import database.db_config  # noqa: F401 - process หลักมี Mongo client เหมือน app.py
+from processors.sentiment_analyzer import SentimentAnalyzer
+from processors.sentiment_pool import SentimentPool
+
+FORBIDDEN_MODULES = ["database", "app", "flask", "pymongo", "scheduling", "fetchers"]
+
+SAMPLE_TEXTS = [
+    "AAPL to the moon, huge beat on earnings",
+    "TSLA is going to crash hard, bearish all the way",
+    "Holding MSFT, nothing new today",
+    "Bullish breakout on NVDA with strong volume",
+    "Sold everything, this market is a disaster",
+]
+
+
+def check(start_method=None, workers=2):
+    pool = SentimentPool(max_workers=workers, min_pool_batch=1, chunk_size=50, start_method=start_method)
+    analyzer = SentimentAnalyzer(use_memo=False)
+    texts = [f"{text} #{i}" for i in range(40) for text in SAMPLE_TEXTS]
+    ok = True
+    try:
+        results = asyncio.run(pool.score_many(texts))
+        expected = [analyzer.analyze(text) for text in texts]
+        mismatches = sum(1 for got, want in zip(results, expected) if got != want)
+        print(f"   scores: {len(texts):,} texts | pool {pool.stats['pool_texts']:,} | mismatches {mismatches}")
+        ok = mismatches == 0 and pool.stats["pool_texts"] > 0
+
+        modules = pool.worker_modules(FORBIDDEN_MODULES)
+        if modules is None:
+            print("   ❌ pool not available")
+            return False
+        print(f"   worker modules: {modules or 'none'} (checked: {', '.join(FORBIDDEN_MODULES)})")
+        ok = ok and not modules
+    finally:
+        pool.shutdown()
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check that SentimentPool workers stay minimal")
+    parser.add_argument("--start-method", default=None, help="forkserver / spawn (default: forkserver ถ้ามี)")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🔍 Sentiment pool worker check")
+    print("=" * 70)
+    if check(args.start_method, args.workers):
+        print("✅ Workers import only the sentiment worker (no app / database)")
+    else:
+        print("❌ Sentiment pool check failed")
+        sys.exit(1)
@@ -111,7 +111,7 @@ def fetch_all_news(force_refresh=False, batch_size=50):
         # รัน batch processing (async)
         start_time = datetime.now()
         results = asyncio.run(
-            batch_processor.process_all_stocks_async(symbols, batch_size=batch_size)
+            batch_processor.process_all_stocks_async(symbols, batch_size=batch_size, job="fetch-all-news")
         )
         end_time = datetime.now()
         elapsed = (end_time - start_time).total_seconds()
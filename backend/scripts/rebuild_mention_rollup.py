@@ -0,0 +1,46 @@
+"""
+Script สร้าง ticker_mentions rollup ใหม่จาก post_reddit / post_yahoo
+ใช้ตอนเริ่มใช้ rollup ครั้งแรก (ข้อมูลเก่าก่อนมี rollup) - ควรรันตอนที่ scheduler ไม่ได้ทำงาน
+
+Usage:
+    python scripts/rebuild_mention_rollup.py --days 30
+"""
+import sys
+from pathlib import Path
+from datetime import datetime
+
+# ตั้งค่า encoding สำหรับ Windows terminal
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# เพิ่ม path ของ backend เข้าไปใน sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from database.db_config import db
+from processors.mention_rollup import mention_rollup
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild ticker_mentions rollup")
+    parser.add_argument("--days", type=int, default=30, help="จำนวนวันย้อนหลังที่ต้องการสร้างใหม่")
+    parser.add_argument("--sources", nargs="+", default=["reddit", "yahoo"])
+    args = parser.parse_args()
+
+    if db is None:
+        print("❌ Database not available")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"🔄 Rebuilding ticker_mentions ({args.days} days, sources: {', '.join(args.sources)})")
+    print("=" * 60)
+    started = datetime.now()
+
+    mention_rollup.ensure_indexes()
+    total = mention_rollup.rebuild(days=args.days, sources=args.sources)
+
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"✅ Counted {total:,} posts in {elapsed:.1f}s")
@@ -302,7 +302,7 @@ def start_fetching(force_refresh=False, batch_size=50, update_threshold_hours=24
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             results = asyncio.run(
-                batch_processor.process_all_stocks_async(list(all_symbols), batch_size=batch_size)
+                batch_processor.process_all_stocks_async(list(all_symbols), batch_size=batch_size, job="start-fetching")
             )
         
         end_time = datetime.now()
@@ -1,6 +1,6 @@
 """
 Script สำหรับเริ่ม Reddit Bulk Scheduler
-รัน Reddit bulk fetch ทุก 45 วินาที
+รัน Reddit bulk fetch ต่อเนื่อง (ทุก ~45 วินาที, ปรับตามปริมาณ posts)
 """
 import sys
 import os
@@ -19,7 +19,7 @@ def main():
     print("🚀 เริ่ม Reddit Bulk Scheduler")
     print("="*70)
     print("\n📋 การตั้งค่า:")
-    print("   ⏰ อัปเดตทุก 45 วินาที")
+    print("   ⏰ อัปเดตต่อเนื่อง (ทุก ~45 วินาที, ปรับตามปริมาณ posts)")
     print("   📊 Subreddits: wallstreetbets, stocks, investing, options, pennystocks")
     print("   🔍 Extract tickers จาก posts")
     print("   💬 วิเคราะห์ sentiment ครั้งเดียวต่อ post")
@@ -86,7 +86,7 @@ def test_fetching_display(num_stocks=10, batch_size=1000):
         # รัน batch processing (async)
         start_time = datetime.now()
         results = asyncio.run(
-            batch_processor.process_all_stocks_async(list(test_symbols), batch_size=batch_size)
+            batch_processor.process_all_stocks_async(list(test_symbols), batch_size=batch_size, resume=False)
         )
         end_time = datetime.now()
         elapsed = (end_time - start_time).total_seconds()
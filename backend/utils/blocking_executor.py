@@ -0,0 +1,132 @@
+"""
+Blocking Executor
+Thread pool เดียวทั้ง process สำหรับงาน blocking I/O (yfinance, requests) ที่ถูกเรียกจาก async code
+- จำนวน threads คงที่ (ไม่สร้าง ThreadPoolExecutor ใหม่ทุกครั้งที่ fallback)
+- คิวมีขนาดจำกัด: ถ้างานค้างเต็มคิว caller จะรอ (backpressure) แทนการกองงานใน memory
+- ปิดอัตโนมัติตอน process จบ (atexit)
+"""
+import asyncio
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+
+class BlockingExecutor:
+    """
+    Bounded thread pool
+
+    Args:
+        max_workers: จำนวน threads
+        max_queue: จำนวนงานที่รอคิวได้ (ไม่รวมงานที่กำลังรัน)
+        thread_name_prefix: ชื่อ threads (ดูใน debugger/profiler)
+    """
+
+    def __init__(self, max_workers: int = 16, max_queue: int = 256, thread_name_prefix: str = "blocking-io"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        # slot = งานที่กำลังรัน + งานในคิว
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "queueWaits": 0, "queued": 0, "running": 0}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """สร้าง thread pool ตอนใช้ครั้งแรก"""
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("BlockingExecutor has been shut down")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=self.thread_name_prefix)
+            return self._executor
+
+    def _wrap(self, fn: Callable) -> Callable:
+        def run():
+            with self._lock:
+                self.stats["queued"] -= 1
+                self.stats["running"] += 1
+            try:
+                return fn()
+            except Exception:
+                with self._lock:
+                    self.stats["failed"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self.stats["running"] -= 1
+                    self.stats["completed"] += 1
+                self._slots.release()
+        return run
+
+    def _submit(self, fn: Callable):
+        """submit งานที่ได้ slot แล้ว - ถ้า submit ไม่สำเร็จ (เช่น shut down แล้ว) คืน slot ก่อน raise"""
+        try:
+            executor = self._get_executor()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.stats["submitted"] += 1
+            self.stats["queued"] += 1
+        try:
+            return executor.submit(self._wrap(fn))
+        except Exception:
+            with self._lock:
+                self.stats["queued"] -= 1
+            self._slots.release()
+            raise
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        รัน blocking function ใน pool แล้ว await ผลลัพธ์
+
+        Args:
+            fn: Function ที่ต้องการรัน (blocking)
+
+        Returns:
+            ผลลัพธ์ของ fn(*args, **kwargs)
+        """
+        # ✅ คิวเต็ม → รอแบบ async (ไม่บล็อก event loop) จนกว่าจะมี slot ว่าง
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["queueWaits"] += 1
+            delay = 0.005
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(delay)  # ถูก cancel ระหว่างรอ = ยังไม่ได้ slot (ไม่ต้องคืน)
+                delay = min(delay * 2, 0.1)
+        future = self._submit(lambda: fn(*args, **kwargs))
+        return await asyncio.wrap_future(future)
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """รันใน pool จาก sync code (บล็อกถ้าคิวเต็ม) - คืน concurrent.futures.Future"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["queueWaits"] += 1
+            self._slots.acquire()
+        return self._submit(lambda: fn(*args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        """ปิด threads (เรียกอัตโนมัติตอน process จบ)"""
+        with self._lock:
+            self._shutdown = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def get_stats(self) -> Dict:
+        """queue depth, งานที่กำลังรัน และ counters"""
+        with self._lock:
+            return {**self.stats, "queueDepth": self.stats["queued"], "maxWorkers": self.max_workers,
+                    "maxQueue": self.max_queue}
+
+
+# Global instance (threads เริ่มตอนใช้ครั้งแรก)
+blocking_executor = BlockingExecutor(
+    max_workers=int(os.getenv("BLOCKING_IO_WORKERS", 16)),
+    max_queue=int(os.getenv("BLOCKING_IO_QUEUE", 256))
+)
+atexit.register(blocking_executor.shutdown, wait=False)
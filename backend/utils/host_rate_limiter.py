@@ -0,0 +1,277 @@
+"""
+Host Rate Limiter
+Token bucket แยกตาม host (query1/query2 Yahoo, article hosts, Reddit, NewsAPI)
+- จอง token แบบ reservation (ไม่ถือ lock ระหว่างรอ) → ไม่มี caller ตัวไหนบล็อกตัวอื่น
+- จำกัด concurrency ต่อ host (แทน semaphore เดียวทั้ง process)
+- ปรับ rate อัตโนมัติเมื่อเจอ 429 / Retry-After (ลดครึ่ง แล้วค่อยๆ เพิ่มกลับเมื่อสำเร็จ)
+- ปรับ rate ตาม quota ที่ server แจ้ง (record_quota - เช่น x-ratelimit-* ของ Reddit)
+
+Usage:
+    async with host_rate_limiter.limit(url):
+        async with session.get(url) as response:
+            host_rate_limiter.record_response(url, response.status, response.headers.get("Retry-After"))
+
+    with host_rate_limiter.limit_sync(url):  # requests (blocking)
+        response = requests.get(url)
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# host → (requests ต่อวินาที, burst, concurrency)
+DEFAULT_HOST_LIMITS: Dict[str, Tuple[float, int, int]] = {
+    "query1.finance.yahoo.com": (10.0, 20, 25),
+    "query2.finance.yahoo.com": (10.0, 20, 25),
+    "oauth.reddit.com": (1.5, 5, 4),  # Reddit API: ~100 requests/นาที ต่อ OAuth client
+    "newsapi.org": (1.0, 5, 2),
+}
+# article hosts และ host อื่นๆ ที่ไม่ได้กำหนดไว้ (แต่ละ host มี bucket ของตัวเอง)
+DEFAULT_LIMIT: Tuple[float, int, int] = (2.0, 4, 4)
+
+REDDIT_HOST = "oauth.reddit.com"
+YAHOO_QUERY2_HOST = "query2.finance.yahoo.com"
+
+# 429 ที่ไม่มี Retry-After → cooldown เริ่มต้น (เพิ่มเป็น 2 เท่าเมื่อโดนติดกัน)
+DEFAULT_COOLDOWN_SECONDS = 5.0
+MAX_COOLDOWN_SECONDS = 300.0
+MIN_RATE_FRACTION = 0.05  # rate ต่ำสุดหลังถูก throttle (สัดส่วนของ rate ที่กำหนด)
+RECOVERY_STEP_FRACTION = 0.05  # เพิ่ม rate กลับทีละกี่ % ต่อ response ที่สำเร็จ
+
+
+def parse_host_limits(value: Optional[str]) -> Dict[str, Tuple[float, int, int]]:
+    """
+    แปลง env HOST_RATE_LIMITS ("host=rate:burst:concurrency,...") เป็น dict (รวมกับค่า default)
+    ใช้ host "*" สำหรับ default ของ host ที่ไม่ได้กำหนด
+    """
+    limits = dict(DEFAULT_HOST_LIMITS)
+    if not value:
+        return limits
+    for part in value.split(","):
+        host, _, spec = part.partition("=")
+        try:
+            rate, burst, concurrency = spec.split(":")
+            limits[host.strip().lower()] = (float(rate), int(burst), int(concurrency))
+        except ValueError:
+            print(f"⚠️ Invalid HOST_RATE_LIMITS entry: {part!r}")
+    return limits
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Retry-After header (วินาที หรือ HTTP date) → วินาที"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_host(url_or_host: str) -> str:
+    """URL หรือ host → host (ตัวพิมพ์เล็ก)"""
+    if "://" in url_or_host:
+        return (urlparse(url_or_host).hostname or "").lower()
+    return url_or_host.lower()
+
+
+class HostBucket:
+    """
+    Token bucket + concurrency limit ของ host เดียว
+
+    Args:
+        host: Host name
+        rate: tokens ต่อวินาที
+        burst: จำนวน tokens สูงสุดที่สะสมได้
+        concurrency: จำนวน requests พร้อมกันสูงสุด
+    """
+
+    def __init__(self, host: str, rate: float, burst: int, concurrency: int):
+        self.host = host
+        self.configured_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = max(1, concurrency)
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._cooldown = DEFAULT_COOLDOWN_SECONDS
+        # ✅ lock นี้ถือแค่ตอนคำนวณ reservation (ไม่เคยถือระหว่างรอ)
+        self._lock = threading.Lock()
+        # semaphore ต่อ event loop (batch แต่ละรอบใช้ asyncio.run → loop ใหม่)
+        self._async_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._thread_semaphore = threading.BoundedSemaphore(self.concurrency)
+        self.stats = {"granted": 0, "waits": 0, "waitSeconds": 0.0, "throttled": 0, "inFlight": 0}
+
+    def reserve(self) -> float:
+        """
+        จอง token หนึ่งตัว
+
+        Returns:
+            จำนวนวินาทีที่ต้องรอก่อนส่ง request (0 = ส่งได้ทันที)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # tokens ติดลบได้ = คิวของ caller ที่จองไว้แล้ว (รอตามลำดับโดยไม่ต้องมี lock)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            wait = max(wait, self._blocked_until - now)
+
+            self.stats["granted"] += 1
+            if wait > 0:
+                self.stats["waits"] += 1
+                self.stats["waitSeconds"] += wait
+            return wait
+
+    def _get_async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            self._async_semaphores[loop] = semaphore
+        return semaphore
+
+    def record_throttle(self, retry_after: Optional[float]):
+        """โดน 429: หยุดส่งจนครบ Retry-After (หรือ cooldown) และลด rate ลงครึ่งหนึ่ง"""
+        with self._lock:
+            now = time.monotonic()
+            cooldown = retry_after if retry_after is not None else self._cooldown
+            self._blocked_until = max(self._blocked_until, now + min(cooldown, MAX_COOLDOWN_SECONDS))
+            self._cooldown = min(self._cooldown * 2, MAX_COOLDOWN_SECONDS)
+            self.rate = max(self.configured_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self.stats["throttled"] += 1
+
+    def record_success(self):
+        """response สำเร็จ: ค่อยๆ เพิ่ม rate กลับไปที่ค่าที่กำหนด"""
+        if self.rate >= self.configured_rate and self._cooldown == DEFAULT_COOLDOWN_SECONDS:
+            return
+        with self._lock:
+            self.rate = min(self.configured_rate, self.rate + self.configured_rate * RECOVERY_STEP_FRACTION)
+            self._cooldown = DEFAULT_COOLDOWN_SECONDS
+
+    def record_quota(self, remaining: float, reset_seconds: float):
+        """
+        quota ที่ server แจ้ง (เช่น x-ratelimit-remaining / x-ratelimit-reset ของ Reddit):
+        กระจาย requests ที่เหลือให้พอถึงรอบ reset (quota หมด → หยุดจนถึง reset)
+        """
+        with self._lock:
+            now = time.monotonic()
+            reset_seconds = max(0.0, reset_seconds)
+            self.stats["quotaRemaining"] = remaining
+            if remaining < 1:
+                self._blocked_until = max(self._blocked_until, now + min(reset_seconds, MAX_COOLDOWN_SECONDS))
+                self._tokens = min(self._tokens, 0.0)
+                return
+            quota_rate = remaining / max(reset_seconds, 1.0)
+            self.rate = min(self.configured_rate, max(self.configured_rate * MIN_RATE_FRACTION, quota_rate))
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "waitSeconds": round(self.stats["waitSeconds"], 2),
+            "rate": round(self.rate, 3),
+            "configuredRate": self.configured_rate,
+            "burst": self.burst,
+            "concurrency": self.concurrency,
+            "blockedForSeconds": round(max(0.0, self._blocked_until - time.monotonic()), 1),
+        }
+
+
+class HostRateLimiter:
+    """
+    Rate limiter แยก budget ตาม host
+
+    Args:
+        host_limits: {host: (rate, burst, concurrency)} - host "*" = default ของ host ที่ไม่ได้กำหนด
+    """
+
+    def __init__(self, host_limits: Optional[Dict[str, Tuple[float, int, int]]] = None):
+        self.host_limits = dict(host_limits or DEFAULT_HOST_LIMITS)
+        self.default_limit = self.host_limits.pop("*", DEFAULT_LIMIT)
+        self._buckets: Dict[str, HostBucket] = {}
+        self._lock = threading.Lock()
+
+    def get_bucket(self, url_or_host: str) -> HostBucket:
+        host = get_host(url_or_host)
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    rate, burst, concurrency = self.host_limits.get(host, self.default_limit)
+                    bucket = HostBucket(host, rate, burst, concurrency)
+                    self._buckets[host] = bucket
+        return bucket
+
+    @asynccontextmanager
+    async def limit(self, url_or_host: str):
+        """รอ token + slot ของ host (async)"""
+        bucket = self.get_bucket(url_or_host)
+        async with bucket._get_async_semaphore():
+            wait = bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            bucket.stats["inFlight"] += 1
+            try:
+                yield bucket
+            finally:
+                bucket.stats["inFlight"] -= 1
+
+    @contextmanager
+    def limit_sync(self, url_or_host: str):
+        """รอ token + slot ของ host (blocking - สำหรับ requests / yfinance ใน thread)"""
+        bucket = self.get_bucket(url_or_host)
+        with bucket._thread_semaphore:
+            wait = bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            bucket.stats["inFlight"] += 1
+            try:
+                yield bucket
+            finally:
+                bucket.stats["inFlight"] -= 1
+
+    def record_response(self, url_or_host: str, status: int, retry_after=None):
+        """
+        แจ้งผล response ให้ limiter ปรับ rate
+
+        Args:
+            url_or_host: URL หรือ host ของ request
+            status: HTTP status code
+            retry_after: ค่า Retry-After header (ถ้ามี)
+        """
+        bucket = self.get_bucket(url_or_host)
+        if status == 429 or (status == 503 and retry_after is not None):
+            bucket.record_throttle(parse_retry_after(retry_after))
+        elif status < 400:
+            bucket.record_success()
+
+    def record_quota(self, url_or_host: str, remaining: float, reset_seconds: float):
+        """
+        แจ้ง quota ที่เหลือจาก response headers
+
+        Args:
+            url_or_host: URL หรือ host ของ request
+            remaining: จำนวน requests ที่เหลือในรอบนี้
+            reset_seconds: จำนวนวินาทีจนถึงรอบ quota ใหม่
+        """
+        self.get_bucket(url_or_host).record_quota(remaining, reset_seconds)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """counters ต่อ host (granted, waits, throttled, ...)"""
+        return {host: bucket.get_stats() for host, bucket in sorted(self._buckets.items())}
+
+
+# Global instance
+host_rate_limiter = HostRateLimiter(parse_host_limits(os.getenv("HOST_RATE_LIMITS")))
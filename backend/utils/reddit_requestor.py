@@ -0,0 +1,32 @@
+"""
+Reddit Requestor
+Requestor ของ asyncprawcore ที่ส่งทุก HTTP request ของ asyncpraw ผ่าน host_rate_limiter
+- ทุก request (listing ของ subreddit, submission.load, comments, replace_more) ใช้ token ของ Reddit
+  → ดึงหลาย subreddits พร้อมกันได้โดยไม่เกิน budget ต่อนาทีที่กำหนด
+- อ่าน x-ratelimit-remaining / x-ratelimit-reset จากทุก response แล้วปรับ rate ของ bucket ตาม quota จริง
+
+Usage:
+    asyncpraw.Reddit(..., requestor_class=RateLimitedRequestor)
+"""
+from asyncprawcore import Requestor
+
+from utils.host_rate_limiter import host_rate_limiter
+
+
+class RateLimitedRequestor(Requestor):
+    """asyncprawcore.Requestor + token bucket ต่อ host + quota จาก response headers"""
+
+    async def request(self, *args, timeout=None, **kwargs):
+        url = args[1] if len(args) > 1 else kwargs.get("url", "")
+        async with host_rate_limiter.limit(url):
+            response = await super().request(*args, timeout=timeout, **kwargs)
+        headers = response.headers
+        host_rate_limiter.record_response(url, response.status, headers.get("Retry-After"))
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+        if remaining is not None and reset is not None:
+            try:
+                host_rate_limiter.record_quota(url, float(remaining), float(reset))
+            except ValueError:
+                pass
+        return response
@@ -0,0 +1,158 @@
+"""
+Rotating Bloom Filter
+Bloom filter แบบหลาย generation (แบ่งตามเวลา) - memory คงที่ ไม่โตตามเวลาที่ process ทำงาน
+- add() ใส่ใน generation ปัจจุบัน, `in` ตรวจทุก generation
+- generation ใหม่ถูกสร้างเมื่อครบ generation_seconds หรือเต็ม capacity (scalable)
+- generation เก่ากว่า window หรือเกิน memory cap จะถูกทิ้ง
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import Dict, Iterable, List
+
+
+class _Generation:
+    """Bloom filter หนึ่งชุด (bitset ขนาดคงที่)"""
+
+    __slots__ = ("bits", "num_bits", "num_hashes", "capacity", "count", "created_at")
+
+    def __init__(self, capacity: int, error_rate: float, created_at: float):
+        self.capacity = capacity
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.created_at = created_at
+
+    # double hashing: ตำแหน่งที่ i = h1 + i*h2 (Kirsch-Mitzenmacher)
+    def add(self, h1: int, h2: int):
+        bits, num_bits = self.bits, self.num_bits
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % num_bits
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def contains(self, h1: int, h2: int) -> bool:
+        bits, num_bits = self.bits, self.num_bits
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % num_bits
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def false_positive_rate(self) -> float:
+        """อัตรา false positive โดยประมาณจากจำนวน items ที่ใส่ไปแล้ว"""
+        if self.count == 0:
+            return 0.0
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class RotatingBloomFilter:
+    """
+    Time-windowed Bloom filter
+
+    Args:
+        window_seconds: ช่วงเวลาที่ต้องจำ (เช่น 7 วัน = days_back ของ batch processor)
+        generations: จำนวน generations ใน window (เช่น 7 = generation ละ 1 วัน)
+        capacity_per_generation: จำนวน items ต่อ generation ก่อนเริ่ม generation ใหม่
+        error_rate: false positive rate เป้าหมายต่อ generation
+        max_bytes: memory cap (ทิ้ง generation เก่าสุดเมื่อเกิน)
+    """
+
+    def __init__(self, window_seconds: float = 7 * 24 * 3600, generations: int = 7,
+                 capacity_per_generation: int = 200_000, error_rate: float = 0.001,
+                 max_bytes: int = 32 * 1024 * 1024):
+        self.window_seconds = window_seconds
+        self.generation_seconds = window_seconds / max(1, generations)
+        self.capacity_per_generation = capacity_per_generation
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self._generations: List[_Generation] = []
+        self._lock = threading.Lock()
+        self.stats = {"adds": 0, "lookups": 0, "positives": 0, "rotations": 0, "evictions": 0}
+
+    @staticmethod
+    def _hashes(key: str):
+        digest = hashlib.md5(key.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def _rotate(self, now: float):
+        """สร้าง generation ใหม่ / ทิ้ง generation เก่า (เรียกตอนถือ _lock อยู่)"""
+        current = self._generations[-1] if self._generations else None
+        if (current is None or now - current.created_at >= self.generation_seconds
+                or current.count >= current.capacity):
+            self._generations.append(_Generation(self.capacity_per_generation, self.error_rate, now))
+            if current is not None:
+                self.stats["rotations"] += 1
+
+            # ทิ้ง generation ที่เก่ากว่า window
+            while len(self._generations) > 1 and now - self._generations[0].created_at > self.window_seconds + self.generation_seconds:
+                self._generations.pop(0)
+                self.stats["evictions"] += 1
+
+            # ✅ memory cap - ทิ้ง generation เก่าสุดก่อน (เหลืออย่างน้อย generation ปัจจุบัน)
+            while len(self._generations) > 1 and sum(g.nbytes for g in self._generations) > self.max_bytes:
+                self._generations.pop(0)
+                self.stats["evictions"] += 1
+
+    def add(self, key: str):
+        """เพิ่ม key เข้า generation ปัจจุบัน"""
+        h1, h2 = self._hashes(key)
+        with self._lock:
+            self._rotate(time.time())
+            self._generations[-1].add(h1, h2)
+            self.stats["adds"] += 1
+
+    def update(self, keys: Iterable[str]):
+        """เพิ่มหลาย keys"""
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        """True = อาจเคยเห็นแล้ว (มี false positive ได้), False = ไม่เคยเห็นแน่นอน (ภายใน window)"""
+        h1, h2 = self._hashes(key)
+        with self._lock:
+            self.stats["lookups"] += 1
+            found = any(g.contains(h1, h2) for g in reversed(self._generations))
+            if found:
+                self.stats["positives"] += 1
+            return found
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(g.count for g in self._generations)
+
+    def clear(self):
+        with self._lock:
+            self._generations = []
+
+    def false_positive_rate(self) -> float:
+        """false positive rate รวม (ตรวจทุก generation) โดยประมาณ"""
+        with self._lock:
+            miss = 1.0
+            for g in self._generations:
+                miss *= 1 - g.false_positive_rate()
+            return 1 - miss
+
+    def get_stats(self) -> Dict:
+        """ขนาด, memory และ false positive rate"""
+        fp_rate = self.false_positive_rate()
+        with self._lock:
+            return {
+                **self.stats,
+                "items": sum(g.count for g in self._generations),
+                "generations": len(self._generations),
+                "bytes": sum(g.nbytes for g in self._generations),
+                "maxBytes": self.max_bytes,
+                "windowHours": round(self.window_seconds / 3600, 1),
+                "falsePositiveRate": round(fp_rate, 6),
+                "oldestGeneration": (
+                    time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self._generations[0].created_at))
+                    if self._generations else None
+                ),
+            }
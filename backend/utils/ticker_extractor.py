@@ -0,0 +1,213 @@
+"""
+Ticker Extractor
+ดึง stock tickers จากข้อความด้วย tokenization รอบเดียว (ใช้ร่วมกันทุก ingest path)
+
+รองรับ (เหมือน RedditBulkProcessor.extract_tickers เดิม):
+- $AAPL
+- keyword ก่อน/หลัง ticker เช่น "buy AAPL", "AAPL is", "AAPL stock"
+- (AAPL) / [AAPL]
+- ticker: AAPL / symbol: AAPL
+- AAPL ที่มีคำเกี่ยวกับการลงทุนอยู่ใกล้ๆ (±50 ตัวอักษร)
+"""
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+
+# ✅ compile ครั้งเดียวตอน import
+# $SYMBOL - ใช้ทั้งใน Python และใน MongoDB ($regexFindAll) ของ trending aggregation
+DOLLAR_TICKER_REGEX = r'\$([A-Z]{1,5})\b'
+DOLLAR_TICKER_PATTERN = re.compile(DOLLAR_TICKER_REGEX)
+WORD_PATTERN = re.compile(r'\w+')
+
+# คำที่อยู่ก่อน ticker ("buy AAPL") และหลัง ticker ("AAPL is")
+KEYWORDS_BEFORE = frozenset({
+    'BUY', 'SELL', 'HOLD', 'TRADE', 'STOCK', 'SHARE', 'SHARES', 'TICKER', 'SYMBOL', 'NYSE', 'NASDAQ'
+})
+KEYWORDS_AFTER = frozenset({
+    'IS', 'TO', 'WILL', 'CAN', 'SHOULD', 'GOING', 'UP', 'DOWN', 'BUY', 'SELL', 'HOLD',
+    'STOCK', 'SHARE', 'SHARES', 'TICKER', 'SYMBOL'
+})
+COLON_PREFIXES = ('TICKER', 'SYMBOL')
+
+# คำที่ต้องมีใน context (substring) ของ ticker ที่ไม่มีรูปแบบอื่นรองรับ
+CONTEXT_KEYWORDS = (
+    'STOCK', 'SHARE', 'TICKER', 'SYMBOL', 'BUY', 'SELL', 'HOLD', 'TRADE',
+    'PRICE', 'MARKET', 'INVEST', 'PORTFOLIO', 'POSITION', 'CALL', 'PUT',
+    'OPTION', 'DIVIDEND', 'EARNINGS', 'REVENUE', 'EPS', 'PE', 'RATIO'
+)
+CONTEXT_WINDOW = 50
+MIN_CONTEXT_KEYWORD_LENGTH = min(len(k) for k in CONTEXT_KEYWORDS)
+
+# คำที่มักถูกจับเป็น ticker ผิดๆ
+IGNORE_TICKERS = frozenset({
+    'USD', 'GDP', 'CEO', 'IPO', 'ETF', 'SEC', 'IRS', 'FDA',
+    'AI', 'IT', 'TV', 'PC', 'USA', 'ON', 'ALL', 'FOR', 'THE',
+    'AND', 'OR', 'IS', 'AT', 'TO', 'IN', 'OF', 'AS', 'BE'
+})
+
+
+# ตัวอักษรที่ regex แบบ IGNORECASE ของรูปแบบ keyword เดิมถือว่าเป็น A-Z (หลัง upper())
+REGEX_CASE_ALIASES = {0x130: 'I', 0x212A: 'K'}
+
+
+def _is_ticker_token(token: str) -> bool:
+    """token เป็นตัวอักษร A-Z ล้วน 1-5 ตัว"""
+    return len(token) <= 5 and token.isascii() and token.isalpha()
+
+
+def _keyword_form(token: str) -> str:
+    """token ในมุมมองของ regex IGNORECASE (ใช้ตรวจ keyword / รูปแบบ ticker ของกฎ keyword และ colon)"""
+    return token if token.isascii() else token.translate(REGEX_CASE_ALIASES)
+
+
+class KeywordIndex:
+    """
+    ตำแหน่งของ CONTEXT_KEYWORDS ทั้งหมดในข้อความ (สร้างครั้งเดียวต่อข้อความ)
+    ใช้ตรวจว่าช่วง [start, end) มี keyword อยู่ทั้งคำหรือไม่ ด้วย binary search
+    """
+
+    def __init__(self, text_upper: str):
+        spans = []
+        for keyword in CONTEXT_KEYWORDS:
+            pos = text_upper.find(keyword)
+            while pos >= 0:
+                spans.append((pos, pos + len(keyword)))
+                pos = text_upper.find(keyword, pos + 1)
+        spans.sort()
+        self._starts = [start for start, _ in spans]
+        self._ends = [end for _, end in spans]
+
+    def has_keyword(self, start: int, end: int) -> bool:
+        """มี keyword อยู่ใน text[start:end] หรือไม่"""
+        i = bisect_left(self._starts, start)
+        last_start = end - MIN_CONTEXT_KEYWORD_LENGTH
+        while i < len(self._starts) and self._starts[i] <= last_start:
+            if self._ends[i] <= end:
+                return True
+            i += 1
+        return False
+
+
+class TickerExtractor:
+    """
+    Extract stock tickers จากข้อความ
+
+    - tokenize ข้อความ (uppercase) ครั้งเดียว แล้วตรวจแต่ละ token กับ valid_tickers (set → O(1))
+    - ตรวจรูปแบบ ($, keyword, brackets, colon) จาก token ข้างเคียง แทนการ findall หลายรอบ
+    - context check ใช้ KeywordIndex (สร้างเฉพาะเมื่อจำเป็น)
+    - ผลตรงกับ regex เดิม รวมถึงกรณี match ไม่ซ้อนกันของ findall (ตรวจด้วย scripts/benchmark_ticker_extraction.py)
+    """
+
+    def __init__(self, ignore_tickers: Optional[Iterable[str]] = None):
+        self.ignore_tickers = frozenset(ignore_tickers) if ignore_tickers is not None else IGNORE_TICKERS
+
+    @staticmethod
+    def extract_dollar(text: str) -> List[str]:
+        """
+        หา $SYMBOL ทั้งหมด (ไม่ตรวจกับรายชื่อหุ้น)
+
+        Returns:
+            List ของ tickers ตามลำดับที่พบ (ไม่ซ้ำ)
+        """
+        if not text:
+            return []
+        return list(dict.fromkeys(DOLLAR_TICKER_PATTERN.findall(text.upper())))
+
+    def extract(self, text: str, valid_tickers: Set[str]) -> Set[str]:
+        """
+        Extract tickers ที่อยู่ใน valid_tickers
+
+        Args:
+            text: ข้อความที่ต้องการ extract
+            valid_tickers: Set ของ ticker symbols ที่ถูกต้อง
+
+        Returns:
+            Set ของ ticker symbols ที่พบ
+        """
+        if not text or not valid_tickers:
+            return set()
+
+        text_upper = text.upper()
+        tokens = [(m.start(), m.end(), m.group()) for m in WORD_PATTERN.finditer(text_upper)]
+        ignore = self.ignore_tickers
+        tickers = set()
+        keyword_index = None
+        last = len(tokens) - 1
+        # regex เดิม (findall) ไม่ match ซ้อนกัน: token ที่ถูกใช้ใน match ก่อนหน้าแล้วเริ่ม match ใหม่ไม่ได้
+        # เก็บ index ของ token ที่ถูกใช้ไปแล้วของแต่ละรูปแบบ (keyword ก่อน / keyword หลัง / colon)
+        before_taken = after_taken = colon_taken = -1
+        if text_upper.isascii():
+            forms = [token for _, _, token in tokens]
+        else:
+            forms = [_keyword_form(token) for _, _, token in tokens]
+
+        for i, (start, end, token) in enumerate(tokens):
+            by_before = i == before_taken
+            by_colon = i == colon_taken
+            by_after = False
+            if i < last:
+                keyword, next_keyword = forms[i], forms[i + 1]
+                # "buy SYMBOL", "stock SYMBOL" (keyword ที่ถูกใช้เป็น SYMBOL ไปแล้วไม่นับ)
+                if (not by_before and keyword in KEYWORDS_BEFORE and _is_ticker_token(next_keyword)
+                        and text_upper[end:tokens[i + 1][0]].isspace()):
+                    before_taken = i + 1
+                # "SYMBOL is", "SYMBOL stock" (keyword ถูกใช้ไปด้วย)
+                if (next_keyword in KEYWORDS_AFTER and i != after_taken and _is_ticker_token(keyword)
+                        and text_upper[end:tokens[i + 1][0]].isspace()):
+                    after_taken = i + 1
+                    by_after = True
+                # "ticker: SYMBOL", "symbol:SYMBOL"
+                if not by_colon and keyword.endswith(COLON_PREFIXES) and _is_ticker_token(next_keyword):
+                    gap = text_upper[end:tokens[i + 1][0]]
+                    if gap[:1] == ':' and (len(gap) == 1 or gap[1:].isspace()):
+                        colon_taken = i + 1
+
+            if token in tickers or token not in valid_tickers or token in ignore or not _is_ticker_token(token):
+                continue
+
+            if by_before or by_after or by_colon:
+                tickers.add(token)
+                continue
+
+            # $SYMBOL
+            if start > 0 and text_upper[start - 1] == '$':
+                tickers.add(token)
+                continue
+
+            # (SYMBOL) / [SYMBOL]
+            if 0 < start and end < len(text_upper) and text_upper[start - 1] in '([' and text_upper[end] in ')]':
+                tickers.add(token)
+                continue
+
+            # SYMBOL (2-5 ตัว) ที่มีคำสำคัญอยู่ใกล้ตำแหน่งแรกที่พบ
+            if len(token) >= 2:
+                if keyword_index is None:
+                    keyword_index = KeywordIndex(text_upper)
+                ticker_pos = text_upper.find(token)
+                context_start = max(0, ticker_pos - CONTEXT_WINDOW)
+                context_end = min(len(text_upper), ticker_pos + len(token) + CONTEXT_WINDOW)
+                if keyword_index.has_keyword(context_start, context_end):
+                    tickers.add(token)
+
+        return tickers
+
+    def extract_many(self, texts: Iterable[str], valid_tickers: Set[str]) -> List[Set[str]]:
+        """
+        Batch API: extract tickers จากหลายข้อความ
+
+        Returns:
+            List ของ Set (ตามลำดับเดียวกับ texts)
+        """
+        if not valid_tickers:
+            return [set() for _ in texts]
+        cache: Dict[str, Set[str]] = {}
+        results = []
+        for text in texts:
+            if text not in cache:
+                cache[text] = self.extract(text, valid_tickers)
+            results.append(set(cache[text]))
+        return results
+
+
+# Global instance
+ticker_extractor = TickerExtractor()
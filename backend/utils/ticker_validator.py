@@ -1,9 +1,9 @@
 """
 ใช้รายชื่อหุ้นทั้งหมดจาก Yahoo Finance
 """
-import re
 from typing import List, Set, Optional
 from utils.stock_list_fetcher import stock_list_fetcher
+from utils.ticker_extractor import DOLLAR_TICKER_PATTERN, ticker_extractor
 
 class TickerValidator:
     """Validate and filter stock ticker symbols"""
@@ -20,7 +20,7 @@ class TickerValidator:
         }
         
         # Common valid ticker patterns (1-5 uppercase letters)
-        self.ticker_pattern = re.compile(r'\$([A-Z]{1,5})\b')
+        self.ticker_pattern = DOLLAR_TICKER_PATTERN
         
         # Known valid tickers (fallback - จะถูกแทนที่ด้วยรายชื่อจาก database)
         self.known_valid_tickers: Set[str] = {
@@ -126,16 +126,14 @@ class TickerValidator:
         if not text:
             return []
         
-        # Find all $TICKER patterns
-        matches = self.ticker_pattern.findall(text.upper())
+        # Find all $TICKER patterns (ไม่ซ้ำ)
+        matches = ticker_extractor.extract_dollar(text)
         
         # Filter valid tickers
-        valid_tickers = [
+        return [
             ticker for ticker in matches
             if self.is_valid_ticker(ticker)
         ]
-        
-        return list(set(valid_tickers))  # Remove duplicates
     
     def filter_tickers(self, tickers: List[str]) -> List[str]:
         """